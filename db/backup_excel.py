@@ -3,16 +3,21 @@
 from __future__ import annotations
 
 import ast
-import io
+import importlib
 import json
-from datetime import datetime
-from typing import Any
+from datetime import date, datetime, time, timedelta, timezone
+from decimal import Decimal
+from typing import Any, BinaryIO, Callable
 
+import numpy as np
 import pandas as pd
 import streamlit as st
-from openpyxl.utils import get_column_letter
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from psycopg.rows import tuple_row
 
 from db.backup_utils import (
+	_arquivo_temporario_download,
 	_get_pk_columns,
 	_get_serial_columns,
 	_get_tables_with_fk_children,
@@ -20,13 +25,29 @@ from db.backup_utils import (
 	_quote_identifier,
 )
 from db.backup_validate import (
+	_get_column_sql_types,
 	_get_required_columns_for_insert,
 	_get_table_column_types,
-	_prevalidate_fk_values,
+	_prevalidate_fk_staging,
 	_table_columns,
 )
 from db.db_schema import db_connect
 
+# Leitor Rust do pandas (pip install python-calamine): bem mais rápido que o openpyxl
+try:
+	importlib.import_module("python_calamine")
+	_EXCEL_READ_ENGINE: str | None = "calamine"
+except ImportError:
+	_EXCEL_READ_ENGINE = None
+
+_IMPORT_STAGING_TABLE = "_bf1_import_stage"
+_IMPORT_LINHA_COL = "_bf1_linha"
+# Linhas por lote do cursor server-side na exportação
+EXPORT_ROWS_PER_FETCH = 2000
+_EXCEL_NATIVE_TYPES = (str, int, float, Decimal, bool, datetime, date, time, timedelta)
+_INTEGER_TYPES = {"smallint", "integer", "bigint"}
+_TEXT_TYPES = {"text", "character varying", "character"}
+
 
 def _normalize_excel_typed_value(value: Any, data_type: str) -> Any:
 	dtype = (data_type or "").lower()
@@ -70,79 +91,119 @@ def _normalize_excel_typed_value(value: Any, data_type: str) -> Any:
 	return value
 
 
-def _prepare_dataframe_for_excel(df: pd.DataFrame) -> pd.DataFrame:
-	if df.empty:
-		return df
-
-	safe_df = df.copy()
-	for col in safe_df.columns:
-		series = safe_df[col]
-		if pd.api.types.is_datetime64tz_dtype(series.dtype):
-			safe_df[col] = series.dt.tz_convert("UTC").dt.tz_localize(None)
-			continue
-
-		if pd.api.types.is_object_dtype(series.dtype):
-			def _normalize_obj(value: Any) -> Any:
-				if value is None:
-					return None
-				if isinstance(value, datetime):
-					if value.tzinfo is None:
-						return value
-					return pd.Timestamp(value).tz_convert("UTC").tz_localize(None).to_pydatetime()
-				return value
-
-			safe_df[col] = series.map(_normalize_obj)
+def _normalize_distinct_values(series: pd.Series, data_type: str) -> tuple[pd.Series, int]:
+	"""Aplica `_normalize_excel_typed_value` uma vez por valor distinto da coluna."""
+	values = series.dropna()
+	if values.empty:
+		return series, 0
+	mapping = {v: _normalize_excel_typed_value(v, data_type) for v in pd.unique(values)}
+	changed = [v for v, typed in mapping.items() if typed is not v]
+	if not changed:
+		return series, 0
+	normalized = series.astype(object)
+	normalized.loc[values.index] = values.map(mapping.__getitem__)
+	return normalized, int(values.isin(changed).sum())
 
-	return safe_df
 
+def _normalize_excel_column(series: pd.Series, data_type: str) -> tuple[pd.Series, int]:
+	"""Converte a coluna inteira para o tipo PostgreSQL de destino.
 
-def _apply_excel_datetime_format(
-	writer: pd.ExcelWriter,
-	sheet_name: str,
-	df: pd.DataFrame,
-	col_types: dict[str, str],
-) -> None:
-	if df.empty:
-		return
-
-	ws = writer.sheets.get(sheet_name)
-	if ws is None:
-		return
-
-	datetime_cols: set[str] = set()
-	for col in df.columns:
-		dtype = df[col].dtype
-		db_type = col_types.get(str(col).lower(), "")
-		if pd.api.types.is_datetime64_any_dtype(dtype):
-			datetime_cols.add(str(col))
-			continue
-		if "timestamp" in db_type or db_type in {"date", "time", "timetz"}:
-			datetime_cols.add(str(col))
-
-	if not datetime_cols:
-		return
-
-	excel_dt_format = "yyyy-mm-dd hh:mm:ss"
-	excel_date_format = "yyyy-mm-dd"
-	excel_time_format = "hh:mm:ss"
-
-	for idx, col_name in enumerate(df.columns, start=1):
-		if str(col_name) not in datetime_cols:
-			continue
-
-		db_type = col_types.get(str(col_name).lower(), "")
-		if db_type == "date":
-			number_format = excel_date_format
-		elif db_type in {"time", "timetz"}:
-			number_format = excel_time_format
-		else:
-			number_format = excel_dt_format
-
-		col_letter = get_column_letter(idx)
-		for row_idx in range(2, len(df) + 2):
-			cell = ws[f"{col_letter}{row_idx}"]
-			if cell.value is not None:
-				cell.number_format = number_format
+	Retorna a coluna como objetos Python (None para vazios), pronta para COPY,
+	e quantos valores JSON/ARRAY foram reescritos.
+	"""
+	dtype = (data_type or "").lower()
+	normalized_cells = 0
+	if dtype in {"json", "jsonb", "array"}:
+		series, normalized_cells = _normalize_distinct_values(series, dtype)
+	elif dtype in _INTEGER_TYPES or dtype in _TEXT_TYPES:
+		# Colunas com vazios chegam do Excel como float (1.0): volta para inteiro.
+		if pd.api.types.is_float_dtype(series.dtype):
+			values = series.dropna().to_numpy()
+			if np.isfinite(values).all() and (values == np.floor(values)).all():
+				series = series.astype("Int64")
+	elif dtype == "boolean":
+		if pd.api.types.is_numeric_dtype(series.dtype) and not pd.api.types.is_bool_dtype(series.dtype):
+			series = series.ne(0).astype(object).where(series.notna(), None)
+
+	return series.astype(object).where(series.notna(), None), normalized_cells
+
+
+def _excel_number_format(db_type: str) -> str | None:
+	if db_type == "date":
+		return "yyyy-mm-dd"
+	if db_type.startswith("time") and not db_type.startswith("timestamp"):
+		return "hh:mm:ss"
+	if "timestamp" in db_type:
+		return "yyyy-mm-dd hh:mm:ss"
+	return None
+
+
+def _excel_value(value: Any) -> Any:
+	# Excel não guarda fuso: datas com tz saem em UTC; JSON/ARRAY/UUID saem como texto.
+	if value is None:
+		return None
+	if isinstance(value, datetime):
+		if value.tzinfo is not None:
+			return value.astimezone(timezone.utc).replace(tzinfo=None)
+		return value
+	if isinstance(value, time):
+		return value.replace(tzinfo=None)
+	if isinstance(value, _EXCEL_NATIVE_TYPES):
+		return value
+	return str(value)
+
+
+def _excel_row_writer(ws, col_types: list[str]) -> Callable[[tuple], list]:
+	"""Monta, uma vez por coluna, a conversão da linha do banco para o Excel."""
+	formats = [_excel_number_format(db_type) for db_type in col_types]
+
+	def _cell(value: Any, number_format: str) -> Any:
+		if value is None:
+			return None
+		cell = WriteOnlyCell(ws, value=value)
+		cell.number_format = number_format
+		return cell
+
+	if not any(formats):
+		return lambda row: [_excel_value(v) for v in row]
+	return lambda row: [
+		_cell(_excel_value(v), fmt) if fmt else _excel_value(v) for v, fmt in zip(row, formats)
+	]
+
+
+def _write_table_xlsx(conn, table: str, destino: BinaryIO) -> int:
+	"""Grava a tabela inteira em `destino` como .xlsx. Retorna o número de linhas.
+
+	As linhas vêm de um cursor server-side direto para uma planilha write-only:
+	nem o resultado nem a planilha ficam inteiros em memória.
+	"""
+	col_types = _get_table_column_types(conn, table)
+	wb = Workbook(write_only=True)
+	ws = wb.create_sheet("data")
+	total = 0
+	with conn.cursor(name="bf1_export_xlsx", row_factory=tuple_row) as sc:
+		sc.itersize = EXPORT_ROWS_PER_FETCH
+		sc.execute(f"SELECT * FROM {_quote_identifier(table)}")
+		col_names = [desc[0] for desc in sc.description or []]
+		ws.append(col_names)
+		write_row = _excel_row_writer(ws, [col_types.get(str(col).lower(), "") for col in col_names])
+		while True:
+			rows = sc.fetchmany(EXPORT_ROWS_PER_FETCH)
+			if not rows:
+				break
+			for row in rows:
+				ws.append(write_row(row))
+			total += len(rows)
+	wb.save(destino)
+	return total
+
+
+def _write_table_csv(conn, table: str, destino: BinaryIO) -> None:
+	"""Grava a tabela em `destino` como CSV, formatado pelo próprio PostgreSQL (COPY)."""
+	c = conn.cursor()
+	with c.copy(f"COPY (SELECT * FROM {_quote_identifier(table)}) TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+		for data in copy:
+			destino.write(data)
 
 
 def download_tabela() -> None:
@@ -152,33 +213,37 @@ def download_tabela() -> None:
 		return
 
 	selected = st.selectbox("Table to export", tables, key="export_table_select")
+	export_format = st.radio(
+		"Export format",
+		["xlsx", "csv"],
+		horizontal=True,
+		help="CSV é gerado direto pelo PostgreSQL e é a opção mais rápida para tabelas de log grandes.",
+		key="export_table_format",
+	)
 	if not selected:
 		return
 
-	with db_connect() as conn:
-		col_types = _get_table_column_types(conn, selected)
-		c = conn.cursor()
-		c.execute(f"SELECT * FROM {_quote_identifier(selected)}")
-		rows = c.fetchall() or []
-		col_names = [desc[0] for desc in c.description] if c.description else []
-
-	df = pd.DataFrame([list(r.values()) for r in rows] if rows else [], columns=col_names)
-	df_excel = _prepare_dataframe_for_excel(df)
-
-	buffer = io.BytesIO()
-	with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-		df_excel.to_excel(writer, index=False, sheet_name="data")
-		_apply_excel_datetime_format(writer, "data", df_excel, col_types)
-	buffer.seek(0)
-
-	st.download_button(
-		label=f"Download table {selected} (.xlsx)",
-		data=buffer.getvalue(),
-		file_name=f"{selected}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-		mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-		on_click="ignore",
-		width="stretch",
-	)
+	# Arquivo temporário em disco: a memória não cresce com o tamanho da tabela.
+	with _arquivo_temporario_download(f".{export_format}") as caminho:
+		with open(caminho, "wb") as arquivo, db_connect() as conn:
+			if export_format == "csv":
+				_write_table_csv(conn, selected, arquivo)
+			else:
+				_write_table_xlsx(conn, selected, arquivo)
+
+		if export_format == "csv":
+			mime = "text/csv"
+		else:
+			mime = "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+		with open(caminho, "rb") as arquivo:
+			st.download_button(
+				label=f"Download table {selected} (.{export_format})",
+				data=arquivo,
+				file_name=f"{selected}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}",
+				mime=mime,
+				on_click="ignore",
+				width="stretch",
+			)
 
 
 def upload_tabela() -> None:
@@ -198,7 +263,7 @@ def upload_tabela() -> None:
 		return
 
 	if st.button("Import table", type="primary", width="stretch"):
-		df = pd.read_excel(uploaded)
+		df = pd.read_excel(uploaded, engine=_EXCEL_READ_ENGINE)
 		df.columns = [str(col).strip() for col in df.columns]
 		db_cols = _table_columns(selected)
 		use_cols = [c for c in df.columns if c in db_cols]
@@ -222,40 +287,54 @@ def upload_tabela() -> None:
 				st.caption(f"Colunas obrigatórias ausentes: {', '.join(missing_required)}")
 				return
 
-			payload = df[use_cols].astype(object)
-			rows = []
+			payload = pd.DataFrame(index=df.index)
 			normalized_cells = 0
-			for row in payload.itertuples(index=False, name=None):
-				normalized_row: list[Any] = []
-				for idx, value in enumerate(row):
-					col_name = use_cols[idx]
-					base_value = None if pd.isna(value) else value
-					typed_value = _normalize_excel_typed_value(base_value, col_types.get(col_name.lower(), ""))
-					if typed_value is not base_value:
-						normalized_cells += 1
-					normalized_row.append(typed_value)
-				rows.append(tuple(normalized_row))
-
-			col_idx = {col: idx for idx, col in enumerate(use_cols)}
+			for col in use_cols:
+				payload[col], changed = _normalize_excel_column(df[col], col_types.get(col.lower(), ""))
+				normalized_cells += changed
+
 			for req_col in required_cols:
-				idx = col_idx.get(req_col)
-				if idx is None:
-					continue
-				for row_number, row in enumerate(rows, start=2):
-					if row[idx] is None:
-						st.error(
-							"Importação bloqueada: coluna obrigatória com valor vazio "
-							f"na tabela '{selected}'."
-						)
-						st.caption(f"Coluna: {req_col} | Linha Excel: {row_number}")
-						return
+				empty_rows = np.flatnonzero(payload[req_col].isna().to_numpy())
+				if len(empty_rows):
+					st.error(
+						"Importação bloqueada: coluna obrigatória com valor vazio "
+						f"na tabela '{selected}'."
+					)
+					st.caption(f"Coluna: {req_col} | Linha Excel: {int(empty_rows[0]) + 2}")
+					return
 
 			fk_parent_tables = _get_tables_with_fk_children(conn)
 			is_fk_parent = selected.lower() in {t.lower() for t in fk_parent_tables}
+			pk_cols = _get_pk_columns(conn, selected) if is_fk_parent else []
+			if is_fk_parent and not pk_cols:
+				st.error(
+					f"Importação bloqueada: a tabela '{selected}' é referenciada por FK "
+					"e não possui PRIMARY KEY detectada para UPSERT seguro."
+				)
+				st.info(
+					"Para evitar quebra de integridade, esse cenário não executa TRUNCATE CASCADE. "
+					"Defina uma PK na tabela ou use restore SQL completo."
+				)
+				return
+
+			# Carrega o arquivo numa tabela temporária com os tipos da tabela destino:
+			# conversões, FKs e a gravação final viram SQL sobre conjuntos.
+			c = conn.cursor()
+			sql_types = _get_column_sql_types(conn, selected)
+			qt = _quote_identifier(selected)
+			qs = _quote_identifier(_IMPORT_STAGING_TABLE)
+			ql = _quote_identifier(_IMPORT_LINHA_COL)
+			col_sql = ", ".join(_quote_identifier(col) for col in use_cols)
+			col_defs = ", ".join(f"{_quote_identifier(col)} {sql_types[col]}" for col in use_cols)
+			c.execute(f"CREATE TEMP TABLE {qs} ({ql} bigint, {col_defs}) ON COMMIT DROP")
+			with c.copy(f"COPY {qs} ({ql}, {col_sql}) FROM STDIN") as copy:
+				for row_number, row in enumerate(payload.itertuples(index=False, name=None), start=2):
+					copy.write_row((row_number, *row))
 
 			if validate_fks:
-				fk_errors = _prevalidate_fk_values(conn, selected, use_cols, rows)
+				fk_errors = _prevalidate_fk_staging(conn, selected, _IMPORT_STAGING_TABLE, use_cols)
 				if fk_errors:
+					conn.rollback()
 					st.error(
 						"Importação bloqueada por inconsistência de FK no arquivo Excel. "
 						"Corrija os valores e tente novamente."
@@ -264,59 +343,37 @@ def upload_tabela() -> None:
 						st.caption(f"- {item}")
 					return
 
-			c = conn.cursor()
-			col_sql = ", ".join(_quote_identifier(col) for col in use_cols)
-			placeholders = ", ".join(["%s"] * len(use_cols))
-
 			if is_fk_parent:
-				pk_cols = _get_pk_columns(conn, selected)
-				if not pk_cols:
-					st.error(
-						f"Importação bloqueada: a tabela '{selected}' é referenciada por FK "
-						"e não possui PRIMARY KEY detectada para UPSERT seguro."
-					)
-					st.info(
-						"Para evitar quebra de integridade, esse cenário não executa TRUNCATE CASCADE. "
-						"Defina uma PK na tabela ou use restore SQL completo."
-					)
-					return
-
 				pk_set = {col.lower() for col in pk_cols}
 				update_cols = [col for col in use_cols if col.lower() not in pk_set]
 				conflict_target = ", ".join(_quote_identifier(col) for col in pk_cols)
-
 				if update_cols:
 					update_clause = ", ".join(
 						f"{_quote_identifier(col)} = EXCLUDED.{_quote_identifier(col)}" for col in update_cols
 					)
-					upsert_sql = (
-						f"INSERT INTO {_quote_identifier(selected)} ({col_sql}) "
-						f"VALUES ({placeholders}) "
-						f"ON CONFLICT ({conflict_target}) DO UPDATE SET {update_clause}"
-					)
+					on_conflict = f"ON CONFLICT ({conflict_target}) DO UPDATE SET {update_clause}"
 				else:
-					upsert_sql = (
-						f"INSERT INTO {_quote_identifier(selected)} ({col_sql}) "
-						f"VALUES ({placeholders}) "
-						f"ON CONFLICT ({conflict_target}) DO NOTHING"
+					on_conflict = f"ON CONFLICT ({conflict_target}) DO NOTHING"
+
+				source_sql = qs
+				if all(col in use_cols for col in pk_cols):
+					# PK repetida no arquivo: vale a última linha, como no INSERT linha a linha.
+					source_sql = (
+						f"(SELECT DISTINCT ON ({conflict_target}) * FROM {qs} "
+						f"ORDER BY {conflict_target}, {ql} DESC) s"
 					)
-
-				c.executemany(upsert_sql, rows)
+				c.execute(f"INSERT INTO {qt} ({col_sql}) SELECT {col_sql} FROM {source_sql} ORDER BY {ql} {on_conflict}")
 				st.info(
 					f"⚠️ '{selected}' é referenciada por outras tabelas: linhas existentes foram "
 					"atualizadas (UPSERT) e linhas ausentes no Excel foram mantidas. "
 					"Nenhum dado filho foi apagado."
 				)
 			else:
-				c.execute(f"TRUNCATE TABLE {_quote_identifier(selected)} RESTART IDENTITY CASCADE")
-				c.executemany(
-					f"INSERT INTO {_quote_identifier(selected)} ({col_sql}) VALUES ({placeholders})",
-					rows,
-				)
+				c.execute(f"TRUNCATE TABLE {qt} RESTART IDENTITY CASCADE")
+				c.execute(f"INSERT INTO {qt} ({col_sql}) SELECT {col_sql} FROM {qs} ORDER BY {ql}")
 
 			serial_cols = _get_serial_columns(conn, selected)
 			for col in serial_cols:
-				qt = _quote_identifier(selected)
 				qc = _quote_identifier(col)
 				c.execute(
 					f"""
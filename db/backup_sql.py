@@ -2,31 +2,39 @@
 
 from __future__ import annotations
 
+import io
+import itertools
+import logging
+import re
 from datetime import datetime
+from typing import BinaryIO, Iterable, Iterator, cast
 
 import streamlit as st
 
-from db.backup_repair import _repair_insert_legacy_literals
+from db.backup_repair import _repair_insert_legacy_literals, _sanitize_identifier
 from db.backup_utils import (
-    _build_data_only_sql,
+    _abrir_backup_sql,
+    _arquivo_temporario_download,
     _build_pg_env_from_database_url,
     _detect_cmd,
     _execute_with_savepoint,
     _extract_insert_table,
     _extract_truncate_tables,
-    _generate_backup_sql_content,
     _is_array_syntax_error,
     _is_fk_violation_error,
     _is_json_syntax_error,
     _list_tables,
     _prepare_schema_for_restore,
+    _psql_de_pedacos,
     _quote_identifier,
     _run_command,
     _run_fix_sequences_after_restore,
+    escrever_backup_sql,
 )
 from db.db_config import DATABASE_URL
 from db.db_schema import db_connect
 
+logger = logging.getLogger(__name__)
 
 def get_postgres_backup_mode() -> tuple[str, str]:
     pg_env, dbname = _build_pg_env_from_database_url(DATABASE_URL)
@@ -59,23 +67,518 @@ def get_postgres_backup_mode() -> tuple[str, str]:
 
 
 def download_db() -> None:
-    sql_content, mode = _generate_backup_sql_content()
-    label = "Download PostgreSQL full backup (.sql)"
-    if mode == "fallback":
-        label = "Download PostgreSQL data-only backup (.sql)"
-
-    st.download_button(
-        label=label,
-        data=sql_content.encode("utf-8"),
-        file_name=f"bf1_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql",
-        mime="application/sql",
-        on_click="ignore",
-        width="stretch",
-    )
+    # Dump compactado direto num arquivo temporário: a memória não cresce com o banco.
+    with _arquivo_temporario_download(".sql.gz") as caminho:
+        with open(caminho, "wb") as arquivo:
+            mode = escrever_backup_sql(arquivo, compressao="gzip")
+        label = "Download PostgreSQL full backup (.sql.gz)"
+        if mode == "fallback":
+            label = "Download PostgreSQL data-only backup (.sql.gz)"
+
+        with open(caminho, "rb") as arquivo:
+            st.download_button(
+                label=label,
+                data=arquivo,
+                file_name=f"bf1_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql.gz",
+                mime="application/gzip",
+                on_click="ignore",
+                width="stretch",
+            )
 
 
-def restore_backup_from_sql(sql_content: str) -> bool:
-    is_data_only = "BF1 POSTGRES DATA-ONLY DUMP" in (sql_content[:4096] or "")
+# Linhas acumuladas por COPY ao agrupar INSERTs consecutivos da mesma tabela
+RESTORE_LINHAS_POR_COPY = 5000
+
+# Literal simples inteiro (atalho) ou um caractere que muda o estado do parser
+_SQL_ESPECIAIS = re.compile(r"'[^']*(?:''[^']*)*'|[;'\"$/-]")
+# Comando inteiro sem comentários, E-strings nem $tag$ (o caso dos dumps BF1), casado
+# em C. Os literais não podem terminar antes de outra aspa: sem ambiguidade, sem
+# retrocesso exponencial quando o comando ainda não chegou inteiro.
+_COMANDO_SIMPLES = re.compile(
+    r"""(?:[^;'"$/-]|-(?!-)|/(?!\*)|'[^']*(?:''[^']*)*'(?!')|"[^"]*(?:""[^"]*)*"(?!"))*;"""
+)
+_INICIO_E_STRING = re.compile(r"(?<![\w$])[Ee]'")
+_VALOR_SIMPLES = re.compile(
+    r"\s*(?:(NULL)|(TRUE|FALSE)|([+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?)|'([^']*(?:''[^']*)*)')\s*([,)])",
+    re.IGNORECASE,
+)
+_SQL_ESTRUTURA = re.compile(r"[Ee]'[^'\\]*(?:(?:\\.|'')[^'\\]*)*'|'[^']*(?:''[^']*)*'|[()\[\],]")
+_SQL_E_STRING = re.compile(r"[\\']")
+_DOLLAR_TAG = re.compile(r"\$(?:[A-Za-z_][A-Za-z0-9_]*)?\$")
+_COPY_FROM_STDIN = re.compile(r"^\s*COPY\s+.+\s+FROM\s+stdin\b", re.IGNORECASE | re.DOTALL)
+_INSERT_CABECALHO = re.compile(
+    r'^\s*INSERT\s+INTO\s+"?([A-Za-z_][A-Za-z0-9_]*)"?\s*\(([^()]*)\)\s*VALUES\s*',
+    re.IGNORECASE,
+)
+_NUMERO_SQL = re.compile(r"^[+-]?(?:\d+(?:\.\d*)?|\.\d+)(?:[eE][+-]?\d+)?$")
+
+
+def iter_sql_statements(pedacos: Iterable[str]) -> Iterator[tuple[str, str | None]]:
+    """Divide um dump SQL em comandos à medida que os pedaços chegam.
+
+    Respeita literais ('...', E'...', $tag$...$tag$) e identificadores "...";
+    comentários (-- e /* */) fora deles são descartados. Blocos
+    `COPY ... FROM stdin` do pg_dump saem como (comando, dados); os demais
+    comandos como (comando, None).
+    """
+    buf = ""
+    pos = 0
+    estado: str | None = None  # None, "'", "E", '"', "copy" ou a tag $...$
+    for pedaco in itertools.chain(pedacos, [None]):
+        final = pedaco is None
+        if not final:
+            buf += pedaco
+        while True:
+            if estado == "copy":
+                if buf.startswith("\\.\n") or (final and buf.rstrip("\r\n") == "\\."):
+                    fim, dados = buf.find("\n") + 1, ""
+                else:
+                    idx = buf.find("\n\\.\n")
+                    if idx < 0 and final and buf.endswith("\n\\."):
+                        idx = len(buf) - 3
+                    if idx < 0:
+                        if final:
+                            fim, dados = len(buf), buf
+                        else:
+                            break
+                    else:
+                        fim, dados = idx + 4, buf[: idx + 1]
+                yield copy_stmt, dados
+                buf, pos, estado = buf[fim:], 0, None
+                continue
+
+            if estado is None and pos == 0:
+                m = _COMANDO_SIMPLES.match(buf)
+                if m and not _INICIO_E_STRING.search(buf, 0, m.end()):
+                    stmt = buf[: m.end() - 1].strip()
+                    if not _COPY_FROM_STDIN.match(stmt):
+                        buf = buf[m.end() :]
+                        if stmt:
+                            yield stmt, None
+                        continue
+
+            if estado is None:
+                m = _SQL_ESPECIAIS.search(buf, pos)
+                if not m:
+                    pos = len(buf)
+                    break
+                i = m.start()
+                ch = buf[i]
+                if ch == "'":
+                    anterior = buf[i - 2 : i] if i >= 2 else " " + buf[:i]
+                    if anterior[-1:] in ("E", "e") and not (anterior[:1].isalnum() or anterior[:1] == "_"):
+                        estado, pos = "E", i + 1
+                    elif m.end() - i > 1 and (m.end() < len(buf) or final):
+                        pos = m.end()
+                    else:
+                        # Literal pode continuar no próximo pedaço.
+                        estado, pos = "'", i + 1
+                    continue
+                if ch == ";":
+                    stmt = buf[:i].strip()
+                    buf, pos = buf[i + 1 :], 0
+                    if not stmt:
+                        continue
+                    if _COPY_FROM_STDIN.match(stmt):
+                        copy_stmt = stmt
+                        # Os dados começam na linha seguinte ao comando.
+                        if not buf and not final:
+                            estado = "copy_inicio"
+                            break
+                        buf = buf[buf.find("\n") + 1 :] if "\n" in buf else ""
+                        estado = "copy"
+                        continue
+                    yield stmt, None
+                    continue
+                if ch in "-/" and i + 1 >= len(buf) and not final:
+                    pos = i
+                    break
+                if ch == "-":
+                    if buf[i + 1 : i + 2] != "-":
+                        pos = i + 1
+                        continue
+                    fim = buf.find("\n", i)
+                    if fim < 0:
+                        if not final:
+                            pos = i
+                            break
+                        fim = len(buf)
+                    buf, pos = buf[:i] + " " + buf[fim:], i
+                    continue
+                if ch == "/":
+                    if buf[i + 1 : i + 2] != "*":
+                        pos = i + 1
+                        continue
+                    fim = buf.find("*/", i + 2)
+                    if fim < 0:
+                        if not final:
+                            pos = i
+                            break
+                        fim = len(buf) - 2
+                    buf, pos = buf[:i] + " " + buf[fim + 2 :], i
+                    continue
+                if ch == "$":
+                    tag = _DOLLAR_TAG.match(buf, i)
+                    if tag:
+                        estado, pos = tag.group(0), tag.end()
+                        continue
+                    if not final and len(buf) - i < 64 and "$" not in buf[i + 1 :]:
+                        pos = i
+                        break
+                    pos = i + 1
+                    continue
+                estado, pos = '"', i + 1
+                continue
+
+            if estado == "copy_inicio":
+                buf = buf[buf.find("\n") + 1 :] if "\n" in buf else ""
+                estado = "copy"
+                if not buf and not final:
+                    break
+                continue
+
+            if estado in ("'", '"'):
+                j = buf.find(estado, pos)
+                if j < 0 or (j + 1 >= len(buf) and not final):
+                    if final:
+                        break
+                    pos = max(pos, j if j >= 0 else len(buf))
+                    break
+                if buf[j + 1 : j + 2] == estado:
+                    pos = j + 2
+                else:
+                    estado, pos = None, j + 1
+                continue
+
+            if estado == "E":
+                m = _SQL_E_STRING.search(buf, pos)
+                if not m or (m.start() + 1 >= len(buf) and not final):
+                    if final:
+                        break
+                    pos = m.start() if m else len(buf)
+                    break
+                j = m.start()
+                if buf[j] == "\\":
+                    pos = j + 2
+                elif buf[j + 1 : j + 2] == "'":
+                    pos = j + 2
+                else:
+                    estado, pos = None, j + 1
+                continue
+
+            # Dentro de $tag$ ... $tag$
+            j = buf.find(estado, pos)
+            if j < 0:
+                if final:
+                    break
+                pos = max(pos, len(buf) - len(estado) + 1)
+                break
+            estado, pos = None, j + len(estado)
+        if final:
+            break
+
+    resto = buf.strip()
+    if resto and estado is None:
+        yield resto, None
+    elif resto:
+        raise ValueError("Backup SQL truncado: literal ou bloco COPY sem fim")
+
+
+def _dividir_itens_sql(texto: str, inicio: int, fechamento: str) -> tuple[list[str], int] | None:
+    """Separa itens por vírgula até o `fechamento` de nível zero. Retorna (itens, fim)."""
+    itens: list[str] = []
+    profundidade = 0
+    atual = inicio
+    for m in _SQL_ESTRUTURA.finditer(texto, inicio):
+        ch = m.group(0)
+        if len(ch) > 1:
+            continue  # literal de texto
+        if ch in "([":
+            profundidade += 1
+        elif ch in ")]":
+            if profundidade == 0:
+                if ch != fechamento:
+                    return None
+                itens.append(texto[atual : m.start()].strip())
+                return itens, m.end()
+            profundidade -= 1
+        elif profundidade == 0:
+            itens.append(texto[atual : m.start()].strip())
+            atual = m.end()
+    return None
+
+
+def _parse_insert_values(stmt: str) -> tuple[str, list[str], list[tuple[str, list[str | None] | None]]] | None:
+    """Decompõe `INSERT INTO t (cols) VALUES (...), (...)` para carga por COPY.
+
+    Retorna (tabela, colunas, linhas), cada linha como (texto SQL da tupla,
+    valores em texto COPY ou None se algum literal não for convertível).
+    """
+    m = _INSERT_CABECALHO.match(stmt)
+    if not m:
+        return None
+    try:
+        tabela = _sanitize_identifier(m.group(1))
+        colunas = [_sanitize_identifier(c.strip().strip('"')) for c in m.group(2).split(",")]
+    except ValueError:
+        return None
+
+    n_colunas = len(colunas)
+    linhas: list[tuple[str, list[str | None] | None]] = []
+    i, n = m.end(), len(stmt)
+    while True:
+        while i < n and stmt[i].isspace():
+            i += 1
+        if i >= n or stmt[i] != "(":
+            return None
+        inicio = i
+
+        # Caminho rápido: só NULL, booleanos, números e textos simples.
+        valores: list[str | None] | None = []
+        j = i + 1
+        fechou = False
+        while True:
+            v = _VALOR_SIMPLES.match(stmt, j)
+            if not v:
+                break
+            nulo, booleano, numero, texto, separador = v.groups()
+            if nulo:
+                valores.append(None)
+            elif booleano:
+                valores.append("t" if booleano.upper() == "TRUE" else "f")
+            elif numero is not None:
+                valores.append(numero)
+            else:
+                valores.append(texto.replace("''", "'") if "''" in texto else texto)
+            j = v.end()
+            if separador == ")":
+                fechou = True
+                break
+
+        if fechou and len(valores) == n_colunas:
+            i = j
+        else:
+            resultado = _dividir_itens_sql(stmt, inicio + 1, ")")
+            if resultado is None:
+                return None
+            itens, i = resultado
+            if len(itens) != n_colunas:
+                return None
+            valores = _linha_para_copy(itens)
+        linhas.append((stmt[inicio:i], valores))
+
+        while i < n and stmt[i].isspace():
+            i += 1
+        if i >= n:
+            return tabela, colunas, linhas
+        if stmt[i] != ",":
+            # ON CONFLICT, RETURNING etc.: fica para a execução comando a comando.
+            return None
+        i += 1
+
+
+def _texto_literal_sql(literal: str) -> str | None:
+    if len(literal) >= 2 and literal[0] == "'" and literal[-1] == "'":
+        interno = literal[1:-1]
+        if "'" not in interno.replace("''", ""):
+            return interno.replace("''", "'")
+    return None
+
+
+def _elemento_array_copy(literal: str) -> str | None:
+    if literal.upper() == "NULL":
+        return "NULL"
+    if literal[:6].upper() == "ARRAY[":
+        return _array_para_copy(literal)
+    valor = _valor_copy(literal)
+    if valor is None:
+        return None
+    return '"' + valor.replace("\\", "\\\\").replace('"', '\\"') + '"'
+
+
+def _array_para_copy(literal: str) -> str | None:
+    resultado = _dividir_itens_sql(literal, 6, "]")
+    if resultado is None or resultado[1] != len(literal):
+        return None
+    itens = [i for i in resultado[0] if i] if resultado[0] != [""] else []
+    elementos = [_elemento_array_copy(item) for item in itens]
+    if any(e is None for e in elementos):
+        return None
+    return "{" + ",".join(cast(list[str], elementos)) + "}"
+
+
+def _valor_copy(literal: str) -> str | None:
+    """Texto COPY de um literal simples; None quando o literal não é convertível."""
+    upper = literal.upper()
+    if upper in ("TRUE", "FALSE"):
+        return "t" if upper == "TRUE" else "f"
+    if _NUMERO_SQL.match(literal):
+        return literal
+    if upper.startswith("ARRAY["):
+        return _array_para_copy(literal)
+    return _texto_literal_sql(literal)
+
+
+def _linha_para_copy(literais: list[str]) -> list[str | None] | None:
+    linha: list[str | None] = []
+    for literal in literais:
+        if literal.upper() == "NULL":
+            linha.append(None)
+            continue
+        valor = _valor_copy(literal)
+        if valor is None:
+            return None
+        linha.append(valor)
+    return linha
+
+
+def _restaurar_comandos(conn, comandos: Iterable[tuple[str, str | None]]) -> None:
+    """Aplica os comandos do dump na transação de `conn` (sem commit).
+
+    INSERTs consecutivos da mesma tabela e colunas são agrupados e carregados por
+    COPY FROM STDIN. Se um lote falha, só ele é refeito linha a linha, com o
+    reparo de literais legados e a fila de pendências de FK.
+    """
+    c = conn.cursor()
+    existing_tables = {t.lower() for t in _list_tables()}
+    pending_fk_inserts: list[tuple[str, str]] = []
+    lote_chave: tuple[str, tuple[str, ...]] | None = None
+    lote_linhas: list[list[str | None]] = []
+    lote_textos: list[str] = []
+
+    def _executar_insert(stmt: str, insert_table: str) -> None:
+        ok_stmt, err_stmt = _execute_with_savepoint(c, stmt)
+        if ok_stmt:
+            return
+
+        if err_stmt and (_is_json_syntax_error(err_stmt) or _is_array_syntax_error(err_stmt)):
+            repaired_stmt = _repair_insert_legacy_literals(conn, stmt, insert_table)
+            if repaired_stmt and repaired_stmt != stmt:
+                ok_repaired, err_repaired = _execute_with_savepoint(c, repaired_stmt)
+                if ok_repaired:
+                    return
+                err_stmt = err_repaired if err_repaired else err_stmt
+
+        if err_stmt and _is_fk_violation_error(err_stmt):
+            pending_fk_inserts.append((stmt, str(err_stmt)))
+            return
+
+        raise err_stmt if err_stmt else RuntimeError("Unknown restore statement error")
+
+    def _descarregar_lote() -> None:
+        nonlocal lote_chave
+        if lote_chave is None:
+            return
+        tabela, colunas = lote_chave
+        qt = _quote_identifier(tabela)
+        col_sql = ", ".join(_quote_identifier(col) for col in colunas)
+        c.execute("SAVEPOINT bf1_restore_copy")
+        try:
+            with c.copy(f"COPY {qt} ({col_sql}) FROM STDIN") as copy:
+                for linha in lote_linhas:
+                    copy.write_row(linha)
+            c.execute("RELEASE SAVEPOINT bf1_restore_copy")
+        except Exception as exc:
+            c.execute("ROLLBACK TO SAVEPOINT bf1_restore_copy")
+            c.execute("RELEASE SAVEPOINT bf1_restore_copy")
+            logger.info("COPY em %s falhou (%s); refazendo %d linha(s) uma a uma", tabela, exc, len(lote_textos))
+            for texto in lote_textos:
+                _executar_insert(f"INSERT INTO {qt} ({col_sql}) VALUES {texto}", tabela)
+        lote_chave = None
+        lote_linhas.clear()
+        lote_textos.clear()
+
+    for stmt, copy_data in comandos:
+        upper = stmt.upper()
+
+        if upper.startswith("INSERT"):
+            insert_table = _extract_insert_table(stmt)
+            if insert_table and insert_table.lower() not in existing_tables:
+                continue
+            parsed = _parse_insert_values(stmt)
+            # Literal fora do formato simples: o comando original é executado, na ordem.
+            if parsed is not None and all(valores is not None for _, valores in parsed[2]):
+                tabela, colunas, linhas = parsed
+                chave = (tabela, tuple(colunas))
+                if chave != lote_chave:
+                    _descarregar_lote()
+                    lote_chave = chave
+                for texto, valores in linhas:
+                    lote_linhas.append(cast(list, valores))
+                    lote_textos.append(texto)
+                if len(lote_linhas) >= RESTORE_LINHAS_POR_COPY:
+                    _descarregar_lote()
+                continue
+            _descarregar_lote()
+            if insert_table:
+                _executar_insert(stmt, insert_table)
+                continue
+
+        _descarregar_lote()
+        if upper in {"BEGIN", "COMMIT", "ROLLBACK"}:
+            continue
+
+        if upper.startswith("TRUNCATE TABLE"):
+            tables = _extract_truncate_tables(stmt)
+            if tables is not None:
+                valid_tables = [t for t in tables if t.lower() in existing_tables]
+                if not valid_tables:
+                    continue
+                stmt = (
+                    "TRUNCATE TABLE "
+                    + ", ".join(_quote_identifier(t) for t in valid_tables)
+                    + " RESTART IDENTITY CASCADE"
+                )
+
+        if copy_data is not None:
+            with c.copy(stmt) as copy:
+                copy.write(copy_data)
+            continue
+
+        ok_stmt, err_stmt = _execute_with_savepoint(c, stmt)
+        if not ok_stmt:
+            raise err_stmt if err_stmt else RuntimeError("Unknown restore statement error")
+
+    _descarregar_lote()
+
+    max_passes = max(2, len(existing_tables) + 1)
+    for _ in range(max_passes):
+        if not pending_fk_inserts:
+            break
+
+        next_pending: list[tuple[str, str]] = []
+        progress = 0
+        for stmt, _last_error in pending_fk_inserts:
+            ok_stmt, err_stmt = _execute_with_savepoint(c, stmt)
+            if ok_stmt:
+                progress += 1
+                continue
+
+            if err_stmt and _is_fk_violation_error(err_stmt):
+                next_pending.append((stmt, str(err_stmt)))
+                continue
+
+            raise err_stmt if err_stmt else RuntimeError("Unknown restore statement error")
+
+        pending_fk_inserts = next_pending
+        if progress == 0:
+            break
+
+    if pending_fk_inserts:
+        first_error = pending_fk_inserts[0][1]
+        raise RuntimeError(
+            "Restore failed: unresolved foreign key dependencies in "
+            f"{len(pending_fk_inserts)} INSERT statement(s). First error: {first_error}"
+        )
+
+
+def restaurar_backup_sql(arquivo: BinaryIO) -> bool:
+    """Restaura um backup .sql, .sql.gz ou .sql.zst lido em streaming de `arquivo`.
+
+    Usa o psql quando disponível; senão, o parser incremental com carga por COPY.
+    """
+    cabecalho = next(_abrir_backup_sql(arquivo), "")[:4096]
+    is_data_only = "BF1 POSTGRES DATA-ONLY DUMP" in cabecalho
     if is_data_only:
         try:
             _prepare_schema_for_restore()
@@ -83,14 +586,8 @@ def restore_backup_from_sql(sql_content: str) -> bool:
             st.error(f"Failed to prepare schema for restore: {exc}")
             return False
 
-    pg_env, dbname = _build_pg_env_from_database_url(DATABASE_URL)
-    psql = _detect_cmd(("psql", "psql16", "psql15", "psql14"))
-    if psql:
-        ok, _, err = _run_command(
-            [psql, "-d", dbname, "-v", "ON_ERROR_STOP=1"],
-            sql_input=sql_content,
-            env_overrides=pg_env,
-        )
+    if _detect_cmd(("psql", "psql16", "psql15", "psql14")):
+        ok, err = _psql_de_pedacos(_abrir_backup_sql(arquivo))
         if ok:
             try:
                 _run_fix_sequences_after_restore()
@@ -99,84 +596,9 @@ def restore_backup_from_sql(sql_content: str) -> bool:
             return True
         st.warning(f"psql failed, trying statement execution. Detail: {err.strip()}")
 
-    statements = [s.strip() for s in sql_content.split(";") if s.strip()]
     try:
         with db_connect() as conn:
-            c = conn.cursor()
-            existing_tables = {t.lower() for t in _list_tables()}
-            pending_fk_inserts: list[tuple[str, str]] = []
-
-            for stmt in statements:
-                upper = stmt.upper()
-                if upper in {"BEGIN", "COMMIT", "ROLLBACK"}:
-                    continue
-                if stmt.strip().startswith("--"):
-                    continue
-
-                if upper.startswith("TRUNCATE TABLE"):
-                    tables = _extract_truncate_tables(stmt)
-                    if tables is not None:
-                        valid_tables = [t for t in tables if t.lower() in existing_tables]
-                        if not valid_tables:
-                            continue
-                        stmt = (
-                            "TRUNCATE TABLE "
-                            + ", ".join(_quote_identifier(t) for t in valid_tables)
-                            + " RESTART IDENTITY CASCADE"
-                        )
-
-                insert_table = _extract_insert_table(stmt)
-                if insert_table and insert_table.lower() not in existing_tables:
-                    continue
-
-                ok_stmt, err_stmt = _execute_with_savepoint(c, stmt)
-                if ok_stmt:
-                    continue
-
-                if insert_table and err_stmt and (_is_json_syntax_error(err_stmt) or _is_array_syntax_error(err_stmt)):
-                    repaired_stmt = _repair_insert_legacy_literals(conn, stmt, insert_table)
-                    if repaired_stmt and repaired_stmt != stmt:
-                        ok_repaired, err_repaired = _execute_with_savepoint(c, repaired_stmt)
-                        if ok_repaired:
-                            continue
-                        err_stmt = err_repaired if err_repaired else err_stmt
-
-                if insert_table and err_stmt and _is_fk_violation_error(err_stmt):
-                    pending_fk_inserts.append((stmt, str(err_stmt)))
-                    continue
-
-                raise err_stmt if err_stmt else RuntimeError("Unknown restore statement error")
-
-            max_passes = max(2, len(existing_tables) + 1)
-            for _ in range(max_passes):
-                if not pending_fk_inserts:
-                    break
-
-                next_pending: list[tuple[str, str]] = []
-                progress = 0
-                for stmt, _last_error in pending_fk_inserts:
-                    ok_stmt, err_stmt = _execute_with_savepoint(c, stmt)
-                    if ok_stmt:
-                        progress += 1
-                        continue
-
-                    if err_stmt and _is_fk_violation_error(err_stmt):
-                        next_pending.append((stmt, str(err_stmt)))
-                        continue
-
-                    raise err_stmt if err_stmt else RuntimeError("Unknown restore statement error")
-
-                pending_fk_inserts = next_pending
-                if progress == 0:
-                    break
-
-            if pending_fk_inserts:
-                first_error = pending_fk_inserts[0][1]
-                raise RuntimeError(
-                    "Restore failed: unresolved foreign key dependencies in "
-                    f"{len(pending_fk_inserts)} INSERT statement(s). First error: {first_error}"
-                )
-
+            _restaurar_comandos(conn, iter_sql_statements(_abrir_backup_sql(arquivo)))
             conn.commit()
 
         try:
@@ -189,19 +611,22 @@ def restore_backup_from_sql(sql_content: str) -> bool:
         return False
 
 
+def restore_backup_from_sql(sql_content: str) -> bool:
+    return restaurar_backup_sql(io.BytesIO(sql_content.encode("utf-8")))
+
+
 def upload_db() -> None:
     uploaded = st.file_uploader(
         "Upload PostgreSQL SQL backup",
-        type=["sql"],
-        help="Only PostgreSQL SQL dumps are accepted.",
+        type=["sql", "gz", "zst"],
+        help="Only PostgreSQL SQL dumps are accepted (plain, gzip or zstd).",
         key="upload_sql_backup",
     )
     if not uploaded:
         return
 
     if st.button("Restore SQL backup", type="primary", width="stretch"):
-        sql_text = uploaded.getvalue().decode("utf-8", errors="ignore")
-        if restore_backup_from_sql(sql_text):
+        if restaurar_backup_sql(uploaded):
             st.success("Backup restored successfully.")
         else:
             st.error("Backup restore failed.")
@@ -1,23 +1,35 @@
 import io
 import ast
+import gzip
+import importlib
 import json
 import os
 import re
 import shutil
 import subprocess
-from collections import defaultdict
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime
 from pathlib import Path
-from typing import Any
+from typing import Any, BinaryIO, Iterable, Iterator
 from urllib.parse import parse_qs, unquote, urlparse
 
-import pandas as pd
 import streamlit as st
-from openpyxl.utils import get_column_letter
 
 from db.db_config import DATABASE_URL
 from db.db_schema import db_connect
+from db.query_cache import invalidar_tabelas
 
+try:
+    zstandard = importlib.import_module("zstandard")
+except ImportError:
+    zstandard = None
+
+# Linhas por INSERT multi-linha (e por lote do cursor server-side) no dump data-only
+BACKUP_LINHAS_POR_INSERT = 500
+_BACKUP_CHUNK_BYTES = 1 << 20
+_GZIP_MAGIC = b"\x1f\x8b"
+_ZSTD_MAGIC = b"\x28\xb5\x2f\xfd"
 
 def _sanitize_identifier(identifier: str) -> str:
     value = (identifier or "").strip()
@@ -96,13 +108,16 @@ def _build_pg_env_from_database_url(database_url: str) -> tuple[dict[str, str],
 def _list_tables() -> list[str]:
     with db_connect() as conn:
         c = conn.cursor()
+        # Partições ficam de fora: seus dados já saem pela tabela particionada.
         c.execute(
             """
-            SELECT table_name
-            FROM information_schema.tables
-            WHERE table_schema = current_schema()
-              AND table_type = 'BASE TABLE'
-            ORDER BY table_name
+            SELECT c.relname AS table_name
+            FROM pg_class c
+            JOIN pg_namespace n ON n.oid = c.relnamespace
+            WHERE n.nspname = current_schema()
+              AND c.relkind IN ('r', 'p')
+              AND NOT c.relispartition
+            ORDER BY c.relname
             """
         )
         return [str(r['table_name']) for r in (c.fetchall() or []) if r and r['table_name']]
@@ -269,132 +284,43 @@ def _get_tables_with_fk_children(conn) -> set[str]:
     return {str(r['parent_table']) for r in (c.fetchall() or []) if r and r['parent_table']}
 
 
-def _get_fk_constraints(conn, table: str) -> list[dict[str, Any]]:
-    """Retorna constraints FK da tabela destino para validação prévia opcional."""
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT
-            tc.constraint_name,
-            kcu.column_name AS local_column,
-            ccu.table_name AS parent_table,
-            ccu.column_name AS parent_column,
-            kcu.ordinal_position
-        FROM information_schema.table_constraints tc
-        JOIN information_schema.key_column_usage kcu
-          ON tc.constraint_name = kcu.constraint_name
-         AND tc.table_schema = kcu.table_schema
-        JOIN information_schema.constraint_column_usage ccu
-          ON ccu.constraint_name = tc.constraint_name
-         AND ccu.table_schema = tc.table_schema
-        WHERE tc.constraint_type = 'FOREIGN KEY'
-          AND tc.table_schema = current_schema()
-          AND tc.table_name = %s
-        ORDER BY tc.constraint_name, kcu.ordinal_position
-        """,
-        (table,),
-    )
-
-    grouped: dict[str, dict[str, Any]] = defaultdict(
-        lambda: {"local_columns": [], "parent_columns": [], "parent_table": ""}
-    )
-    for row in c.fetchall() or []:
-        name = str(row["constraint_name"])
-        grouped[name]["parent_table"] = str(row["parent_table"])
-        grouped[name]["local_columns"].append(str(row["local_column"]))
-        grouped[name]["parent_columns"].append(str(row["parent_column"]))
-
-    constraints: list[dict[str, Any]] = []
-    for name, data in grouped.items():
-        constraints.append(
-            {
-                "constraint_name": name,
-                "parent_table": data["parent_table"],
-                "local_columns": data["local_columns"],
-                "parent_columns": data["parent_columns"],
-            }
-        )
-    return constraints
-
-
-def _prevalidate_fk_values(
-    conn,
-    selected: str,
-    use_cols: list[str],
-    rows: list[tuple[Any, ...]],
-) -> list[str]:
-    """Valida FKs do payload antes de gravar para erro amigável pré-transação de escrita."""
-    if not rows:
-        return []
-
-    constraints = _get_fk_constraints(conn, selected)
-    if not constraints:
-        return []
-
-    col_idx = {col: idx for idx, col in enumerate(use_cols)}
-    errors: list[str] = []
-    c = conn.cursor()
-
-    for fk in constraints:
-        local_cols = fk["local_columns"]
-        parent_cols = fk["parent_columns"]
-        parent_table = fk["parent_table"]
-        fk_name = fk["constraint_name"]
-
-        # Só valida FKs cujas colunas estão presentes no arquivo importado.
-        if any(col not in col_idx for col in local_cols):
-            continue
-
-        distinct_keys: set[tuple[Any, ...]] = set()
-        for row in rows:
-            values = tuple(row[col_idx[col]] for col in local_cols)
-            # FK com qualquer coluna NULL é permitida (sem checar referência).
-            if any(v is None for v in values):
-                continue
-            distinct_keys.add(values)
-
-        for key_values in distinct_keys:
-            where_sql = " AND ".join(f"{_quote_identifier(pc)} = %s" for pc in parent_cols)
-            check_sql = (
-                f"SELECT 1 FROM {_quote_identifier(parent_table)} "
-                f"WHERE {where_sql} LIMIT 1"
-            )
-            c.execute(check_sql, key_values)
-            if c.fetchone() is None:
-                key_map = ", ".join(f"{lc}={val!r}" for lc, val in zip(local_cols, key_values))
-                errors.append(
-                    f"FK {fk_name}: valor não encontrado em {parent_table} ({key_map})"
-                )
-                if len(errors) >= 10:
-                    return errors
-
-    return errors
-
-
 def _run_fix_sequences_after_restore() -> None:
-    """Ressincroniza sequences após restore SQL para evitar colisões de ID."""
+    """Ressincroniza sequences e descarta caches de schema/regras/consultas após restore SQL."""
+    from db.db_schema import carregar_catalogo_schema, invalidar_catalogo_schema
     from db.migrations import fix_sequences
+    from db.rules_utils import invalidar_cache_regras
 
-    fix_sequences()
+    invalidar_catalogo_schema()
+    invalidar_cache_regras()
+    invalidar_tabelas()
+    try:
+        fix_sequences()
+    finally:
+        carregar_catalogo_schema()
 
 
-def _build_data_only_sql() -> str:
-    lines: list[str] = [
-        "-- BF1 POSTGRES DATA-ONLY DUMP",
-        f"-- generated_at_utc: {datetime.utcnow().isoformat()}Z",
-        "BEGIN;",
-    ]
+def iter_data_only_sql(linhas_por_insert: int = BACKUP_LINHAS_POR_INSERT) -> Iterator[str]:
+    """Gera o dump data-only em pedaços, com memória constante.
+
+    Cada tabela é lida por um cursor nomeado (server-side) em lotes de
+    `linhas_por_insert` linhas, e cada lote vira um INSERT multi-linha. Tudo roda
+    numa transação REPEATABLE READ, então as tabelas saem do mesmo snapshot.
+    """
+    yield "-- BF1 POSTGRES DATA-ONLY DUMP\n"
+    yield f"-- generated_at_utc: {datetime.utcnow().isoformat()}Z\n"
+    yield "BEGIN;\n"
 
     tables = _order_tables_for_dump(_list_tables())
     if tables:
         trunc = ", ".join(_quote_identifier(t) for t in tables)
-        lines.append(f"TRUNCATE TABLE {trunc} RESTART IDENTITY CASCADE;")
+        yield f"TRUNCATE TABLE {trunc} RESTART IDENTITY CASCADE;\n"
 
     sequence_reset_lines: list[str] = []
 
     with db_connect() as conn:
         c = conn.cursor()
-        for table in tables:
+        c.execute("SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY")
+        for idx, table in enumerate(tables):
             c.execute(
                 """
                 SELECT column_name, data_type
@@ -415,19 +341,24 @@ def _build_data_only_sql() -> str:
             if not cols:
                 continue
 
+            qt = _quote_identifier(table)
             col_sql = ", ".join(_quote_identifier(cn) for cn in cols)
-            c.execute(f"SELECT {col_sql} FROM {_quote_identifier(table)}")
-            for row in c.fetchall() or []:
-                values = ", ".join(
-                    _sql_literal_typed(row[col], col_types.get(col, ""))
-                    for col in cols
-                )
-                lines.append(f"INSERT INTO {_quote_identifier(table)} ({col_sql}) VALUES ({values});")
+            with conn.cursor(name=f"bf1_backup_{idx}") as sc:
+                sc.itersize = linhas_por_insert
+                sc.execute(f"SELECT {col_sql} FROM {qt}")
+                while True:
+                    rows = sc.fetchmany(linhas_por_insert)
+                    if not rows:
+                        break
+                    values = ",\n".join(
+                        "(" + ", ".join(_sql_literal_typed(row[col], col_types.get(col, "")) for col in cols) + ")"
+                        for row in rows
+                    )
+                    yield f"INSERT INTO {qt} ({col_sql}) VALUES\n{values};\n"
 
             # Prepara resets de sequence para colunas SERIAL/IDENTITY
             serial_cols = _get_serial_columns(conn, table)
             for col in serial_cols:
-                qt = _quote_identifier(table)
                 qc = _quote_identifier(col)
                 sequence_reset_lines.append(
                     f"SELECT setval("
@@ -438,11 +369,11 @@ def _build_data_only_sql() -> str:
 
     # Aplica resets de sequence após todos os INSERTs para evitar colisão de IDs pós-restore
     if sequence_reset_lines:
-        lines.append("-- Reajusta sequences para evitar colisão de IDs pós-restore")
-        lines.extend(sequence_reset_lines)
+        yield "-- Reajusta sequences para evitar colisão de IDs pós-restore\n"
+        for line in sequence_reset_lines:
+            yield line + "\n"
 
-    lines.append("COMMIT;")
-    return "\n".join(lines) + "\n"
+    yield "COMMIT;\n"
 
 
 def _prepare_schema_for_restore() -> None:
@@ -787,13 +718,17 @@ def get_postgres_backup_mode() -> tuple[str, str]:
     return "full", f"Compatible with {pg_dump}"
 
 
-def _generate_backup_sql_content() -> tuple[str, str]:
+def _pg_dump_para(saida: BinaryIO) -> tuple[bool, str]:
+    """Copia a saída do pg_dump para `saida` em blocos, sem carregá-la em memória."""
     pg_env, dbname = _build_pg_env_from_database_url(DATABASE_URL)
-    mode, detail = get_postgres_backup_mode()
-    if mode == "full":
-        pg_dump = _detect_cmd(("pg_dump", "pg_dump16", "pg_dump15", "pg_dump14"))
-        if pg_dump:
-            ok, out, err = _run_command(
+    pg_dump = _detect_cmd(("pg_dump", "pg_dump16", "pg_dump15", "pg_dump14"))
+    if not pg_dump:
+        return False, "pg_dump not found"
+    env = os.environ.copy()
+    env.update({k: v for k, v in pg_env.items() if v})
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            proc = subprocess.Popen(
                 [
                     pg_dump,
                     "--dbname",
@@ -803,563 +738,181 @@ def _generate_backup_sql_content() -> tuple[str, str]:
                     "--format=plain",
                     "--encoding=UTF8",
                 ],
-                env_overrides=pg_env,
+                stdout=subprocess.PIPE,
+                stderr=stderr_file,
+                env=env,
             )
-            if ok and out.strip():
-                return out, "full"
-            st.warning(f"pg_dump failed, using fallback. Detail: {err.strip()}")
-
-    _ = detail
-    return _build_data_only_sql(), "fallback"
-
-
-def download_db() -> None:
-    sql_content, mode = _generate_backup_sql_content()
-    label = "Download PostgreSQL full backup (.sql)"
-    if mode == "fallback":
-        label = "Download PostgreSQL data-only backup (.sql)"
-
-    st.download_button(
-        label=label,
-        data=sql_content.encode("utf-8"),
-        file_name=f"bf1_backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql",
-        mime="application/sql",
-        on_click="ignore",
-        width="stretch",
-    )
+        except FileNotFoundError:
+            return False, f"Command not found: {pg_dump}"
+        assert proc.stdout is not None
+        shutil.copyfileobj(proc.stdout, saida, _BACKUP_CHUNK_BYTES)
+        proc.stdout.close()
+        returncode = proc.wait()
+        stderr_file.seek(0)
+        err = stderr_file.read().decode("utf-8", errors="ignore")
+    return returncode == 0, err
+
+
+@contextmanager
+def _saida_compactada(destino: BinaryIO, compressao: str | None) -> Iterator[BinaryIO]:
+    if not compressao:
+        yield destino
+    elif compressao == "gzip":
+        with gzip.GzipFile(fileobj=destino, mode="wb", compresslevel=6) as gz:
+            yield gz
+    elif compressao == "zstd":
+        if zstandard is None:
+            raise RuntimeError("zstd compression requires the `zstandard` package")
+        with zstandard.ZstdCompressor(level=10).stream_writer(destino, closefd=False) as zw:
+            yield zw
+    else:
+        raise ValueError(f"Unsupported compression: {compressao}")
 
 
-def restore_backup_from_sql(sql_content: str) -> bool:
-    is_data_only = "BF1 POSTGRES DATA-ONLY DUMP" in (sql_content[:4096] or "")
-    if is_data_only:
-        try:
-            _prepare_schema_for_restore()
-        except Exception as exc:
-            st.error(f"Failed to prepare schema for restore: {exc}")
-            return False
+@contextmanager
+def _arquivo_temporario_download(sufixo: str = "") -> Iterator[str]:
+    """Caminho de um arquivo temporário em disco, removido ao sair do bloco.
 
-    pg_env, dbname = _build_pg_env_from_database_url(DATABASE_URL)
-    psql = _detect_cmd(("psql", "psql16", "psql15", "psql14"))
-    if psql:
-        ok, _, err = _run_command(
-            [psql, "-d", dbname, "-v", "ON_ERROR_STOP=1"],
-            sql_input=sql_content,
-            env_overrides=pg_env,
-        )
-        if ok:
-            try:
-                _run_fix_sequences_after_restore()
-            except Exception as exc:
-                st.warning(f"Restore concluído, mas falhou ao ressincronizar sequences: {exc}")
-            return True
-        st.warning(f"psql failed, trying statement execution. Detail: {err.strip()}")
-
-    statements = [s.strip() for s in sql_content.split(";") if s.strip()]
+    Para gerar exportações grandes sem ocupar memória e entregá-las ao
+    `st.download_button`, que só aceita arquivo aberto com `open(caminho, "rb")`.
+    """
+    fd, caminho = tempfile.mkstemp(suffix=sufixo)
+    os.close(fd)
     try:
-        with db_connect() as conn:
-            c = conn.cursor()
-            existing_tables = {t.lower() for t in _list_tables()}
-            pending_fk_inserts: list[tuple[str, str]] = []
-
-            for stmt in statements:
-                upper = stmt.upper()
-                if upper in {"BEGIN", "COMMIT", "ROLLBACK"}:
-                    continue
-
-                # Ignora linhas de comentário SQL geradas no dump
-                if stmt.strip().startswith("--"):
-                    continue
-
-                if upper.startswith("TRUNCATE TABLE"):
-                    tables = _extract_truncate_tables(stmt)
-                    if tables is not None:
-                        valid_tables = [t for t in tables if t.lower() in existing_tables]
-                        if not valid_tables:
-                            continue
-                        stmt = (
-                            "TRUNCATE TABLE "
-                            + ", ".join(_quote_identifier(t) for t in valid_tables)
-                            + " RESTART IDENTITY CASCADE"
-                        )
-
-                insert_table = _extract_insert_table(stmt)
-                if insert_table and insert_table.lower() not in existing_tables:
-                    # Data-only dumps podem referenciar tabelas removidas; ignora para não abortar restore.
-                    continue
-
-                ok_stmt, err_stmt = _execute_with_savepoint(c, stmt)
-                if ok_stmt:
-                    continue
-
-                if insert_table and err_stmt and (
-                    _is_json_syntax_error(err_stmt) or _is_array_syntax_error(err_stmt)
-                ):
-                    repaired_stmt = _repair_insert_legacy_literals(conn, stmt, insert_table)
-                    if repaired_stmt and repaired_stmt != stmt:
-                        ok_repaired, err_repaired = _execute_with_savepoint(c, repaired_stmt)
-                        if ok_repaired:
-                            continue
-                        err_stmt = err_repaired if err_repaired else err_stmt
-
-                if insert_table and err_stmt and _is_fk_violation_error(err_stmt):
-                    pending_fk_inserts.append((stmt, str(err_stmt)))
-                    continue
-
-                raise err_stmt if err_stmt else RuntimeError("Unknown restore statement error")
-
-            max_passes = max(2, len(existing_tables) + 1)
-            for _ in range(max_passes):
-                if not pending_fk_inserts:
-                    break
-
-                next_pending: list[tuple[str, str]] = []
-                progress = 0
-                for stmt, _last_error in pending_fk_inserts:
-                    ok_stmt, err_stmt = _execute_with_savepoint(c, stmt)
-                    if ok_stmt:
-                        progress += 1
-                        continue
-
-                    if err_stmt and _is_fk_violation_error(err_stmt):
-                        next_pending.append((stmt, str(err_stmt)))
-                        continue
-
-                    raise err_stmt if err_stmt else RuntimeError("Unknown restore statement error")
-
-                pending_fk_inserts = next_pending
-                if progress == 0:
-                    break
-
-            if pending_fk_inserts:
-                first_error = pending_fk_inserts[0][1]
-                raise RuntimeError(
-                    "Restore failed: unresolved foreign key dependencies in "
-                    f"{len(pending_fk_inserts)} INSERT statement(s). First error: {first_error}"
-                )
-
-            conn.commit()
-
+        yield caminho
+    finally:
         try:
-            _run_fix_sequences_after_restore()
-        except Exception as exc:
-            st.warning(f"Restore concluído, mas falhou ao ressincronizar sequences: {exc}")
-        return True
-    except Exception as exc:
-        st.error(f"Restore failed: {exc}")
-        return False
-
-
-def upload_db() -> None:
-    uploaded = st.file_uploader(
-        "Upload PostgreSQL SQL backup",
-        type=["sql"],
-        help="Only PostgreSQL SQL dumps are accepted.",
-        key="upload_sql_backup",
-    )
-    if not uploaded:
-        return
-
-    if st.button("Restore SQL backup", type="primary", width="stretch"):
-        sql_text = uploaded.getvalue().decode("utf-8", errors="ignore")
-        if restore_backup_from_sql(sql_text):
-            st.success("Backup restored successfully.")
-        else:
-            st.error("Backup restore failed.")
+            os.unlink(caminho)
+        except OSError:
+            pass
 
 
-def _table_columns(table_name: str) -> list[str]:
-    with db_connect() as conn:
-        c = conn.cursor()
-        c.execute(
-            """
-            SELECT column_name
-            FROM information_schema.columns
-            WHERE table_schema = current_schema()
-              AND table_name = %s
-            ORDER BY ordinal_position
-            """,
-            (table_name,),
-        )
-        return [str(r['column_name']) for r in (c.fetchall() or []) if r and r['column_name']]
-
-
-def _get_table_column_types(conn, table_name: str) -> dict[str, str]:
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT column_name, data_type
-        FROM information_schema.columns
-        WHERE table_schema = current_schema()
-          AND table_name = %s
-        """,
-        (table_name,),
-    )
-    return {
-        str(r['column_name']).lower(): str(r['data_type']).lower()
-        for r in (c.fetchall() or [])
-        if r and r.get('column_name') and r.get('data_type')
-    }
-
-
-def _get_required_columns_for_insert(conn, table_name: str) -> list[str]:
-    """Retorna colunas obrigatórias em INSERT sem valor padrão/identity."""
-    c = conn.cursor()
-    c.execute(
-        """
-        SELECT column_name
-        FROM information_schema.columns
-        WHERE table_schema = current_schema()
-          AND table_name = %s
-          AND is_nullable = 'NO'
-          AND column_default IS NULL
-          AND is_identity = 'NO'
-          AND COALESCE(is_generated, 'NEVER') = 'NEVER'
-        ORDER BY ordinal_position
-        """,
-        (table_name,),
-    )
-    return [
-        str(r['column_name'])
-        for r in (c.fetchall() or [])
-        if r and r.get('column_name')
-    ]
+def escrever_backup_sql(destino: BinaryIO, compressao: str | None = "gzip") -> str:
+    """Grava o backup SQL em `destino` (arquivo ou stream binário) em streaming.
 
+    `compressao` pode ser "gzip", "zstd" ou None. A saída do pg_dump passa por
+    um arquivo temporário (para permitir o fallback se ele falhar no meio); o
+    dump data-only é gerado direto no destino. Retorna "full" ou "fallback".
+    """
+    mode, _ = get_postgres_backup_mode()
+    with _saida_compactada(destino, compressao) as saida:
+        if mode == "full":
+            with tempfile.TemporaryFile() as bruto:
+                ok, err = _pg_dump_para(bruto)
+                if ok and bruto.tell() > 0:
+                    bruto.seek(0)
+                    shutil.copyfileobj(bruto, saida, _BACKUP_CHUNK_BYTES)
+                    return "full"
+            st.warning(f"pg_dump failed, using fallback. Detail: {err.strip()}")
 
-def _normalize_excel_typed_value(value: Any, data_type: str) -> Any:
-    dtype = (data_type or "").lower()
-    if value is None:
-        return None
+        for pedaco in iter_data_only_sql():
+            saida.write(pedaco.encode("utf-8"))
+    return "fallback"
 
-    if dtype in {"json", "jsonb"}:
-        if isinstance(value, (dict, list, tuple)):
-            return json.dumps(value, ensure_ascii=False)
-        if isinstance(value, str):
-            raw = value.strip()
-            if not raw:
-                return None
-            try:
-                parsed = json.loads(raw)
-                return json.dumps(parsed, ensure_ascii=False)
-            except Exception:
-                try:
-                    parsed = ast.literal_eval(raw)
-                    if isinstance(parsed, (dict, list, tuple)):
-                        return json.dumps(parsed, ensure_ascii=False)
-                except Exception:
-                    return value
-        return value
 
-    if dtype == "array":
-        if isinstance(value, (list, tuple)):
-            return list(value)
-        if isinstance(value, str):
-            raw = value.strip()
-            if not raw:
-                return None
-            try:
-                parsed = ast.literal_eval(raw)
-                if isinstance(parsed, (list, tuple)):
-                    return list(parsed)
-            except Exception:
-                return value
-        return value
+def _abrir_backup_sql(arquivo: BinaryIO) -> Iterator[str]:
+    """Lê um backup .sql, .sql.gz ou .sql.zst em pedaços de texto, desde o início.
 
-    return value
+    A compressão é detectada pelo cabeçalho; `arquivo` precisa ser seekable
+    para permitir mais de uma leitura (psql e, se falhar, o restore interno).
+    """
+    arquivo.seek(0)
+    magic = arquivo.read(4)
+    arquivo.seek(0)
+    if magic.startswith(_GZIP_MAGIC):
+        bruto: BinaryIO = gzip.GzipFile(fileobj=arquivo, mode="rb")
+    elif magic.startswith(_ZSTD_MAGIC):
+        if zstandard is None:
+            raise RuntimeError("zstd backups require the `zstandard` package")
+        bruto = zstandard.ZstdDecompressor().stream_reader(arquivo, closefd=False)
+    else:
+        bruto = arquivo
+    texto = io.TextIOWrapper(bruto, encoding="utf-8", errors="ignore", newline="")
+    try:
+        while True:
+            pedaco = texto.read(_BACKUP_CHUNK_BYTES)
+            if not pedaco:
+                break
+            yield pedaco
+    finally:
+        # Desacopla sem fechar `arquivo`, que pode ser lido de novo.
+        texto.detach()
+
+
+def _psql_de_pedacos(pedacos: Iterable[str]) -> tuple[bool, str]:
+    """Envia o dump ao psql pelo stdin, em pedaços. Retorna (ok, stderr)."""
+    pg_env, dbname = _build_pg_env_from_database_url(DATABASE_URL)
+    psql = _detect_cmd(("psql", "psql16", "psql15", "psql14"))
+    if not psql:
+        return False, "psql not found"
+    env = os.environ.copy()
+    env.update({k: v for k, v in pg_env.items() if v})
+    with tempfile.TemporaryFile() as stderr_file:
+        try:
+            proc = subprocess.Popen(
+                [psql, "-d", dbname, "-v", "ON_ERROR_STOP=1"],
+                stdin=subprocess.PIPE,
+                stdout=subprocess.DEVNULL,
+                stderr=stderr_file,
+                env=env,
+            )
+        except FileNotFoundError:
+            return False, f"Command not found: {psql}"
+        assert proc.stdin is not None
+        try:
+            for pedaco in pedacos:
+                proc.stdin.write(pedaco.encode("utf-8"))
+            proc.stdin.close()
+        except BrokenPipeError:
+            # psql parou (ON_ERROR_STOP); o motivo fica no stderr.
+            pass
+        returncode = proc.wait()
+        stderr_file.seek(0)
+        err = stderr_file.read().decode("utf-8", errors="ignore")
+    return returncode == 0, err
 
 
-def _prepare_dataframe_for_excel(df: pd.DataFrame) -> pd.DataFrame:
-    if df.empty:
-        return df
+def download_db() -> None:
+    from db.backup_sql import download_db as _download_db
 
-    safe_df = df.copy()
+    _download_db()
 
-    for col in safe_df.columns:
-        series = safe_df[col]
-        if pd.api.types.is_datetime64tz_dtype(series.dtype):
-            safe_df[col] = series.dt.tz_convert("UTC").dt.tz_localize(None)
-            continue
 
-        if pd.api.types.is_object_dtype(series.dtype):
-            def _normalize_obj(value: Any) -> Any:
-                if value is None:
-                    return None
-                if isinstance(value, datetime):
-                    if value.tzinfo is None:
-                        return value
-                    return pd.Timestamp(value).tz_convert("UTC").tz_localize(None).to_pydatetime()
-                return value
-
-            safe_df[col] = series.map(_normalize_obj)
-
-    return safe_df
-
-
-def _apply_excel_datetime_format(
-    writer: pd.ExcelWriter,
-    sheet_name: str,
-    df: pd.DataFrame,
-    col_types: dict[str, str],
-) -> None:
-    """Aplica formato explícito de data/hora para consistência visual no Excel."""
-    if df.empty:
-        return
+def restore_backup_from_sql(sql_content: str) -> bool:
+    from db.backup_sql import restore_backup_from_sql as _restore_backup_from_sql
 
-    ws = writer.sheets.get(sheet_name)
-    if ws is None:
-        return
+    return _restore_backup_from_sql(sql_content)
 
-    datetime_cols: set[str] = set()
-    for col in df.columns:
-        dtype = df[col].dtype
-        db_type = col_types.get(str(col).lower(), "")
-        if pd.api.types.is_datetime64_any_dtype(dtype):
-            datetime_cols.add(str(col))
-            continue
-        if "timestamp" in db_type or db_type in {"date", "time", "timetz"}:
-            datetime_cols.add(str(col))
 
-    if not datetime_cols:
+def upload_db() -> None:
+    uploaded = st.file_uploader(
+        "Upload PostgreSQL SQL backup",
+        type=["sql", "gz", "zst"],
+        help="Only PostgreSQL SQL dumps are accepted (plain, gzip or zstd).",
+        key="upload_sql_backup",
+    )
+    if not uploaded:
         return
 
-    excel_dt_format = "yyyy-mm-dd hh:mm:ss"
-    excel_date_format = "yyyy-mm-dd"
-    excel_time_format = "hh:mm:ss"
-
-    for idx, col_name in enumerate(df.columns, start=1):
-        if str(col_name) not in datetime_cols:
-            continue
+    if st.button("Restore SQL backup", type="primary", width="stretch"):
+        from db.backup_sql import restaurar_backup_sql
 
-        db_type = col_types.get(str(col_name).lower(), "")
-        if db_type == "date":
-            number_format = excel_date_format
-        elif db_type in {"time", "timetz"}:
-            number_format = excel_time_format
+        if restaurar_backup_sql(uploaded):
+            st.success("Backup restored successfully.")
         else:
-            number_format = excel_dt_format
-
-        col_letter = get_column_letter(idx)
-        for row_idx in range(2, len(df) + 2):
-            cell = ws[f"{col_letter}{row_idx}"]
-            if cell.value is not None:
-                cell.number_format = number_format
+            st.error("Backup restore failed.")
 
 
 def download_tabela() -> None:
-    tables = _list_tables()
-    if not tables:
-        st.info("No tables found for export.")
-        return
+    from db.backup_excel import download_tabela as _download_tabela
 
-    selected = st.selectbox("Table to export", tables, key="export_table_select")
-    if not selected:
-        return
-
-    with db_connect() as conn:
-        col_types = _get_table_column_types(conn, selected)
-        c = conn.cursor()
-        c.execute(f"SELECT * FROM {_quote_identifier(selected)}")
-        rows = c.fetchall() or []
-        col_names = [desc[0] for desc in c.description] if c.description else []
-
-    df = pd.DataFrame(
-        [list(r.values()) for r in rows] if rows else [],
-        columns=col_names,
-    )
-
-    df_excel = _prepare_dataframe_for_excel(df)
-
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine="openpyxl") as writer:
-        df_excel.to_excel(writer, index=False, sheet_name="data")
-        _apply_excel_datetime_format(writer, "data", df_excel, col_types)
-    buffer.seek(0)
-
-    st.download_button(
-        label=f"Download table {selected} (.xlsx)",
-        data=buffer.getvalue(),
-        file_name=f"{selected}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx",
-        mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-        on_click="ignore",
-        width="stretch",
-    )
+    _download_tabela()
 
 
 def upload_tabela() -> None:
-    tables = _list_tables()
-    if not tables:
-        st.info("No tables found for import.")
-        return
+    from db.backup_excel import upload_tabela as _upload_tabela
 
-    selected = st.selectbox("Destination table", tables, key="import_table_select")
-    uploaded = st.file_uploader("Upload Excel (.xlsx)", type=["xlsx"], key="upload_table_xlsx")
-    validate_fks = st.checkbox(
-        "Pré-validar chaves estrangeiras antes de importar (recomendado)",
-        value=True,
-        key="import_table_validate_fks",
-    )
-    if not selected or not uploaded:
-        return
-
-    if st.button("Import table", type="primary", width="stretch"):
-        df = pd.read_excel(uploaded)
-        df.columns = [str(col).strip() for col in df.columns]
-        db_cols = _table_columns(selected)
-        use_cols = [c for c in df.columns if c in db_cols]
-        if not use_cols:
-            st.error("No compatible columns were found.")
-            return
-
-        with db_connect() as conn:
-            col_types = _get_table_column_types(conn, selected)
-            required_cols = _get_required_columns_for_insert(conn, selected)
-
-            missing_required = [c for c in required_cols if c not in use_cols]
-            if missing_required:
-                st.error(
-                    "Importação bloqueada: o arquivo não contém colunas obrigatórias "
-                    f"da tabela '{selected}'."
-                )
-                st.caption(
-                    "Isso normalmente indica seleção incorreta da tabela de destino "
-                    "ou arquivo Excel de outra tabela."
-                )
-                st.caption(f"Colunas obrigatórias ausentes: {', '.join(missing_required)}")
-                return
-
-            payload = df[use_cols].astype(object)
-            rows = []
-            normalized_cells = 0
-            for row in payload.itertuples(index=False, name=None):
-                normalized_row: list[Any] = []
-                for idx, value in enumerate(row):
-                    col_name = use_cols[idx]
-                    base_value = None if pd.isna(value) else value
-                    typed_value = _normalize_excel_typed_value(
-                        base_value,
-                        col_types.get(col_name.lower(), ""),
-                    )
-                    if typed_value is not base_value:
-                        normalized_cells += 1
-                    normalized_row.append(typed_value)
-                rows.append(tuple(normalized_row))
-
-            col_idx = {col: idx for idx, col in enumerate(use_cols)}
-            for req_col in required_cols:
-                idx = col_idx.get(req_col)
-                if idx is None:
-                    continue
-                for row_number, row in enumerate(rows, start=2):
-                    if row[idx] is None:
-                        st.error(
-                            "Importação bloqueada: coluna obrigatória com valor vazio "
-                            f"na tabela '{selected}'."
-                        )
-                        st.caption(
-                            f"Coluna: {req_col} | Linha Excel: {row_number}"
-                        )
-                        return
-
-            # Detecta em tempo real se esta tabela tem filhos FK no banco.
-            # Se tiver, TRUNCATE ... CASCADE apagaria os filhos — usa UPSERT.
-            # Se não tiver, TRUNCATE + INSERT é seguro e mais simples.
-            fk_parent_tables = _get_tables_with_fk_children(conn)
-            is_fk_parent = selected.lower() in {t.lower() for t in fk_parent_tables}
-
-            if validate_fks:
-                fk_errors = _prevalidate_fk_values(conn, selected, use_cols, rows)
-                if fk_errors:
-                    st.error(
-                        "Importação bloqueada por inconsistência de FK no arquivo Excel. "
-                        "Corrija os valores e tente novamente."
-                    )
-                    for item in fk_errors:
-                        st.caption(f"- {item}")
-                    return
-
-            c = conn.cursor()
-            col_sql = ", ".join(_quote_identifier(col) for col in use_cols)
-            placeholders = ", ".join(["%s"] * len(use_cols))
-
-            if is_fk_parent:
-                # Tabela pai de FK: usa UPSERT para preservar os filhos.
-                # Requer que a tabela tenha PK definida (obrigatório para ON CONFLICT).
-                pk_cols = _get_pk_columns(conn, selected)
-                if not pk_cols:
-                    st.error(
-                        f"Importação bloqueada: a tabela '{selected}' é referenciada por FK "
-                        "e não possui PRIMARY KEY detectada para UPSERT seguro."
-                    )
-                    st.info(
-                        "Para evitar quebra de integridade, esse cenário não executa TRUNCATE CASCADE. "
-                        "Defina uma PK na tabela ou use restore SQL completo."
-                    )
-                    return
-                else:
-                    # UPSERT: insere ou atualiza. Linhas no banco que NÃO estão
-                    # no Excel são mantidas (não apagadas), preservando os filhos FK.
-                    # Colunas de atualização = todas exceto as de PK.
-                    pk_set = {col.lower() for col in pk_cols}
-                    update_cols = [col for col in use_cols if col.lower() not in pk_set]
-                    conflict_target = ", ".join(_quote_identifier(col) for col in pk_cols)
-
-                    if update_cols:
-                        update_clause = ", ".join(
-                            f"{_quote_identifier(col)} = EXCLUDED.{_quote_identifier(col)}"
-                            for col in update_cols
-                        )
-                        upsert_sql = (
-                            f"INSERT INTO {_quote_identifier(selected)} ({col_sql}) "
-                            f"VALUES ({placeholders}) "
-                            f"ON CONFLICT ({conflict_target}) DO UPDATE SET {update_clause}"
-                        )
-                    else:
-                        # Todas as colunas são PK (tabela de chave composta pura): ignora duplicatas.
-                        upsert_sql = (
-                            f"INSERT INTO {_quote_identifier(selected)} ({col_sql}) "
-                            f"VALUES ({placeholders}) "
-                            f"ON CONFLICT ({conflict_target}) DO NOTHING"
-                        )
-
-                    c.executemany(upsert_sql, rows)
-                    st.info(
-                        f"⚠️ '{selected}' é referenciada por outras tabelas: linhas existentes foram "
-                        "atualizadas (UPSERT) e linhas ausentes no Excel foram mantidas. "
-                        "Nenhum dado filho foi apagado."
-                    )
-            else:
-                # Tabela folha: sem filhos FK, TRUNCATE+INSERT é seguro.
-                c.execute(
-                    f"TRUNCATE TABLE {_quote_identifier(selected)} RESTART IDENTITY CASCADE"
-                )
-                c.executemany(
-                    f"INSERT INTO {_quote_identifier(selected)} ({col_sql}) VALUES ({placeholders})",
-                    rows,
-                )
-
-            # Ressincroniza sequences para colunas SERIAL/IDENTITY.
-            serial_cols = _get_serial_columns(conn, selected)
-            for col in serial_cols:
-                qt = _quote_identifier(selected)
-                qc = _quote_identifier(col)
-                c.execute(
-                    f"""
-                    SELECT setval(
-                        pg_get_serial_sequence(%s, %s),
-                        COALESCE((SELECT MAX({qc}) FROM {qt}), 1),
-                        true
-                    )
-                    """,
-                    (selected, col),
-                )
-            conn.commit()
-
-        if normalized_cells > 0:
-            st.info(
-                f"{normalized_cells} valores foram normalizados para tipos PostgreSQL "
-                "(JSON/ARRAY) durante a importação."
-            )
-
-        st.success(f"Table {selected} imported successfully.")
+    _upload_tabela()
 
 
 def list_temporadas() -> list[str]:
@@ -1403,17 +956,21 @@ def create_next_temporada() -> str:
 
     return next_year
 
-def backup_banco(backup_dir: str = "backups") -> str:
+def backup_banco(backup_dir: str = "backups", compressao: str | None = "gzip") -> str:
     Path(backup_dir).mkdir(parents=True, exist_ok=True)
-    sql_content, _ = _generate_backup_sql_content()
-    backup_file = Path(backup_dir) / f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}.sql"
-    backup_file.write_text(sql_content, encoding="utf-8")
+    extensao = {"gzip": ".sql.gz", "zstd": ".sql.zst"}.get(compressao or "", ".sql")
+    backup_file = Path(backup_dir) / f"backup_{datetime.now().strftime('%Y%m%d_%H%M%S')}{extensao}"
+    with backup_file.open("wb") as destino:
+        escrever_backup_sql(destino, compressao=compressao)
     return str(backup_file)
 
 
 def restaurar_backup(backup_file: str) -> bool:
+    from db.backup_sql import restaurar_backup_sql
+
     try:
-        sql = Path(backup_file).read_text(encoding="utf-8")
+        arquivo = Path(backup_file).open("rb")
     except Exception:
         return False
-    return restore_backup_from_sql(sql)
+    with arquivo:
+        return restaurar_backup_sql(arquivo)
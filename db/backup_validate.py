@@ -53,6 +53,22 @@ def _get_table_column_types(conn, table_name: str) -> dict[str, str]:
     }
 
 
+def _get_column_sql_types(conn, table_name: str) -> dict[str, str]:
+    """Tipo SQL completo (ex.: `character varying(120)`, `integer[]`) de cada coluna."""
+    c = conn.cursor()
+    c.execute(
+        """
+        SELECT a.attname AS column_name, format_type(a.atttypid, a.atttypmod) AS sql_type
+        FROM pg_attribute a
+        WHERE a.attrelid = to_regclass(quote_ident(%s))
+          AND a.attnum > 0
+          AND NOT a.attisdropped
+        """,
+        (table_name,),
+    )
+    return {str(r["column_name"]): str(r["sql_type"]) for r in (c.fetchall() or []) if r and r.get("column_name")}
+
+
 def _get_required_columns_for_insert(conn, table_name: str) -> list[str]:
     c = conn.cursor()
     c.execute(
@@ -119,22 +135,25 @@ def _get_fk_constraints(conn, table: str) -> list[dict[str, Any]]:
     return constraints
 
 
-def _prevalidate_fk_values(
+def _prevalidate_fk_staging(
     conn,
     selected: str,
+    staging: str,
     use_cols: list[str],
-    rows: list[tuple[Any, ...]],
+    limite: int = 10,
 ) -> list[str]:
-    if not rows:
-        return []
+    """Valida as FKs de `selected` contra as linhas já carregadas em `staging`.
 
+    Uma consulta anti-join por constraint (em vez de uma busca por valor).
+    Retorna até `limite` mensagens de chaves sem correspondência no pai.
+    """
     constraints = _get_fk_constraints(conn, selected)
     if not constraints:
         return []
 
-    col_idx = {col: idx for idx, col in enumerate(use_cols)}
     errors: list[str] = []
     c = conn.cursor()
+    cols = set(use_cols)
 
     for fk in constraints:
         local_cols = fk["local_columns"]
@@ -142,34 +161,39 @@ def _prevalidate_fk_values(
         parent_table = fk["parent_table"]
         fk_name = fk["constraint_name"]
 
-        if any(col not in col_idx for col in local_cols):
+        if any(col not in cols for col in local_cols):
             continue
 
-        distinct_keys: set[tuple[Any, ...]] = set()
-        for row in rows:
-            values = tuple(row[col_idx[col]] for col in local_cols)
-            if any(v is None for v in values):
-                continue
-            distinct_keys.add(values)
-
-        for key_values in distinct_keys:
-            where_sql = " AND ".join(f"{_quote_identifier(pc)} = %s" for pc in parent_cols)
-            check_sql = (
-                f"SELECT 1 FROM {_quote_identifier(parent_table)} "
-                f"WHERE {where_sql} LIMIT 1"
-            )
-            c.execute(check_sql, key_values)
-            if c.fetchone() is None:
-                key_map = ", ".join(f"{lc}={val!r}" for lc, val in zip(local_cols, key_values))
-                errors.append(f"FK {fk_name}: valor não encontrado em {parent_table} ({key_map})")
-                if len(errors) >= 10:
-                    return errors
+        select_sql = ", ".join(f"s.{_quote_identifier(lc)}" for lc in local_cols)
+        not_null_sql = " AND ".join(f"s.{_quote_identifier(lc)} IS NOT NULL" for lc in local_cols)
+        join_sql = " AND ".join(
+            f"p.{_quote_identifier(pc)} = s.{_quote_identifier(lc)}" for lc, pc in zip(local_cols, parent_cols)
+        )
+        c.execute(
+            f"""
+            SELECT DISTINCT {select_sql}
+            FROM {_quote_identifier(staging)} s
+            WHERE {not_null_sql}
+              AND NOT EXISTS (
+                  SELECT 1 FROM {_quote_identifier(parent_table)} p WHERE {join_sql}
+              )
+            LIMIT %s
+            """,
+            (limite - len(errors),),
+        )
+        for row in c.fetchall() or []:
+            key_values = list(row.values())
+            key_map = ", ".join(f"{lc}={val!r}" for lc, val in zip(local_cols, key_values))
+            errors.append(f"FK {fk_name}: valor não encontrado em {parent_table} ({key_map})")
+        if len(errors) >= limite:
+            return errors
 
     return errors
 
 __all__ = [
     "_table_columns",
     "_get_table_column_types",
+    "_get_column_sql_types",
     "_get_required_columns_for_insert",
-    "_prevalidate_fk_values",
+    "_prevalidate_fk_staging",
 ]
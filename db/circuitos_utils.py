@@ -8,7 +8,7 @@ from typing import Iterable
 
 import requests
 
-from db.db_schema import db_connect, get_table_columns
+from db.db_schema import db_connect, get_table_columns, invalidar_catalogo_schema
 
 logger = logging.getLogger(__name__)
 
@@ -42,10 +42,13 @@ def ensure_provas_circuit_id_column() -> None:
     with db_connect() as conn:
         c = conn.cursor()
         cols = get_table_columns(conn, 'provas')
-        if "circuit_id" not in cols:
+        adicionada = "circuit_id" not in cols
+        if adicionada:
             c.execute("ALTER TABLE provas ADD COLUMN circuit_id TEXT REFERENCES circuitos_f1(circuit_id)")
         c.execute("CREATE INDEX IF NOT EXISTS idx_provas_circuit_id ON provas(circuit_id)")
         conn.commit()
+    if adicionada:
+        invalidar_catalogo_schema("provas")
 
 
 def _extract_circuit_entries_from_season(data: dict) -> dict[str, dict]:
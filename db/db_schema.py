@@ -3,7 +3,9 @@
 from __future__ import annotations
 
 import logging
+import threading
 from contextlib import contextmanager
+from typing import Optional
 
 from db.connection_pool import get_pool
 
@@ -24,7 +26,45 @@ def db_connect():
         yield conn
 
 
-def get_table_columns(conn, table_name: str) -> list[str]:
+# Catálogo de schema em memória (tabela -> colunas), compartilhado pelo processo.
+# Carregado após as migrations; enquanto não carregado, as consultas vão ao banco.
+_catalogo_lock = threading.Lock()
+_catalogo_schema: Optional[dict[str, list[str]]] = None
+
+
+def carregar_catalogo_schema() -> None:
+    """Carrega (ou recarrega) o catálogo de colunas das tabelas do schema public."""
+    global _catalogo_schema
+    catalogo: dict[str, list[str]] = {}
+    with db_connect() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            SELECT table_name, column_name
+            FROM information_schema.columns
+            WHERE table_schema = 'public'
+            ORDER BY table_name, ordinal_position
+            """
+        )
+        for row in cur.fetchall():
+            catalogo.setdefault(row["table_name"], []).append(row["column_name"])
+        cur.close()
+    with _catalogo_lock:
+        _catalogo_schema = catalogo
+    logger.info("Catálogo de schema carregado (%s tabelas)", len(catalogo))
+
+
+def invalidar_catalogo_schema(table_name: Optional[str] = None) -> None:
+    """Descarta o catálogo inteiro ou apenas a entrada de uma tabela."""
+    global _catalogo_schema
+    with _catalogo_lock:
+        if table_name is None:
+            _catalogo_schema = None
+        elif _catalogo_schema is not None:
+            _catalogo_schema.pop(table_name, None)
+
+
+def _consultar_colunas(conn, table_name: str) -> list[str]:
     cur = conn.cursor()
     cur.execute(
         """
@@ -40,7 +80,27 @@ def get_table_columns(conn, table_name: str) -> list[str]:
     return cols
 
 
+def get_table_columns(conn, table_name: str) -> list[str]:
+    catalogo = _catalogo_schema
+    if catalogo is not None:
+        cols = catalogo.get(table_name)
+        if cols is not None:
+            return list(cols)
+
+    cols = _consultar_colunas(conn, table_name)
+    if catalogo is not None and cols:
+        # Tabela criada depois da carga (ex.: CREATE TABLE IF NOT EXISTS em runtime)
+        with _catalogo_lock:
+            if _catalogo_schema is catalogo:
+                catalogo[table_name] = cols
+    return list(cols)
+
+
 def table_exists(conn, table_name: str) -> bool:
+    catalogo = _catalogo_schema
+    if catalogo is not None and table_name in catalogo:
+        return True
+
     cur = conn.cursor()
     cur.execute(
         """
@@ -144,6 +204,8 @@ __all__ = [
     "db_connect",
     "get_table_columns",
     "table_exists",
+    "carregar_catalogo_schema",
+    "invalidar_catalogo_schema",
     "init_db",
     "run_migrations",
 ]
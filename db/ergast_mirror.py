@@ -0,0 +1,508 @@
+"""Espelho local (PostgreSQL) dos dados Ergast/Jolpica: corridas, resultados, grid e pit stops.
+
+Segue o padrão de `db/circuitos_utils.atualizar_base_circuitos`: busca por temporada na
+API, grava em tabelas locais e as leituras analíticas passam a ser SQL indexado.
+Um job em background mantém a temporada corrente (e as recentes) sincronizadas.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import re
+import threading
+import time
+from datetime import datetime
+from typing import Iterable, Optional
+
+import requests
+
+from db.circuitos_utils import BASE_URL, REQUEST_TIMEOUT
+from db.db_schema import db_connect
+
+logger = logging.getLogger(__name__)
+
+PAGE_LIMIT = 100
+PAUSA_ENTRE_REQUESTS = 0.3
+PRIMEIRA_TEMPORADA_PIT_STOPS = 2011
+# Intervalo do job de sincronização em segundos (0 desativa)
+SYNC_INTERVAL = int(os.getenv("BF1_ERGAST_SYNC_INTERVAL", "3600"))
+SYNC_TEMPORADAS_RECENTES = 4
+_SYNC_LOCK_KEY = 0x4246_3145  # pg_advisory_lock: um único sincronizador por banco
+
+_job_lock = threading.Lock()
+_job_thread: Optional[threading.Thread] = None
+
+
+def ensure_ergast_mirror_tables() -> None:
+    """Cria as tabelas do espelho Ergast quando ausentes."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ergast_corridas (
+                temporada   TEXT NOT NULL,
+                rodada      INTEGER NOT NULL,
+                nome        TEXT NOT NULL,
+                circuit_id  TEXT,
+                data        DATE,
+                PRIMARY KEY (temporada, rodada)
+            )
+            """
+        )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ergast_resultados (
+                temporada     TEXT NOT NULL,
+                rodada        INTEGER NOT NULL,
+                driver_id     TEXT NOT NULL,
+                piloto        TEXT NOT NULL,
+                piloto_norm   TEXT NOT NULL,
+                construtor    TEXT,
+                ordem         INTEGER NOT NULL,
+                grid          INTEGER,
+                posicao       INTEGER,
+                pontos        REAL,
+                status        TEXT,
+                terminou      BOOLEAN NOT NULL DEFAULT FALSE,
+                volta_rapida  TEXT,
+                PRIMARY KEY (temporada, rodada, driver_id)
+            )
+            """
+        )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ergast_grid (
+                temporada    TEXT NOT NULL,
+                rodada       INTEGER NOT NULL,
+                driver_id    TEXT NOT NULL,
+                piloto       TEXT NOT NULL,
+                piloto_norm  TEXT NOT NULL,
+                posicao      INTEGER,
+                PRIMARY KEY (temporada, rodada, driver_id)
+            )
+            """
+        )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ergast_pit_stops (
+                temporada  TEXT NOT NULL,
+                rodada     INTEGER NOT NULL,
+                driver_id  TEXT NOT NULL,
+                parada     INTEGER NOT NULL,
+                volta      INTEGER,
+                duracao    TEXT,
+                PRIMARY KEY (temporada, rodada, driver_id, parada)
+            )
+            """
+        )
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS ergast_sync_estado (
+                temporada        TEXT PRIMARY KEY,
+                rodadas          INTEGER NOT NULL DEFAULT 0,
+                sincronizado_em  TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+            """
+        )
+        c.execute("CREATE INDEX IF NOT EXISTS idx_ergast_corridas_circuit ON ergast_corridas(circuit_id, temporada)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_ergast_resultados_piloto ON ergast_resultados(piloto_norm, temporada)")
+        c.execute("CREATE INDEX IF NOT EXISTS idx_ergast_resultados_posicao ON ergast_resultados(temporada, posicao)")
+        conn.commit()
+
+
+def _normalizar_piloto(nome: str) -> str:
+    return re.sub(r"\s+", " ", str(nome or "").strip().lower())
+
+
+def _nome_piloto(driver: dict) -> str:
+    return f"{driver.get('givenName', '')} {driver.get('familyName', '')}".strip()
+
+
+def _to_int(value) -> Optional[int]:
+    try:
+        return int(float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _fetch_json(path: str, offset: int = 0) -> dict | None:
+    sep = "&" if "?" in path else "?"
+    url = f"{BASE_URL}/{path}{sep}limit={PAGE_LIMIT}&offset={offset}"
+    try:
+        response = requests.get(url, timeout=REQUEST_TIMEOUT)
+        response.raise_for_status()
+        return response.json()
+    except Exception as e:
+        logger.warning("Falha ao consultar Ergast/Jolpica (%s): %s", url, e)
+        return None
+    finally:
+        time.sleep(PAUSA_ENTRE_REQUESTS)
+
+
+def _fetch_races_paginado(path: str, chave_itens: Optional[str] = None) -> Optional[dict[int, dict]]:
+    """Percorre todas as páginas de um endpoint e agrupa os itens por rodada.
+
+    A API pagina por item (resultado, volta etc.), então uma mesma corrida pode vir
+    dividida entre páginas. Retorna None se alguma página falhar.
+    """
+    por_rodada: dict[int, dict] = {}
+    offset = 0
+    while True:
+        data = _fetch_json(path, offset)
+        if not data:
+            return None
+        try:
+            mr = data["MRData"]
+            races = mr["RaceTable"].get("Races", [])
+            total = int(mr.get("total", 0))
+        except (KeyError, TypeError, ValueError):
+            return None
+
+        for race in races:
+            rodada = _to_int(race.get("round"))
+            if not rodada:
+                continue
+            atual = por_rodada.setdefault(rodada, {k: v for k, v in race.items() if k != chave_itens})
+            if chave_itens:
+                atual.setdefault(chave_itens, []).extend(race.get(chave_itens, []))
+
+        offset += PAGE_LIMIT
+        if offset >= total:
+            return por_rodada
+
+
+def _coletar_temporada(season: str) -> Optional[dict]:
+    calendario = _fetch_races_paginado(f"{season}.json")
+    resultados = _fetch_races_paginado(f"{season}/results.json", "Results")
+    if calendario is None or resultados is None:
+        return None
+    grid = _fetch_races_paginado(f"{season}/qualifying.json", "QualifyingResults") or {}
+
+    pit_stops: dict[int, list[dict]] = {}
+    if (_to_int(season) or 0) >= PRIMEIRA_TEMPORADA_PIT_STOPS:
+        for rodada in sorted(resultados):
+            por_rodada = _fetch_races_paginado(f"{season}/{rodada}/pitstops.json", "PitStops") or {}
+            pit_stops[rodada] = por_rodada.get(rodada, {}).get("PitStops", [])
+
+    corridas = []
+    for rodada, race in sorted(calendario.items()):
+        circuito = race.get("Circuit", {})
+        corridas.append(
+            (
+                season,
+                rodada,
+                str(race.get("raceName", f"Round {rodada}")),
+                str(circuito.get("circuitId", "")).strip() or None,
+                race.get("date") or None,
+            )
+        )
+
+    linhas_resultados = []
+    for rodada, race in resultados.items():
+        for ordem, item in enumerate(race.get("Results", []), start=1):
+            driver = item.get("Driver", {})
+            nome = _nome_piloto(driver)
+            status = str(item.get("status", ""))
+            status_norm = status.strip().lower()
+            linhas_resultados.append(
+                (
+                    season,
+                    rodada,
+                    str(driver.get("driverId") or nome),
+                    nome,
+                    _normalizar_piloto(nome),
+                    str(item.get("Constructor", {}).get("name", "")) or None,
+                    ordem,
+                    _to_int(item.get("grid")),
+                    _to_int(item.get("position")),
+                    _to_float(item.get("points")),
+                    status,
+                    status_norm == "finished" or status_norm.startswith("+"),
+                    item.get("FastestLap", {}).get("Time", {}).get("time"),
+                )
+            )
+
+    linhas_grid = []
+    for rodada, race in grid.items():
+        for item in race.get("QualifyingResults", []):
+            driver = item.get("Driver", {})
+            nome = _nome_piloto(driver)
+            linhas_grid.append(
+                (
+                    season,
+                    rodada,
+                    str(driver.get("driverId") or nome),
+                    nome,
+                    _normalizar_piloto(nome),
+                    _to_int(item.get("position")),
+                )
+            )
+
+    linhas_pit = []
+    for rodada, paradas in pit_stops.items():
+        for item in paradas:
+            linhas_pit.append(
+                (
+                    season,
+                    rodada,
+                    str(item.get("driverId", "")),
+                    _to_int(item.get("stop")) or 0,
+                    _to_int(item.get("lap")),
+                    str(item.get("duration", "")) or None,
+                )
+            )
+
+    return {
+        "corridas": corridas,
+        "resultados": linhas_resultados,
+        "grid": linhas_grid,
+        "pit_stops": linhas_pit,
+        "rodadas": len(resultados),
+    }
+
+
+def _gravar_temporada(conn, season: str, dados: dict) -> None:
+    c = conn.cursor()
+    for tabela in ("ergast_pit_stops", "ergast_grid", "ergast_resultados", "ergast_corridas"):
+        c.execute(f"DELETE FROM {tabela} WHERE temporada = %s", (season,))
+    c.executemany(
+        "INSERT INTO ergast_corridas (temporada, rodada, nome, circuit_id, data) VALUES (%s, %s, %s, %s, %s)",
+        dados["corridas"],
+    )
+    c.executemany(
+        """
+        INSERT INTO ergast_resultados (
+            temporada, rodada, driver_id, piloto, piloto_norm, construtor, ordem,
+            grid, posicao, pontos, status, terminou, volta_rapida
+        ) VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        ON CONFLICT (temporada, rodada, driver_id) DO NOTHING
+        """,
+        dados["resultados"],
+    )
+    c.executemany(
+        """
+        INSERT INTO ergast_grid (temporada, rodada, driver_id, piloto, piloto_norm, posicao)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (temporada, rodada, driver_id) DO NOTHING
+        """,
+        dados["grid"],
+    )
+    c.executemany(
+        """
+        INSERT INTO ergast_pit_stops (temporada, rodada, driver_id, parada, volta, duracao)
+        VALUES (%s, %s, %s, %s, %s, %s)
+        ON CONFLICT (temporada, rodada, driver_id, parada) DO NOTHING
+        """,
+        dados["pit_stops"],
+    )
+    c.execute(
+        """
+        INSERT INTO ergast_sync_estado (temporada, rodadas, sincronizado_em)
+        VALUES (%s, %s, CURRENT_TIMESTAMP)
+        ON CONFLICT (temporada) DO UPDATE SET
+            rodadas = excluded.rodadas,
+            sincronizado_em = CURRENT_TIMESTAMP
+        """,
+        (season, dados["rodadas"]),
+    )
+
+
+def atualizar_base_ergast(seasons: Iterable[str]) -> dict[str, int]:
+    """Sincroniza o espelho Ergast para as temporadas informadas.
+
+    Cada temporada é gravada em sua própria transação (substituição completa).
+    Retorna contagem de temporadas sincronizadas e resultados gravados.
+    """
+    ensure_ergast_mirror_tables()
+
+    seasons_norm = sorted({str(s).strip() for s in seasons if str(s).strip()})
+    processed = 0
+    total_resultados = 0
+    for season in seasons_norm:
+        dados = _coletar_temporada(season)
+        if dados is None:
+            continue
+        with db_connect() as conn:
+            _gravar_temporada(conn, season, dados)
+            conn.commit()
+        processed += 1
+        total_resultados += len(dados["resultados"])
+
+    logger.info("✓ Espelho Ergast atualizado: %s temporadas, %s resultados", processed, total_resultados)
+    return {"temporadas": processed, "resultados": total_resultados}
+
+
+def _temporadas_pendentes() -> list[str]:
+    """Temporada corrente sempre; temporadas recentes encerradas até uma sincronização final.
+
+    Uma temporada só conta como fechada no espelho quando foi sincronizada depois
+    de 1º de janeiro do ano seguinte: a última sincronização feita durante a
+    temporada pode ter perdido a prova final (app fora do ar) ou correções
+    posteriores dos resultados.
+    """
+    ano = datetime.now().year
+    recentes = [str(a) for a in range(ano - SYNC_TEMPORADAS_RECENTES + 1, ano + 1)]
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT temporada FROM ergast_sync_estado
+            WHERE temporada ~ '^[0-9]{4}$'
+              AND sincronizado_em >= make_date(CAST(temporada AS INTEGER) + 1, 1, 1)
+            """
+        )
+        fechadas = {str(r["temporada"]) for r in c.fetchall() or []}
+    return [s for s in recentes if s == str(ano) or s not in fechadas]
+
+
+def sincronizar_ergast_agora() -> Optional[dict[str, int]]:
+    """Executa uma rodada do job. Retorna None se outro processo já estiver sincronizando."""
+    ensure_ergast_mirror_tables()
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute("SELECT pg_try_advisory_lock(%s) AS ok", (_SYNC_LOCK_KEY,))
+        row = c.fetchone()
+        conn.commit()
+        if not row or not row["ok"]:
+            return None
+        try:
+            return atualizar_base_ergast(_temporadas_pendentes())
+        finally:
+            c.execute("SELECT pg_advisory_unlock(%s)", (_SYNC_LOCK_KEY,))
+            conn.commit()
+
+
+def _loop_sync() -> None:
+    while True:
+        try:
+            sincronizar_ergast_agora()
+        except Exception as exc:
+            logger.warning("Falha na sincronização do espelho Ergast: %s", exc)
+        time.sleep(SYNC_INTERVAL)
+
+
+def iniciar_sync_ergast_background() -> bool:
+    """Inicia (uma vez por processo) a thread de sincronização periódica do espelho."""
+    global _job_thread
+    if SYNC_INTERVAL <= 0:
+        return False
+    with _job_lock:
+        if _job_thread is not None and _job_thread.is_alive():
+            return False
+        _job_thread = threading.Thread(target=_loop_sync, name="ergast-sync", daemon=True)
+        _job_thread.start()
+    return True
+
+
+# ---------------------------------------------------------------------------
+# Leituras (retornam None quando a temporada ainda não foi espelhada)
+# ---------------------------------------------------------------------------
+
+def _temporada_espelhada(c, season: str) -> bool:
+    c.execute("SELECT 1 FROM ergast_sync_estado WHERE temporada = %s", (season,))
+    return c.fetchone() is not None
+
+
+def get_resultados_temporada_espelho(season: str) -> Optional[dict]:
+    """Resultados da temporada: {total_races, races: [(rodada, nome, [linhas])]}."""
+    try:
+        with db_connect() as conn:
+            c = conn.cursor()
+            if not _temporada_espelhada(c, season):
+                return None
+            c.execute(
+                """
+                SELECT r.rodada, c.nome AS corrida, r.piloto, r.posicao, r.pontos, r.terminou
+                FROM ergast_resultados r
+                LEFT JOIN ergast_corridas c ON c.temporada = r.temporada AND c.rodada = r.rodada
+                WHERE r.temporada = %s
+                ORDER BY r.rodada, r.ordem
+                """,
+                (season,),
+            )
+            rows = c.fetchall() or []
+    except Exception as exc:
+        logger.debug("Espelho Ergast indisponível: %s", exc)
+        return None
+
+    races: list[tuple[int, str, list[dict]]] = []
+    for row in rows:
+        rodada = int(row["rodada"])
+        if not races or races[-1][0] != rodada:
+            races.append((rodada, str(row["corrida"] or f"Round {rodada}"), []))
+        races[-1][2].append(row)
+    return {"total_races": len(races), "races": races}
+
+
+def get_historico_circuito_espelho(circuit_id: str, anos: list[str]) -> Optional[dict[str, float]]:
+    """Média de posição por piloto no circuito, em uma única consulta."""
+    try:
+        with db_connect() as conn:
+            c = conn.cursor()
+            c.execute("SELECT count(*) AS n FROM ergast_sync_estado WHERE temporada = ANY(%s)", (anos,))
+            row = c.fetchone()
+            if not row or int(row["n"]) < len(anos):
+                return None
+            c.execute(
+                """
+                SELECT r.piloto_norm, AVG(r.posicao)::float AS media
+                FROM ergast_resultados r
+                JOIN ergast_corridas c ON c.temporada = r.temporada AND c.rodada = r.rodada
+                WHERE c.circuit_id = %s
+                  AND r.temporada = ANY(%s)
+                  AND r.posicao > 0
+                  AND r.piloto_norm <> ''
+                GROUP BY r.piloto_norm
+                """,
+                (circuit_id, anos),
+            )
+            return {str(r["piloto_norm"]): float(r["media"]) for r in c.fetchall() or []}
+    except Exception as exc:
+        logger.debug("Espelho Ergast indisponível: %s", exc)
+        return None
+
+
+def get_grid_ultima_corrida_espelho(season: str) -> Optional[tuple[int, dict[str, int]]]:
+    """(rodada, grid de classificação) da última rodada espelhada da temporada."""
+    try:
+        with db_connect() as conn:
+            c = conn.cursor()
+            if not _temporada_espelhada(c, season):
+                return None
+            c.execute(
+                """
+                SELECT rodada, piloto_norm, posicao
+                FROM ergast_grid
+                WHERE temporada = %s
+                  AND rodada = (SELECT max(rodada) FROM ergast_grid WHERE temporada = %s)
+                  AND posicao > 0
+                  AND piloto_norm <> ''
+                """,
+                (season, season),
+            )
+            rows = c.fetchall() or []
+    except Exception as exc:
+        logger.debug("Espelho Ergast indisponível: %s", exc)
+        return None
+    if not rows:
+        return None
+    return int(rows[0]["rodada"]), {str(r["piloto_norm"]): int(r["posicao"]) for r in rows}
+
+
+__all__ = [
+    "ensure_ergast_mirror_tables",
+    "atualizar_base_ergast",
+    "sincronizar_ergast_agora",
+    "iniciar_sync_ergast_background",
+    "get_resultados_temporada_espelho",
+    "get_historico_circuito_espelho",
+    "get_grid_ultima_corrida_espelho",
+]
@@ -8,7 +8,9 @@ import os
 import logging
 from typing import Optional, TypedDict
 from db.connection_pool import get_pool
-from db.repo_users import hash_password, get_user_by_email
+from db.query_cache import invalidar_tabelas
+from db.repo_users import get_user_by_email
+from utils.senhas import hash_senha
 from utils.logging_utils import redact_identifier
 
 logger = logging.getLogger(__name__)
@@ -124,8 +126,8 @@ class MasterUserManager:
             with pool.get_connection() as conn:
                 cursor = conn.cursor()
                 
-                # Hash da senha com bcrypt
-                senha_hashed = hash_password(creds['senha'])
+                # Hash da senha com bcrypt (inicialização: aguarda vaga no pool sem limite)
+                senha_hashed = hash_senha(creds['senha'], espera=None)
                 
                 # Insert com email do ambiente (não o email padrão)
                 cursor.execute('''
@@ -146,6 +148,7 @@ class MasterUserManager:
                 master_id = inserted['id'] if inserted else None
                 
                 conn.commit()
+                invalidar_tabelas("usuarios")
                 
                 logger.info(f"✓ Usuário Master criado com sucesso (ID: {master_id})")
                 logger.info(f"  Nome: {creds['nome']}")
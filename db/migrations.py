@@ -6,7 +6,18 @@ import logging
 from db.circuitos_utils import ensure_circuitos_f1_table, ensure_provas_circuit_id_column
 from db.connection_pool import get_pool
 from db.db_config import INDICES
-from db.db_schema import get_table_columns, init_db, table_exists
+from db.ergast_mirror import ensure_ergast_mirror_tables
+from db.particoes_logs import ensure_tabelas_logs_particionadas
+from db.repo_agendamentos import ensure_agendamentos_table
+from db.repo_login_rate_limit import ensure_login_rate_limit_table
+from db.repo_email_outbox import ensure_email_outbox_table
+from db.db_schema import (
+    carregar_catalogo_schema,
+    get_table_columns,
+    init_db,
+    invalidar_catalogo_schema,
+    table_exists,
+)
 
 logger = logging.getLogger(__name__)
 
@@ -201,6 +212,89 @@ def create_access_logs_table_if_missing() -> None:
             conn.rollback()
 
 
+def _migracao_executada(conn, nome: str) -> bool:
+    """True se a migração de dados `nome` já rodou neste banco."""
+    cursor = conn.cursor()
+    cursor.execute(
+        """
+        CREATE TABLE IF NOT EXISTS migracoes_executadas (
+            nome          TEXT PRIMARY KEY,
+            executada_em  TIMESTAMPTZ NOT NULL DEFAULT now()
+        )
+        """
+    )
+    cursor.execute("SELECT 1 FROM migracoes_executadas WHERE nome = %s", (nome,))
+    return cursor.fetchone() is not None
+
+
+def _marcar_migracao_executada(conn, nome: str) -> None:
+    """Registra `nome` na transação corrente (sem commit), junto com a própria migração."""
+    conn.cursor().execute(
+        "INSERT INTO migracoes_executadas (nome) VALUES (%s) ON CONFLICT (nome) DO NOTHING",
+        (nome,),
+    )
+
+
+def ensure_log_search_indexes() -> None:
+    """Índices das telas de log: busca 'contém' por trigramas e temporada indexável.
+
+    pg_trgm pode não estar disponível (permissão em banco gerenciado); nesse caso
+    as buscas seguem funcionando, só sem o índice GIN.
+    """
+    pool = get_pool()
+    with pool.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if table_exists(conn, "log_apostas") and not _migracao_executada(conn, "log_apostas_temporada"):
+                cols = set(get_table_columns(conn, "log_apostas"))
+                if "temporada" in cols:
+                    # Uma vez por banco: logs antigos sem temporada herdam o ano da aposta,
+                    # para que o filtro por temporada seja `temporada = %s` e use o índice.
+                    # Os registros novos já são gravados com a temporada aparada.
+                    fontes = [
+                        f"NULLIF(SUBSTR(CAST({col} AS TEXT), 1, 4), '')"
+                        for col in ("data", "data_criacao")
+                        if col in cols
+                    ]
+                    if fontes:
+                        cursor.execute(
+                            f"""
+                            UPDATE log_apostas
+                            SET temporada = COALESCE({", ".join(fontes)})
+                            WHERE NULLIF(TRIM(CAST(temporada AS TEXT)), '') IS NULL
+                              AND COALESCE({", ".join(fontes)}) IS NOT NULL
+                            """
+                        )
+                    cursor.execute(
+                        "UPDATE log_apostas SET temporada = TRIM(temporada) WHERE temporada <> TRIM(temporada)"
+                    )
+                    _marcar_migracao_executada(conn, "log_apostas_temporada")
+            conn.commit()
+        except Exception as exc:
+            logger.warning("⚠️  Falha ao normalizar temporada em log_apostas: %s", exc)
+            conn.rollback()
+
+        try:
+            cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+            conn.commit()
+        except Exception as exc:
+            logger.warning("⚠️  pg_trgm indisponível; buscas nos logs ficam sem índice: %s", exc)
+            conn.rollback()
+            return
+
+        try:
+            if table_exists(conn, "access_logs"):
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_ip_trgm ON access_logs USING gin (ip_address gin_trgm_ops)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_email_trgm ON access_logs USING gin (email gin_trgm_ops)")
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_access_logs_nome_trgm ON access_logs USING gin (nome gin_trgm_ops)")
+            if table_exists(conn, "log_apostas") and "apostador" in set(get_table_columns(conn, "log_apostas")):
+                cursor.execute("CREATE INDEX IF NOT EXISTS idx_log_apostas_apostador_trgm ON log_apostas USING gin (apostador gin_trgm_ops)")
+            conn.commit()
+        except Exception as exc:
+            logger.warning("⚠️  Falha ao criar índices de busca dos logs: %s", exc)
+            conn.rollback()
+
+
 def create_usuarios_status_historico_if_missing() -> None:
     pool = get_pool()
     with pool.get_connection() as conn:
@@ -336,6 +430,45 @@ def create_missing_tables_if_needed() -> None:
             conn.rollback()
 
 
+def ensure_posicoes_participantes_unique() -> None:
+    """Garante a chave única (prova_id, usuario_id, temporada) usada pelo upsert da classificação.
+
+    Remove duplicatas antigas (mantendo a linha mais recente) antes de criar o índice.
+    Sem o índice todo upsert `ON CONFLICT` da classificação falharia em runtime,
+    então uma falha aqui aborta as migrations.
+    """
+    pool = get_pool()
+    with pool.get_connection() as conn:
+        cursor = conn.cursor()
+        try:
+            if not table_exists(conn, "posicoes_participantes"):
+                return
+            if "temporada" not in get_table_columns(conn, "posicoes_participantes"):
+                return
+            cursor.execute(
+                """
+                DELETE FROM posicoes_participantes p
+                USING posicoes_participantes q
+                WHERE p.prova_id = q.prova_id
+                  AND p.usuario_id = q.usuario_id
+                  AND p.temporada IS NOT DISTINCT FROM q.temporada
+                  AND p.id < q.id
+                """
+            )
+            cursor.execute(
+                "CREATE UNIQUE INDEX IF NOT EXISTS ux_posicoes_participantes_prova_usuario_temporada "
+                "ON posicoes_participantes(prova_id, usuario_id, temporada)"
+            )
+            conn.commit()
+        except Exception as exc:
+            logger.error("✗ Falha ao criar chave única de posicoes_participantes: %s", exc)
+            conn.rollback()
+            raise RuntimeError(
+                "Não foi possível criar ux_posicoes_participantes_prova_usuario_temporada; "
+                "o upsert da classificação depende dela"
+            ) from exc
+
+
 def fix_sequences() -> None:
     """Ressincroniza sequences SERIAL/IDENTITY com o maior id real de cada tabela.
 
@@ -358,6 +491,7 @@ def fix_sequences() -> None:
         "championship_results",
         "hall_da_fama",
         "usuarios_status_historico",
+        "email_outbox",
     ]
     pool = get_pool()
     with pool.get_connection() as conn:
@@ -411,6 +545,8 @@ def fix_sequences() -> None:
 
 
 def run_migrations() -> None:
+    # Migrations alteram o schema: consultas vão direto ao banco até a recarga no final.
+    invalidar_catalogo_schema()
     init_db()
 
     pool = get_pool()
@@ -420,6 +556,10 @@ def run_migrations() -> None:
             create_missing_tables_if_needed()
             ensure_circuitos_f1_table()
             ensure_provas_circuit_id_column()
+            ensure_ergast_mirror_tables()
+            ensure_email_outbox_table()
+            ensure_agendamentos_table()
+            ensure_login_rate_limit_table()
             add_temporada_columns_if_missing()
             add_abandono_column_if_missing()
             add_legacy_columns_if_missing()
@@ -429,6 +569,8 @@ def run_migrations() -> None:
             add_penalidade_auto_percent_if_missing()
             harden_log_apostas_datetime_fields()
             create_access_logs_table_if_missing()
+            ensure_tabelas_logs_particionadas()
+            ensure_log_search_indexes()
             create_usuarios_status_historico_if_missing()
             create_hall_da_fama_table()
 
@@ -441,6 +583,7 @@ def run_migrations() -> None:
                     cursor.execute(idx)
 
             conn.commit()
+            ensure_posicoes_participantes_unique()
             logger.info("✓ Todas as migrations executadas com sucesso")
         except Exception as exc:
             logger.error("✗ Erro ao executar migrations: %s", exc)
@@ -469,6 +612,11 @@ def run_migrations() -> None:
             "⚠️  Migration de tipos nativos não pôde ser concluída (app segue normal): %s", exc
         )
 
+    try:
+        carregar_catalogo_schema()
+    except Exception as exc:
+        logger.warning("⚠️  Catálogo de schema não carregado; usando consultas diretas: %s", exc)
+
 
 def create_hall_da_fama_table() -> None:
     try:
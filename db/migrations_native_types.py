@@ -447,6 +447,40 @@ def sync_aposta_native(conn, aposta_id: int) -> None:
         logger.debug('sync_aposta_native falhou para id=%s: %s', aposta_id, exc)
 
 
+def sync_apostas_native(conn, aposta_ids: list[int]) -> None:
+    """
+    Versão em lote de `sync_aposta_native`: uma leitura e um executemany.
+    Não faz commit — responsabilidade do caller.
+    """
+    if not aposta_ids:
+        return
+    try:
+        cur = conn.cursor()
+        cols = get_table_columns(conn, 'apostas')
+        if 'data_envio_ts' not in cols:
+            return
+        cur.execute(
+            'SELECT id, data_envio, pilotos, fichas FROM apostas WHERE id = ANY(%s)',
+            ([int(i) for i in aposta_ids],)
+        )
+        rows = cur.fetchall() or []
+        cur.executemany(
+            'UPDATE apostas SET data_envio_ts = %s, pilotos_arr = %s, fichas_arr = %s '
+            'WHERE id = %s',
+            [
+                (
+                    _safe_timestamptz(row['data_envio']),
+                    _safe_text_array(row['pilotos']),
+                    _safe_int_array(row['fichas']),
+                    row['id'],
+                )
+                for row in rows
+            ]
+        )
+    except Exception as exc:
+        logger.debug('sync_apostas_native falhou para %d aposta(s): %s', len(aposta_ids), exc)
+
+
 def sync_resultado_native(conn, prova_id: int) -> None:
     """
     Sincroniza as colunas nativas de um resultado recém-inserido/atualizado.
@@ -0,0 +1,348 @@
+"""Particionamento mensal das tabelas de log, com retenção e arquivamento.
+
+`access_logs` e `login_attempts` viram tabelas particionadas por mês na coluna
+de data (`{tabela}_pAAAAMM`, mais uma partição DEFAULT de segurança). Um job em
+background, no padrão do sincronizador Ergast, cria as partições dos próximos
+meses e, para as que passaram da retenção, exporta o conteúdo para
+`{BF1_LOGS_ARQUIVO_DIR}/{partição}.csv.gz`, desanexa e apaga a partição —
+sem DELETE em massa nem inchaço da tabela.
+
+`log_apostas` fica fora: é o histórico das apostas (consultado por temporada e
+usuário, não por período) e não tem uma coluna de criação sempre preenchida.
+"""
+
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import re
+import threading
+import time
+from datetime import date
+from pathlib import Path
+from typing import Optional
+
+from db.db_schema import db_connect, invalidar_catalogo_schema
+
+logger = logging.getLogger(__name__)
+
+# tabela -> (coluna de partição, variável de ambiente da retenção, retenção padrão em meses)
+TABELAS_PARTICIONADAS: dict[str, tuple[str, str, int]] = {
+    "access_logs": ("created_at", "BF1_RETENCAO_ACCESS_LOGS_MESES", 12),
+    "login_attempts": ("tentativa_em", "BF1_RETENCAO_LOGIN_ATTEMPTS_MESES", 1),
+}
+# Índices recriados na tabela particionada (propagados a cada partição)
+_INDICES: dict[str, tuple[str, ...]] = {
+    "access_logs": (
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_created_at ON access_logs(created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_perfil ON access_logs(perfil)",
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_sucesso ON access_logs(sucesso)",
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_created_at_id_desc ON access_logs(created_at DESC, id DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_access_logs_perfil_created_at_desc ON access_logs(perfil, created_at DESC)",
+    ),
+    "login_attempts": (
+        "CREATE INDEX IF NOT EXISTS idx_login_attempts_email_action_tentativa ON login_attempts(email, action, tentativa_em DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_login_attempts_ip_action_tentativa ON login_attempts(ip_address, action, tentativa_em DESC)",
+    ),
+}
+# Partições criadas à frente do mês corrente
+MESES_A_FRENTE = 2
+INTERVALO_MANUTENCAO = int(os.getenv("BF1_PARTICOES_INTERVALO", "21600"))
+ARQUIVO_DIR = os.getenv("BF1_LOGS_ARQUIVO_DIR", os.path.join("backups", "logs"))
+_MANUTENCAO_LOCK_KEY = 0x4246_3150  # pg_advisory_lock: uma única manutenção por banco
+
+_job_lock = threading.Lock()
+_job_thread: Optional[threading.Thread] = None
+
+
+def _retencao_meses(tabela: str) -> int:
+    _, env, padrao = TABELAS_PARTICIONADAS[tabela]
+    try:
+        return max(1, int(os.getenv(env, str(padrao))))
+    except ValueError:
+        logger.warning("%s inválido; usando %s", env, padrao)
+        return padrao
+
+
+def _somar_meses(mes: date, n: int) -> date:
+    total = mes.year * 12 + (mes.month - 1) + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def _meses_entre(inicio: date, fim: date) -> list[date]:
+    meses = []
+    mes = date(inicio.year, inicio.month, 1)
+    while mes <= fim:
+        meses.append(mes)
+        mes = _somar_meses(mes, 1)
+    return meses
+
+
+def _nome_particao(tabela: str, mes: date) -> str:
+    return f"{tabela}_p{mes:%Y%m}"
+
+
+def _relkind(c, tabela: str) -> Optional[str]:
+    c.execute(
+        """
+        SELECT c.relkind
+        FROM pg_class c
+        JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE n.nspname = current_schema() AND c.relname = %s
+        """,
+        (tabela,),
+    )
+    row = c.fetchone()
+    return str(row["relkind"]) if row else None
+
+
+def _garantir_particao(c, tabela: str, coluna: str, mes: date) -> bool:
+    """Cria a partição do mês, movendo para ela o que caiu na DEFAULT. Retorna se criou."""
+    nome = _nome_particao(tabela, mes)
+    if _relkind(c, nome) is not None:
+        return False
+    inicio, fim = mes.isoformat(), _somar_meses(mes, 1).isoformat()
+    c.execute(f"CREATE TABLE {nome} (LIKE {tabela})")
+    if _relkind(c, f"{tabela}_default") is not None:
+        c.execute(
+            f"""
+            WITH movidas AS (
+                DELETE FROM {tabela}_default
+                WHERE {coluna} >= %s AND {coluna} < %s
+                RETURNING *
+            )
+            INSERT INTO {nome} SELECT * FROM movidas
+            """,
+            (inicio, fim),
+        )
+    c.execute(f"ALTER TABLE {tabela} ATTACH PARTITION {nome} FOR VALUES FROM ('{inicio}') TO ('{fim}')")
+    return True
+
+
+def _criar_login_attempts_se_ausente(c) -> None:
+    c.execute(
+        """
+        CREATE TABLE IF NOT EXISTS login_attempts (
+            id INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+            email TEXT,
+            sucesso BOOLEAN DEFAULT FALSE,
+            tentativa_em TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            ip_address TEXT,
+            action TEXT DEFAULT 'login'
+        )
+        """
+    )
+
+
+def _converter_para_particionada(c, tabela: str, coluna: str) -> None:
+    """Recria `tabela` como particionada por mês em `coluna`, copiando os dados.
+
+    Colunas, NOT NULL, defaults (exceto sequences) e FKs vêm da tabela original;
+    `id` passa a usar a sequence `{tabela}_id_seq`, e a PK vira (id, coluna).
+    """
+    legado = f"{tabela}__legado"
+    c.execute(f"ALTER TABLE {tabela} RENAME TO {legado}")
+
+    c.execute(
+        """
+        SELECT a.attname AS coluna, pg_get_expr(d.adbin, d.adrelid) AS expr
+        FROM pg_attrdef d
+        JOIN pg_attribute a ON a.attrelid = d.adrelid AND a.attnum = d.adnum
+        WHERE d.adrelid = to_regclass(%s)
+        """,
+        (legado,),
+    )
+    defaults = {str(r["coluna"]): str(r["expr"]) for r in c.fetchall() or []}
+    c.execute(
+        """
+        SELECT conname, pg_get_constraintdef(oid) AS definicao
+        FROM pg_constraint
+        WHERE conrelid = to_regclass(%s) AND contype = 'f'
+        """,
+        (legado,),
+    )
+    fks = [(str(r["conname"]), str(r["definicao"])) for r in c.fetchall() or []]
+    c.execute(
+        """
+        SELECT attname FROM pg_attribute
+        WHERE attrelid = to_regclass(%s) AND attnum > 0 AND NOT attisdropped
+        ORDER BY attnum
+        """,
+        (legado,),
+    )
+    colunas = [str(r["attname"]) for r in c.fetchall() or []]
+
+    c.execute(f"CREATE TABLE {tabela} (LIKE {legado}) PARTITION BY RANGE ({coluna})")
+    for col, expr in defaults.items():
+        if "nextval(" not in expr:
+            c.execute(f'ALTER TABLE {tabela} ALTER COLUMN "{col}" SET DEFAULT {expr}')
+    c.execute(f"ALTER TABLE {tabela} ALTER COLUMN {coluna} SET DEFAULT CURRENT_TIMESTAMP")
+    c.execute(f"ALTER TABLE {tabela} ALTER COLUMN {coluna} SET NOT NULL")
+    c.execute(f"CREATE TABLE {tabela}_default PARTITION OF {tabela} DEFAULT")
+
+    c.execute(f"SELECT MIN({coluna}) AS inicio, MAX({coluna}) AS fim FROM {legado}")
+    row = c.fetchone() or {}
+    hoje = date.today()
+    inicio = row.get("inicio").date() if row.get("inicio") else hoje
+    fim = max(row.get("fim").date() if row.get("fim") else hoje, _somar_meses(hoje, MESES_A_FRENTE))
+    for mes in _meses_entre(min(inicio, hoje), fim):
+        _garantir_particao(c, tabela, coluna, mes)
+
+    col_sql = ", ".join(f'"{col}"' for col in colunas)
+    select_sql = ", ".join(
+        f"COALESCE({coluna}, CURRENT_TIMESTAMP)" if col == coluna else f'"{col}"' for col in colunas
+    )
+    c.execute(f"INSERT INTO {tabela} ({col_sql}) SELECT {select_sql} FROM {legado}")
+    # Só depois do DROP: a PK e os índices reaproveitam os nomes da tabela original.
+    c.execute(f"DROP TABLE {legado}")
+    c.execute(f"ALTER TABLE {tabela} ADD PRIMARY KEY (id, {coluna})")
+
+    c.execute(f"CREATE SEQUENCE IF NOT EXISTS {tabela}_id_seq")
+    c.execute(f"ALTER SEQUENCE {tabela}_id_seq OWNED BY {tabela}.id")
+    c.execute(f"ALTER TABLE {tabela} ALTER COLUMN id SET DEFAULT nextval('{tabela}_id_seq')")
+    c.execute(f"SELECT setval('{tabela}_id_seq', COALESCE((SELECT MAX(id) FROM {tabela}), 0) + 1, false)")
+    for nome, definicao in fks:
+        c.execute(f"ALTER TABLE {tabela} ADD CONSTRAINT {nome} {definicao}")
+
+
+def ensure_tabelas_logs_particionadas() -> None:
+    """Migration: converte as tabelas de log em particionadas (idempotente)."""
+    for tabela, (coluna, _, _) in TABELAS_PARTICIONADAS.items():
+        with db_connect() as conn:
+            c = conn.cursor()
+            try:
+                if tabela == "login_attempts":
+                    _criar_login_attempts_se_ausente(c)
+                kind = _relkind(c, tabela)
+                if kind == "r":
+                    _converter_para_particionada(c, tabela, coluna)
+                    logger.info("✓ `%s` convertida para particionamento mensal por `%s`", tabela, coluna)
+                if kind in {"r", "p"}:
+                    for ddl in _INDICES.get(tabela, ()):
+                        c.execute(ddl)
+                conn.commit()
+            except Exception as exc:
+                logger.warning("⚠️  Falha ao particionar `%s` (tabela segue como estava): %s", tabela, exc)
+                conn.rollback()
+    invalidar_catalogo_schema()
+
+
+def _particoes_mensais(c, tabela: str) -> list[tuple[str, date]]:
+    c.execute(
+        """
+        SELECT child.relname AS nome
+        FROM pg_inherits i
+        JOIN pg_class child ON child.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass(%s)
+        """,
+        (tabela,),
+    )
+    padrao = re.compile(rf"^{re.escape(tabela)}_p(\d{{4}})(\d{{2}})$")
+    particoes = []
+    for r in c.fetchall() or []:
+        m = padrao.match(str(r["nome"]))
+        if m:
+            particoes.append((str(r["nome"]), date(int(m.group(1)), int(m.group(2)), 1)))
+    return sorted(particoes, key=lambda p: p[1])
+
+
+def _exportar_particao(conn, nome: str, destino_dir: Path) -> Path:
+    """Grava a partição em `destino_dir/{nome}.csv.gz` (arquivo completo ou nenhum)."""
+    destino_dir.mkdir(parents=True, exist_ok=True)
+    destino = destino_dir / f"{nome}.csv.gz"
+    parcial = destino.with_name(destino.name + ".parcial")
+    c = conn.cursor()
+    with gzip.open(parcial, "wb") as saida:
+        with c.copy(f"COPY (SELECT * FROM {nome}) TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+            for dados in copy:
+                saida.write(dados)
+    os.replace(parcial, destino)
+    return destino
+
+
+def manter_particoes_logs(hoje: Optional[date] = None, destino_dir: Optional[str] = None) -> dict[str, list[str]]:
+    """Cria as partições futuras e arquiva/remove as que passaram da retenção.
+
+    Retorna {"criadas": [...], "arquivadas": [...]} com os nomes das partições.
+    """
+    hoje = hoje or date.today()
+    mes_atual = date(hoje.year, hoje.month, 1)
+    pasta = Path(destino_dir or ARQUIVO_DIR)
+    resultado: dict[str, list[str]] = {"criadas": [], "arquivadas": []}
+
+    for tabela, (coluna, _, _) in TABELAS_PARTICIONADAS.items():
+        with db_connect() as conn:
+            c = conn.cursor()
+            if _relkind(c, tabela) != "p":
+                continue
+            for mes in _meses_entre(mes_atual, _somar_meses(mes_atual, MESES_A_FRENTE)):
+                if _garantir_particao(c, tabela, coluna, mes):
+                    resultado["criadas"].append(_nome_particao(tabela, mes))
+            conn.commit()
+
+            limite = _somar_meses(mes_atual, -_retencao_meses(tabela))
+            for nome, mes in _particoes_mensais(c, tabela):
+                if mes >= limite:
+                    break
+                try:
+                    arquivo = _exportar_particao(conn, nome, pasta)
+                    conn.commit()
+                    c.execute(f"ALTER TABLE {tabela} DETACH PARTITION {nome}")
+                    c.execute(f"DROP TABLE {nome}")
+                    conn.commit()
+                except Exception as exc:
+                    # Sem arquivo completo a partição fica; a próxima rodada tenta de novo.
+                    logger.warning("Falha ao arquivar a partição %s: %s", nome, exc)
+                    conn.rollback()
+                    continue
+                logger.info("Partição %s arquivada em %s e removida", nome, arquivo)
+                resultado["arquivadas"].append(nome)
+    return resultado
+
+
+def manter_particoes_logs_agora() -> Optional[dict[str, list[str]]]:
+    """Executa uma rodada. Retorna None se outro processo já estiver executando."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute("SELECT pg_try_advisory_lock(%s) AS ok", (_MANUTENCAO_LOCK_KEY,))
+        row = c.fetchone()
+        conn.commit()
+        if not row or not row["ok"]:
+            return None
+        try:
+            return manter_particoes_logs()
+        finally:
+            c.execute("SELECT pg_advisory_unlock(%s)", (_MANUTENCAO_LOCK_KEY,))
+            conn.commit()
+
+
+def _loop_manutencao() -> None:
+    while True:
+        try:
+            manter_particoes_logs_agora()
+        except Exception as exc:
+            logger.warning("Falha na manutenção das partições de log: %s", exc)
+        time.sleep(INTERVALO_MANUTENCAO)
+
+
+def iniciar_manutencao_particoes() -> bool:
+    """Inicia (uma vez por processo) a thread de manutenção das partições de log."""
+    global _job_thread
+    if INTERVALO_MANUTENCAO <= 0:
+        return False
+    with _job_lock:
+        if _job_thread is not None and _job_thread.is_alive():
+            return False
+        _job_thread = threading.Thread(target=_loop_manutencao, name="particoes-logs", daemon=True)
+        _job_thread.start()
+    return True
+
+
+__all__ = [
+    "TABELAS_PARTICIONADAS",
+    "ensure_tabelas_logs_particionadas",
+    "manter_particoes_logs",
+    "manter_particoes_logs_agora",
+    "iniciar_manutencao_particoes",
+]
@@ -0,0 +1,91 @@
+"""Cache em memória de consultas, invalidado por versão de tabela.
+
+Cada tabela tem um contador de versão. Uma entrada guarda o DataFrame junto com
+as versões das tabelas de que depende no momento da leitura; ela só é servida
+enquanto nenhuma dessas tabelas mudar. Escritas chamam `invalidar_tabelas(...)`
+apenas com as tabelas afetadas, sem derrubar os caches da API Ergast.
+
+O TTL é uma rede de segurança para escritas feitas por outros processos.
+"""
+
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Hashable, Iterable
+
+import pandas as pd
+
+QUERY_CACHE_TTL = float(os.getenv("BF1_QUERY_CACHE_TTL", "120"))
+QUERY_CACHE_MAX_ENTRADAS = int(os.getenv("BF1_QUERY_CACHE_MAX_ENTRADAS", "256"))
+
+_lock = threading.Lock()
+_versoes: dict[str, int] = {}
+_geracao = 0
+# chave -> (df, versões das tabelas no momento da leitura, instante da leitura)
+_entradas: "OrderedDict[Hashable, tuple[pd.DataFrame, tuple, float]]" = OrderedDict()
+
+
+def _snapshot(tabelas: Iterable[str]) -> tuple[int, tuple[tuple[str, int], ...]]:
+    return _geracao, tuple((t, _versoes.get(t, 0)) for t in tabelas)
+
+
+def consultar_com_cache(
+    tabelas: Iterable[str],
+    chave: Hashable,
+    carregar: Callable[[], pd.DataFrame],
+) -> pd.DataFrame:
+    """Retorna o DataFrame em cache para `chave` ou executa `carregar()`.
+
+    `tabelas` lista todas as tabelas lidas pela consulta. Sempre devolve uma
+    cópia, para que o chamador possa alterar o resultado livremente.
+    """
+    tabelas = tuple(sorted(set(tabelas)))
+    chave_completa = (tabelas, chave)
+    agora = time.monotonic()
+    with _lock:
+        snapshot = _snapshot(tabelas)
+        entrada = _entradas.get(chave_completa)
+        if entrada is not None:
+            df, versoes, lido_em = entrada
+            if versoes == snapshot and agora - lido_em <= QUERY_CACHE_TTL:
+                _entradas.move_to_end(chave_completa)
+                return df.copy()
+            del _entradas[chave_completa]
+
+    df = carregar()
+
+    with _lock:
+        # Só guarda se nenhuma tabela mudou durante a leitura.
+        if _snapshot(tabelas) == snapshot:
+            _entradas[chave_completa] = (df, snapshot, agora)
+            _entradas.move_to_end(chave_completa)
+            while len(_entradas) > QUERY_CACHE_MAX_ENTRADAS:
+                _entradas.popitem(last=False)
+    return df.copy()
+
+
+def invalidar_tabelas(*tabelas: str) -> None:
+    """Invalida as consultas que dependem das tabelas informadas.
+
+    Sem argumentos, descarta o cache inteiro (ex.: após restauração de backup).
+    """
+    global _geracao
+    with _lock:
+        if not tabelas:
+            _geracao += 1
+            _entradas.clear()
+            return
+        for nome in tabelas:
+            _versoes[nome] = _versoes.get(nome, 0) + 1
+        obsoletas = [k for k in _entradas if set(k[0]) & set(tabelas)]
+        for k in obsoletas:
+            del _entradas[k]
+
+
+__all__ = [
+    "consultar_com_cache",
+    "invalidar_tabelas",
+]
@@ -0,0 +1,76 @@
+"""Repositório dos eventos já executados pelo agendador de prazos de apostas."""
+
+from __future__ import annotations
+
+import logging
+from typing import Iterable
+
+from db.db_schema import db_connect
+
+logger = logging.getLogger(__name__)
+
+
+def ensure_agendamentos_table() -> None:
+    """Cria a tabela `agendamentos_apostas` quando ausente."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS agendamentos_apostas (
+                chave         TEXT PRIMARY KEY,
+                tipo          TEXT NOT NULL,
+                prova_id      INTEGER,
+                executado_em  TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+        conn.commit()
+
+
+def agendamentos_executados(chaves: Iterable[str]) -> set[str]:
+    """Subconjunto de `chaves` já executado por qualquer réplica."""
+    chaves = list(chaves)
+    if not chaves:
+        return set()
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute("SELECT chave FROM agendamentos_apostas WHERE chave = ANY(%s)", (chaves,))
+        return {str(r["chave"]) for r in c.fetchall() or []}
+
+
+def reservar_agendamentos(conn, tipo: str, prova_id: int, chaves: Iterable[str]) -> set[str]:
+    """Grava `chaves` na transação de `conn` (sem commit). Retorna as que esta chamada reservou.
+
+    Chaves já gravadas por outra rodada ou réplica ficam de fora do retorno, de
+    modo que o efeito do evento pode ir na mesma transação, condicionado à reserva.
+    """
+    chaves = list(dict.fromkeys(chaves))
+    if not chaves:
+        return set()
+    c = conn.cursor()
+    c.execute(
+        """
+        INSERT INTO agendamentos_apostas (chave, tipo, prova_id)
+        SELECT chave, %s, %s FROM unnest(%s::text[]) AS chave
+        ON CONFLICT (chave) DO NOTHING
+        RETURNING chave
+        """,
+        (tipo, prova_id, chaves),
+    )
+    reservadas = {str(r["chave"]) for r in c.fetchall() or []}
+    c.close()
+    return reservadas
+
+
+def marcar_agendamentos_executados(tipo: str, prova_id: int, chaves: Iterable[str]) -> None:
+    with db_connect() as conn:
+        reservar_agendamentos(conn, tipo, prova_id, chaves)
+        conn.commit()
+
+
+__all__ = [
+    "ensure_agendamentos_table",
+    "agendamentos_executados",
+    "reservar_agendamentos",
+    "marcar_agendamentos_executados",
+]
@@ -8,6 +8,7 @@ from typing import Optional
 import pandas as pd
 
 from db.db_schema import db_connect, get_table_columns, table_exists
+from db.query_cache import consultar_com_cache
 
 
 def _query_to_df(query: str, params: tuple | None = None) -> pd.DataFrame:
@@ -25,8 +26,10 @@ def _query_to_df(query: str, params: tuple | None = None) -> pd.DataFrame:
 
 def get_apostas_df(temporada: Optional[str] = None) -> pd.DataFrame:
     if temporada:
-        return _query_to_df("SELECT * FROM apostas WHERE temporada = %s", (temporada,))
-    return _query_to_df("SELECT * FROM apostas")
+        query, params = "SELECT * FROM apostas WHERE temporada = %s", (temporada,)
+    else:
+        query, params = "SELECT * FROM apostas", ()
+    return consultar_com_cache(("apostas",), (query, params), lambda: _query_to_df(query, params))
 
 
 def get_posicoes_participantes_df(temporada: Optional[str] = None) -> pd.DataFrame:
@@ -45,6 +48,14 @@ def _usuarios_status_historico_exists(conn) -> bool:
 def get_participantes_temporada_df(temporada: Optional[str] = None) -> pd.DataFrame:
     if temporada is None:
         temporada = str(datetime.now().year)
+    return consultar_com_cache(
+        ("usuarios", "usuarios_status_historico"),
+        ("get_participantes_temporada_df", temporada),
+        lambda: _carregar_participantes_temporada(temporada),
+    )
+
+
+def _carregar_participantes_temporada(temporada: str) -> pd.DataFrame:
     season_start = f"{temporada}-01-01 00:00:00"
     season_end = f"{temporada}-12-31 23:59:59"
 
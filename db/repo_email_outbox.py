@@ -0,0 +1,148 @@
+"""Repositório da fila persistente de emails (outbox)."""
+
+from __future__ import annotations
+
+import json
+import logging
+from typing import Any
+
+from db.db_schema import db_connect
+
+logger = logging.getLogger(__name__)
+
+STATUS_PENDENTE = "pendente"
+STATUS_ENVIANDO = "enviando"
+STATUS_ENVIADO = "enviado"
+STATUS_FALHA = "falha"
+
+
+def ensure_email_outbox_table() -> None:
+    """Cria a tabela `email_outbox` quando ausente."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            CREATE TABLE IF NOT EXISTS email_outbox (
+                id                  INTEGER GENERATED BY DEFAULT AS IDENTITY PRIMARY KEY,
+                tipo                TEXT NOT NULL,
+                payload             JSONB NOT NULL,
+                status              TEXT NOT NULL DEFAULT 'pendente',
+                tentativas          INTEGER NOT NULL DEFAULT 0,
+                proxima_tentativa   TIMESTAMPTZ NOT NULL DEFAULT now(),
+                reservado_ate       TIMESTAMPTZ,
+                ultimo_erro         TEXT,
+                criado_em           TIMESTAMPTZ NOT NULL DEFAULT now(),
+                enviado_em          TIMESTAMPTZ
+            )
+            """
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_email_outbox_pendentes ON email_outbox(proxima_tentativa) "
+            "WHERE status IN ('pendente', 'enviando')"
+        )
+        conn.commit()
+
+
+def enfileirar_email(conn, tipo: str, payload: dict[str, Any]) -> int | None:
+    """Insere um email na fila usando a transação do chamador (não faz commit).
+
+    Gravar na mesma transação da operação de negócio garante que o email só
+    existe se a operação for confirmada.
+    """
+    c = conn.cursor()
+    c.execute(
+        "INSERT INTO email_outbox (tipo, payload) VALUES (%s, %s::jsonb) RETURNING id",
+        (tipo, json.dumps(payload, ensure_ascii=False, default=str)),
+    )
+    row = c.fetchone()
+    c.close()
+    return int(row["id"]) if row else None
+
+
+def enfileirar_emails(conn, tipo: str, payloads: list[dict[str, Any]]) -> int:
+    """Versão em lote de `enfileirar_email` (mesma transação, sem commit)."""
+    if not payloads:
+        return 0
+    c = conn.cursor()
+    c.executemany(
+        "INSERT INTO email_outbox (tipo, payload) VALUES (%s, %s::jsonb)",
+        [(tipo, json.dumps(p, ensure_ascii=False, default=str)) for p in payloads],
+    )
+    c.close()
+    return len(payloads)
+
+
+def reservar_emails_pendentes(limite: int = 5, lease_segundos: int = 300) -> list[dict]:
+    """Reserva um lote de emails prontos para envio (seguro entre processos).
+
+    Também recupera itens `enviando` cujo lease expirou (worker que caiu no meio).
+    """
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            UPDATE email_outbox
+            SET status = %s,
+                reservado_ate = now() + make_interval(secs => %s)
+            WHERE id IN (
+                SELECT id FROM email_outbox
+                WHERE (status = %s AND proxima_tentativa <= now())
+                   OR (status = %s AND reservado_ate < now())
+                ORDER BY proxima_tentativa, id
+                LIMIT %s
+                FOR UPDATE SKIP LOCKED
+            )
+            RETURNING id, tipo, payload, tentativas
+            """,
+            (STATUS_ENVIANDO, lease_segundos, STATUS_PENDENTE, STATUS_ENVIANDO, limite),
+        )
+        rows = [dict(r) for r in c.fetchall() or []]
+        conn.commit()
+    for row in rows:
+        if isinstance(row.get("payload"), str):
+            row["payload"] = json.loads(row["payload"])
+    return rows
+
+
+def marcar_email_enviado(email_id: int) -> None:
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            UPDATE email_outbox
+            SET status = %s, enviado_em = now(), reservado_ate = NULL, ultimo_erro = NULL,
+                tentativas = tentativas + 1
+            WHERE id = %s
+            """,
+            (STATUS_ENVIADO, email_id),
+        )
+        conn.commit()
+
+
+def marcar_email_falha(email_id: int, erro: str, atraso_segundos: int, definitivo: bool) -> None:
+    """Registra falha: reagenda com backoff ou encerra como `falha` definitiva."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            UPDATE email_outbox
+            SET status = %s,
+                tentativas = tentativas + 1,
+                ultimo_erro = %s,
+                reservado_ate = NULL,
+                proxima_tentativa = now() + make_interval(secs => %s)
+            WHERE id = %s
+            """,
+            (STATUS_FALHA if definitivo else STATUS_PENDENTE, str(erro)[:1000], atraso_segundos, email_id),
+        )
+        conn.commit()
+
+
+__all__ = [
+    "ensure_email_outbox_table",
+    "enfileirar_email",
+    "enfileirar_emails",
+    "reservar_emails_pendentes",
+    "marcar_email_enviado",
+    "marcar_email_falha",
+]
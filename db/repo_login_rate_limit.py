@@ -0,0 +1,91 @@
+"""Janela deslizante compartilhada do rate limiting de login.
+
+Tabela UNLOGGED com uma linha por falha recente, por (ação, email) e por
+(ação, IP). Todas as réplicas leem e gravam a mesma janela; por ser UNLOGGED
+não gera WAL e é esvaziada após uma queda do servidor, o que só zera
+bloqueios em andamento. O histórico de auditoria continua em `login_attempts`.
+"""
+
+from __future__ import annotations
+
+import logging
+
+from db.db_schema import db_connect
+
+logger = logging.getLogger(__name__)
+
+TIPO_EMAIL = "email"
+TIPO_IP = "ip"
+
+
+def ensure_login_rate_limit_table() -> None:
+    """Cria a tabela `login_falhas_recentes` quando ausente."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            CREATE UNLOGGED TABLE IF NOT EXISTS login_falhas_recentes (
+                action    TEXT NOT NULL,
+                tipo      TEXT NOT NULL,
+                chave     TEXT NOT NULL,
+                falha_em  TIMESTAMPTZ NOT NULL DEFAULT now()
+            )
+            """
+        )
+        c.execute(
+            "CREATE INDEX IF NOT EXISTS idx_login_falhas_recentes_chave "
+            "ON login_falhas_recentes(action, tipo, chave, falha_em)"
+        )
+        conn.commit()
+
+
+def contar_falhas_recentes(email: str, ip_address: str, action: str, janela_segundos: int) -> tuple[int, int]:
+    """(falhas do email, falhas do IP) da ação nos últimos `janela_segundos`."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            """
+            SELECT count(*) FILTER (WHERE tipo = %s) AS falhas,
+                   count(*) FILTER (WHERE tipo = %s) AS falhas_ip
+            FROM login_falhas_recentes
+            WHERE action = %s
+              AND falha_em > now() - make_interval(secs => %s)
+              AND ((tipo = %s AND chave = %s) OR (tipo = %s AND chave = %s))
+            """,
+            (TIPO_EMAIL, TIPO_IP, action, janela_segundos, TIPO_EMAIL, email, TIPO_IP, ip_address),
+        )
+        row = c.fetchone()
+    if not row:
+        return 0, 0
+    return int(row["falhas"] or 0), int(row["falhas_ip"] or 0)
+
+
+def registrar_falha_recente(email: str, ip_address: str, action: str) -> None:
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.executemany(
+            "INSERT INTO login_falhas_recentes (action, tipo, chave) VALUES (%s, %s, %s)",
+            [(action, TIPO_EMAIL, email), (action, TIPO_IP, ip_address)],
+        )
+        conn.commit()
+
+
+def limpar_falhas_expiradas(janela_segundos: int) -> int:
+    """Remove falhas fora da maior janela em uso. Retorna quantas linhas saíram."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute(
+            "DELETE FROM login_falhas_recentes WHERE falha_em <= now() - make_interval(secs => %s)",
+            (janela_segundos,),
+        )
+        removidas = c.rowcount or 0
+        conn.commit()
+    return removidas
+
+
+__all__ = [
+    "ensure_login_rate_limit_table",
+    "contar_falhas_recentes",
+    "registrar_falha_recente",
+    "limpar_falhas_expiradas",
+]
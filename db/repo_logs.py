@@ -4,14 +4,18 @@ from __future__ import annotations
 
 import logging
 from datetime import datetime
-from typing import Optional
+from typing import Any, Optional
 
 import pandas as pd
 
 from db.db_schema import db_connect, get_table_columns
+from db.query_cache import consultar_com_cache
 
 logger = logging.getLogger(__name__)
 
+# Linhas por página nos visualizadores de log (paginação por chave, sem OFFSET)
+LOGS_POR_PAGINA = 50
+
 
 def registrar_log_aposta(
 	usuario_id: int,
@@ -44,6 +48,8 @@ def registrar_log_aposta(
 			return
 
 		data_txt = horario_dt.strftime("%Y-%m-%d")
+		# Sem temporada explícita vale o ano da aposta: o filtro por temporada usa só a coluna.
+		temporada = str(temporada or "").strip() or data_txt[:4]
 
 		with db_connect() as conn:
 			cur = conn.cursor()
@@ -82,6 +88,73 @@ def registrar_log_aposta(
 		logger.debug("registrar_log_aposta falhou: %s", exc)
 
 
+def registrar_logs_aposta(registros: list[dict]) -> int:
+	"""Versão em lote de `registrar_log_aposta`: uma conexão e um executemany.
+
+	Cada registro usa as mesmas chaves dos argumentos de `registrar_log_aposta`.
+	Retorna quantos logs foram gravados.
+	"""
+	linhas = []
+	for reg in registros:
+		horario = reg.get("horario")
+		horario_dt = horario if isinstance(horario, datetime) else None
+		if horario_dt is None:
+			try:
+				horario_dt = pd.to_datetime(horario, errors="coerce").to_pydatetime() if horario is not None else None
+			except Exception:
+				horario_dt = None
+		if horario_dt is None:
+			logger.error(
+				"registrar_logs_aposta ignorou registro: horario ausente/invalido para usuario_id=%s prova_id=%s",
+				reg.get("usuario_id"),
+				reg.get("prova_id"),
+			)
+			continue
+		linhas.append(
+			(
+				reg["usuario_id"],
+				reg["prova_id"],
+				reg["apostador"],
+				reg["aposta"],
+				reg["nome_prova"],
+				reg["pilotos"],
+				reg["piloto_11"],
+				reg["tipo_aposta"],
+				reg["automatica"],
+				horario_dt.strftime("%Y-%m-%d"),
+				horario_dt,
+				reg.get("ip_address"),
+				str(reg.get("temporada") or "").strip() or horario_dt.strftime("%Y"),
+				reg.get("status", "Registrada"),
+			)
+		)
+	if not linhas:
+		return 0
+	try:
+		with db_connect() as conn:
+			cur = conn.cursor()
+			cols = get_table_columns(conn, "log_apostas")
+			if not cols:
+				cur.close()
+				return 0
+			cur.executemany(
+				"""
+				INSERT INTO log_apostas
+					(usuario_id, prova_id, apostador, aposta, nome_prova,
+					 pilotos, piloto_11, tipo_aposta, automatica, data, horario,
+					 ip_address, temporada, status)
+				VALUES (%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s,%s)
+				""",
+				linhas,
+			)
+			cur.close()
+			conn.commit()
+	except Exception as exc:
+		logger.debug("registrar_logs_aposta falhou: %s", exc)
+		return 0
+	return len(linhas)
+
+
 def log_aposta_existe(usuario_id: int, prova_id: int, temporada: Optional[str] = None) -> bool:
 	with db_connect() as conn:
 		cur = conn.cursor()
@@ -99,4 +172,221 @@ def log_aposta_existe(usuario_id: int, prova_id: int, temporada: Optional[str] =
 		cur.close()
 		return exists
 
-__all__ = ["registrar_log_aposta", "log_aposta_existe"]
+def _padrao_contem(texto: str) -> str:
+	"""Padrão ILIKE para 'contém', com curingas digitados pelo usuário escapados."""
+	escapado = texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+	return f"%{escapado}%"
+
+
+def _estimar_linhas(cur, from_where_sql: str, params: list) -> int:
+	"""Total aproximado pelo planejador (EXPLAIN), sem varrer a tabela."""
+	cur.execute(f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {from_where_sql}", params)
+	row = cur.fetchone()
+	try:
+		return int(row["QUERY PLAN"][0]["Plan"]["Plan Rows"])
+	except (TypeError, KeyError, IndexError, ValueError):
+		return 0
+
+
+def consultar_logs_apostas(
+	temporada: Optional[str] = None,
+	usuario_id: Optional[int] = None,
+	apostador_contem: str = "",
+	tipo_aposta: Optional[int] = None,
+	data: Optional[str] = None,
+	status: Optional[str] = None,
+	somente_automaticas: bool = False,
+	antes_de_id: Optional[int] = None,
+	limite: int = LOGS_POR_PAGINA,
+) -> tuple[list[dict], Optional[int], int]:
+	"""Uma página do log de apostas, da mais recente para a mais antiga.
+
+	A paginação é por chave (`id < antes_de_id`), então cada página custa o
+	mesmo independentemente de quantas vieram antes. Retorna (linhas, cursor
+	da próxima página ou None, total estimado pelos filtros).
+	"""
+	with db_connect() as conn:
+		cols = {str(c) for c in get_table_columns(conn, "log_apostas")}
+		if not cols:
+			return [], None, 0
+		user_col = "usuario_id" if "usuario_id" in cols else ("user_id" if "user_id" in cols else None)
+		status_expr = "COALESCE(status, 'Registrada')" if "status" in cols else "'Registrada'"
+		ip_expr = "ip_address" if "ip_address" in cols else "NULL"
+
+		where: list[str] = []
+		params: list[Any] = []
+		if temporada and "temporada" in cols:
+			where.append("temporada = %s")
+			params.append(str(temporada).strip())
+		if usuario_id is not None:
+			if not user_col:
+				return [], None, 0
+			where.append(f"{user_col} = %s")
+			params.append(int(usuario_id))
+		if apostador_contem:
+			where.append("apostador ILIKE %s")
+			params.append(_padrao_contem(apostador_contem))
+		if tipo_aposta is not None:
+			where.append("tipo_aposta = %s")
+			params.append(int(tipo_aposta))
+		if data:
+			where.append("CAST(data AS TEXT) = %s")
+			params.append(str(data))
+		if status:
+			where.append(f"{status_expr} = %s")
+			params.append(status)
+		if somente_automaticas:
+			where.append("automatica > 0")
+
+		cur = conn.cursor()
+		from_where = "log_apostas" + (" WHERE " + " AND ".join(where) if where else "")
+		total = _estimar_linhas(cur, from_where, params)
+
+		pagina_where = list(where)
+		pagina_params = list(params)
+		if antes_de_id is not None:
+			pagina_where.append("id < %s")
+			pagina_params.append(int(antes_de_id))
+		pagina_sql = " WHERE " + " AND ".join(pagina_where) if pagina_where else ""
+		cur.execute(
+			"SELECT id, "
+			f"{user_col or 'NULL'} AS usuario_id, "
+			"data, horario, apostador, nome_prova, pilotos, aposta, piloto_11, "
+			"tipo_aposta, automatica, "
+			f"{ip_expr} AS ip_address, "
+			"temporada, "
+			f"{status_expr} AS status "
+			f"FROM log_apostas{pagina_sql} ORDER BY id DESC LIMIT %s",
+			(*pagina_params, limite + 1),
+		)
+		linhas = [dict(r) for r in cur.fetchall() or []]
+
+	proximo = int(linhas[limite - 1]["id"]) if len(linhas) > limite else None
+	return linhas[:limite], proximo, max(total, len(linhas))
+
+
+def opcoes_status_log_apostas(temporada: Optional[str] = None) -> list[str]:
+	"""Status distintos do log de apostas (para o filtro da tela), em cache."""
+	temporada = str(temporada).strip() if temporada else None
+
+	def _carregar() -> pd.DataFrame:
+		with db_connect() as conn:
+			cols = {str(c) for c in get_table_columns(conn, "log_apostas")}
+			if "status" not in cols:
+				return pd.DataFrame({"status": ["Registrada"]})
+			cur = conn.cursor()
+			if temporada and "temporada" in cols:
+				cur.execute(
+					"SELECT DISTINCT COALESCE(status, 'Registrada') AS status FROM log_apostas WHERE temporada = %s",
+					(temporada,),
+				)
+			else:
+				cur.execute("SELECT DISTINCT COALESCE(status, 'Registrada') AS status FROM log_apostas")
+			return pd.DataFrame([dict(r) for r in cur.fetchall() or []], columns=["status"])
+
+	df = consultar_com_cache(("log_apostas",), ("opcoes_status_log_apostas", temporada), _carregar)
+	return sorted(str(v) for v in df["status"].tolist())
+
+
+def consultar_access_logs(
+	inicio: datetime,
+	fim: datetime,
+	perfil: Optional[str] = None,
+	evento: Optional[str] = None,
+	sucesso: Optional[bool] = None,
+	ip_contem: str = "",
+	usuario_contem: str = "",
+	antes_de: Optional[tuple[datetime, int]] = None,
+	limite: int = LOGS_POR_PAGINA,
+) -> tuple[list[dict], Optional[tuple[datetime, int]], dict[str, int]]:
+	"""Uma página do log de acessos em [inicio, fim), do mais recente ao mais antigo.
+
+	Paginação por chave em (created_at, id). Retorna (linhas, cursor da próxima
+	página ou None, estimativas {"total", "sucesso"} pelos filtros).
+	"""
+	where = ["created_at >= %s", "created_at < %s"]
+	params: list[Any] = [inicio, fim]
+	if perfil:
+		where.append("LOWER(COALESCE(perfil, '')) = %s")
+		params.append(perfil.lower())
+	if evento:
+		where.append("evento = %s")
+		params.append(evento)
+	if sucesso is not None:
+		where.append("sucesso = %s")
+		params.append(bool(sucesso))
+	if ip_contem:
+		where.append("ip_address ILIKE %s")
+		params.append(_padrao_contem(ip_contem))
+	if usuario_contem:
+		where.append("(email ILIKE %s OR nome ILIKE %s)")
+		padrao = _padrao_contem(usuario_contem)
+		params.extend([padrao, padrao])
+
+	with db_connect() as conn:
+		cur = conn.cursor()
+		from_where = "access_logs WHERE " + " AND ".join(where)
+		total = _estimar_linhas(cur, from_where, params)
+		if sucesso is None:
+			total_sucesso = min(total, _estimar_linhas(cur, from_where + " AND sucesso", params))
+		else:
+			total_sucesso = total if sucesso else 0
+
+		pagina_where = list(where)
+		pagina_params = list(params)
+		if antes_de is not None:
+			pagina_where.append("(created_at, id) < (%s, %s)")
+			pagina_params.extend(antes_de)
+		cur.execute(
+			f"""
+			SELECT id, created_at, evento, sucesso, user_id, email, nome, perfil, ip_address, detalhes
+			FROM access_logs
+			WHERE {" AND ".join(pagina_where)}
+			ORDER BY created_at DESC, id DESC
+			LIMIT %s
+			""",
+			(*pagina_params, limite + 1),
+		)
+		linhas = [dict(r) for r in cur.fetchall() or []]
+
+	proximo = None
+	if len(linhas) > limite:
+		ultima = linhas[limite - 1]
+		proximo = (ultima["created_at"], int(ultima["id"]))
+	return linhas[:limite], proximo, {"total": max(total, len(linhas)), "sucesso": total_sucesso}
+
+def opcoes_filtro_access_logs() -> tuple[list[str], list[str]]:
+	"""(perfis, eventos) distintos do log de acessos, em cache."""
+
+	def _carregar() -> pd.DataFrame:
+		with db_connect() as conn:
+			cur = conn.cursor()
+			cur.execute(
+				"""
+				SELECT DISTINCT 'perfil' AS campo, LOWER(TRIM(perfil)) AS valor
+				FROM access_logs
+				WHERE TRIM(COALESCE(perfil, '')) <> ''
+				UNION
+				SELECT DISTINCT 'evento', TRIM(evento)
+				FROM access_logs
+				WHERE TRIM(COALESCE(evento, '')) <> ''
+				"""
+			)
+			return pd.DataFrame([dict(r) for r in cur.fetchall() or []], columns=["campo", "valor"])
+
+	df = consultar_com_cache(("access_logs",), "opcoes_filtro_access_logs", _carregar)
+	perfis = sorted(df.loc[df["campo"] == "perfil", "valor"].astype(str).tolist())
+	eventos = sorted(df.loc[df["campo"] == "evento", "valor"].astype(str).tolist())
+	return perfis, eventos
+
+
+__all__ = [
+	"LOGS_POR_PAGINA",
+	"registrar_log_aposta",
+	"registrar_logs_aposta",
+	"log_aposta_existe",
+	"consultar_logs_apostas",
+	"opcoes_status_log_apostas",
+	"consultar_access_logs",
+	"opcoes_filtro_access_logs",
+]
@@ -8,6 +8,7 @@ from typing import Optional
 import pandas as pd
 
 from db.db_schema import db_connect, get_table_columns
+from db.query_cache import consultar_com_cache, invalidar_tabelas
 
 logger = logging.getLogger(__name__)
 
@@ -28,20 +29,34 @@ def _query_to_df(query: str, params: tuple | None = None) -> pd.DataFrame:
     return pd.DataFrame([dict(r) for r in rows])
 
 
+def _query_to_df_cache(tabelas: tuple[str, ...], query: str, params: tuple = ()) -> pd.DataFrame:
+    return consultar_com_cache(tabelas, (query, params), lambda: _query_to_df(query, params))
+
+
 def get_pilotos_df() -> pd.DataFrame:
-    return _query_to_df("SELECT * FROM pilotos ORDER BY nome")
+    return _query_to_df_cache(("pilotos",), "SELECT * FROM pilotos ORDER BY nome")
 
 
 def get_provas_df(temporada: Optional[str] = None) -> pd.DataFrame:
     if temporada:
-        return _query_to_df(
+        return _query_to_df_cache(
+            ("provas",),
             "SELECT * FROM provas WHERE temporada = %s OR temporada IS NULL ORDER BY data ASC, id ASC",
             (temporada,),
         )
-    return _query_to_df("SELECT * FROM provas ORDER BY data ASC, id ASC")
+    return _query_to_df_cache(("provas",), "SELECT * FROM provas ORDER BY data ASC, id ASC")
 
 
 def get_resultados_df(temporada: Optional[str] = None) -> pd.DataFrame:
+    # Com temporada a consulta faz JOIN em provas; depende das duas tabelas.
+    return consultar_com_cache(
+        ("resultados", "provas"),
+        ("get_resultados_df", temporada or None),
+        lambda: _carregar_resultados(temporada),
+    )
+
+
+def _carregar_resultados(temporada: Optional[str]) -> pd.DataFrame:
     with db_connect() as conn:
         cols = get_table_columns(conn, "resultados")
         has_jsonb = "posicoes_jsonb" in cols
@@ -85,6 +100,7 @@ def add_piloto(nome: str, equipe: str = "", status: str = "Ativo", numero: int =
             )
             cur.close()
             conn.commit()
+            invalidar_tabelas("pilotos")
         return True
     except Exception as exc:
         logger.warning("add_piloto falhou: %s", exc)
@@ -106,6 +122,7 @@ def update_piloto(piloto_id: int, **campos) -> bool:
             cur.execute(f"UPDATE pilotos SET {set_clause} WHERE id = %s", values)
             cur.close()
             conn.commit()
+            invalidar_tabelas("pilotos")
         return True
     except Exception as exc:
         logger.error("update_piloto falhou: %s", exc)
@@ -119,6 +136,7 @@ def delete_piloto(piloto_id: int) -> bool:
             cur.execute("DELETE FROM pilotos WHERE id = %s", (piloto_id,))
             cur.close()
             conn.commit()
+            invalidar_tabelas("pilotos")
         return True
     except Exception as exc:
         logger.error("delete_piloto falhou: %s", exc)
@@ -143,6 +161,7 @@ def add_prova(
             )
             cur.close()
             conn.commit()
+            invalidar_tabelas("provas")
         return True
     except Exception as exc:
         logger.error("add_prova falhou: %s", exc)
@@ -164,6 +183,7 @@ def update_prova(prova_id: int, **campos) -> bool:
             cur.execute(f"UPDATE provas SET {set_clause} WHERE id = %s", values)
             cur.close()
             conn.commit()
+            invalidar_tabelas("provas")
         return True
     except Exception as exc:
         logger.error("update_prova falhou: %s", exc)
@@ -177,6 +197,7 @@ def delete_prova(prova_id: int) -> bool:
             cur.execute("DELETE FROM provas WHERE id = %s", (prova_id,))
             cur.close()
             conn.commit()
+            invalidar_tabelas("provas")
         return True
     except Exception as exc:
         logger.error("delete_prova falhou: %s", exc)
@@ -210,6 +231,7 @@ def salvar_resultado(prova_id: int, posicoes: str, abandono_pilotos: str = "") -
             )
             cur.close()
             conn.commit()
+            invalidar_tabelas("resultados")
         return True
     except Exception as exc:
         logger.error("salvar_resultado falhou: %s", exc)
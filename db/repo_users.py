@@ -6,10 +6,12 @@ import logging
 from datetime import datetime
 from typing import Optional
 
-import bcrypt
 import pandas as pd
 
 from db.db_schema import db_connect, get_table_columns, table_exists
+from db.query_cache import invalidar_tabelas
+from db.sessao_cache import invalidar_sessoes_usuario
+from utils.senhas import SenhaServicoOcupado, agendar_rehash, hash_senha, precisa_rehash, verificar_senha
 
 logger = logging.getLogger(__name__)
 
@@ -66,15 +68,39 @@ def _must_change_password_db_value(conn, must_change: bool):
 
 
 def hash_password(plain: str) -> str:
-    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt()).decode()
+    return hash_senha(plain)
 
 
 def check_password(plain: str, hashed: str) -> bool:
-    try:
-        return bcrypt.checkpw(plain.encode(), hashed.encode())
-    except Exception:
+    """Verifica a senha no pool de bcrypt; levanta `SenhaServicoOcupado` sem vaga."""
+    return verificar_senha(plain, hashed)
+
+
+def rehash_senha_se_necessario(user_id: int, plain: str, hashed: str) -> bool:
+    """Após um login válido, regrava o hash em segundo plano se o custo mudou.
+
+    O UPDATE só vale se o hash ainda for o verificado, para não sobrescrever
+    uma troca de senha feita no meio tempo. Retorna True se o rehash foi agendado.
+    """
+    if not precisa_rehash(hashed):
         return False
 
+    def _gravar(novo_hash: str) -> None:
+        with db_connect() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE usuarios SET senha_hash = %s WHERE id = %s AND senha_hash = %s",
+                (novo_hash, user_id, hashed),
+            )
+            atualizado = cur.rowcount
+            cur.close()
+            conn.commit()
+        if atualizado:
+            invalidar_tabelas("usuarios")
+            logger.info("Hash de senha do usuário %s atualizado para o custo configurado", user_id)
+
+    return agendar_rehash(plain, _gravar)
+
 
 def get_user_by_email(email: str) -> Optional[dict]:
     with db_connect() as conn:
@@ -104,6 +130,7 @@ def get_master_user() -> Optional[dict]:
 
 
 def cadastrar_usuario(nome: str, email: str, senha: str, perfil: str = "participante") -> bool:
+    """Cria o usuário; levanta `SenhaServicoOcupado` se o pool de bcrypt estiver cheio."""
     try:
         hashed = hash_password(senha)
         with db_connect() as conn:
@@ -121,13 +148,17 @@ def cadastrar_usuario(nome: str, email: str, senha: str, perfil: str = "particip
                 )
             cur.close()
             conn.commit()
+            invalidar_tabelas("usuarios")
         return True
+    except SenhaServicoOcupado:
+        raise
     except Exception as exc:
         logger.warning("cadastrar_usuario falhou: %s", exc)
         return False
 
 
 def autenticar_usuario(email: str, senha: str) -> Optional[dict]:
+    """Usuário se a senha conferir; levanta `SenhaServicoOcupado` se o pool de bcrypt estiver cheio."""
     user = get_user_by_email(email)
     if user and check_password(senha, user["senha_hash"]):
         return user
@@ -144,6 +175,7 @@ def update_user_email(user_id: int, novo_email: str) -> bool:
             )
             cur.close()
             conn.commit()
+            invalidar_tabelas("usuarios")
         logger.info("Email do usuário %s atualizado", user_id)
         return True
     except Exception as exc:
@@ -152,6 +184,7 @@ def update_user_email(user_id: int, novo_email: str) -> bool:
 
 
 def update_user_password(user_id: int, nova_senha: str, must_change_password: bool = False) -> bool:
+    """Grava a nova senha ou um hash pronto; sem vaga no pool de bcrypt levanta `SenhaServicoOcupado`."""
     try:
         if isinstance(nova_senha, str) and nova_senha.startswith("$2"):
             senha_hash = nova_senha
@@ -173,8 +206,11 @@ def update_user_password(user_id: int, nova_senha: str, must_change_password: bo
                 )
             cur.close()
             conn.commit()
+            invalidar_tabelas("usuarios")
         logger.info("Senha do usuário %s atualizada", user_id)
         return True
+    except SenhaServicoOcupado:
+        raise
     except Exception as exc:
         logger.error("Erro ao atualizar senha: %s", exc)
         return False
@@ -195,6 +231,8 @@ def update_usuario(user_id: int, **campos) -> bool:
             cur.execute(f"UPDATE usuarios SET {set_clause} WHERE id = %s", values)
             cur.close()
             conn.commit()
+            invalidar_tabelas("usuarios")
+            invalidar_sessoes_usuario(user_id)
         return True
     except Exception as exc:
         logger.error("update_usuario falhou: %s", exc)
@@ -208,6 +246,8 @@ def delete_usuario(user_id: int) -> bool:
             cur.execute("DELETE FROM usuarios WHERE id = %s", (user_id,))
             cur.close()
             conn.commit()
+            invalidar_tabelas("usuarios")
+            invalidar_sessoes_usuario(user_id)
         return True
     except Exception as exc:
         logger.error("delete_usuario falhou: %s", exc)
@@ -277,6 +317,8 @@ def registrar_historico_status_usuario(
         )
         cursor.close()
         conn.commit()
+        invalidar_tabelas("usuarios_status_historico")
+        invalidar_sessoes_usuario(usuario_id)
 
 
 def get_usuario_temporadas_ativas(user_id: int) -> list[str]:
@@ -364,6 +406,7 @@ def get_usuario_temporadas_ativas(user_id: int) -> list[str]:
 __all__ = [
     "hash_password",
     "check_password",
+    "rehash_senha_se_necessario",
     "get_user_by_email",
     "get_user_by_id",
     "get_master_user",
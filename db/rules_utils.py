@@ -4,11 +4,29 @@ Utilitários para Gestão de Regras de Temporada
 
 import logging
 import json
+import threading
 from typing import Optional
 from db.connection_pool import get_pool
 
 logger = logging.getLogger(__name__)
 
+# Versão das regras no processo: incrementada a cada escrita em `regras`/`temporadas_regras`.
+# Caches de regras (ex.: services.rules_service) comparam a versão para se invalidar.
+_regras_versao = 0
+_regras_versao_lock = threading.Lock()
+
+
+def get_versao_regras() -> int:
+    """Retorna a versão corrente das regras no processo."""
+    return _regras_versao
+
+
+def invalidar_cache_regras() -> None:
+    """Invalida explicitamente os caches de regras do processo."""
+    global _regras_versao
+    with _regras_versao_lock:
+        _regras_versao += 1
+
 def init_rules_table():
     """Cria a tabela de regras se não existir"""
     with get_pool().get_connection() as conn:
@@ -120,6 +138,7 @@ def criar_regra(
                 pontos_campeao, pontos_vice, pontos_equipe
             ))
             conn.commit()
+            invalidar_cache_regras()
             return True
     except Exception as e:
         logger.error(f"Erro ao criar regra: {e}")
@@ -175,6 +194,7 @@ def atualizar_regra(
                 pontos_campeao, pontos_vice, pontos_equipe, regra_id
             ))
             conn.commit()
+            invalidar_cache_regras()
             return True
     except Exception as e:
         logger.error(f"Erro ao atualizar regra: {e}")
@@ -190,6 +210,7 @@ def excluir_regra(regra_id: int) -> bool:
                 return False
             c.execute('DELETE FROM regras WHERE id = %s', (regra_id,))
             conn.commit()
+            invalidar_cache_regras()
             return True
     except Exception as e:
         logger.error(f"Erro ao excluir regra: {e}")
@@ -259,6 +280,7 @@ def clonar_regra(regra_id: int, novo_nome: str) -> Optional[int]:
             inserted = c.fetchone()
             new_id = inserted['id'] if inserted else None
             conn.commit()
+            invalidar_cache_regras()
             return new_id
     except Exception as e:
         logger.error(f"Erro ao clonar regra: {e}")
@@ -292,6 +314,7 @@ def associar_regra_temporada(temporada: str, regra_id: int) -> bool:
                 (temporada, regra_id),
             )
             conn.commit()
+            invalidar_cache_regras()
             return True
     except Exception as e:
         logger.error(f"Erro ao associar regra: {e}")
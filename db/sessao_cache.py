@@ -0,0 +1,108 @@
+"""Cache de sessões verificadas para o guarda de rotas do `main.py`.
+
+Cada rerun do Streamlit decodifica o JWT e relê o usuário (e, para inativos,
+as temporadas permitidas) antes de renderizar a página. Aqui o resultado dessa
+verificação fica em memória por token, até o menor entre o TTL e o `exp` do
+JWT. Escritas no usuário chamam `invalidar_sessoes_usuario(user_id)`.
+
+Como no cache de consultas, o TTL é a rede de segurança para alterações feitas
+por outros processos.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Callable, Optional
+
+SESSAO_CACHE_TTL = float(os.getenv("BF1_SESSAO_CACHE_TTL", "30"))
+SESSAO_CACHE_MAX_ENTRADAS = int(os.getenv("BF1_SESSAO_CACHE_MAX_ENTRADAS", "1024"))
+
+_lock = threading.Lock()
+# Contador global de invalidações; cada usuário guarda o valor da última que o atingiu.
+_contador = 0
+_invalidado_em: dict[object, int] = {}
+# chave do token -> (sessão, expira_em, user_id, contador no momento da leitura)
+_entradas: "OrderedDict[str, tuple[dict, float, object, int]]" = OrderedDict()
+
+
+def _chave(token: str) -> str:
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
+
+
+def _copiar(sessao: dict) -> dict:
+    copia = dict(sessao)
+    copia["allowed_seasons"] = list(sessao.get("allowed_seasons") or [])
+    return copia
+
+
+def consultar_sessao(token: str, verificar: Callable[[str], Optional[dict]]) -> Optional[dict]:
+    """Retorna a sessão verificada de `token`, executando `verificar(token)` se preciso.
+
+    `verificar` devolve None para token inválido (não vai para o cache) ou um
+    dict com ao menos `user_id`, `payload` e `allowed_seasons`.
+    """
+    if not token or SESSAO_CACHE_TTL <= 0:
+        return verificar(token)
+    chave = _chave(token)
+    agora = time.time()
+    with _lock:
+        entrada = _entradas.get(chave)
+        if entrada is not None:
+            sessao, expira_em, user_id, lido_em = entrada
+            if agora < expira_em and _invalidado_em.get(user_id, 0) <= lido_em:
+                _entradas.move_to_end(chave)
+                return _copiar(sessao)
+            del _entradas[chave]
+        lido_em = _contador
+
+    sessao = verificar(token)
+    if sessao is None:
+        return None
+
+    expira_em = agora + SESSAO_CACHE_TTL
+    exp = (sessao.get("payload") or {}).get("exp")
+    if isinstance(exp, (int, float)):
+        expira_em = min(expira_em, float(exp))
+    user_id = sessao.get("user_id")
+    with _lock:
+        # Só guarda se o usuário não foi alterado durante a verificação.
+        if _invalidado_em.get(user_id, 0) <= lido_em:
+            _entradas[chave] = (_copiar(sessao), expira_em, user_id, lido_em)
+            _entradas.move_to_end(chave)
+            while len(_entradas) > SESSAO_CACHE_MAX_ENTRADAS:
+                _entradas.popitem(last=False)
+    return sessao
+
+
+def invalidar_sessoes_usuario(user_id) -> None:
+    """Descarta as sessões em cache do usuário (status, perfil ou histórico mudou)."""
+    global _contador
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        pass
+    with _lock:
+        _contador += 1
+        _invalidado_em[user_id] = _contador
+        obsoletas = [k for k, entrada in _entradas.items() if entrada[2] == user_id]
+        for k in obsoletas:
+            del _entradas[k]
+
+
+def invalidar_sessao_token(token: str) -> None:
+    """Descarta a entrada de um token (ex.: logout)."""
+    if not token:
+        return
+    with _lock:
+        _entradas.pop(_chave(token), None)
+
+
+__all__ = [
+    "consultar_sessao",
+    "invalidar_sessoes_usuario",
+    "invalidar_sessao_token",
+]
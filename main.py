@@ -109,8 +109,14 @@ logger = logging.getLogger(__name__)
 
 # ============ INICIALIZAÇÃO DO BANCO ============
 from db.repo_users import get_user_by_id, get_usuario_temporadas_ativas
+from db.sessao_cache import consultar_sessao, invalidar_sessao_token
 from db.migrations import run_migrations
 from db.master_user_manager import MasterUserManager
+from db.ergast_mirror import iniciar_sync_ergast_background
+from db.particoes_logs import iniciar_manutencao_particoes
+from services.email_outbox import iniciar_worker_email_outbox
+from services.login_rate_limit import iniciar_gravador_tentativas
+from services.bets_agendador import iniciar_agendador_apostas
 
 @st.cache_resource(show_spinner=False)
 def bootstrap_app() -> bool:
@@ -118,6 +124,11 @@ def bootstrap_app() -> bool:
     run_migrations()
     logger.info("✓ Banco de dados/migrations inicializados")
     MasterUserManager.create_master_user()
+    iniciar_sync_ergast_background()
+    iniciar_worker_email_outbox()
+    iniciar_gravador_tentativas()
+    iniciar_agendador_apostas()
+    iniciar_manutencao_particoes()
     return True
 
 
@@ -452,6 +463,45 @@ def _ensure_token_from_cookie() -> bool:
     return bool(token)
 
 
+def _verificar_sessao(token: str) -> dict | None:
+    """Decodifica o JWT e lê o estado atual do usuário (perfil, status, temporadas)."""
+    payload = decode_token(token) if token else None
+    if not payload:
+        return None
+
+    perfil = str(payload.get("perfil", "participante")).strip().lower()
+    user_id = payload.get("user_id")
+    user = get_user_by_id(int(user_id)) if user_id else None
+    if not user:
+        return {
+            "payload": payload,
+            "user_id": int(user_id) if user_id else None,
+            "usuario_encontrado": False,
+            "perfil": perfil,
+            "status": str(payload.get("status", "")).strip().lower(),
+            "inativo": False,
+            "allowed_seasons": [],
+        }
+
+    status_usuario = str(user.get("status", "")).strip().lower()
+    perfil_usuario = str(user.get("perfil", perfil)).strip().lower()
+    usuario_inativo = (status_usuario != "ativo") or (perfil_usuario == "inativo")
+    return {
+        "payload": payload,
+        "user_id": int(user_id),
+        "usuario_encontrado": True,
+        "perfil": perfil_usuario,
+        "status": status_usuario,
+        "inativo": usuario_inativo,
+        "allowed_seasons": get_usuario_temporadas_ativas(int(user_id)) if usuario_inativo else [],
+    }
+
+
+def _sessao_verificada(token: str) -> dict | None:
+    """Sessão verificada em cache por token; evita reler o usuário a cada rerun."""
+    return consultar_sessao(token, _verificar_sessao)
+
+
 def _sync_session_from_token() -> bool:
     """Sincroniza dados básicos da sessão a partir do token antes de renderizar o menu."""
     if not _ensure_token_from_cookie():
@@ -461,42 +511,22 @@ def _sync_session_from_token() -> bool:
         return False
 
     token = st.session_state.get("token")
-    payload = decode_token(token) if token else None
-    if not payload:
+    sessao = _sessao_verificada(token) if token else None
+    if not sessao:
         st.session_state.pop("user_role", None)
         st.session_state.pop("user_id", None)
         st.session_state.pop("user_nome", None)
         return False
 
-    perfil = str(payload.get("perfil", "participante")).strip().lower()
-    user_id = payload.get("user_id")
-
-    st.session_state["user_id"] = user_id
+    payload = sessao["payload"]
+    st.session_state["user_id"] = payload.get("user_id")
     st.session_state["user_nome"] = payload.get("nome", st.session_state.get("user_nome"))
 
-    user = get_user_by_id(int(user_id)) if user_id else None
-    if not user:
-        st.session_state["user_role"] = perfil
-        st.session_state["user_status"] = str(payload.get("status", "")).strip().lower()
-        st.session_state["allowed_seasons"] = []
-        st.session_state["inactive_has_history"] = False
-        return True
-
-    status_usuario = str(user.get("status", "")).strip().lower()
-    perfil_usuario = str(user.get("perfil", perfil)).strip().lower()
-    usuario_inativo = (status_usuario != "ativo") or (perfil_usuario == "inativo")
-
-    if usuario_inativo:
-        allowed_seasons = get_usuario_temporadas_ativas(int(user_id))
-        st.session_state["allowed_seasons"] = allowed_seasons
-        st.session_state["inactive_has_history"] = bool(allowed_seasons)
-        st.session_state["user_role"] = "inativo"
-    else:
-        st.session_state["allowed_seasons"] = []
-        st.session_state["inactive_has_history"] = False
-        st.session_state["user_role"] = perfil_usuario
-
-    st.session_state["user_status"] = status_usuario
+    allowed_seasons = sessao["allowed_seasons"]
+    st.session_state["allowed_seasons"] = allowed_seasons
+    st.session_state["inactive_has_history"] = bool(allowed_seasons)
+    st.session_state["user_role"] = "inativo" if sessao["inativo"] else sessao["perfil"]
+    st.session_state["user_status"] = sessao["status"]
     return True
 
 
@@ -509,23 +539,22 @@ def _enforce_route_guard(pagina: str):
     if not token:
         _clear_session_and_redirect_login("Sessão ausente. Faça login novamente.")
 
-    payload = decode_token(token)
-    if not payload:
+    sessao = _sessao_verificada(token)
+    if not sessao:
         _clear_session_and_redirect_login("Sessão expirada ou inválida. Faça login novamente.")
 
-    perfil = str(payload.get("perfil", "participante")).strip().lower()
+    payload = sessao["payload"]
     user_id = payload.get("user_id")
 
     if not user_id:
         _clear_session_and_redirect_login("Sessão inválida. Faça login novamente.")
 
-    user = get_user_by_id(int(user_id))
-    if not user:
+    if not sessao["usuario_encontrado"]:
         _clear_session_and_redirect_login("Usuário não encontrado. Faça login novamente.")
 
-    status_usuario = str(user.get("status", "")).strip().lower()
-    perfil_usuario = str(user.get("perfil", perfil)).strip().lower()
-    usuario_inativo = (status_usuario != "ativo") or (perfil_usuario == "inativo")
+    status_usuario = sessao["status"]
+    perfil_usuario = sessao["perfil"]
+    usuario_inativo = sessao["inativo"]
 
     # Sincroniza sessão com claims assinadas do JWT a cada rota.
     st.session_state["user_id"] = user_id
@@ -534,7 +563,7 @@ def _enforce_route_guard(pagina: str):
     st.session_state["user_status"] = status_usuario
 
     if usuario_inativo:
-        allowed_seasons = get_usuario_temporadas_ativas(int(user_id))
+        allowed_seasons = sessao["allowed_seasons"]
         has_history = bool(allowed_seasons)
         allowed_pages = INATIVO_ALLOWED_PAGES_WITH_HISTORY if has_history else INATIVO_ALLOWED_PAGES_NO_HISTORY
         st.session_state["allowed_seasons"] = allowed_seasons
@@ -662,6 +691,7 @@ def main():
     
     # LOGOUT
     if pagina == "Logout":
+        invalidar_sessao_token(st.session_state.get("token"))
         clear_auth_cookies()
         for k in list(st.session_state.keys()):
             del st.session_state[k]
@@ -13,7 +13,9 @@ except ImportError:
 
 # Funções de auth/usuário importadas dos módulos focados de dados.
 from db.db_schema import db_connect, get_table_columns
+from db.query_cache import invalidar_tabelas
 from db.repo_users import hash_password, check_password, get_user_by_id
+from utils.senhas import MSG_SENHA_OCUPADO, SenhaServicoOcupado, hash_senha
 
 # Exportar explicitamente para manter compatibilidade
 __all__ = ['hash_password', 'check_password', 'autenticar_usuario', 'generate_token',
@@ -198,7 +200,10 @@ def decode_token(token: str):
 
 # --- REGISTRO DE USUÁRIO ---
 def cadastrar_usuario(nome: str, email: str, senha: str, perfil="participante", status="Ativo") -> bool:
-    """Cria novo usuário, garantindo unicidade de email."""
+    """Cria novo usuário, garantindo unicidade de email.
+
+    Levanta `SenhaServicoOcupado` se o pool de bcrypt estiver cheio.
+    """
     try:
         senha_hashed = hash_password(senha)
         with db_connect() as conn:
@@ -221,6 +226,7 @@ def cadastrar_usuario(nome: str, email: str, senha: str, perfil="participante",
             row = c.fetchone()
             user_id = row['id'] if row else None
             conn.commit()
+        invalidar_tabelas('usuarios')
         try:
             if isinstance(user_id, int):
                 from db.repo_users import registrar_historico_status_usuario
@@ -233,6 +239,8 @@ def cadastrar_usuario(nome: str, email: str, senha: str, perfil="participante",
         except Exception:
             pass
         return True
+    except SenhaServicoOcupado:
+        raise
     except Exception:
         # fix #3: logar exceção para diagnóstico em vez de engolir silenciosamente
         logger.exception("cadastrar_usuario falhou para email=%s", email)
@@ -378,7 +386,10 @@ def redefinir_senha_com_token(email: str, token: str, nova_senha: str):
         if not token_row:
             return False, "Token inválido ou expirado."
 
-        senha_hashed = hash_password(nova_senha)
+        try:
+            senha_hashed = hash_password(nova_senha)
+        except SenhaServicoOcupado:
+            return False, MSG_SENHA_OCUPADO
         pwd_col = _get_usuarios_password_column(conn)
         cols = get_table_columns(conn, 'usuarios')
         if 'must_change_password' in cols:
@@ -406,6 +417,7 @@ def redefinir_senha_com_token(email: str, token: str, nova_senha: str):
             (token_row['id'],),
         )
         conn.commit()
+    invalidar_tabelas('usuarios')
 
     return True, "Senha redefinida com sucesso."
 
@@ -430,7 +442,8 @@ def criar_master_se_nao_existir():
         c.execute("SELECT COUNT(*) AS cnt FROM usuarios WHERE perfil = %s", ('master',))
         existe = c.fetchone()['cnt'] > 0
         if not existe:
-            senha_hashed = hash_password(senha)
+            # Inicialização: aguarda vaga no pool de bcrypt sem limite.
+            senha_hashed = hash_senha(senha, espera=None)
             cols = get_table_columns(conn, 'usuarios')
             if 'faltas' in cols:
                 c.execute(
@@ -445,6 +458,7 @@ def criar_master_se_nao_existir():
                     (nome, email, senha_hashed, 'master', 'Ativo')
                 )
             conn.commit()
+            invalidar_tabelas('usuarios')
 
 # Alias para compatibilidade
 def create_token(user_id: int, nome: str, perfil: str, status: str) -> str:
@@ -0,0 +1,303 @@
+"""Agendador de prazos de apostas: lembretes antes do horário limite e apostas
+automáticas logo depois, sem depender de um admin abrir a Gestão de Apostas.
+
+Segue o padrão do sincronizador Ergast: uma thread por processo e um
+`pg_try_advisory_lock` que deixa uma única réplica executando por vez. Cada
+evento concluído é gravado em `agendamentos_apostas`, de modo que reinícios e
+outras réplicas não repetem lembretes nem apostas automáticas. Lembretes gravam
+a chave na mesma transação que enfileira os emails.
+"""
+
+from __future__ import annotations
+
+import html
+import logging
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+import pandas as pd
+
+from db.db_schema import db_connect
+from db.repo_agendamentos import agendamentos_executados, marcar_agendamentos_executados, reservar_agendamentos
+from db.repo_email_outbox import enfileirar_emails
+from db.repo_races import get_provas_df
+from db.repo_users import get_user_by_id
+from services.bets_write import _participantes_sem_aposta, gerar_apostas_automaticas_prova
+from services.email_outbox import TIPO_LEMBRETE_APOSTA, notificar_email_outbox
+from utils.datetime_utils import now_sao_paulo, parse_datetime_sao_paulo
+
+logger = logging.getLogger(__name__)
+
+
+def _horas_env(nome: str, padrao: str) -> tuple[float, ...]:
+    try:
+        horas = {float(h) for h in os.getenv(nome, padrao).split(",") if h.strip()}
+    except ValueError:
+        logger.warning("%s inválido; usando %s", nome, padrao)
+        horas = {float(h) for h in padrao.split(",")}
+    return tuple(sorted(h for h in horas if h > 0))
+
+
+# Intervalo máximo entre rodadas em segundos (0 desativa)
+INTERVALO_AGENDADOR = int(os.getenv("BF1_AGENDADOR_INTERVALO", "60"))
+# Antecedências (em horas) dos lembretes para quem ainda não apostou
+LEMBRETES_HORAS_ANTES = _horas_env("BF1_LEMBRETES_HORAS_ANTES", "24,2")
+# Depois do prazo, por quanto tempo ainda vale gerar as apostas automáticas
+JANELA_APOSTAS_AUTOMATICAS_HORAS = float(os.getenv("BF1_JANELA_APOSTAS_AUTOMATICAS_HORAS", "12"))
+_AGENDADOR_LOCK_KEY = 0x4246_3147  # pg_advisory_lock: um único agendador por banco
+
+EVENTO_LEMBRETE = "lembrete"
+EVENTO_APOSTAS_AUTOMATICAS = "apostas_automaticas"
+
+_job_lock = threading.Lock()
+_job_thread: Optional[threading.Thread] = None
+
+
+def _prazos_provas(provas_df: pd.DataFrame) -> list[tuple[datetime, dict]]:
+    """Índice (horário limite, prova) ordenado por prazo, ignorando provas inativas."""
+    prazos = []
+    if provas_df.empty:
+        return prazos
+    for prova in provas_df.to_dict("records"):
+        if str(prova.get("status") or "").strip().lower() == "inativa":
+            continue
+        try:
+            limite = parse_datetime_sao_paulo(str(prova.get("data") or ""), str(prova.get("horario_prova") or ""))
+        except ValueError:
+            continue
+        prazos.append((limite, prova))
+    prazos.sort(key=lambda item: (item[0], int(item[1]["id"])))
+    return prazos
+
+
+def _chave_lembrete(prova_id: int, horas: float) -> str:
+    return f"{EVENTO_LEMBRETE}:{prova_id}:{horas:g}h"
+
+
+def _chave_apostas_automaticas(prova_id: int) -> str:
+    return f"{EVENTO_APOSTAS_AUTOMATICAS}:{prova_id}"
+
+
+def eventos_devidos(prazos: list[tuple[datetime, dict]], agora: datetime) -> list[dict]:
+    """Eventos que já deveriam ter disparado em `agora`.
+
+    Se várias antecedências de lembrete já passaram (ex.: app fora do ar), só a
+    mais próxima do prazo é enviada; as demais são marcadas junto com ela.
+    Apostas automáticas só disparam dentro da janela após o prazo.
+    """
+    janela = timedelta(hours=JANELA_APOSTAS_AUTOMATICAS_HORAS)
+    eventos = []
+    for limite, prova in prazos:
+        prova_id = int(prova["id"])
+        if agora < limite:
+            vencidas = [h for h in LEMBRETES_HORAS_ANTES if limite - timedelta(hours=h) <= agora]
+            if vencidas:
+                eventos.append(
+                    {
+                        "tipo": EVENTO_LEMBRETE,
+                        "prova": prova,
+                        "limite": limite,
+                        "horas": min(vencidas),
+                        "chaves": [_chave_lembrete(prova_id, h) for h in vencidas],
+                    }
+                )
+        elif agora <= limite + janela:
+            eventos.append(
+                {
+                    "tipo": EVENTO_APOSTAS_AUTOMATICAS,
+                    "prova": prova,
+                    "limite": limite,
+                    "chaves": [_chave_apostas_automaticas(prova_id)],
+                }
+            )
+    return eventos
+
+
+def proximo_disparo(prazos: list[tuple[datetime, dict]], agora: datetime) -> Optional[datetime]:
+    """Instante do próximo evento futuro (lembrete ou prazo), se houver."""
+    proximos = []
+    for limite, _ in prazos:
+        if limite <= agora:
+            continue
+        proximos.append(limite)
+        proximos.extend(
+            limite - timedelta(hours=h) for h in LEMBRETES_HORAS_ANTES if limite - timedelta(hours=h) > agora
+        )
+    return min(proximos) if proximos else None
+
+
+def _temporada_prova(prova: dict, limite: datetime) -> str:
+    temporada = prova.get("temporada")
+    if temporada is None or pd.isna(temporada) or not str(temporada).strip():
+        return str(limite.year)
+    return str(temporada).strip()
+
+
+def _enviar_lembretes(prova: dict, limite: datetime, horas: float, chaves: list[str]) -> Optional[int]:
+    """Enfileira um lembrete por participante sem aposta. Retorna quantos.
+
+    As `chaves` do evento são reservadas na mesma transação dos emails: se a do
+    lembrete já estava gravada, nada é enfileirado e o retorno é None.
+    """
+    prova_id = int(prova["id"])
+    temporada = _temporada_prova(prova, limite)
+    payloads = [
+        {
+            "usuario_id": int(u["id"]),
+            "prova_id": prova_id,
+            "nome_prova": str(prova.get("nome") or ""),
+            "temporada": temporada,
+            "horario_limite": limite.isoformat(),
+            "horas_antes": horas,
+        }
+        for u in _participantes_sem_aposta(prova_id, temporada)
+        if str(u.get("email") or "").strip()
+    ]
+    with db_connect() as conn:
+        reservadas = reservar_agendamentos(conn, EVENTO_LEMBRETE, prova_id, chaves)
+        if _chave_lembrete(prova_id, horas) not in reservadas:
+            conn.rollback()
+            return None
+        enfileirar_emails(conn, TIPO_LEMBRETE_APOSTA, payloads)
+        conn.commit()
+    if payloads:
+        notificar_email_outbox()
+    return len(payloads)
+
+
+def renderizar_email_lembrete_aposta(payload: dict) -> tuple[str, str, str]:
+    """Monta (destinatario, assunto, corpo_html) do lembrete de aposta pendente."""
+    usuario = get_user_by_id(int(payload["usuario_id"]))
+    if not usuario:
+        raise ValueError(f"Usuário não encontrado: id={payload.get('usuario_id')}")
+    nome_prova = str(payload.get("nome_prova", ""))
+    temporada = str(payload.get("temporada", ""))
+    try:
+        limite_txt = datetime.fromisoformat(str(payload["horario_limite"])).strftime("%d/%m/%Y %H:%M:%S")
+    except (KeyError, ValueError):
+        limite_txt = str(payload.get("horario_limite", ""))
+    assunto = f"Lembrete de aposta - {nome_prova} ({temporada})"
+    corpo = (
+        f"<p>Olá {html.escape(str(usuario.get('nome') or 'participante'))}!</p>"
+        f"<p>Este é um lembrete para registrar sua aposta da prova <b>{html.escape(nome_prova)}</b> "
+        f"da temporada <b>{html.escape(temporada)}</b>.</p>"
+        f"<p><b>Horário limite (Calendário):</b> {html.escape(limite_txt)}</p>"
+        "<p>Sem aposta até o horário limite, uma aposta automática será gerada.</p>"
+        "<p>Boa sorte!</p>"
+    )
+    return str(usuario.get("email") or ""), assunto, corpo
+
+
+def _executar_evento(evento: dict, chaves: list[str]) -> None:
+    prova = evento["prova"]
+    prova_id = int(prova["id"])
+    if evento["tipo"] == EVENTO_LEMBRETE:
+        enviados = _enviar_lembretes(prova, evento["limite"], evento["horas"], chaves)
+        if enviados is None:
+            logger.info("Agendador: lembrete da prova %s já enviado por outra rodada", prova_id)
+        else:
+            logger.info("Agendador: %s lembrete(s) enfileirado(s) para a prova %s", enviados, prova_id)
+    else:
+        # Falha levanta exceção: o evento não é marcado e a próxima rodada tenta de novo.
+        geradas, mensagens = gerar_apostas_automaticas_prova(
+            prova_id, temporada=_temporada_prova(prova, evento["limite"]), levantar_falhas=True
+        )
+        logger.info("Agendador: %s aposta(s) automática(s) gerada(s) para a prova %s", geradas, prova_id)
+        for msg in mensagens:
+            logger.info("Agendador (prova %s): %s", prova_id, msg)
+
+
+def _executar_eventos_devidos(agora: datetime) -> list[str]:
+    eventos = eventos_devidos(_prazos_provas(get_provas_df()), agora)
+    if not eventos:
+        return []
+    ja_executados = agendamentos_executados(ch for ev in eventos for ch in ev["chaves"])
+    executados = []
+    for evento in eventos:
+        pendentes = [ch for ch in evento["chaves"] if ch not in ja_executados]
+        if not pendentes:
+            continue
+        prova_id = int(evento["prova"]["id"])
+        if evento["tipo"] == EVENTO_LEMBRETE and _chave_lembrete(prova_id, evento["horas"]) in ja_executados:
+            # Lembrete mais próximo já enviado: as antecedências maiores são redundantes.
+            marcar_agendamentos_executados(evento["tipo"], prova_id, pendentes)
+            continue
+        try:
+            _executar_evento(evento, pendentes)
+        except Exception as exc:
+            # Não marca: a próxima rodada tenta de novo.
+            logger.warning("Agendador: falha em %s: %s", pendentes[0], exc)
+            continue
+        if evento["tipo"] != EVENTO_LEMBRETE:
+            # Lembretes já gravaram as chaves junto com os emails.
+            marcar_agendamentos_executados(evento["tipo"], prova_id, pendentes)
+        executados.extend(pendentes)
+    return executados
+
+
+def executar_agendador_agora(agora: Optional[datetime] = None) -> Optional[list[str]]:
+    """Executa uma rodada. Retorna None se outra réplica já estiver executando."""
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.execute("SELECT pg_try_advisory_lock(%s) AS ok", (_AGENDADOR_LOCK_KEY,))
+        row = c.fetchone()
+        conn.commit()
+        if not row or not row["ok"]:
+            return None
+        try:
+            return _executar_eventos_devidos(agora or now_sao_paulo())
+        finally:
+            c.execute("SELECT pg_advisory_unlock(%s)", (_AGENDADOR_LOCK_KEY,))
+            conn.commit()
+
+
+def _segundos_ate_proxima_rodada() -> float:
+    agora = now_sao_paulo()
+    proximo = proximo_disparo(_prazos_provas(get_provas_df()), agora)
+    if proximo is None:
+        return float(INTERVALO_AGENDADOR)
+    return max(1.0, min(float(INTERVALO_AGENDADOR), (proximo - agora).total_seconds() + 1))
+
+
+def _loop_agendador() -> None:
+    while True:
+        espera = float(INTERVALO_AGENDADOR)
+        try:
+            executar_agendador_agora()
+            espera = _segundos_ate_proxima_rodada()
+        except Exception as exc:
+            logger.warning("Falha no agendador de prazos de apostas: %s", exc)
+        time.sleep(espera)
+
+
+def iniciar_agendador_apostas() -> bool:
+    """Inicia (uma vez por processo) a thread do agendador de prazos."""
+    global _job_thread
+    if INTERVALO_AGENDADOR <= 0:
+        return False
+    with _job_lock:
+        if _job_thread is not None and _job_thread.is_alive():
+            return False
+        _job_thread = threading.Thread(target=_loop_agendador, name="agendador-apostas", daemon=True)
+        _job_thread.start()
+    return True
+
+
+__all__ = [
+    "LEMBRETES_HORAS_ANTES",
+    "JANELA_APOSTAS_AUTOMATICAS_HORAS",
+    "eventos_devidos",
+    "proximo_disparo",
+    "renderizar_email_lembrete_aposta",
+    "executar_agendador_agora",
+    "iniciar_agendador_apostas",
+]
+
+
+if __name__ == "__main__":
+    # Modo avulso: `python -m services.bets_agendador` (ex.: worker separado do app).
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(name)s - %(levelname)s - %(message)s")
+    _loop_agendador()
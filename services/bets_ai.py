@@ -7,11 +7,15 @@ import importlib
 import json
 import logging
 import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
 from typing import Optional
 
 import pandas as pd
 
 from utils.data_utils import (
+    PrazoErgastEsgotado,
     get_circuit_id_por_nome_prova,
     get_constructor_standings,
     get_driver_standings,
@@ -22,6 +26,7 @@ from utils.data_utils import (
     get_qualifying_grid_ultima_corrida,
     get_qualifying_vs_race_delta,
     get_taxa_dnf_por_piloto,
+    prazo_requisicoes,
 )
 from utils.data_utils import get_current_season
 
@@ -33,6 +38,21 @@ try:
 except ImportError:
     httpx = None
 
+try:
+    from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+except ImportError:
+    add_script_run_ctx = None
+    get_script_run_ctx = None
+
+try:
+    from streamlit.runtime.scriptrunner_utils.script_run_context import SCRIPT_RUN_CONTEXT_ATTR_NAME
+except ImportError:
+    SCRIPT_RUN_CONTEXT_ATTR_NAME = "streamlit_script_run_ctx"
+
+# Prazo total para montar o contexto Ergast; o que não chegar a tempo fica de fora.
+ERGAST_CONTEXT_TIMEOUT = float(os.getenv("BF1_ERGAST_CONTEXT_TIMEOUT", "8"))
+_ERGAST_EXECUTOR = ThreadPoolExecutor(max_workers=10, thread_name_prefix="ergast-ctx")
+
 
 def _extrair_json_texto(raw_text: str) -> Optional[dict]:
     if not raw_text:
@@ -110,7 +130,106 @@ def _get_resumo_cenario_campeonato(resultados_df: pd.DataFrame, provas_df: pd.Da
     return out
 
 
-def _get_contexto_temporada_atual_ergast(temporada: Optional[str] = None, nome_prova: Optional[str] = None) -> dict:
+def _ctx_top_pilotos(temporada: str) -> list[dict]:
+    df_pilotos = get_driver_standings(temporada)
+    top_pilotos = []
+    for _, row in df_pilotos.head(8).iterrows():
+        top_pilotos.append(
+            {
+                "p": int(row.get("Position", 0) or 0),
+                "n": str(row.get("Driver", "")).strip(),
+                "e": str(row.get("Constructor", "")).strip(),
+                "pt": int(row.get("Points", 0) or 0),
+            }
+        )
+    return top_pilotos
+
+
+def _ctx_top_construtores(temporada: str) -> list[dict]:
+    df_construtores = get_constructor_standings(temporada)
+    top_construtores = []
+    for _, row in df_construtores.head(5).iterrows():
+        top_construtores.append(
+            {
+                "p": int(row.get("Position", 0) or 0),
+                "n": str(row.get("Constructor", "")).strip(),
+                "pt": int(row.get("Points", 0) or 0),
+            }
+        )
+    return top_construtores
+
+
+def _ctx_delta_grid(temporada: str) -> dict:
+    df_delta = get_qualifying_vs_race_delta(temporada)
+    if df_delta.empty:
+        return {"top": [], "bot": []}
+    top_delta = []
+    bottom_delta = []
+    for _, row in df_delta.sort_values("Delta", ascending=False).head(5).iterrows():
+        top_delta.append(
+            {
+                "n": str(row.get("Driver", "")).strip(),
+                "d": int(row.get("Delta", 0) or 0),
+            }
+        )
+    for _, row in df_delta.sort_values("Delta", ascending=True).head(4).iterrows():
+        bottom_delta.append(
+            {
+                "n": str(row.get("Driver", "")).strip(),
+                "d": int(row.get("Delta", 0) or 0),
+            }
+        )
+    return {"top": top_delta, "bot": bottom_delta}
+
+
+def _ctx_voltas_rapidas(temporada: str) -> list[dict]:
+    df_volta_rapida = get_fastest_lap_times(temporada)
+    voltas = []
+    for _, row in df_volta_rapida.head(5).iterrows():
+        voltas.append({"n": str(row.get("Driver", "")).strip(), "t": str(row.get("Fastest Lap", "")).strip()})
+    return voltas
+
+
+def _ctx_historico_circuito(temporada: str, nome_prova: str) -> tuple[Optional[str], dict]:
+    circuit_id = get_circuit_id_por_nome_prova(temporada, nome_prova)
+    if not circuit_id:
+        return None, {}
+    return circuit_id, get_historico_circuito(circuit_id, n_anos=4, season_ref=temporada)
+
+
+def _executar_com_contexto_streamlit(prazo: float, ctx, fn, *args, **kwargs):
+    # Tarefa que só saiu da fila depois do prazo não ocupa o pool com requisições.
+    if time.monotonic() >= prazo:
+        raise PrazoErgastEsgotado("prazo esgotado antes do início")
+    thread = threading.current_thread()
+    # Propaga o ScriptRunContext para que st.cache_data funcione sem avisos nas threads.
+    # A thread é do pool: o contexto sai ao terminar, para não vazar para a próxima
+    # tarefa (de outra sessão ou do agendador, que não tem contexto).
+    if ctx is not None and add_script_run_ctx is not None:
+        add_script_run_ctx(thread, ctx)
+    try:
+        with prazo_requisicoes(prazo):
+            return fn(*args, **kwargs)
+    finally:
+        if hasattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME):
+            delattr(thread, SCRIPT_RUN_CONTEXT_ATTR_NAME)
+
+
+def _get_contexto_temporada_atual_ergast(
+    temporada: Optional[str] = None,
+    nome_prova: Optional[str] = None,
+    timeout: float = ERGAST_CONTEXT_TIMEOUT,
+) -> dict:
+    """
+    Monta o contexto Ergast da temporada disparando todas as consultas em paralelo.
+
+    Respeita um prazo total (`timeout`, em segundos): chaves cujas consultas não
+    terminarem a tempo (ou falharem) ficam com o valor vazio padrão. O prazo vale
+    também dentro das consultas: requisições HTTP usam só o tempo restante e
+    tarefas que ainda estavam na fila são canceladas.
+    """
+    inicio = time.monotonic()
+    prazo = inicio + timeout
     contexto = {
         "src": "ergast",
         "s": None,
@@ -134,111 +253,56 @@ def _get_contexto_temporada_atual_ergast(temporada: Optional[str] = None, nome_p
 
     contexto["s"] = temporada_resolvida
 
-    try:
-        df_pilotos = get_driver_standings(temporada_resolvida)
-        if not df_pilotos.empty:
-            top_pilotos = []
-            for _, row in df_pilotos.head(8).iterrows():
-                top_pilotos.append(
-                    {
-                        "p": int(row.get("Position", 0) or 0),
-                        "n": str(row.get("Driver", "")).strip(),
-                        "e": str(row.get("Constructor", "")).strip(),
-                        "pt": int(row.get("Points", 0) or 0),
-                    }
-                )
-            contexto["tp"] = top_pilotos
-    except Exception:
-        pass
-
-    try:
-        df_construtores = get_constructor_standings(temporada_resolvida)
-        if not df_construtores.empty:
-            top_construtores = []
-            for _, row in df_construtores.head(5).iterrows():
-                top_construtores.append(
-                    {
-                        "p": int(row.get("Position", 0) or 0),
-                        "n": str(row.get("Constructor", "")).strip(),
-                        "pt": int(row.get("Points", 0) or 0),
-                    }
-                )
-            contexto["tc"] = top_construtores
-    except Exception:
-        pass
-
-    try:
-        df_delta = get_qualifying_vs_race_delta(temporada_resolvida)
-        if not df_delta.empty:
-            top_delta = []
-            bottom_delta = []
-            for _, row in df_delta.sort_values("Delta", ascending=False).head(5).iterrows():
-                top_delta.append(
-                    {
-                        "n": str(row.get("Driver", "")).strip(),
-                        "d": int(row.get("Delta", 0) or 0),
-                    }
-                )
-            for _, row in df_delta.sort_values("Delta", ascending=True).head(4).iterrows():
-                bottom_delta.append(
-                    {
-                        "n": str(row.get("Driver", "")).strip(),
-                        "d": int(row.get("Delta", 0) or 0),
-                    }
-                )
-            contexto["du"] = {"top": top_delta, "bot": bottom_delta}
-    except Exception:
-        pass
-
-    try:
-        df_volta_rapida = get_fastest_lap_times(temporada_resolvida)
-        if not df_volta_rapida.empty:
-            voltas = []
-            for _, row in df_volta_rapida.head(5).iterrows():
-                voltas.append({"n": str(row.get("Driver", "")).strip(), "t": str(row.get("Fastest Lap", "")).strip()})
-            contexto["vr"] = voltas
-    except Exception:
-        pass
-
-    try:
-        contexto["qg"] = get_qualifying_grid_ultima_corrida(temporada_resolvida)
-    except Exception:
-        pass
-
-    try:
-        contexto["rp5"] = get_posicoes_recentes(temporada_resolvida, n_corridas=5)
-    except Exception:
-        pass
-
-    try:
-        contexto["rp8"] = get_posicoes_recentes(temporada_resolvida, n_corridas=8)
-    except Exception:
-        pass
-
-    try:
-        contexto["dnf"] = get_taxa_dnf_por_piloto(temporada_resolvida, n_corridas=8)
-    except Exception:
-        pass
-
     try:
         ano = int(temporada_resolvida)
         seasons_11 = [str(ano - 2), str(ano - 1), str(ano)]
     except Exception:
         seasons_11 = None
 
-    try:
-        contexto["fr11"] = get_frequencia_11_por_piloto(seasons_11)
-    except Exception:
-        pass
+    tarefas = {
+        "tp": (_ctx_top_pilotos, (temporada_resolvida,), {}),
+        "tc": (_ctx_top_construtores, (temporada_resolvida,), {}),
+        "du": (_ctx_delta_grid, (temporada_resolvida,), {}),
+        "vr": (_ctx_voltas_rapidas, (temporada_resolvida,), {}),
+        "qg": (get_qualifying_grid_ultima_corrida, (temporada_resolvida,), {}),
+        "rp5": (get_posicoes_recentes, (temporada_resolvida,), {"n_corridas": 5}),
+        "rp8": (get_posicoes_recentes, (temporada_resolvida,), {"n_corridas": 8}),
+        "dnf": (get_taxa_dnf_por_piloto, (temporada_resolvida,), {"n_corridas": 8}),
+        "fr11": (get_frequencia_11_por_piloto, (seasons_11,), {}),
+    }
+    if nome_prova:
+        tarefas["hc"] = (_ctx_historico_circuito, (temporada_resolvida, nome_prova), {})
 
-    try:
-        if nome_prova:
-            circuit_id = get_circuit_id_por_nome_prova(temporada_resolvida, nome_prova)
-            if circuit_id:
-                contexto["circuit_id"] = circuit_id
-                contexto["hc"] = get_historico_circuito(circuit_id, n_anos=4, season_ref=temporada_resolvida)
-    except Exception:
-        pass
+    ctx = get_script_run_ctx() if get_script_run_ctx is not None else None
+    futuros = {
+        _ERGAST_EXECUTOR.submit(_executar_com_contexto_streamlit, prazo, ctx, fn, *args, **kwargs): chave
+        for chave, (fn, args, kwargs) in tarefas.items()
+    }
+    concluidos, pendentes = wait(futuros, timeout=max(0.0, prazo - time.monotonic()))
+
+    for futuro in concluidos:
+        chave = futuros[futuro]
+        try:
+            valor = futuro.result()
+        except Exception as exc:
+            logger.debug("Contexto Ergast '%s' indisponível: %s", chave, exc)
+            continue
+        if chave == "hc":
+            contexto["circuit_id"], contexto["hc"] = valor
+            if not contexto["circuit_id"]:
+                contexto["circuit_id"] = None
+        elif valor is not None:
+            contexto[chave] = valor
+
+    if pendentes:
+        # As que não começaram saem da fila; as em andamento param no prazo das requisições.
+        for futuro in pendentes:
+            futuro.cancel()
+        logger.warning(
+            "Contexto Ergast parcial após %.1fs; sem resposta: %s",
+            timeout,
+            ", ".join(sorted(futuros[f] for f in pendentes)),
+        )
 
     return contexto
 
@@ -3,15 +3,19 @@
 from __future__ import annotations
 
 import ast
+import logging
 from datetime import datetime
 from typing import Optional, cast
 
+import numpy as np
 import pandas as pd
 
 from db.db_schema import db_connect, get_table_columns
 from services.rules_service import get_regras_aplicaveis
 from utils.datetime_utils import parse_datetime_sao_paulo
 
+logger = logging.getLogger(__name__)
+
 
 def _fetch_df(conn, query: str, params: tuple | None = None) -> pd.DataFrame:
     cur = conn.cursor()
@@ -26,135 +30,240 @@ def _parse_datetime_sp(date_str: str, time_str: str):
     return parse_datetime_sao_paulo(date_str, time_str)
 
 
-def calcular_pontuacao_lote(ap_df, res_df, prov_df, temporada_descarte=None):
-    """
-    Calcula pontuação usando:
-    - Tabelas de pontos da REGRA (Normal/Sprint), com fallback FIA hardcoded
-    - Fichas DINAMICAS da aposta do usuário
-    - Bonus 11o DINAMICO da regra da temporada
-    - Penalidades DINAMICAS das regras
+PONTOS_F1_NORMAL = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+PONTOS_SPRINT = [8, 7, 6, 5, 4, 3, 2, 1]
 
-    Formula: Pontos = (Pontos_Regra x Fichas) + Bonus_11o - Penalidades
-    """
-    PONTOS_F1_NORMAL = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
-    PONTOS_SPRINT = [8, 7, 6, 5, 4, 3, 2, 1]
 
-    ress_map = {}
-    abandonos_map = {}
-    for _, r in res_df.iterrows():
+def _mapear_resultados(res_df: pd.DataFrame) -> tuple[dict, dict]:
+    """Parseia `posicoes`/`abandono_pilotos` uma única vez por prova."""
+    ress_map: dict = {}
+    abandonos_map: dict = {}
+    if res_df is None or res_df.empty:
+        return ress_map, abandonos_map
+    has_abandono = "abandono_pilotos" in res_df.columns
+    for r in res_df.to_dict("records"):
         try:
             ress_map[r["prova_id"]] = ast.literal_eval(r["posicoes"])
         except Exception:
             continue
         try:
-            if "abandono_pilotos" in res_df.columns:
-                raw = r.get("abandono_pilotos", "")
-                if raw is None:
-                    raw = ""
-                aband_list = [p.strip() for p in str(raw).split(",") if p and p.strip()]
-                abandonos_map[r["prova_id"]] = set(aband_list)
-            else:
-                abandonos_map[r["prova_id"]] = set()
+            raw = r.get("abandono_pilotos", "") if has_abandono else ""
+            if raw is None:
+                raw = ""
+            abandonos_map[r["prova_id"]] = {p.strip() for p in str(raw).split(",") if p and p.strip()}
         except Exception:
             abandonos_map[r["prova_id"]] = set()
+    return ress_map, abandonos_map
 
-    if "tipo" in prov_df.columns:
-        tipos = prov_df["tipo"].fillna("").astype(str).tolist()
-    else:
-        tipos = [""] * len(prov_df)
-    nomes = prov_df["nome"].fillna("").astype(str).tolist() if "nome" in prov_df.columns else [""] * len(prov_df)
-    tipos_resolvidos = []
-    for i in range(len(prov_df)):
-        t = tipos[i].strip().lower()
-        n = nomes[i].strip().lower()
-        if t == "sprint" or ("sprint" in n):
-            tipos_resolvidos.append("Sprint")
-        else:
-            tipos_resolvidos.append("Normal")
-    tipos_prova = dict(zip(prov_df["id"], tipos_resolvidos))
-    temporadas_prova = dict(
-        zip(
-            prov_df["id"],
-            prov_df["temporada"] if "temporada" in prov_df.columns else [str(datetime.now().year)] * len(prov_df),
-        )
-    )
-    has_temp_aposta = "temporada" in ap_df.columns
 
-    pontos = []
-    for _, aposta in ap_df.iterrows():
-        prova_id = aposta["prova_id"]
+def _resolver_tipos_prova(prov_df: pd.DataFrame) -> dict:
+    """Mapeia prova_id -> 'Sprint'/'Normal' (coluna `tipo` ou nome contendo 'sprint')."""
+    if prov_df is None or prov_df.empty:
+        return {}
+    vazio = pd.Series("", index=prov_df.index)
+    tipos = prov_df["tipo"].fillna("").astype(str).str.strip().str.lower() if "tipo" in prov_df.columns else vazio
+    nomes = prov_df["nome"].fillna("").astype(str).str.strip().str.lower() if "nome" in prov_df.columns else vazio
+    is_sprint = (tipos == "sprint") | nomes.str.contains("sprint", regex=False)
+    return dict(zip(prov_df["id"], np.where(is_sprint, "Sprint", "Normal")))
 
-        if prova_id not in ress_map:
-            pontos.append(None)
-            continue
 
-        res = ress_map[prova_id]
-        tipo = tipos_prova.get(prova_id, "Normal")
-        temporada_aposta = None
-        if has_temp_aposta:
-            try:
-                temporada_aposta = aposta.get("temporada", None)
-            except Exception:
-                temporada_aposta = None
-        if temporada_aposta is not None and str(temporada_aposta).strip() != "" and not pd.isna(temporada_aposta):
-            temporada_prova = str(temporada_aposta)
-        else:
-            temporada_prova = temporadas_prova.get(prova_id, str(datetime.now().year))
+def _explodir_csv(valores: pd.Series) -> pd.DataFrame:
+    """Converte coluna CSV ('a, b, c') em formato longo: (aposta, ordem, valor)."""
+    longo = valores.fillna("").astype(str).str.split(",").explode()
+    df = pd.DataFrame({"aposta": longo.index.to_numpy(), "valor": longo.to_numpy()})
+    df["ordem"] = df.groupby("aposta").cumcount()
+    return df
 
-        regras = get_regras_aplicaveis(temporada_prova, tipo)
 
-        if tipo == "Sprint":
-            pontos_tabela = regras.get("pontos_sprint_posicoes") or regras.get("pontos_posicoes") or ([])
-            if not pontos_tabela:
-                pontos_tabela = PONTOS_SPRINT
+def calcular_pontuacao_temporada(ap_df: pd.DataFrame, res_df: pd.DataFrame, prov_df: pd.DataFrame) -> pd.Series:
+    """
+    Pontua um lote inteiro de apostas (ex.: a temporada toda) em uma única passada vetorizada.
+
+    Cada resultado é parseado uma vez, as regras são resolvidas uma vez por
+    (temporada, tipo de prova) e pilotos/fichas são expandidos em formato longo
+    para que pontos, bônus do 11º e abandonos sejam calculados com operações de array.
+
+    Retorna uma Series alinhada ao índice de `ap_df`, com NaN para apostas de
+    provas ainda sem resultado. A pontuação é a mesma de `calcular_pontuacao_lote`.
+    """
+    if ap_df is None or ap_df.empty:
+        return pd.Series([], dtype=float, index=ap_df.index if ap_df is not None else None)
+
+    n_apostas = len(ap_df)
+    ress_map, abandonos_map = _mapear_resultados(res_df)
+    tipos_prova = _resolver_tipos_prova(prov_df)
+    ano_atual = str(datetime.now().year)
+    if prov_df is not None and not prov_df.empty and "temporada" in prov_df.columns:
+        temporadas_prova = dict(zip(prov_df["id"], prov_df["temporada"]))
+    else:
+        temporadas_prova = {}
+
+    prova_ids = ap_df["prova_id"].reset_index(drop=True)
+    com_resultado = prova_ids.isin(list(ress_map.keys())).to_numpy()
+    pontos = np.full(n_apostas, np.nan)
+    if not com_resultado.any():
+        return pd.Series(pontos, index=ap_df.index)
+
+    # Temporada da aposta tem precedência; senão, a da prova; senão, o ano corrente.
+    temporada_fallback = prova_ids.map(temporadas_prova).where(lambda s: s.notna(), ano_atual).astype(str)
+    if "temporada" in ap_df.columns:
+        temp_ap = ap_df["temporada"].reset_index(drop=True)
+        temp_valida = temp_ap.notna() & (temp_ap.astype(str).str.strip() != "")
+        temporadas = temp_ap.astype(str).where(temp_valida, temporada_fallback)
+    else:
+        temporadas = temporada_fallback
+    tipos = prova_ids.map(tipos_prova).fillna("Normal")
+
+    # Regras: uma resolução por combinação (temporada, tipo) distinta.
+    codigos = np.zeros(n_apostas, dtype=int)
+    codigos_validos, combos = pd.factorize(pd.Series(list(zip(temporadas[com_resultado], tipos[com_resultado]))))
+    codigos[com_resultado] = codigos_validos
+    n_combos = len(combos)
+    tabelas: list[list] = []
+    bonus_11 = np.zeros(n_combos)
+    penalidade = np.zeros(n_combos)
+    dobra = np.zeros(n_combos, dtype=bool)
+    fator_auto = np.ones(n_combos)
+    for i, (temp_combo, tipo_combo) in enumerate(combos):
+        regras = get_regras_aplicaveis(temp_combo, tipo_combo)
+        if tipo_combo == "Sprint":
+            tabela = regras.get("pontos_sprint_posicoes") or regras.get("pontos_posicoes") or PONTOS_SPRINT
         else:
-            pontos_tabela = regras.get("pontos_posicoes") or ([])
-            if not pontos_tabela:
-                pontos_tabela = PONTOS_F1_NORMAL
-        n_posicoes = len(pontos_tabela)
+            tabela = regras.get("pontos_posicoes") or PONTOS_F1_NORMAL
+        tabelas.append([float(v) for v in tabela])
+        bonus_11[i] = float(regras.get("pontos_11_colocado", 25))
+        if regras.get("penalidade_abandono"):
+            penalidade[i] = float(regras.get("pontos_penalidade", 0) or 0)
+        dobra[i] = tipo_combo == "Sprint" and bool(regras.get("pontos_dobrada"))
+        fator_auto[i] = max(0, 1 - (float(regras.get("penalidade_auto_percent", 20)) / 100))
+
+    # Matriz combo x posição; coluna 0 (e além da tabela) vale zero.
+    largura = max(len(t) for t in tabelas) + 1
+    matriz_pontos = np.zeros((n_combos, largura))
+    for i, tabela in enumerate(tabelas):
+        matriz_pontos[i, 1 : len(tabela) + 1] = tabela
+
+    ap_validas = ap_df.reset_index(drop=True)[com_resultado]
+
+    pilotos_longo = _explodir_csv(ap_validas["pilotos"])
+    pilotos_longo["piloto"] = pilotos_longo.pop("valor").str.strip()
+    fichas_longo = _explodir_csv(ap_validas["fichas"])
+    fichas_longo["ficha"] = pd.to_numeric(fichas_longo.pop("valor").str.strip(), errors="coerce").fillna(0)
+    longo = pilotos_longo.merge(fichas_longo, on=["aposta", "ordem"], how="left")
+    longo["ficha"] = longo["ficha"].fillna(0).to_numpy(dtype=float)
+    longo["prova_id"] = prova_ids.to_numpy()[longo["aposta"].to_numpy()]
+
+    # Posição real de cada piloto por prova (mesma semântica do dict piloto->posição).
+    posicoes_reais = []
+    for prova_id, res in ress_map.items():
+        for piloto, pos in {str(v).strip(): int(k) for k, v in res.items()}.items():
+            posicoes_reais.append((prova_id, piloto, pos))
+    pos_df = pd.DataFrame(posicoes_reais, columns=["prova_id", "piloto", "pos_real"])
+    pos_df = pos_df.drop_duplicates(subset=["prova_id", "piloto"], keep="last")
+    longo = longo.merge(pos_df, on=["prova_id", "piloto"], how="left")
+
+    aband_df = pd.DataFrame(
+        [(prova_id, p) for prova_id, aband in abandonos_map.items() for p in aband],
+        columns=["prova_id", "piloto"],
+    )
+    aband_df["abandono"] = 1.0
+    longo = longo.merge(aband_df, on=["prova_id", "piloto"], how="left")
 
-        bonus_11 = regras.get("pontos_11_colocado", 25)
+    idx_aposta = longo["aposta"].to_numpy()
+    combo_linha = codigos[idx_aposta]
+    pos_real = longo["pos_real"].fillna(0).to_numpy(dtype=int)
+    pos_real = np.where((pos_real >= 1) & (pos_real < largura), pos_real, 0)
+    base = matriz_pontos[combo_linha, pos_real]
+    soma_fichas = np.bincount(idx_aposta, weights=longo["ficha"].to_numpy() * base, minlength=n_apostas)
+    n_abandonos = np.bincount(idx_aposta, weights=longo["abandono"].fillna(0).to_numpy(), minlength=n_apostas)
 
-        pilotos = [p.strip() for p in aposta["pilotos"].split(",")]
-        fichas = list(map(int, aposta["fichas"].split(",")))
-        piloto_11 = aposta["piloto_11"]
-        automatica = int(aposta.get("automatica", 0))
+    piloto_11_real = prova_ids.map({pid: res.get(11, "") for pid, res in ress_map.items()})
+    acerto_11 = (ap_df["piloto_11"].reset_index(drop=True) == piloto_11_real).to_numpy()
 
-        piloto_para_pos = {str(v).strip(): int(k) for k, v in res.items()}
+    pt = soma_fichas + np.where(acerto_11, bonus_11[codigos], 0.0)
+    pt = pt - penalidade[codigos] * n_abandonos
+    pt = np.where(dobra[codigos], pt * 2, pt)
 
-        pt = 0
-        for i in range(len(pilotos)):
-            piloto = pilotos[i]
-            ficha = fichas[i] if i < len(fichas) else 0
-            pos_real = piloto_para_pos.get(piloto, None)
+    if "automatica" in ap_df.columns:
+        automatica = pd.to_numeric(ap_df["automatica"], errors="coerce").fillna(0).to_numpy()
+        for i in np.flatnonzero((automatica >= 2) & com_resultado):
+            pt[i] = round(pt[i] * fator_auto[codigos[i]], 2)
 
-            if pos_real is not None and 1 <= pos_real <= n_posicoes:
-                base = pontos_tabela[pos_real - 1]
-                pt += ficha * base
+    pontos[com_resultado] = pt[com_resultado]
+    return pd.Series(pontos, index=ap_df.index)
 
-        piloto_11_real = res.get(11, "")
-        if piloto_11 == piloto_11_real:
-            pt += bonus_11
 
-        if regras.get("penalidade_abandono"):
-            aband_prova = abandonos_map.get(prova_id, set())
-            if aband_prova:
-                num_aband_apostados = sum(1 for p in pilotos if p in aband_prova)
-                deduz = regras.get("pontos_penalidade", 0) * num_aband_apostados
-                if deduz:
-                    pt -= deduz
+def calcular_pontuacao_lote(ap_df, res_df, prov_df, temporada_descarte=None):
+    """
+    Calcula pontuação usando:
+    - Tabelas de pontos da REGRA (Normal/Sprint), com fallback FIA hardcoded
+    - Fichas DINAMICAS da aposta do usuário
+    - Bonus 11o DINAMICO da regra da temporada
+    - Penalidades DINAMICAS das regras
+
+    Formula: Pontos = (Pontos_Regra x Fichas) + Bonus_11o - Penalidades
 
-        if tipo == "Sprint" and regras.get("pontos_dobrada"):
-            pt = pt * 2
+    Retorna lista alinhada a `ap_df` (None para provas sem resultado).
+    Delegada ao motor vetorizado `calcular_pontuacao_temporada`.
+    """
+    serie = calcular_pontuacao_temporada(ap_df, res_df, prov_df)
+    return [None if pd.isna(v) else float(v) for v in serie.tolist()]
+
+
+_SQL_UPSERT_CLASSIFICACAO = """
+    WITH dados AS (
+        SELECT * FROM unnest(%(usuarios)s::integer[], %(posicoes)s::integer[], %(pontos)s::real[])
+            AS d(usuario_id, posicao, pontos)
+    ),
+    removidos AS (
+        DELETE FROM posicoes_participantes p
+        WHERE p.prova_id = %(prova_id)s
+          AND p.temporada = %(temporada)s
+          AND NOT EXISTS (SELECT 1 FROM dados d WHERE d.usuario_id = p.usuario_id)
+    )
+    INSERT INTO posicoes_participantes (prova_id, usuario_id, posicao, pontos, temporada)
+    SELECT %(prova_id)s, usuario_id, posicao, pontos, %(temporada)s FROM dados
+    ON CONFLICT (prova_id, usuario_id, temporada) DO UPDATE
+        SET posicao = EXCLUDED.posicao, pontos = EXCLUDED.pontos
+        WHERE (posicoes_participantes.posicao, posicoes_participantes.pontos)
+              IS DISTINCT FROM (EXCLUDED.posicao, EXCLUDED.pontos)
+"""
 
-        if automatica >= 2:
-            penalidade_auto_percent = regras.get("penalidade_auto_percent", 20)
-            fator = max(0, 1 - (float(penalidade_auto_percent) / 100))
-            pt = round(pt * fator, 2)
 
-        pontos.append(pt)
+def _gravar_classificacao(conn, p_id, df_c: pd.DataFrame, temp, has_temporada: bool) -> int:
+    """
+    Grava a classificação completa de uma prova em um único round-trip.
 
-    return pontos
+    Com a coluna `temporada`, faz upsert em (prova_id, usuario_id, temporada): remove
+    participantes ausentes e só reescreve linhas cuja posição/pontos mudaram.
+    Retorna o número de linhas inseridas/atualizadas. Não faz commit.
+    """
+    usuarios = [int(v) for v in df_c["usuario_id"]]
+    posicoes = [int(v) for v in df_c["posicao"]]
+    pontos = [float(v) for v in df_c["pontos"]]
+
+    c = conn.cursor()
+    if has_temporada:
+        c.execute(
+            _SQL_UPSERT_CLASSIFICACAO,
+            {
+                "prova_id": p_id,
+                "temporada": temp,
+                "usuarios": usuarios,
+                "posicoes": posicoes,
+                "pontos": pontos,
+            },
+        )
+        gravadas = c.rowcount
+    else:
+        c.execute("DELETE FROM posicoes_participantes WHERE prova_id=%s", (p_id,))
+        c.executemany(
+            "INSERT INTO posicoes_participantes (prova_id, usuario_id, posicao, pontos) VALUES (%s,%s,%s,%s)",
+            [(p_id, u, pos, pts) for u, pos, pts in zip(usuarios, posicoes, pontos)],
+        )
+        gravadas = len(usuarios)
+    c.close()
+    return gravadas
 
 
 def salvar_classificacao_prova(p_id, df_c, temp=None):
@@ -162,143 +271,240 @@ def salvar_classificacao_prova(p_id, df_c, temp=None):
         temp = str(datetime.now().year)
 
     with db_connect() as conn:
-        c = conn.cursor()
-        cols = get_table_columns(conn, "posicoes_participantes")
-        has_temporada = "temporada" in cols
+        has_temporada = "temporada" in get_table_columns(conn, "posicoes_participantes")
+        _gravar_classificacao(conn, p_id, df_c, temp, has_temporada)
+        conn.commit()
+
+
+_SQL_USUARIOS_ATIVOS = """
+    SELECT id
+    FROM usuarios
+    WHERE lower(trim(coalesce(status, ''))) = 'ativo'
+"""
+_SQL_APOSTAS_CLASSIFICACAO = (
+    "SELECT usuario_id, prova_id, data_envio, pilotos, fichas, piloto_11, automatica, temporada FROM apostas"
+)
+
+
+def _primeiras_provas_por_temporada(provs: pd.DataFrame) -> dict:
+    """Mapeia temporada -> id da primeira prova (por data), base da regra 'sem base' de 85%."""
+    primeira_prova_por_temp = {}
+    if provs.empty:
+        return primeira_prova_por_temp
+    if "temporada" in provs.columns and "data" in provs.columns:
+        provs_dt = provs.copy()
+        provs_dt["__data_dt"] = pd.to_datetime(provs_dt["data"], errors="coerce")
+        for temp_val, grp in provs_dt.groupby("temporada"):
+            grp = cast(pd.DataFrame, grp)
+            grp = grp.sort_values(by=["__data_dt"])
+            if not grp.empty:
+                primeira_prova_por_temp[str(temp_val)] = int(grp.iloc[0]["id"])
+    elif "data" in provs.columns:
+        provs_dt = cast(pd.DataFrame, provs.copy())
+        provs_dt["__data_dt"] = pd.to_datetime(provs_dt["data"], errors="coerce")
+        provs_dt = provs_dt.sort_values(by=["__data_dt"])
+        if not provs_dt.empty:
+            primeira_prova_por_temp[str(datetime.now().year)] = int(provs_dt.iloc[0]["id"])
+    else:
+        primeira_prova_por_temp[str(datetime.now().year)] = int(provs.iloc[0]["id"])
+    return primeira_prova_por_temp
+
+
+def _montar_classificacao_prova(
+    pid,
+    temporada_prova,
+    aps: pd.DataFrame,
+    pontos: pd.Series,
+    piloto_11_real,
+    usrs: pd.DataFrame,
+    eh_primeira_prova: bool,
+) -> Optional[pd.DataFrame]:
+    """
+    Monta a classificação de uma prova a partir das apostas já pontuadas.
 
-        if has_temporada:
-            c.execute("DELETE FROM posicoes_participantes WHERE prova_id=%s AND temporada=%s", (p_id, temp))
+    `aps` contém apenas apostas da prova; `pontos` vem de `calcular_pontuacao_temporada`
+    (mesmo índice). Retorna None quando não há apostas válidas para a temporada da prova.
+    """
+    if "temporada" in aps.columns:
+        aps = aps[(aps["temporada"] == temporada_prova) | (aps["temporada"].isna())]
+    if aps.empty:
+        return None
+
+    pontos_por_usuario = pontos.loc[aps.index].groupby(aps["usuario_id"]).sum()
+    primeira_aposta = aps.drop_duplicates(subset=["usuario_id"], keep="first").set_index("usuario_id")
+
+    tab = []
+    first_no_base_flags = {}
+    for uid in usrs["id"].tolist() if not usrs.empty else []:
+        if uid not in primeira_aposta.index:
+            pontos_val = 0
+            data_envio = None
+            acerto_11 = 0
+            if eh_primeira_prova:
+                first_no_base_flags[int(uid)] = True
         else:
-            c.execute("DELETE FROM posicoes_participantes WHERE prova_id=%s", (p_id,))
-
-        for _, r in df_c.iterrows():
-            if has_temporada:
-                c.execute(
-                    "INSERT INTO posicoes_participantes (prova_id, usuario_id, posicao, pontos, temporada) VALUES (%s,%s,%s,%s,%s)",
-                    (p_id, int(r["usuario_id"]), int(r["posicao"]), float(r["pontos"]), temp),
-                )
-            else:
-                c.execute(
-                    "INSERT INTO posicoes_participantes (prova_id, usuario_id, posicao, pontos) VALUES (%s,%s,%s,%s)",
-                    (p_id, int(r["usuario_id"]), int(r["posicao"]), float(r["pontos"])),
-                )
-        conn.commit()
+            ap = primeira_aposta.loc[uid]
+            pontos_val = float(pontos_por_usuario.get(uid, 0))
+            data_envio = ap.get("data_envio", None)
+            acerto_11 = 1 if ap["piloto_11"] == piloto_11_real else 0
+            if eh_primeira_prova:
+                try:
+                    if int(ap.get("automatica", 0)) > 0:
+                        first_no_base_flags[int(uid)] = True
+                except Exception:
+                    pass
+
+        tab.append(
+            {
+                "usuario_id": uid,
+                "pontos": pontos_val,
+                "data_envio": data_envio,
+                "acerto_11": acerto_11,
+            }
+        )
 
+    if not tab:
+        return None
 
-def atualizar_classificacoes_todas_as_provas(temporada: Optional[str] = None):
+    if first_no_base_flags:
+        try:
+            pontos_validos = [
+                t["pontos"]
+                for t in tab
+                if t["pontos"] is not None and not first_no_base_flags.get(int(t["usuario_id"]), False)
+            ]
+            pior_pontuador = min(pontos_validos) if pontos_validos else 0
+        except Exception:
+            pior_pontuador = 0
+        for t in tab:
+            if first_no_base_flags.get(int(t["usuario_id"]), False):
+                t["pontos"] = round(pior_pontuador * 0.85, 2)
+
+    df = pd.DataFrame(tab)
+    df["data_envio"] = pd.to_datetime(df["data_envio"], errors="coerce")
+    df = df.sort_values(by=["pontos", "acerto_11", "data_envio"], ascending=[False, False, True]).reset_index(drop=True)
+    df["posicao"] = df.index + 1
+    return df
+
+
+def _piloto_11_real(ress: pd.DataFrame, pid):
+    res_row = ress[ress["prova_id"] == pid].iloc[0]
+    return ast.literal_eval(res_row["posicoes"]).get(11, "")
+
+
+def atualizar_classificacao_prova(prova_id: int) -> bool:
+    """
+    Modo incremental: recalcula apenas a classificação da prova informada.
+
+    Usado ao salvar o resultado de uma prova. Só as linhas de `posicoes_participantes`
+    que mudaram são gravadas. Retorna False quando a prova não tem resultado.
+    """
     with db_connect() as conn:
-        usrs = cast(
-            pd.DataFrame,
-            _fetch_df(
-                conn,
-                """
-                SELECT id
-                FROM usuarios
-                WHERE lower(trim(coalesce(status, ''))) = 'ativo'
-                """,
-            ),
+        prova = _fetch_df(conn, "SELECT id, nome, data, tipo, temporada FROM provas WHERE id = %s", (prova_id,))
+        if prova.empty:
+            return False
+        ress = _fetch_df(
+            conn,
+            "SELECT prova_id, posicoes, abandono_pilotos FROM resultados WHERE prova_id = %s",
+            (prova_id,),
         )
-        provs = cast(pd.DataFrame, _fetch_df(conn, "SELECT id, nome, data, tipo, temporada FROM provas"))
-        apts = cast(
-            pd.DataFrame,
-            _fetch_df(conn, "SELECT usuario_id, prova_id, data_envio, pilotos, fichas, piloto_11, automatica, temporada FROM apostas"),
+        if ress.empty:
+            return False
+
+        temporada_prova = prova.iloc[0].get("temporada", str(datetime.now().year))
+        if temporada_prova is not None:
+            provs_temp = _fetch_df(
+                conn, "SELECT id, nome, data, tipo, temporada FROM provas WHERE temporada = %s", (temporada_prova,)
+            )
+        else:
+            provs_temp = pd.DataFrame()
+        primeira_prova_id = _primeiras_provas_por_temporada(provs_temp).get(str(temporada_prova))
+
+        usrs = _fetch_df(conn, _SQL_USUARIOS_ATIVOS)
+        aps = _fetch_df(conn, _SQL_APOSTAS_CLASSIFICACAO + " WHERE prova_id = %s", (prova_id,))
+        if aps.empty:
+            return True
+
+        pontos = calcular_pontuacao_temporada(aps, ress, prova)
+        df = _montar_classificacao_prova(
+            prova_id,
+            temporada_prova,
+            aps,
+            pontos,
+            _piloto_11_real(ress, prova_id),
+            usrs,
+            str(prova_id) == str(primeira_prova_id),
         )
+        if df is None:
+            return True
+
+        if temporada_prova is None:
+            temporada_prova = str(datetime.now().year)
+        has_temporada = "temporada" in get_table_columns(conn, "posicoes_participantes")
+        alteradas = _gravar_classificacao(conn, prova_id, df, temporada_prova, has_temporada)
+        conn.commit()
+    logger.info("Classificação da prova %s recalculada (%s linha(s) alteradas)", prova_id, alteradas)
+    return True
+
+
+def atualizar_classificacoes_todas_as_provas(temporada: Optional[str] = None, prova_id: Optional[int] = None):
+    if prova_id is not None:
+        atualizar_classificacao_prova(prova_id)
+        return
+
+    with db_connect() as conn:
+        usrs = cast(pd.DataFrame, _fetch_df(conn, _SQL_USUARIOS_ATIVOS))
+        provs = cast(pd.DataFrame, _fetch_df(conn, "SELECT id, nome, data, tipo, temporada FROM provas"))
+        apts = cast(pd.DataFrame, _fetch_df(conn, _SQL_APOSTAS_CLASSIFICACAO))
         ress = cast(pd.DataFrame, _fetch_df(conn, "SELECT prova_id, posicoes, abandono_pilotos FROM resultados"))
 
-        if temporada and "temporada" in provs.columns:
-            provs = provs[provs["temporada"] == temporada]
-
-        primeira_prova_por_temp = {}
-        if not provs.empty:
-            if "temporada" in provs.columns and "data" in provs.columns:
-                provs_dt = provs.copy()
-                provs_dt["__data_dt"] = pd.to_datetime(provs_dt["data"], errors="coerce")
-                for temp_val, grp in provs_dt.groupby("temporada"):
-                    grp = cast(pd.DataFrame, grp)
-                    grp = grp.sort_values(by=["__data_dt"])
-                    if not grp.empty:
-                        primeira_prova_por_temp[str(temp_val)] = int(grp.iloc[0]["id"])
-            elif "data" in provs.columns:
-                provs_dt = cast(pd.DataFrame, provs.copy())
-                provs_dt["__data_dt"] = pd.to_datetime(provs_dt["data"], errors="coerce")
-                provs_dt = provs_dt.sort_values(by=["__data_dt"])
-                if not provs_dt.empty:
-                    primeira_prova_por_temp[str(datetime.now().year)] = int(provs_dt.iloc[0]["id"])
-            elif not provs.empty:
-                primeira_prova_por_temp[str(datetime.now().year)] = int(provs.iloc[0]["id"])
-
-        for _, pr in provs.iterrows():
-            pid = pr["id"]
-            if pid not in ress["prova_id"].values:
-                continue
-
-            temporada_prova = pr.get("temporada", str(datetime.now().year))
-            aps = apts[apts["prova_id"] == pid]
-            if "temporada" in aps.columns:
-                aps = aps[(aps["temporada"] == temporada_prova) | (aps["temporada"].isna())]
-            if aps.empty:
-                continue
-
-            res_row = ress[ress["prova_id"] == pid].iloc[0]
-            res_p = ast.literal_eval(res_row["posicoes"])
-            piloto_11_real = res_p.get(11, "")
-
-            tab = []
-            first_no_base_flags = {}
-            for _, u in usrs.iterrows():
-                ap = aps[aps["usuario_id"] == u["id"]]
-
-                if ap.empty:
-                    pontos_val = 0
-                    data_envio = None
-                    acerto_11 = 0
-                    if str(pid) == str(primeira_prova_por_temp.get(str(temporada_prova), None)):
-                        first_no_base_flags[int(u["id"])] = True
-                else:
-                    p_list = calcular_pontuacao_lote(ap, ress, provs)
-                    pontos_val = sum(p_list) if p_list else 0
-                    data_envio = ap.iloc[0].get("data_envio", None)
-                    acerto_11 = 1 if ap.iloc[0]["piloto_11"] == piloto_11_real else 0
-                    if str(pid) == str(primeira_prova_por_temp.get(str(temporada_prova), None)):
-                        try:
-                            if int(ap.iloc[0].get("automatica", 0)) > 0:
-                                first_no_base_flags[int(u["id"])] = True
-                        except Exception:
-                            pass
-
-                tab.append(
-                    {
-                        "usuario_id": u["id"],
-                        "pontos": pontos_val,
-                        "data_envio": data_envio,
-                        "acerto_11": acerto_11,
-                    }
-                )
-
-            if first_no_base_flags:
-                try:
-                    pontos_validos = [
-                        t["pontos"]
-                        for t in tab
-                        if t["pontos"] is not None and not first_no_base_flags.get(int(t["usuario_id"]), False)
-                    ]
-                    pior_pontuador = min(pontos_validos) if pontos_validos else 0
-                except Exception:
-                    pior_pontuador = 0
-                for t in tab:
-                    if first_no_base_flags.get(int(t["usuario_id"]), False):
-                        t["pontos"] = round(pior_pontuador * 0.85, 2)
+    if temporada and "temporada" in provs.columns:
+        provs = provs[provs["temporada"] == temporada]
+    if provs.empty or ress.empty or apts.empty:
+        return
+
+    primeira_prova_por_temp = _primeiras_provas_por_temporada(provs)
+
+    apts = apts[apts["prova_id"].isin(provs["id"])]
+    pontos = calcular_pontuacao_temporada(apts, ress, provs)
+    apostas_por_prova = dict(tuple(apts.groupby("prova_id")))
+
+    classificacoes = []
+    for _, pr in provs.iterrows():
+        pid = pr["id"]
+        if pid not in ress["prova_id"].values or pid not in apostas_por_prova:
+            continue
 
-            df = pd.DataFrame(tab)
-            df["data_envio"] = pd.to_datetime(df["data_envio"], errors="coerce")
-            df = df.sort_values(by=["pontos", "acerto_11", "data_envio"], ascending=[False, False, True]).reset_index(drop=True)
-            df["posicao"] = df.index + 1
-            salvar_classificacao_prova(pid, df, temporada_prova)
+        temporada_prova = pr.get("temporada", str(datetime.now().year))
+        df = _montar_classificacao_prova(
+            pid,
+            temporada_prova,
+            apostas_por_prova[pid],
+            pontos,
+            _piloto_11_real(ress, pid),
+            usrs,
+            str(pid) == str(primeira_prova_por_temp.get(str(temporada_prova), None)),
+        )
+        if df is not None:
+            if temporada_prova is None:
+                temporada_prova = str(datetime.now().year)
+            classificacoes.append((pid, df, temporada_prova))
+
+    if not classificacoes:
+        return
+
+    with db_connect() as conn:
+        has_temporada = "temporada" in get_table_columns(conn, "posicoes_participantes")
+        for pid, df, temporada_prova in classificacoes:
+            _gravar_classificacao(conn, pid, df, temporada_prova, has_temporada)
+        conn.commit()
 
 
 __all__ = [
     "_parse_datetime_sp",
     "calcular_pontuacao_lote",
+    "calcular_pontuacao_temporada",
     "salvar_classificacao_prova",
     "atualizar_classificacoes_todas_as_provas",
+    "atualizar_classificacao_prova",
 ]
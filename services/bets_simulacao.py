@@ -0,0 +1,147 @@
+"""Simulação Monte Carlo de corridas para estimativas de apostas.
+
+Cada piloto recebe um desempenho latente ~ Normal(mu, sigma) por simulação; a
+ordem de chegada é a ordenação desses desempenhos, de modo que cada posição é
+ocupada por exatamente um piloto. Abandonos (taxa `dnf` por piloto) vão para o
+fim do grid. As amostras dependem só da corrida (campo + parâmetros), então são
+reaproveitadas entre apostas de usuários diferentes na mesma prova.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+
+N_SIMULACOES = int(os.getenv("BF1_SIMULACOES_APOSTA", "20000"))
+_MAX_AMOSTRAS_EM_CACHE = 8
+PERCENTIS = (10, 25, 50, 75, 90)
+
+_amostras_lock = threading.Lock()
+_amostras_cache: "OrderedDict[tuple, tuple[np.ndarray, np.ndarray]]" = OrderedDict()
+
+
+def _chave_campo(nomes: Sequence[str], mus, sigmas, dnfs, n_sim: int) -> tuple:
+    return (
+        tuple(nomes),
+        tuple(round(float(v), 4) for v in mus),
+        tuple(round(float(v), 4) for v in sigmas),
+        tuple(round(float(v), 4) for v in dnfs),
+        int(n_sim),
+    )
+
+
+def _semente(chave: tuple) -> int:
+    # Semente estável por corrida: a mesma aposta recebe sempre a mesma estimativa.
+    return int(hashlib.sha256(repr(chave).encode("utf-8")).hexdigest()[:16], 16)
+
+
+def simular_posicoes(
+    nomes: Sequence[str],
+    mus: Sequence[float],
+    sigmas: Sequence[float],
+    dnfs: Sequence[float],
+    n_sim: int = N_SIMULACOES,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Amostra `n_sim` ordens de chegada completas para o campo informado.
+
+    Retorna (posicoes, abandonos), ambos com forma (n_sim, n_pilotos): posição
+    1-based de cada piloto e máscara de abandono. Resultados ficam em cache.
+    """
+    chave = _chave_campo(nomes, mus, sigmas, dnfs, n_sim)
+    with _amostras_lock:
+        em_cache = _amostras_cache.get(chave)
+        if em_cache is not None:
+            _amostras_cache.move_to_end(chave)
+            return em_cache
+
+    n = len(nomes)
+    rng = np.random.default_rng(_semente(chave))
+    mu = np.asarray(mus, dtype=np.float32)
+    sigma = np.asarray(sigmas, dtype=np.float32)
+    desempenho = mu + sigma * rng.standard_normal((n_sim, n), dtype=np.float32)
+    abandonos = rng.random((n_sim, n), dtype=np.float32) < np.asarray(dnfs, dtype=np.float32)
+    # Abandonos vão para o fim, mantendo entre si a ordem do desempenho.
+    desempenho = np.where(abandonos, desempenho + np.float32(1e6), desempenho)
+
+    ordem = np.argsort(desempenho, axis=1)
+    posicoes = np.empty((n_sim, n), dtype=np.int16)
+    np.put_along_axis(posicoes, ordem, np.arange(1, n + 1, dtype=np.int16)[None, :], axis=1)
+    posicoes.setflags(write=False)
+    abandonos.setflags(write=False)
+
+    with _amostras_lock:
+        _amostras_cache[chave] = (posicoes, abandonos)
+        _amostras_cache.move_to_end(chave)
+        while len(_amostras_cache) > _MAX_AMOSTRAS_EM_CACHE:
+            _amostras_cache.popitem(last=False)
+    return posicoes, abandonos
+
+
+def distribuicao_pontos_aposta(
+    amostras: tuple[np.ndarray, np.ndarray],
+    indices_pilotos: Sequence[int],
+    fichas: Sequence[int],
+    indice_11: Optional[int],
+    tabela_pontos: Sequence[float],
+    bonus_11: float,
+    penalidade_abandono: float = 0.0,
+    dobrar: bool = False,
+) -> dict:
+    """Distribuição dos pontos BF1 de uma aposta sobre as amostras da corrida.
+
+    Mesma fórmula de `bets_scoring`: pontos da posição x fichas + bônus do 11º
+    - penalidade por abandono, dobrado quando a regra da sprint manda.
+    """
+    posicoes, abandonos = amostras
+    n_sim, n = posicoes.shape
+    tabela = np.zeros(n + 1, dtype=np.float64)
+    valores = [float(v) for v in tabela_pontos][:n]
+    tabela[1 : len(valores) + 1] = valores
+
+    idx = np.asarray(indices_pilotos, dtype=np.intp)
+    pesos = np.asarray(fichas, dtype=np.float64)
+    pos_aposta = posicoes[:, idx]
+    pontos_por_piloto = tabela[pos_aposta] * pesos
+    pontos_pilotos = pontos_por_piloto.sum(axis=1)
+    if penalidade_abandono:
+        pontos_pilotos = pontos_pilotos - float(penalidade_abandono) * abandonos[:, idx].sum(axis=1)
+
+    if indice_11 is not None:
+        acerto_11 = posicoes[:, indice_11] == 11
+    else:
+        acerto_11 = np.zeros(n_sim, dtype=bool)
+    pontos_11 = np.where(acerto_11, float(bonus_11), 0.0)
+
+    fator = 2.0 if dobrar else 1.0
+    total = (pontos_pilotos + pontos_11) * fator
+    percentis = np.percentile(total, PERCENTIS)
+
+    # Chance de cada piloto apostado terminar em posição que pontua.
+    n_pontuaveis = int(np.count_nonzero(tabela[1:] > 0))
+    prob_pontuar = (pos_aposta <= n_pontuaveis).mean(axis=0) if n_pontuaveis else np.zeros(len(idx))
+
+    return {
+        "n_simulacoes": int(n_sim),
+        "media": float(total.mean()),
+        "desvio": float(total.std()),
+        "media_pilotos": float(pontos_pilotos.mean() * fator),
+        "media_bonus_11": float(pontos_11.mean() * fator),
+        "prob_11": float(acerto_11.mean()),
+        "percentis": {int(p): float(v) for p, v in zip(PERCENTIS, percentis)},
+        "prob_pontuar_por_piloto": [float(v) for v in prob_pontuar],
+        "posicao_mediana_por_piloto": [int(round(float(v))) for v in np.median(pos_aposta, axis=0)],
+        "pontos_por_piloto": [float(v) * fator for v in pontos_por_piloto.mean(axis=0)],
+    }
+
+
+__all__ = [
+    "N_SIMULACOES",
+    "PERCENTIS",
+    "simular_posicoes",
+    "distribuicao_pontos_aposta",
+]
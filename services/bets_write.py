@@ -9,17 +9,22 @@ import logging
 import math
 import os
 import random
+import re
+import threading
+import time
 from datetime import datetime
 from typing import Callable, Optional, Union, cast
 
 import pandas as pd
 
 from db.db_schema import db_connect, get_table_columns
-from db.migrations_native_types import sync_aposta_native
-from db.repo_bets import get_apostas_df
+from db.migrations_native_types import sync_aposta_native, sync_apostas_native
+from db.query_cache import invalidar_tabelas
+from db.repo_bets import get_apostas_df, get_participantes_temporada_df
 from db.repo_races import get_horario_prova, get_pilotos_df, get_provas_df, get_resultados_df
 from db.repo_users import get_user_by_id
-from db.repo_logs import registrar_log_aposta
+from db.repo_email_outbox import enfileirar_email, enfileirar_emails
+from db.repo_logs import registrar_log_aposta, registrar_logs_aposta
 from services.bets_ai import (
     _gerar_aposta_perplexity,
     _get_contexto_temporada_atual_ergast,
@@ -28,15 +33,27 @@ from services.bets_ai import (
 )
 from services.bets_rules import ajustar_aposta_para_regras
 from services.bets_rules import _aposta_valida_regras, pode_fazer_aposta
-from services.email_service import enviar_email, gerar_analise_aposta_com_probabilidade
+from services.bets_simulacao import distribuicao_pontos_aposta, simular_posicoes
+from services.email_outbox import TIPO_APOSTA_REGISTRADA, notificar_email_outbox
+from services.email_service import gerar_analise_aposta_com_probabilidade
 from services.rules_service import get_regras_aplicaveis
 from utils.datetime_utils import now_sao_paulo
+from utils.helpers import normalize_str
 from utils.input_models import BetSubmissionInput, ValidationError
 from utils.logging_utils import redact_identifier
 from utils.request_utils import get_client_ip
 
 logger = logging.getLogger(__name__)
 
+TAMANHO_GRID_SIMULACAO = 20
+MODELO_CORRIDA_TTL = float(os.getenv("BF1_MODELO_CORRIDA_TTL", "600"))
+
+_modelos_lock = threading.Lock()
+# (temporada, prova, tipo, assinatura das regras) -> (instante da construção, modelo)
+_modelos_corrida: dict[tuple, tuple[float, dict]] = {}
+# Locks de construção listrados por hash da chave: conjunto fixo, não cresce com as chaves.
+_modelos_build_locks: tuple[threading.Lock, ...] = tuple(threading.Lock() for _ in range(16))
+
 
 def _flag_true(value: object) -> bool:
     if isinstance(value, bool):
@@ -98,6 +115,40 @@ def _norm_nome_piloto(nome: str) -> str:
     return str(nome or "").strip().lower()
 
 
+def _chave_comparacao_piloto(nome: str) -> tuple[str, ...]:
+    """Palavras do nome sem acentos nem pontuação, em ordem (ex.: "Zhou Guanyu")."""
+    return tuple(sorted(re.sub(r"[^a-z0-9]+", " ", normalize_str(str(nome or ""))).split()))
+
+
+def _mapear_nomes_campo(nomes, campo) -> dict[str, str]:
+    """Associa cada nome (ex.: grafia do cadastro) ao piloto do campo (grafia Ergast).
+
+    Compara sem acentos, pontuação nem ordem das palavras; não batendo, usa o
+    sobrenome quando só um piloto do campo o tem. Nomes sem par ficam de fora.
+    """
+    por_chave: dict[tuple[str, ...], str] = {}
+    por_sobrenome: dict[str, list[str]] = {}
+    for nome in campo:
+        palavras = re.sub(r"[^a-z0-9]+", " ", normalize_str(str(nome or ""))).split()
+        if not palavras:
+            continue
+        por_chave.setdefault(tuple(sorted(palavras)), nome)
+        por_sobrenome.setdefault(palavras[-1], []).append(nome)
+
+    mapa: dict[str, str] = {}
+    for nome in nomes:
+        palavras = re.sub(r"[^a-z0-9]+", " ", normalize_str(str(nome or ""))).split()
+        if not palavras:
+            continue
+        alvo = por_chave.get(tuple(sorted(palavras)))
+        if alvo is None:
+            candidatos = por_sobrenome.get(palavras[-1], [])
+            alvo = candidatos[0] if len(candidatos) == 1 else None
+        if alvo is not None:
+            mapa[_norm_nome_piloto(nome)] = alvo
+    return mapa
+
+
 def _media_lista(nums: list[int]) -> Optional[float]:
     if not nums:
         return None
@@ -116,34 +167,114 @@ def _clamp(v: float, lo: float, hi: float) -> float:
     return max(lo, min(hi, v))
 
 
-def _estimar_pontos_aposta_ergast(
-    pilotos: list[str],
-    fichas: list[int],
-    piloto_11: str,
-    tipo_prova: str,
-    regras: dict,
-    contexto_ergast: dict,
-) -> dict:
-    pontos_f1 = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
-    pontos_sprint = [8, 7, 6, 5, 4, 3, 2, 1]
+def _parametros_piloto(
+    nome_key: str,
+    sinais: dict,
+    pesos_mu: tuple[float, float, float],
+    n_pos: int,
+    is_sprint: bool,
+    dnf_mu_penalty: float,
+) -> tuple[float, float, float, dict[str, Optional[float]]]:
+    """Posição esperada (mu), dispersão (sigma) e taxa de abandono de um piloto.
+
+    `sinais` traz o contexto Ergast já indexado por nome normalizado; `mu` fica
+    limitado a [1, n_pos]. Retorna também os componentes usados, para telemetria.
+    """
+    pos_por_nome = sinais["pos_por_nome"]
+    delta_por_nome = sinais["delta_por_nome"]
+    vr_set = sinais["vr_set"]
+    qg, rp5, rp8, hc, dnf = (sinais["qg"], sinais["rp5"], sinais["rp8"], sinais["hc"], sinais["dnf"])
+    w_qg, w_rp5, w_hc = pesos_mu
+
+    base_rank = pos_por_nome.get(nome_key)
+    delta = int(delta_por_nome.get(nome_key, 0))
+    ajuste_vr = -0.6 if nome_key in vr_set else 0.0
+
+    qg_pos = None
+    if isinstance(qg, dict):
+        try:
+            qg_pos = int(qg.get(nome_key)) if qg.get(nome_key) is not None else None
+        except Exception:
+            qg_pos = None
 
-    is_sprint = str(tipo_prova).strip().lower() == "sprint"
-    if is_sprint:
-        pontos_lista = regras.get("pontos_sprint_posicoes") or regras.get("pontos_posicoes") or pontos_sprint
+    rec5 = None
+    if isinstance(rp5, dict) and isinstance(rp5.get(nome_key), list):
+        lista5 = [int(x) for x in rp5.get(nome_key, []) if int(x) > 0]
+        rec5 = _media_lista(lista5)
+
+    hist = None
+    if isinstance(hc, dict):
+        try:
+            hist_val = hc.get(nome_key)
+            hist = float(hist_val) if hist_val is not None else None
+        except Exception:
+            hist = None
+
+    componentes: list[tuple[float, float]] = []
+    if qg_pos is not None and qg_pos > 0:
+        componentes.append((w_qg, float(qg_pos)))
+    if rec5 is not None and rec5 > 0:
+        componentes.append((w_rp5, rec5))
+    if hist is not None and hist > 0:
+        componentes.append((w_hc, hist))
+
+    componentes_map: dict[str, Optional[float]] = {
+        "qg": float(qg_pos) if qg_pos is not None else None,
+        "rp5": float(rec5) if rec5 is not None else None,
+        "hc": float(hist) if hist is not None else None,
+        "base_rank": float(base_rank) if base_rank is not None else None,
+        "delta": float(delta),
+        "ajuste_vr": float(ajuste_vr),
+    }
+
+    if componentes:
+        soma_pesos = sum(w for w, _ in componentes)
+        mu = sum(w * v for w, v in componentes) / soma_pesos
+    elif base_rank is not None:
+        mu = float(base_rank)
     else:
-        pontos_lista = regras.get("pontos_posicoes") or pontos_f1
+        mu = float(n_pos) * 0.72
+
+    mu = mu - (0.20 * float(delta)) + ajuste_vr
+
+    dnf_rate = 0.0
+    if isinstance(dnf, dict):
+        try:
+            dnf_rate = float(dnf.get(nome_key, 0.0) or 0.0)
+        except Exception:
+            dnf_rate = 0.0
+    dnf_rate = _clamp(dnf_rate, 0.0, 0.8)
+    mu += dnf_rate * dnf_mu_penalty
+    mu = _clamp(mu, 1.0, float(n_pos))
+
+    sigma = 1.9 if not is_sprint else 1.5
+    if isinstance(rp8, dict) and isinstance(rp8.get(nome_key), list):
+        lista8_raw = [int(x) for x in rp8.get(nome_key, []) if int(x) > 0]
+        if lista8_raw:
+            lista8 = [int(_clamp(float(x), 1.0, float(max(n_pos, 20)))) for x in lista8_raw]
+            std8 = _desvio_padrao_populacao(lista8)
+            if std8 is not None:
+                if is_sprint:
+                    sigma = _clamp(float(std8), 0.9, 3.2)
+                else:
+                    sigma = _clamp(float(std8), 1.1, 4.0)
+
+    return mu, sigma, dnf_rate, componentes_map
 
-    tp = contexto_ergast.get("tp", []) if isinstance(contexto_ergast, dict) else []
-    du = contexto_ergast.get("du", {}) if isinstance(contexto_ergast, dict) else {}
-    vr = contexto_ergast.get("vr", []) if isinstance(contexto_ergast, dict) else []
 
-    qg = contexto_ergast.get("qg", {}) if isinstance(contexto_ergast, dict) else {}
-    rp5 = contexto_ergast.get("rp5", {}) if isinstance(contexto_ergast, dict) else {}
-    rp8 = contexto_ergast.get("rp8", {}) if isinstance(contexto_ergast, dict) else {}
-    hc = contexto_ergast.get("hc", {}) if isinstance(contexto_ergast, dict) else {}
-    fr11 = contexto_ergast.get("fr11", {}) if isinstance(contexto_ergast, dict) else {}
-    dnf = contexto_ergast.get("dnf", {}) if isinstance(contexto_ergast, dict) else {}
+def _forca_sinal_piloto(nome_key: str, sinais: dict) -> tuple[int, int]:
+    """Quanto o contexto da temporada cita o piloto: (fontes, corridas recentes)."""
+    qg, rp5 = sinais["qg"], sinais["rp5"]
+    recentes = len(rp5.get(nome_key) or ()) if isinstance(rp5, dict) else 0
+    fontes = (
+        int(nome_key in sinais["pos_por_nome"])
+        + int(isinstance(qg, dict) and nome_key in qg)
+        + int(recentes > 0)
+    )
+    return fontes, recentes
 
+
+def _pesos_mu_regra(regras: dict, is_sprint: bool) -> tuple[float, float, float]:
     # Parametros ajustaveis por regra para calibracao da estimativa
     default_mu_weights = (0.45, 0.35, 0.20) if is_sprint else (0.40, 0.35, 0.25)
     mu_weights_raw = regras.get("pesos_mu_sprint" if is_sprint else "pesos_mu_normal")
@@ -160,10 +291,48 @@ def _estimar_pontos_aposta_ergast(
     if soma_w <= 0:
         w_qg, w_rp5, w_hc = default_mu_weights
         soma_w = w_qg + w_rp5 + w_hc
-    w_qg, w_rp5, w_hc = (w_qg / soma_w, w_rp5 / soma_w, w_hc / soma_w)
+    return (w_qg / soma_w, w_rp5 / soma_w, w_hc / soma_w)
+
+
+def _construir_modelo_corrida(
+    tipo_prova: str,
+    regras: dict,
+    contexto_ergast: dict,
+    nomes_extra: tuple[str, ...] = (),
+    nomes_obrigatorios: tuple[str, ...] = (),
+) -> dict:
+    """Modelo da corrida compartilhado por todas as apostas da mesma prova.
 
+    Guarda, para cada piloto do campo, taxa de abandono e componentes do mu, além
+    das amostras Monte Carlo, chance de 11º por piloto e as regras de pontuação.
+    Só as escolhas da aposta ficam para `_estimar_pontos_aposta_ergast`.
+
+    O campo tem o tamanho do grid real. `nomes_obrigatorios` entram sempre, no
+    lugar dos inscritos de menor sinal; `nomes_extra` são associados a inscritos
+    ou a vagas e nunca acrescentam carros.
+    """
+    pontos_f1 = [25, 18, 15, 12, 10, 8, 6, 4, 2, 1]
+    pontos_sprint = [8, 7, 6, 5, 4, 3, 2, 1]
+
+    is_sprint = str(tipo_prova).strip().lower() == "sprint"
+    if is_sprint:
+        pontos_lista = regras.get("pontos_sprint_posicoes") or regras.get("pontos_posicoes") or pontos_sprint
+    else:
+        pontos_lista = regras.get("pontos_posicoes") or pontos_f1
+    n_pos = len(pontos_lista)
+
+    ctx = contexto_ergast if isinstance(contexto_ergast, dict) else {}
+    tp = ctx.get("tp", [])
+    du = ctx.get("du", {})
+    vr = ctx.get("vr", [])
+    qg = ctx.get("qg", {})
+    rp5 = ctx.get("rp5", {})
+    rp8 = ctx.get("rp8", {})
+    hc = ctx.get("hc", {})
+    dnf = ctx.get("dnf", {})
+
+    pesos_mu = _pesos_mu_regra(regras, is_sprint)
     dnf_mu_penalty = float(regras.get("dnf_mu_penalty", 1.8 if is_sprint else 2.5))
-    dnf_points_penalty_scale = float(regras.get("dnf_points_penalty_scale", 0.75))
 
     pos_por_nome: dict[str, int] = {}
     for row in tp if isinstance(tp, list) else []:
@@ -183,6 +352,201 @@ def _estimar_pontos_aposta_ergast(
 
     vr_set = {_norm_nome_piloto(row.get("n")) for row in vr if isinstance(vr, list) if _norm_nome_piloto(row.get("n"))}
 
+    sinais = {
+        "pos_por_nome": pos_por_nome,
+        "delta_por_nome": delta_por_nome,
+        "vr_set": vr_set,
+        "qg": qg,
+        "rp5": rp5,
+        "rp8": rp8,
+        "hc": hc,
+        "dnf": dnf,
+    }
+
+    # Campo da corrida: inscritos da temporada (grid da última classificação, resultados
+    # recentes e campeonato), nunca o histórico de temporadas passadas do `fr11`. Acima
+    # do tamanho do grid saem os de menor sinal; abaixo, o grid é completado com vagas
+    # sem sinal, que têm os parâmetros de um piloto desconhecido e podem representá-lo.
+    tamanho_grid = len(qg) if isinstance(qg, dict) and len(qg) >= 10 else TAMANHO_GRID_SIMULACAO
+    inscritos: set[str] = set(pos_por_nome)
+    for fonte in (qg, rp5):
+        if isinstance(fonte, dict):
+            inscritos.update(str(k) for k in fonte if k)
+    # Obrigatórios com outra grafia de um inscrito garantem o inscrito, sem carro a mais.
+    obrigatorios_norm = [n for n in dict.fromkeys(_norm_nome_piloto(n) for n in nomes_obrigatorios) if n]
+    mapa_obrigatorios = _mapear_nomes_campo([n for n in obrigatorios_norm if n not in inscritos], inscritos)
+    obrigatorios = list(dict.fromkeys(mapa_obrigatorios.get(n, n) for n in obrigatorios_norm))
+    por_sinal = sorted(
+        (n for n in inscritos if n not in obrigatorios),
+        key=lambda n: (_forca_sinal_piloto(n, sinais), n),
+        reverse=True,
+    )
+    nomes_campo = sorted((obrigatorios + por_sinal)[:tamanho_grid])
+    n_reais = len(nomes_campo)
+    nomes_campo += [f"__vaga_{i}" for i in range(tamanho_grid - n_reais)]
+    n_campo = len(nomes_campo)
+
+    # Extras (pilotos ativos do cadastro) nunca aumentam o campo: cada um aponta para o
+    # inscrito de mesma grafia ou, sem par, para uma vaga livre enquanto houver.
+    indice_campo = {nome: i for i, nome in enumerate(nomes_campo[:n_reais])}
+    extras = [n for n in dict.fromkeys(_norm_nome_piloto(n) for n in nomes_extra) if n and n not in indice_campo]
+    mapa_extras = _mapear_nomes_campo(extras, nomes_campo[:n_reais])
+    vagas = list(range(n_reais, n_campo))
+    aliases: dict[str, int] = {n: indice_campo[mapa_extras[n]] for n in extras if n in mapa_extras}
+    for nome in extras:
+        if nome not in aliases and vagas:
+            aliases[nome] = vagas.pop(0)
+
+    pilotos_modelo: dict[str, dict] = {}
+    if n_pos > 0:
+        for nome in nomes_campo[:n_reais]:
+            pilotos_modelo[nome] = _parametros_estimativa_piloto(nome, sinais, pesos_mu, n_pos, is_sprint, dnf_mu_penalty)
+
+    # Abandono é sorteado na simulação; não desloca mu (dnf_mu_penalty = 0).
+    parametros_campo = [_parametros_piloto(nome, sinais, pesos_mu, n_campo, is_sprint, 0.0) for nome in nomes_campo]
+    amostras = simular_posicoes(
+        nomes_campo,
+        [p[0] for p in parametros_campo],
+        [p[1] for p in parametros_campo],
+        [p[2] for p in parametros_campo],
+    )
+    chance_11_campo = (amostras[0] == 11).mean(axis=0)
+
+    return {
+        "tipo_prova": str(tipo_prova),
+        "is_sprint": is_sprint,
+        "pontos_lista": [float(v) for v in pontos_lista],
+        "n_pos": n_pos,
+        "pesos_mu": pesos_mu,
+        "dnf_mu_penalty": dnf_mu_penalty,
+        "bonus_11": float(regras.get("pontos_11_colocado", 25) or 25),
+        "penalidade_abandono": (
+            float(regras.get("pontos_penalidade", 0) or 0) if regras.get("penalidade_abandono") else 0.0
+        ),
+        "dobrar": is_sprint and bool(regras.get("pontos_dobrada")),
+        "regras": regras,
+        "telemetria": _telemetria_estimativa_ativa(regras),
+        "sinais": sinais,
+        "pilotos": pilotos_modelo,
+        "nomes_campo": nomes_campo,
+        "nomes_extra": tuple(nomes_extra),
+        "indice_campo": indice_campo,
+        "aliases": aliases,
+        "vagas": vagas,
+        "amostras": amostras,
+        "chance_11": {nome: float(chance_11_campo[i]) for i, nome in enumerate(nomes_campo[:n_reais])},
+        "contexto": ctx,
+    }
+
+
+def _parametros_estimativa_piloto(
+    nome_key: str,
+    sinais: dict,
+    pesos_mu: tuple[float, float, float],
+    n_pos: int,
+    is_sprint: bool,
+    dnf_mu_penalty: float,
+) -> dict:
+    mu, sigma, dnf_rate, componentes_map = _parametros_piloto(
+        nome_key, sinais, pesos_mu, n_pos, is_sprint, dnf_mu_penalty
+    )
+    componentes_map["mu_final"] = float(mu)
+    componentes_map["sigma"] = float(sigma)
+    componentes_map["dnf_rate"] = float(dnf_rate)
+    componentes_map["dnf_penalidade_mu"] = float(dnf_rate * dnf_mu_penalty)
+    return {
+        "dnf_rate": dnf_rate,
+        "componentes": componentes_map,
+    }
+
+
+def _assinatura_regras(regras: dict) -> str:
+    return hashlib.sha256(json.dumps(regras, sort_keys=True, default=str).encode("utf-8")).hexdigest()[:16]
+
+
+def _contexto_tem_sinal(contexto: dict) -> bool:
+    return any(contexto.get(chave) for chave in ("tp", "qg", "rp5"))
+
+
+def obter_modelo_corrida(
+    temporada: Optional[str],
+    nome_prova: str,
+    tipo_prova: str,
+    regras: dict,
+) -> dict:
+    """Modelo da corrida em cache por (temporada, prova, tipo, regras).
+
+    Construído uma vez por `MODELO_CORRIDA_TTL` (mesmo ciclo dos caches Ergast) e
+    compartilhado por estimativas, emails e sugestões; construções concorrentes
+    da mesma prova esperam a primeira terminar.
+    """
+    temporada_str = str(temporada or datetime.now().year)
+    chave = (temporada_str, str(nome_prova or ""), str(tipo_prova), _assinatura_regras(regras))
+    with _modelos_lock:
+        entrada = _modelos_corrida.get(chave)
+        if entrada is not None and time.monotonic() - entrada[0] <= MODELO_CORRIDA_TTL:
+            return entrada[1]
+        lock_chave = _modelos_build_locks[hash(chave) % len(_modelos_build_locks)]
+
+    with lock_chave:
+        with _modelos_lock:
+            entrada = _modelos_corrida.get(chave)
+            if entrada is not None and time.monotonic() - entrada[0] <= MODELO_CORRIDA_TTL:
+                return entrada[1]
+
+        contexto = _get_contexto_temporada_atual_ergast(temporada=temporada_str, nome_prova=nome_prova)
+        nomes_ativos: tuple[str, ...] = ()
+        try:
+            pilotos_df = get_pilotos_df()
+            if not pilotos_df.empty and "status" in pilotos_df.columns:
+                pilotos_df = pilotos_df[pilotos_df["status"] == "Ativo"]
+            nomes_ativos = tuple(str(n) for n in pilotos_df.get("nome", pd.Series(dtype=str)).tolist())
+        except Exception as exc:
+            logger.debug("Pilotos ativos indisponíveis para o modelo da corrida: %s", exc)
+
+        modelo = _construir_modelo_corrida(tipo_prova, regras, contexto, nomes_extra=nomes_ativos)
+        # Contexto vazio (API fora/prazo estourado) não fica em cache: a próxima aposta tenta de novo.
+        if _contexto_tem_sinal(contexto):
+            with _modelos_lock:
+                _modelos_corrida[chave] = (time.monotonic(), modelo)
+                for k in [k for k, (t, _) in _modelos_corrida.items() if time.monotonic() - t > MODELO_CORRIDA_TTL]:
+                    del _modelos_corrida[k]
+        return modelo
+
+
+def invalidar_modelos_corrida() -> None:
+    """Descarta os modelos em cache (ex.: após sincronizar dados Ergast)."""
+    with _modelos_lock:
+        _modelos_corrida.clear()
+
+
+def _indice_no_campo(modelo: dict, nome_key: str) -> Optional[int]:
+    """Posição de `nome_key` no campo do modelo (direto, apelido ou grafia equivalente)."""
+    idx = modelo["indice_campo"].get(nome_key)
+    if idx is None:
+        idx = modelo["aliases"].get(nome_key)
+    if idx is None:
+        par = _mapear_nomes_campo((nome_key,), modelo["indice_campo"]).get(nome_key)
+        idx = modelo["indice_campo"][par] if par is not None else None
+    return idx
+
+
+def _estimar_pontos_aposta_ergast(
+    pilotos: list[str],
+    fichas: list[int],
+    piloto_11: str,
+    tipo_prova: str,
+    regras: dict,
+    contexto_ergast: Optional[dict] = None,
+    modelo: Optional[dict] = None,
+) -> dict:
+    if modelo is None:
+        modelo = _construir_modelo_corrida(tipo_prova, regras, contexto_ergast or {})
+
+    pontos_lista = modelo["pontos_lista"]
+    n_pos = int(modelo["n_pos"])
+    sinais = modelo["sinais"]
+
     pilotos_validos: list[tuple[str, int]] = []
     for piloto, ficha in zip(pilotos, fichas):
         try:
@@ -192,7 +556,6 @@ def _estimar_pontos_aposta_ergast(
         if ficha_i > 0:
             pilotos_validos.append((piloto, ficha_i))
 
-    n_pos = len(pontos_lista)
     if not pilotos_validos or n_pos <= 0:
         return {
             "pontos_estimados": 0.0,
@@ -203,296 +566,109 @@ def _estimar_pontos_aposta_ergast(
             "detalhes": "Sem dados suficientes para estimativa.",
         }
 
-    prob_por_piloto: list[list[float]] = []
-    dnf_rate_por_piloto: list[float] = []
+    # Carro de cada piloto da aposta no campo simulado: o próprio, o inscrito de mesma
+    # grafia ou uma vaga livre.
+    nomes_aposta = tuple(
+        dict.fromkeys(n for n in [_norm_nome_piloto(p) for p, _ in pilotos_validos] + [_norm_nome_piloto(piloto_11)] if n)
+    )
+    vagas_livres = list(modelo["vagas"])
+    indices_sim: dict[str, Optional[int]] = {}
+    for nome_key in nomes_aposta:
+        idx_campo = _indice_no_campo(modelo, nome_key)
+        if idx_campo in indices_sim.values():
+            idx_campo = None
+        if idx_campo is None and vagas_livres:
+            idx_campo = vagas_livres.pop(0)
+        indices_sim[nome_key] = idx_campo
+
+    if any(v is None for v in indices_sim.values()):
+        # Campo lotado sem vaga para todos: modelo avulso, do mesmo tamanho, em que os
+        # pilotos da aposta tomam o lugar dos inscritos de menor sinal.
+        modelo = _construir_modelo_corrida(
+            modelo["tipo_prova"],
+            modelo["regras"],
+            modelo["contexto"],
+            nomes_extra=modelo["nomes_extra"],
+            nomes_obrigatorios=nomes_aposta,
+        )
+        indices_sim = {n: _indice_no_campo(modelo, n) for n in nomes_aposta}
+
+    # Pilotos em vaga (sem sinal no campo) têm os parâmetros calculados na hora.
+    parametros_aposta: list[dict] = []
     telemetria_componentes_por_piloto: list[dict] = []
     for piloto, ficha_i_int in pilotos_validos:
         nome_key = _norm_nome_piloto(piloto)
-        base_rank = pos_por_nome.get(nome_key)
-        delta = int(delta_por_nome.get(nome_key, 0))
-        ajuste_vr = -0.6 if nome_key in vr_set else 0.0
-
-        qg_pos = None
-        if isinstance(qg, dict):
-            try:
-                qg_pos = int(qg.get(nome_key)) if qg.get(nome_key) is not None else None
-            except Exception:
-                qg_pos = None
-
-        rec5 = None
-        if isinstance(rp5, dict) and isinstance(rp5.get(nome_key), list):
-            lista5 = [int(x) for x in rp5.get(nome_key, []) if int(x) > 0]
-            rec5 = _media_lista(lista5)
-
-        hist = None
-        if isinstance(hc, dict):
-            try:
-                hist_val = hc.get(nome_key)
-                hist = float(hist_val) if hist_val is not None else None
-            except Exception:
-                hist = None
-
-        componentes: list[tuple[float, float]] = []
-        if qg_pos is not None and qg_pos > 0:
-            componentes.append((w_qg, float(qg_pos)))
-        if rec5 is not None and rec5 > 0:
-            componentes.append((w_rp5, rec5))
-        if hist is not None and hist > 0:
-            componentes.append((w_hc, hist))
-
-        componentes_map: dict[str, Optional[float]] = {
-            "qg": float(qg_pos) if qg_pos is not None else None,
-            "rp5": float(rec5) if rec5 is not None else None,
-            "hc": float(hist) if hist is not None else None,
-            "base_rank": float(base_rank) if base_rank is not None else None,
-            "delta": float(delta),
-            "ajuste_vr": float(ajuste_vr),
-        }
-
-        if componentes:
-            soma_pesos = sum(w for w, _ in componentes)
-            mu = sum(w * v for w, v in componentes) / soma_pesos
-        elif base_rank is not None:
-            mu = float(base_rank)
-        else:
-            mu = float(n_pos) * 0.72
-
-        mu = mu - (0.20 * float(delta)) + ajuste_vr
-
-        dnf_rate = 0.0
-        if isinstance(dnf, dict):
-            try:
-                dnf_rate = float(dnf.get(nome_key, 0.0) or 0.0)
-            except Exception:
-                dnf_rate = 0.0
-        dnf_rate = _clamp(dnf_rate, 0.0, 0.8)
-        dnf_rate_por_piloto.append(dnf_rate)
-        mu += dnf_rate * dnf_mu_penalty
-        mu = _clamp(mu, 1.0, float(n_pos))
-
-        sigma = 1.9 if not is_sprint else 1.5
-        if isinstance(rp8, dict) and isinstance(rp8.get(nome_key), list):
-            lista8_raw = [int(x) for x in rp8.get(nome_key, []) if int(x) > 0]
-            if lista8_raw:
-                lista8 = [int(_clamp(float(x), 1.0, float(max(n_pos, 20)))) for x in lista8_raw]
-                std8 = _desvio_padrao_populacao(lista8)
-                if std8 is not None:
-                    if is_sprint:
-                        sigma = _clamp(float(std8), 0.9, 3.2)
-                    else:
-                        sigma = _clamp(float(std8), 1.1, 4.0)
-
-        row = []
-        for pos_idx in range(1, n_pos + 1):
-            z = (float(pos_idx) - mu) / sigma
-            row.append(math.exp(-0.5 * z * z))
-        s = sum(row)
-        if s <= 0:
-            row = [1.0 / n_pos] * n_pos
-        else:
-            row = [v / s for v in row]
-        prob_por_piloto.append(row)
-
-        componentes_map["mu_final"] = float(mu)
-        componentes_map["sigma"] = float(sigma)
-        componentes_map["dnf_rate"] = float(dnf_rate)
-        componentes_map["dnf_penalidade_mu"] = float(dnf_rate * dnf_mu_penalty)
+        parametros = modelo["pilotos"].get(modelo["nomes_campo"][indices_sim[nome_key]])
+        if parametros is None:
+            parametros = _parametros_estimativa_piloto(
+                nome_key,
+                sinais,
+                modelo["pesos_mu"],
+                n_pos,
+                modelo["is_sprint"],
+                modelo["dnf_mu_penalty"],
+            )
+        parametros_aposta.append(parametros)
         telemetria_componentes_por_piloto.append(
             {
                 "piloto": redact_identifier(piloto),
                 "fichas": int(ficha_i_int),
-                "componentes": componentes_map,
+                "componentes": parametros["componentes"],
             }
         )
 
-    pilotos_top = pilotos_validos[:n_pos]
-    probs_top = prob_por_piloto[:n_pos]
-    dnf_rate_top = dnf_rate_por_piloto[:n_pos]
-    fator_dnf_top = [1.0 - _clamp(float(r) * dnf_points_penalty_scale, 0.0, 0.90) for r in dnf_rate_top]
-    m = len(pilotos_top)
-
-    dp: dict[tuple[int, int], tuple[float, list[int]]] = {(0, 0): (0.0, [])}
-    for i in range(m):
-        novo_dp: dict[tuple[int, int], tuple[float, list[int]]] = {}
-        for (idx, mask), (score, escolha) in dp.items():
-            if idx != i:
-                continue
-            for pos0 in range(n_pos):
-                bit = 1 << pos0
-                if mask & bit:
-                    continue
-                p = probs_top[i][pos0]
-                ficha_i = float(pilotos_top[i][1])
-                fator_dnf = float(fator_dnf_top[i]) if i < len(fator_dnf_top) else 1.0
-                ganho = p * float(pontos_lista[pos0]) * ficha_i * fator_dnf
-                chave = (i + 1, mask | bit)
-                atual = novo_dp.get(chave)
-                candidato = (score + ganho, escolha + [pos0 + 1])
-                if atual is None or candidato[0] > atual[0]:
-                    novo_dp[chave] = candidato
-        dp = novo_dp
-
-    melhor_score = -1.0
-    melhor_escolha: list[int] = []
-    for (idx, _mask), (score, escolha) in dp.items():
-        if idx == m and score > melhor_score:
-            melhor_score = score
-            melhor_escolha = escolha
-
-    if not melhor_escolha:
-        melhor_escolha = []
-        usadas: set[int] = set()
-        for row in probs_top:
-            ordem = sorted(range(1, n_pos + 1), key=lambda p: row[p - 1], reverse=True)
-            pos_sel = next((p for p in ordem if p not in usadas), ordem[0])
-            melhor_escolha.append(pos_sel)
-            usadas.add(pos_sel)
-
-    pontos_estimados = 0.0
+    p11_key = _norm_nome_piloto(piloto_11)
+    simulacao = distribuicao_pontos_aposta(
+        modelo["amostras"],
+        [indices_sim[_norm_nome_piloto(p)] for p, _ in pilotos_validos],
+        [f for _, f in pilotos_validos],
+        indices_sim.get(p11_key) if p11_key else None,
+        pontos_lista,
+        modelo["bonus_11"],
+        penalidade_abandono=modelo["penalidade_abandono"],
+        dobrar=modelo["dobrar"],
+    )
+
+    pontos_estimados = simulacao["media_pilotos"]
+    bonus_11_estimado = simulacao["media_bonus_11"]
+    chance_11 = simulacao["prob_11"]
+    # Probabilidade de acerto: chance de cada ficha cair em piloto que pontua.
+    soma_fichas = float(sum(f for _, f in pilotos_validos))
+    prob_fichas_pontuando = (
+        sum(p * f for p, (_, f) in zip(simulacao["prob_pontuar_por_piloto"], pilotos_validos)) / soma_fichas
+        if soma_fichas > 0
+        else 0.0
+    )
+    probabilidade_combinada = int(round(_clamp(prob_fichas_pontuando, 0.0, 1.0) * 100.0))
+    percentis = simulacao["percentis"]
+
     detalhes_linhas: list[str] = []
-    probs_media_simples: list[float] = []
-    probs_ponderadas_por_ficha: list[tuple[float, int]] = []
-    telemetria_posicoes: list[dict] = []
-    for idx, ((piloto, ficha_i), pos_sel, row) in enumerate(zip(pilotos_top, melhor_escolha, probs_top)):
-        prob_sel = max(0.001, min(0.999, float(row[pos_sel - 1])))
-        dnf_rate = float(dnf_rate_top[idx]) if idx < len(dnf_rate_top) else 0.0
-        fator_dnf = float(fator_dnf_top[idx]) if idx < len(fator_dnf_top) else 1.0
-        pontos_base = float(pontos_lista[pos_sel - 1]) * float(ficha_i)
-        pontos_esperados = pontos_base * fator_dnf
-        pontos_estimados += pontos_esperados
-        probs_media_simples.append(prob_sel)
-        probs_ponderadas_por_ficha.append((prob_sel, int(ficha_i)))
+    telemetria_pilotos: list[dict] = []
+    for (piloto, ficha_i), parametros, pos_mediana, prob_pontuar, pontos_piloto in zip(
+        pilotos_validos,
+        parametros_aposta,
+        simulacao["posicao_mediana_por_piloto"],
+        simulacao["prob_pontuar_por_piloto"],
+        simulacao["pontos_por_piloto"],
+    ):
         detalhes_linhas.append(
-            f"{piloto}: ficha={ficha_i}, pos~{pos_sel}, p={prob_sel:.3f}, dnf={dnf_rate:.2f}, fator_dnf={fator_dnf:.2f}"
+            f"{piloto}: ficha={ficha_i}, pos~{pos_mediana}, p_pontuar={prob_pontuar:.3f}, dnf={parametros['dnf_rate']:.2f}"
         )
-        telemetria_posicoes.append(
+        telemetria_pilotos.append(
             {
                 "piloto": redact_identifier(piloto),
                 "fichas": int(ficha_i),
-                "posicao_escolhida": int(pos_sel),
-                "prob_posicao": round(prob_sel, 4),
-                "fator_dnf": round(fator_dnf, 4),
-                "pontos_base": round(pontos_base, 3),
-                "pontos_esperados": round(pontos_esperados, 3),
+                "posicao_mediana": int(pos_mediana),
+                "prob_pontuar": round(float(prob_pontuar), 4),
+                "pontos_esperados": round(float(pontos_piloto), 3),
             }
         )
 
-    bonus_11 = float(regras.get("pontos_11_colocado", 25) or 25)
-    p11_key = _norm_nome_piloto(piloto_11)
-    p11_pos = pos_por_nome.get(p11_key)
-
-    freq_11 = None
-    if isinstance(fr11, dict):
-        try:
-            val = fr11.get(p11_key)
-            if val is not None:
-                freq_11 = float(val)
-        except Exception:
-            freq_11 = None
-
-    media_campo_11 = 0.05
-    if isinstance(fr11, dict) and fr11:
-        try:
-            media_campo_11 = float(sum(float(v) for v in fr11.values()) / len(fr11))
-        except Exception:
-            media_campo_11 = 0.05
-
-    # Sinal de circuito para P11: proximidade da media historica de chegada ao 11o.
-    circuito_prior = media_campo_11
-    if isinstance(hc, dict):
-        try:
-            hc_val = hc.get(p11_key)
-            if hc_val is not None:
-                hc_pos = float(hc_val)
-                proximidade_11 = 1.0 - _clamp(abs(hc_pos - 11.0) / 10.0, 0.0, 1.0)
-                circuito_prior = 0.02 + (0.18 * proximidade_11)
-        except Exception:
-            pass
-
-    # Sinal recente para P11: proximidade da media recente ao 11o.
-    recente_prior = media_campo_11
-    if isinstance(rp5, dict) and isinstance(rp5.get(p11_key), list):
-        try:
-            rp5_vals = [int(x) for x in rp5.get(p11_key, []) if int(x) > 0]
-            if rp5_vals:
-                rec_pos = float(sum(rp5_vals)) / float(len(rp5_vals))
-                proximidade_11 = 1.0 - _clamp(abs(rec_pos - 11.0) / 10.0, 0.0, 1.0)
-                recente_prior = 0.02 + (0.18 * proximidade_11)
-        except Exception:
-            pass
-
-    rank_prior = media_campo_11
-    if p11_pos is not None:
-        if p11_pos <= 5:
-            rank_prior = 0.03
-        elif p11_pos <= 8:
-            rank_prior = 0.06
-        elif p11_pos <= 14:
-            rank_prior = 0.11
-        else:
-            rank_prior = 0.09
-
-    if freq_11 is not None:
-        chance_11 = _clamp((0.55 * float(freq_11)) + (0.25 * circuito_prior) + (0.20 * recente_prior), 0.01, 0.40)
-    else:
-        chance_11 = _clamp((0.45 * rank_prior) + (0.30 * circuito_prior) + (0.25 * recente_prior), 0.01, 0.35)
-
-    bonus_11_estimado = bonus_11 * chance_11
-
-    if pilotos_top:
-        n_com_sinal = 0
-        for piloto, _ in pilotos_top:
-            nome_key = _norm_nome_piloto(piloto)
-            tem_sinal = (
-                nome_key in pos_por_nome
-                or (isinstance(qg, dict) and nome_key in qg)
-                or (isinstance(rp5, dict) and nome_key in rp5)
-                or (isinstance(hc, dict) and nome_key in hc)
-            )
-            if tem_sinal:
-                n_com_sinal += 1
-        cob_sinal = float(n_com_sinal) / float(len(pilotos_top))
-    else:
-        cob_sinal = 0.0
-
-    soma_fichas = float(sum(f for _, f in pilotos_top)) if pilotos_top else 0.0
-    fichas_em_top5 = 0.0
-    if soma_fichas > 0:
-        for piloto, ficha_i in pilotos_top:
-            nome_key = _norm_nome_piloto(piloto)
-            if int(pos_por_nome.get(nome_key, 99)) <= 5:
-                fichas_em_top5 += float(ficha_i)
-    conc_fichas = (fichas_em_top5 / soma_fichas) if soma_fichas > 0 else 0.0
-
-    prob_media = (sum(probs_media_simples) / len(probs_media_simples)) if probs_media_simples else 0.0
-    soma_fichas_prob = float(sum(f for _, f in probs_ponderadas_por_ficha)) if probs_ponderadas_por_ficha else 0.0
-    prob_media_ponderada = (
-        sum(float(p) * float(f) for p, f in probs_ponderadas_por_ficha) / soma_fichas_prob
-        if soma_fichas_prob > 0
-        else prob_media
-    )
-
-    if len(probs_media_simples) > 1:
-        media_prob = prob_media
-        std_prob = math.sqrt(sum((p - media_prob) ** 2 for p in probs_media_simples) / len(probs_media_simples))
-        consistencia_prob = 1.0 - _clamp(std_prob / 0.25, 0.0, 1.0)
-    else:
-        consistencia_prob = 0.5
-
-    conc_score = 1.0 - _clamp(abs(conc_fichas - 0.55) / 0.55, 0.0, 1.0)
-
-    indice = (
-        (0.45 * prob_media_ponderada)
-        + (0.30 * cob_sinal)
-        + (0.15 * consistencia_prob)
-        + (0.10 * conc_score)
-    )
-    probabilidade_combinada = int(round(_clamp(indice, 0.0, 1.0) * 100.0))
-
-    if _telemetria_estimativa_ativa(regras):
+    if modelo["telemetria"]:
+        w_qg, w_rp5, w_hc = modelo["pesos_mu"]
         payload = {
             "evento": "estimativa_aposta",
-            "versao": 1,
+            "versao": 3,
             "assinatura_aposta": _assinatura_aposta_telemetria(pilotos_validos, piloto_11, tipo_prova),
             "tipo_prova": str(tipo_prova),
             "n_pilotos": int(len(pilotos_validos)),
@@ -502,26 +678,18 @@ def _estimar_pontos_aposta_ergast(
                 "hc": round(float(w_hc), 4),
             },
             "penalidades": {
-                "dnf_mu_penalty": round(float(dnf_mu_penalty), 4),
-                "dnf_points_penalty_scale": round(float(dnf_points_penalty_scale), 4),
+                "dnf_mu_penalty": round(float(modelo["dnf_mu_penalty"]), 4),
             },
             "componentes_pilotos": telemetria_componentes_por_piloto,
-            "escolha_posicoes": telemetria_posicoes,
-            "sinais_11": {
-                "piloto_11": redact_identifier(piloto_11),
-                "freq_11": round(float(freq_11), 4) if freq_11 is not None else None,
-                "rank_prior": round(float(rank_prior), 4),
-                "circuito_prior": round(float(circuito_prior), 4),
-                "recente_prior": round(float(recente_prior), 4),
-                "chance_11": round(float(chance_11), 4),
-            },
-            "combinacao": {
-                "prob_media": round(float(prob_media), 4),
-                "prob_media_ponderada": round(float(prob_media_ponderada), 4),
-                "cob_sinal": round(float(cob_sinal), 4),
-                "consistencia_prob": round(float(consistencia_prob), 4),
-                "conc_score": round(float(conc_score), 4),
-                "indice": round(float(indice), 4),
+            "pilotos_simulacao": telemetria_pilotos,
+            "simulacao": {
+                "n_simulacoes": int(simulacao["n_simulacoes"]),
+                "n_campo": int(len(modelo["nomes_campo"])),
+                "media": round(float(simulacao["media"]), 3),
+                "desvio": round(float(simulacao["desvio"]), 3),
+                "percentis": {str(k): round(float(v), 3) for k, v in percentis.items()},
+                "prob_11": round(float(chance_11), 4),
+                "prob_fichas_pontuando": round(float(prob_fichas_pontuando), 4),
                 "probabilidade_combinada": int(probabilidade_combinada),
             },
             "resultado": {
@@ -536,7 +704,10 @@ def _estimar_pontos_aposta_ergast(
         "bonus_11_estimado": round(bonus_11_estimado, 1),
         "chance_11": int(round(chance_11 * 100)),
         "probabilidade_combinada": max(0, min(100, probabilidade_combinada)),
-        "criterios": "Ergast(quali+forma+circuito+dnf+11o) + regras da prova",
+        "pontos_p10": round(float(percentis[10]), 1),
+        "pontos_p50": round(float(percentis[50]), 1),
+        "pontos_p90": round(float(percentis[90]), 1),
+        "criterios": f"Ergast(quali+forma+circuito+dnf) + Monte Carlo ({simulacao['n_simulacoes']} corridas) + regras da prova",
         "detalhes": " | ".join(detalhes_linhas[:5]),
     }
 
@@ -661,6 +832,139 @@ def _determinar_tipo_prova(prova_row: Union[pd.Series, dict], nome_prova: Option
     return "Normal"
 
 
+def renderizar_email_aposta_registrada(payload: dict) -> tuple[str, str, str]:
+    """Monta (destinatario, assunto, corpo_html) do email de confirmação de aposta.
+
+    Chamado pelo worker da fila de emails (`services/email_outbox`), fora da requisição:
+    aqui ficam as etapas lentas (contexto Ergast, estimativa e análise via LLM).
+    """
+    usuario = get_user_by_id(int(payload["usuario_id"]))
+    if not usuario:
+        raise ValueError(f"Usuário não encontrado: id={payload.get('usuario_id')}")
+    nome_prova_bd = str(payload.get("nome_prova", ""))
+    pilotos = [str(p) for p in payload.get("pilotos", [])]
+    fichas = [int(f) for f in payload.get("fichas", [])]
+    piloto_11 = str(payload.get("piloto_11", ""))
+    temporada = payload.get("temporada")
+    tipo_prova_regra = str(payload.get("tipo_prova") or "Normal")
+    regras = get_regras_aplicaveis(str(temporada or datetime.now().year), tipo_prova_regra)
+
+    corpo_email = (
+        f"<p>Olá {html.escape(usuario['nome'])},</p>"
+        f"<p>Sua aposta para a prova <b>{html.escape(nome_prova_bd)}</b> foi registrada com sucesso.</p>"
+        "<p><b>Detalhes:</b></p>"
+        "<ul>"
+        f"<li>Pilotos: {html.escape(', '.join(pilotos))}</li>"
+        f"<li>Fichas: {html.escape(', '.join(map(str, fichas)))}</li>"
+        f"<li>Palpite para 11º colocado: {html.escape(piloto_11)}</li>"
+        "</ul>"
+        "<p>Boa sorte na prova!</p>"
+    )
+
+    try:
+        modelo_corrida = obter_modelo_corrida(temporada, nome_prova_bd, tipo_prova_regra, regras)
+        estimativa_email = _estimar_pontos_aposta_ergast(
+            pilotos=pilotos,
+            fichas=fichas,
+            piloto_11=piloto_11,
+            tipo_prova=tipo_prova_regra,
+            regras=regras,
+            modelo=modelo_corrida,
+        )
+        pontos_estimados = estimativa_email.get("pontos_estimados")
+        bonus_11_estimado = estimativa_email.get("bonus_11_estimado")
+        chance_11 = estimativa_email.get("chance_11")
+        probabilidade_combinada = estimativa_email.get("probabilidade_combinada")
+        pontos_p10 = estimativa_email.get("pontos_p10")
+        pontos_p90 = estimativa_email.get("pontos_p90")
+        criterios_estimativa = str(estimativa_email.get("criterios", "Ergast + regras da prova"))
+        detalhes_estimativa = str(estimativa_email.get("detalhes", "")).strip()
+
+        analise = gerar_analise_aposta_com_probabilidade(
+            nome_usuario=usuario.get("nome", ""),
+            contexto_aposta=f"Prova {nome_prova_bd}",
+            detalhes_aposta=(
+                f"Pilotos: {', '.join(pilotos)}; "
+                f"Fichas: {', '.join(map(str, fichas))}; "
+                f"11º: {piloto_11}; "
+                f"Estimativa de pontos (Ergast): {pontos_estimados}; "
+                f"Bônus 11º esperado: {bonus_11_estimado} ({chance_11}%); "
+                f"Critérios: {criterios_estimativa}; "
+                f"Sinais: {detalhes_estimativa}"
+            ),
+        )
+        comentario = str(analise.get("comentario", "")).strip()
+        probabilidade = analise.get("probabilidade")
+
+        if probabilidade_combinada is not None:
+            probabilidade = probabilidade_combinada
+
+        try:
+            prob_i = int(float(probabilidade)) if probabilidade is not None else None
+        except Exception:
+            prob_i = None
+        try:
+            pontos_i = float(pontos_estimados) if pontos_estimados is not None else None
+        except Exception:
+            pontos_i = None
+        if pontos_i is not None:
+            cap_por_pontos = int(max(10, min(95, round(pontos_i * 1.6))))
+            if prob_i is None:
+                prob_i = cap_por_pontos
+            else:
+                prob_i = min(prob_i, cap_por_pontos)
+        if prob_i is not None:
+            probabilidade = max(0, min(100, prob_i))
+
+        abertura_email, fechamento_email = _gerar_copy_email_aposta(
+            nome_usuario=str(usuario.get("nome", "Participante")),
+            nome_prova=nome_prova_bd,
+            pilotos=pilotos,
+            fichas=fichas,
+            piloto_11=piloto_11,
+            pontos_estimados=(float(pontos_estimados) if pontos_estimados is not None else None),
+            probabilidade=probabilidade,
+        )
+
+        previsao_html = ""
+        if comentario:
+            previsao_html += "<p>" + "<br>".join(html.escape(comentario).splitlines()) + "</p>"
+        if pontos_estimados is not None:
+            previsao_html += f"<p><b>Estimativa de pontos:</b> {float(pontos_estimados):.1f}</p>"
+        if pontos_p10 is not None and pontos_p90 is not None:
+            previsao_html += (
+                f"<p><b>Faixa provável (80% das simulações):</b> "
+                f"{float(pontos_p10):.0f} a {float(pontos_p90):.0f} pontos</p>"
+            )
+        if chance_11 is not None:
+            previsao_html += f"<p><b>Probabilidade de acerto do 11º colocado:</b> {int(chance_11)}%</p>"
+        if probabilidade is not None:
+            previsao_html += f"<p><b>Probabilidade estimada de acerto:</b> {int(probabilidade)}%</p>"
+
+        corpo_email = (
+            f"<p>Olá {html.escape(usuario['nome'])},</p>"
+            f"<p>Sua aposta para a prova <b>{html.escape(nome_prova_bd)}</b> foi registrada com sucesso.</p>"
+            f"<p>{html.escape(abertura_email)}</p>"
+            "<p><b>Detalhes:</b></p>"
+            "<ul>"
+            f"<li>Pilotos: {html.escape(', '.join(pilotos))}</li>"
+            f"<li>Fichas: {html.escape(', '.join(map(str, fichas)))}</li>"
+            f"<li>Palpite para 11º colocado: {html.escape(piloto_11)}</li>"
+            "</ul>"
+            f"{previsao_html}"
+            f"<p>{html.escape(fechamento_email)}</p>"
+            "<p><small><b>Aviso de estimativa:</b> a probabilidade informada é apenas uma projeção estatística/opinativa com base em informações disponíveis e pode variar a qualquer momento. Não constitui garantia de resultado esportivo nem direito a pontuação, prevalecendo sempre as regras oficiais do bolão.</small></p>"
+        )
+    except Exception as e:
+        logger.exception(
+            "Falha ao montar conteúdo avançado do email de aposta para %s: %s",
+            redact_identifier(str(usuario.get("email", ""))),
+            e,
+        )
+
+    return usuario["email"], f"Aposta registrada - {nome_prova_bd}", corpo_email
+
+
 def salvar_aposta(
     usuario_id,
     prova_id,
@@ -813,135 +1117,33 @@ def salvar_aposta(
                     aposta_id_inserida = row_aposta.get("id") if hasattr(row_aposta, "get") else row_aposta[0]
                 if aposta_id_inserida is not None:
                     sync_aposta_native(conn, int(aposta_id_inserida))
+                try:
+                    # Savepoint: falha ao enfileirar o email não pode desfazer a aposta.
+                    with conn.transaction():
+                        enfileirar_email(
+                            conn,
+                            TIPO_APOSTA_REGISTRADA,
+                            {
+                                "usuario_id": usuario_id,
+                                "prova_id": prova_id,
+                                "nome_prova": nome_prova_bd,
+                                "pilotos": list(pilotos),
+                                "fichas": list(fichas),
+                                "piloto_11": piloto_11,
+                                "temporada": temporada,
+                                "tipo_prova": tipo_prova_regra,
+                            },
+                        )
+                except Exception as e:
+                    logger.warning("Falha ao enfileirar email de aposta (prova_id=%s): %s", prova_id, e)
             else:
                 _report_error("Aposta fora do horário limite.")
                 return False
 
             conn.commit()
-
-            corpo_email = (
-                f"<p>Olá {html.escape(usuario['nome'])},</p>"
-                f"<p>Sua aposta para a prova <b>{html.escape(nome_prova_bd)}</b> foi registrada com sucesso.</p>"
-                "<p><b>Detalhes:</b></p>"
-                "<ul>"
-                f"<li>Pilotos: {html.escape(', '.join(pilotos))}</li>"
-                f"<li>Fichas: {html.escape(', '.join(map(str, fichas)))}</li>"
-                f"<li>Palpite para 11º colocado: {html.escape(piloto_11)}</li>"
-                "</ul>"
-                "<p>Boa sorte na prova!</p>"
-            )
-
-            try:
-                contexto_ergast_email = _get_contexto_temporada_atual_ergast(
-                    temporada=str(temporada or datetime.now().year),
-                    nome_prova=nome_prova_bd,
-                )
-                estimativa_email = _estimar_pontos_aposta_ergast(
-                    pilotos=pilotos,
-                    fichas=fichas,
-                    piloto_11=piloto_11,
-                    tipo_prova=tipo_prova_regra,
-                    regras=regras,
-                    contexto_ergast=contexto_ergast_email,
-                )
-                pontos_estimados = estimativa_email.get("pontos_estimados")
-                bonus_11_estimado = estimativa_email.get("bonus_11_estimado")
-                chance_11 = estimativa_email.get("chance_11")
-                probabilidade_combinada = estimativa_email.get("probabilidade_combinada")
-                criterios_estimativa = str(estimativa_email.get("criterios", "Ergast + regras da prova"))
-                detalhes_estimativa = str(estimativa_email.get("detalhes", "")).strip()
-
-                analise = gerar_analise_aposta_com_probabilidade(
-                    nome_usuario=usuario.get("nome", ""),
-                    contexto_aposta=f"Prova {nome_prova_bd}",
-                    detalhes_aposta=(
-                        f"Pilotos: {', '.join(pilotos)}; "
-                        f"Fichas: {', '.join(map(str, fichas))}; "
-                        f"11º: {piloto_11}; "
-                        f"Estimativa de pontos (Ergast): {pontos_estimados}; "
-                        f"Bônus 11º esperado: {bonus_11_estimado} ({chance_11}%); "
-                        f"Critérios: {criterios_estimativa}; "
-                        f"Sinais: {detalhes_estimativa}"
-                    ),
-                )
-                comentario = str(analise.get("comentario", "")).strip()
-                probabilidade = analise.get("probabilidade")
-
-                if probabilidade_combinada is not None:
-                    probabilidade = probabilidade_combinada
-
-                try:
-                    prob_i = int(float(probabilidade)) if probabilidade is not None else None
-                except Exception:
-                    prob_i = None
-                try:
-                    pontos_i = float(pontos_estimados) if pontos_estimados is not None else None
-                except Exception:
-                    pontos_i = None
-                if pontos_i is not None:
-                    cap_por_pontos = int(max(10, min(95, round(pontos_i * 1.6))))
-                    if prob_i is None:
-                        prob_i = cap_por_pontos
-                    else:
-                        prob_i = min(prob_i, cap_por_pontos)
-                if prob_i is not None:
-                    probabilidade = max(0, min(100, prob_i))
-
-                abertura_email, fechamento_email = _gerar_copy_email_aposta(
-                    nome_usuario=str(usuario.get("nome", "Participante")),
-                    nome_prova=nome_prova_bd,
-                    pilotos=pilotos,
-                    fichas=fichas,
-                    piloto_11=piloto_11,
-                    pontos_estimados=(float(pontos_estimados) if pontos_estimados is not None else None),
-                    probabilidade=probabilidade,
-                )
-
-                previsao_html = ""
-                if comentario:
-                    previsao_html += "<p>" + "<br>".join(html.escape(comentario).splitlines()) + "</p>"
-                if pontos_estimados is not None:
-                    previsao_html += f"<p><b>Estimativa de pontos:</b> {float(pontos_estimados):.1f}</p>"
-                if chance_11 is not None:
-                    previsao_html += f"<p><b>Probabilidade de acerto do 11º colocado:</b> {int(chance_11)}%</p>"
-                if probabilidade is not None:
-                    previsao_html += f"<p><b>Probabilidade estimada de acerto:</b> {int(probabilidade)}%</p>"
-
-                corpo_email = (
-                    f"<p>Olá {html.escape(usuario['nome'])},</p>"
-                    f"<p>Sua aposta para a prova <b>{html.escape(nome_prova_bd)}</b> foi registrada com sucesso.</p>"
-                    f"<p>{html.escape(abertura_email)}</p>"
-                    "<p><b>Detalhes:</b></p>"
-                    "<ul>"
-                    f"<li>Pilotos: {html.escape(', '.join(pilotos))}</li>"
-                    f"<li>Fichas: {html.escape(', '.join(map(str, fichas)))}</li>"
-                    f"<li>Palpite para 11º colocado: {html.escape(piloto_11)}</li>"
-                    "</ul>"
-                    f"{previsao_html}"
-                    f"<p>{html.escape(fechamento_email)}</p>"
-                    "<p><small><b>Aviso de estimativa:</b> a probabilidade informada é apenas uma projeção estatística/opinativa com base em informações disponíveis e pode variar a qualquer momento. Não constitui garantia de resultado esportivo nem direito a pontuação, prevalecendo sempre as regras oficiais do bolão.</small></p>"
-                )
-            except Exception as e:
-                logger.exception(
-                    "Falha ao montar conteúdo avançado do email de aposta para %s: %s",
-                    redact_identifier(str(usuario.get("email", ""))),
-                    e,
-                )
-
-            try:
-                email_ok = enviar_email(usuario["email"], f"Aposta registrada - {nome_prova_bd}", corpo_email)
-                if not email_ok:
-                    logger.warning(
-                        "Falha de envio de email de aposta para %s (prova_id=%s)",
-                        redact_identifier(str(usuario.get("email", ""))),
-                        prova_id,
-                    )
-            except Exception as e:
-                logger.warning(
-                    "Falha ao enviar email de aposta para %s: %s",
-                    redact_identifier(str(usuario.get("email", ""))),
-                    e,
-                )
+        invalidar_tabelas("apostas")
+        # Conexão já devolvida ao pool: renderização e envio ficam com o worker da fila.
+        notificar_email_outbox()
 
     except Exception as e:
         _report_error("Erro ao salvar aposta.")
@@ -966,35 +1168,13 @@ def salvar_aposta(
     return True
 
 
-def gerar_aposta_automatica(usuario_id, prova_id, nome_prova, apostas_df, provas_df, temporada=None):
-    try:
-        usuario_id = int(usuario_id)
-        prova_id = int(prova_id)
-    except Exception as e:
-        return False, f"IDs inválidos: {e}"
-
-    prova_atual = provas_df[provas_df["id"] == prova_id]
-    if prova_atual.empty:
-        return False, "Prova não encontrada."
-
-    tipo_prova = _determinar_tipo_prova(prova_atual.iloc[0], nome_prova)
-    regras = get_regras_aplicaveis(str(temporada or datetime.now().year), tipo_prova)
-
-    aposta_existente = apostas_df[
-        (apostas_df["usuario_id"] == usuario_id)
-        & (apostas_df["prova_id"] == prova_id)
-        & ((apostas_df["automatica"].isnull()) | (apostas_df["automatica"] == 0))
-    ]
-    if not aposta_existente.empty:
-        return False, "Já existe aposta manual para esta prova."
-
-    ap_ant = pd.DataFrame()
-    prova_id_min = None
-    try:
-        prova_id_min = int(provas_df["id"].min()) if not provas_df.empty else None
-    except Exception:
-        prova_id_min = None
+def _ids_prova_anterior(provas_df: pd.DataFrame, prova_id: int) -> list[int]:
+    """Provas cuja aposta pode ser copiada, em ordem de preferência.
 
+    Primeiro a prova imediatamente anterior no calendário (data + horário);
+    depois, como reserva, a de id imediatamente menor.
+    """
+    ids: list[int] = []
     try:
         provas_tmp = provas_df.copy()
         if "data" in provas_tmp.columns:
@@ -1017,35 +1197,78 @@ def gerar_aposta_automatica(usuario_id, prova_id, nome_prova, apostas_df, provas
             prova_atual_dt = prova_atual_row.iloc[0]["__prova_dt"]
             provas_anteriores = provas_tmp[provas_tmp["__prova_dt"] < prova_atual_dt]
             if not provas_anteriores.empty:
-                prova_ant_id = int(provas_anteriores.iloc[-1]["id"])
-                ap_ant = apostas_df[(apostas_df["usuario_id"] == usuario_id) & (apostas_df["prova_id"] == prova_ant_id)]
+                ids.append(int(provas_anteriores.iloc[-1]["id"]))
     except Exception:
-        ap_ant = pd.DataFrame()
+        pass
 
-    if ap_ant.empty:
-        try:
-            provas_sorted = provas_df.sort_values("id")
-            prev_rows = provas_sorted[provas_sorted["id"] < prova_id]
-            if not prev_rows.empty:
-                prova_ant_id = int(prev_rows.iloc[-1]["id"])
-                ap_ant = apostas_df[(apostas_df["usuario_id"] == usuario_id) & (apostas_df["prova_id"] == prova_ant_id)]
-        except Exception:
-            ap_ant = pd.DataFrame()
+    try:
+        provas_sorted = provas_df.sort_values("id")
+        prev_rows = provas_sorted[provas_sorted["id"] < prova_id]
+        if not prev_rows.empty:
+            prova_ant_id = int(prev_rows.iloc[-1]["id"])
+            if prova_ant_id not in ids:
+                ids.append(prova_ant_id)
+    except Exception:
+        pass
+    return ids
 
+
+def _pilotos_ativos_df() -> pd.DataFrame:
     pilotos_df = get_pilotos_df()
     if not pilotos_df.empty and "status" in pilotos_df.columns:
         pilotos_df = cast(pd.DataFrame, pilotos_df[pilotos_df["status"] == "Ativo"])
+    return pilotos_df
+
+
+def _aposta_a_partir_da_anterior(ap_ant: Union[pd.Series, dict], regras: dict, pilotos_df: pd.DataFrame):
+    """Copia a aposta anterior ajustada às regras atuais; sorteia se não couber."""
+    pilotos_ant = [p.strip() for p in ap_ant["pilotos"].split(",")]
+    fichas_ant = list(map(int, ap_ant["fichas"].split(",")))
+    piloto_11_ant = ap_ant["piloto_11"].strip()
+    pilotos_aj, fichas_aj = ajustar_aposta_para_regras(pilotos_ant, fichas_ant, regras, pilotos_df)
+    if not pilotos_aj:
+        return gerar_aposta_aleatoria_com_regras(pilotos_df, regras)
+    return pilotos_aj, fichas_aj, piloto_11_ant
+
+
+def gerar_aposta_automatica(usuario_id, prova_id, nome_prova, apostas_df, provas_df, temporada=None):
+    try:
+        usuario_id = int(usuario_id)
+        prova_id = int(prova_id)
+    except Exception as e:
+        return False, f"IDs inválidos: {e}"
+
+    prova_atual = provas_df[provas_df["id"] == prova_id]
+    if prova_atual.empty:
+        return False, "Prova não encontrada."
+
+    tipo_prova = _determinar_tipo_prova(prova_atual.iloc[0], nome_prova)
+    regras = get_regras_aplicaveis(str(temporada or datetime.now().year), tipo_prova)
+
+    aposta_existente = apostas_df[
+        (apostas_df["usuario_id"] == usuario_id)
+        & (apostas_df["prova_id"] == prova_id)
+        & ((apostas_df["automatica"].isnull()) | (apostas_df["automatica"] == 0))
+    ]
+    if not aposta_existente.empty:
+        return False, "Já existe aposta manual para esta prova."
+
+    prova_id_min = None
+    try:
+        prova_id_min = int(provas_df["id"].min()) if not provas_df.empty else None
+    except Exception:
+        prova_id_min = None
+
+    ap_ant = pd.DataFrame()
+    for prova_ant_id in _ids_prova_anterior(provas_df, prova_id):
+        ap_ant = apostas_df[(apostas_df["usuario_id"] == usuario_id) & (apostas_df["prova_id"] == prova_ant_id)]
+        if not ap_ant.empty:
+            break
+
+    pilotos_df = _pilotos_ativos_df()
 
     if not ap_ant.empty:
-        ap_ant = ap_ant.iloc[0]
-        pilotos_ant = [p.strip() for p in ap_ant["pilotos"].split(",")]
-        fichas_ant = list(map(int, ap_ant["fichas"].split(",")))
-        piloto_11_ant = ap_ant["piloto_11"].strip()
-        pilotos_aj, fichas_aj = ajustar_aposta_para_regras(pilotos_ant, fichas_ant, regras, pilotos_df)
-        if not pilotos_aj:
-            pilotos_ant, fichas_ant, piloto_11_ant = gerar_aposta_aleatoria_com_regras(pilotos_df, regras)
-        else:
-            pilotos_ant, fichas_ant = pilotos_aj, fichas_aj
+        pilotos_ant, fichas_ant, piloto_11_ant = _aposta_a_partir_da_anterior(ap_ant.iloc[0], regras, pilotos_df)
     else:
         if prova_id_min is not None and prova_id != prova_id_min:
             return False, "Sem aposta anterior para copiar. Gere apenas na primeira prova."
@@ -1086,10 +1309,277 @@ def gerar_aposta_automatica(usuario_id, prova_id, nome_prova, apostas_df, provas
         if "faltas" in cols_usuarios:
             c.execute("UPDATE usuarios SET faltas = COALESCE(faltas, 0) + 1 WHERE id=%s", (usuario_id,))
             conn.commit()
+            invalidar_tabelas("usuarios")
 
     return True, "Aposta automática gerada!"
 
 
+def _participantes_sem_aposta(prova_id: int, temporada: str, usuario_ids=None) -> list[dict]:
+    """Participantes ativos sem aposta na prova (id, nome, email, faltas), numa consulta.
+
+    Sem `usuario_ids`, considera os participantes da temporada exceto o master.
+    """
+    if usuario_ids is None:
+        participantes = get_participantes_temporada_df(temporada)
+        if not participantes.empty and "perfil" in participantes.columns:
+            participantes = participantes[participantes["perfil"].astype(str).str.strip().str.lower() != "master"]
+        usuario_ids = participantes["id"].tolist() if not participantes.empty else []
+    candidatos = sorted({int(u) for u in usuario_ids})
+    if not candidatos:
+        return []
+
+    with db_connect() as conn:
+        c = conn.cursor()
+        aposta_cols = get_table_columns(conn, "apostas")
+        tem_faltas = "faltas" in get_table_columns(conn, "usuarios")
+        filtro_temporada = " AND a.temporada = %s" if "temporada" in aposta_cols else ""
+        params_temporada = (temporada,) if filtro_temporada else ()
+        c.execute(
+            f"""
+            SELECT u.id, u.nome, u.email, {"COALESCE(u.faltas, 0)" if tem_faltas else "0"} AS faltas
+            FROM usuarios u
+            WHERE u.id = ANY(%s)
+              AND lower(trim(coalesce(u.status, ''))) IN ('', 'ativo')
+              AND NOT EXISTS (
+                  SELECT 1 FROM apostas a
+                  WHERE a.usuario_id = u.id AND a.prova_id = %s{filtro_temporada}
+              )
+            ORDER BY u.id
+            """,
+            (candidatos, prova_id, *params_temporada),
+        )
+        return [dict(r) for r in c.fetchall() or []]
+
+
+class FalhaApostasAutomaticas(RuntimeError):
+    """Geração em lote não concluída (prova inexistente ou erro ao gravar)."""
+
+
+def gerar_apostas_automaticas_prova(
+    prova_id, temporada=None, usuario_ids=None, levantar_falhas: bool = False
+) -> tuple[int, list[str]]:
+    """Gera apostas automáticas para todos os participantes sem aposta na prova.
+
+    Versão em lote de `gerar_aposta_automatica`: prova, regras e pilotos são
+    resolvidos uma vez, os ausentes saem de uma única consulta e as apostas
+    anteriores de um único filtro sobre `apostas`. Apostas e `faltas` são
+    gravadas numa só transação; emails vão para a fila e logs em lote depois.
+
+    `usuario_ids` restringe os candidatos; por padrão, todos os participantes
+    da temporada exceto o master. Retorna (apostas geradas, mensagens).
+
+    Com `levantar_falhas`, prova inexistente ou erro ao gravar levantam
+    `FalhaApostasAutomaticas` em vez de voltar como mensagem: o agendador
+    precisa saber que o evento deve ser tentado de novo.
+    """
+    try:
+        prova_id = int(prova_id)
+    except Exception as e:
+        if levantar_falhas:
+            raise FalhaApostasAutomaticas(f"ID de prova inválido: {e}") from e
+        return 0, [f"ID de prova inválido: {e}"]
+
+    provas_df = get_provas_df(temporada)
+    prova_atual = provas_df[provas_df["id"] == prova_id] if not provas_df.empty else provas_df
+    if prova_atual.empty:
+        if levantar_falhas:
+            raise FalhaApostasAutomaticas(f"Prova não encontrada: id={prova_id}")
+        return 0, ["Prova não encontrada."]
+    prova_row = prova_atual.iloc[0]
+    nome_prova = str(prova_row.get("nome") or "")
+    temporada = str(temporada or datetime.now().year)
+    tipo_prova = _determinar_tipo_prova(prova_row, nome_prova)
+    regras = get_regras_aplicaveis(temporada, tipo_prova)
+
+    ausentes = _participantes_sem_aposta(prova_id, temporada, usuario_ids)
+    if not ausentes:
+        return 0, []
+
+    ausentes_ids = [int(u["id"]) for u in ausentes]
+    anteriores = pd.DataFrame()
+    ids_anteriores = _ids_prova_anterior(provas_df, prova_id)
+    if ids_anteriores:
+        apostas_df = get_apostas_df(temporada)
+        if not apostas_df.empty:
+            prioridade = {pid: i for i, pid in enumerate(ids_anteriores)}
+            anteriores = apostas_df[
+                apostas_df["usuario_id"].isin(ausentes_ids) & apostas_df["prova_id"].isin(ids_anteriores)
+            ]
+            anteriores = (
+                anteriores.assign(__prioridade=anteriores["prova_id"].map(prioridade))
+                .sort_values("__prioridade", kind="stable")
+                .drop_duplicates("usuario_id")
+                .set_index("usuario_id")
+            )
+
+    try:
+        prova_id_min = int(provas_df["id"].min())
+    except Exception:
+        prova_id_min = None
+    pilotos_df = _pilotos_ativos_df()
+    quantidade_fichas = regras.get("quantidade_fichas", 15)
+    min_pilotos = regras.get("min_pilotos", 3)
+    max_por_piloto = int(regras.get("fichas_por_piloto", quantidade_fichas))
+
+    mensagens: list[str] = []
+    novas: list[dict] = []
+    for usuario in ausentes:
+        uid = int(usuario["id"])
+        if uid in anteriores.index:
+            pilotos, fichas, piloto_11 = _aposta_a_partir_da_anterior(anteriores.loc[uid], regras, pilotos_df)
+        elif prova_id_min is not None and prova_id != prova_id_min:
+            mensagens.append(f"{usuario['nome']}: sem aposta anterior para copiar.")
+            continue
+        else:
+            pilotos, fichas, piloto_11 = gerar_aposta_aleatoria_com_regras(pilotos_df, regras)
+        automatica = int(usuario["faltas"] or 0) + 1
+        # Mesma validação de `salvar_aposta` (pilotos repetidos, fichas negativas etc.).
+        try:
+            payload = BetSubmissionInput(
+                usuario_id=uid,
+                prova_id=prova_id,
+                pilotos=list(pilotos or []),
+                fichas=list(fichas or []),
+                piloto_11=piloto_11,
+                nome_prova=nome_prova,
+                automatica=automatica,
+                temporada=temporada,
+            )
+        except ValidationError as exc:
+            logger.warning("Aposta automática rejeitada por validacao (usuario_id=%s): %s", uid, exc)
+            mensagens.append(f"{usuario['nome']}: aposta automática gerada é inválida.")
+            continue
+        pilotos, fichas, piloto_11 = payload.pilotos, payload.fichas, payload.piloto_11
+        if (
+            not pilotos
+            or not fichas
+            or not piloto_11
+            or len(pilotos) != len(fichas)
+            or len(pilotos) < min_pilotos
+            or sum(fichas) != quantidade_fichas
+            or max(fichas) > max_por_piloto
+        ):
+            mensagens.append(f"{usuario['nome']}: não há dados válidos para gerar aposta automática.")
+            continue
+        novas.append(
+            {
+                "usuario_id": uid,
+                "apostador": usuario["nome"],
+                "pilotos": list(pilotos),
+                "fichas": [int(f) for f in fichas],
+                "piloto_11": piloto_11,
+                "automatica": automatica,
+            }
+        )
+    if not novas:
+        return 0, mensagens
+
+    agora_sp = now_sao_paulo()
+    data_envio = agora_sp.isoformat()
+    por_usuario = {n["usuario_id"]: n for n in novas}
+    try:
+        with db_connect() as conn:
+            c = conn.cursor()
+            aposta_cols = get_table_columns(conn, "apostas")
+            tem_faltas = "faltas" in get_table_columns(conn, "usuarios")
+            colunas = "usuario_id, prova_id, data_envio, pilotos, fichas, piloto_11, nome_prova, automatica"
+            valores = "v.usuario_id, %s, %s, v.pilotos, v.fichas, v.piloto_11, %s, v.automatica"
+            params: list = [prova_id, data_envio, nome_prova]
+            filtro_temporada = ""
+            if "temporada" in aposta_cols:
+                colunas += ", temporada"
+                valores += ", %s"
+                params.append(temporada)
+                filtro_temporada = " AND a.temporada = %s"
+            params += [
+                [n["usuario_id"] for n in novas],
+                [",".join(n["pilotos"]) for n in novas],
+                [",".join(map(str, n["fichas"])) for n in novas],
+                [n["piloto_11"] for n in novas],
+                [n["automatica"] for n in novas],
+                prova_id,
+            ]
+            if filtro_temporada:
+                params.append(temporada)
+
+            # O NOT EXISTS repete o filtro de ausentes: quem apostou nesse meio-tempo fica de fora.
+            c.execute(
+                f"""
+                INSERT INTO apostas ({colunas})
+                SELECT {valores}
+                FROM unnest(%s::int[], %s::text[], %s::text[], %s::text[], %s::int[])
+                    AS v(usuario_id, pilotos, fichas, piloto_11, automatica)
+                WHERE NOT EXISTS (
+                    SELECT 1 FROM apostas a
+                    WHERE a.usuario_id = v.usuario_id AND a.prova_id = %s{filtro_temporada}
+                )
+                RETURNING id, usuario_id
+                """,
+                params,
+            )
+            inseridas = [dict(r) for r in c.fetchall() or []]
+            gravados = [int(r["usuario_id"]) for r in inseridas]
+            sync_apostas_native(conn, [int(r["id"]) for r in inseridas])
+            if tem_faltas and gravados:
+                c.execute("UPDATE usuarios SET faltas = COALESCE(faltas, 0) + 1 WHERE id = ANY(%s)", (gravados,))
+            try:
+                # Savepoint: falha ao enfileirar os emails não pode desfazer as apostas.
+                with conn.transaction():
+                    enfileirar_emails(
+                        conn,
+                        TIPO_APOSTA_REGISTRADA,
+                        [
+                            {
+                                "usuario_id": uid,
+                                "prova_id": prova_id,
+                                "nome_prova": nome_prova,
+                                "pilotos": por_usuario[uid]["pilotos"],
+                                "fichas": por_usuario[uid]["fichas"],
+                                "piloto_11": por_usuario[uid]["piloto_11"],
+                                "temporada": temporada,
+                                "tipo_prova": tipo_prova,
+                            }
+                            for uid in gravados
+                        ],
+                    )
+            except Exception as e:
+                logger.warning("Falha ao enfileirar emails de apostas automáticas (prova_id=%s): %s", prova_id, e)
+            conn.commit()
+    except Exception as e:
+        logger.exception("Erro ao gerar apostas automáticas em lote (prova_id=%s): %s", prova_id, e)
+        if levantar_falhas:
+            raise FalhaApostasAutomaticas(f"Erro ao salvar apostas automáticas: {e}") from e
+        return 0, mensagens + ["Erro ao salvar apostas automáticas."]
+
+    invalidar_tabelas("apostas", "usuarios")
+    notificar_email_outbox()
+
+    _, _, horario_limite = pode_fazer_aposta(prova_row.get("data"), prova_row.get("horario_prova"), agora_sp)
+    tipo_aposta = 0 if horario_limite and agora_sp <= horario_limite else 1
+    ip_apostador = get_client_ip()
+    registrar_logs_aposta(
+        [
+            {
+                "usuario_id": uid,
+                "prova_id": prova_id,
+                "apostador": por_usuario[uid]["apostador"],
+                "pilotos": ", ".join(por_usuario[uid]["pilotos"]),
+                "aposta": ", ".join(map(str, por_usuario[uid]["fichas"])),
+                "nome_prova": nome_prova,
+                "piloto_11": por_usuario[uid]["piloto_11"],
+                "tipo_aposta": tipo_aposta,
+                "automatica": por_usuario[uid]["automatica"],
+                "horario": agora_sp,
+                "ip_address": ip_apostador,
+                "temporada": temporada,
+                "status": "Registrada",
+            }
+            for uid in gravados
+        ]
+    )
+    return len(gravados), mensagens
+
+
 def gerar_aposta_sem_ideias(usuario_id, prova_id, nome_prova, temporada=None):
     try:
         usuario_id = int(usuario_id)
@@ -1121,7 +1611,7 @@ def gerar_aposta_sem_ideias(usuario_id, prova_id, nome_prova, temporada=None):
     resultados_df = get_resultados_df(temporada)
     ultimas_apostas = _get_resumo_ultimas_apostas(usuario_id, apostas_df, limite=2)
     cenario = _get_resumo_cenario_campeonato(resultados_df, provas_df, limite=2)
-    contexto_ergast = _get_contexto_temporada_atual_ergast(temporada=str(temporada or datetime.now().year), nome_prova=nome_prova)
+    contexto_ergast = obter_modelo_corrida(temporada, nome_prova, tipo_prova, regras)["contexto"]
 
     origem = "aleatória"
     sugestao = _gerar_aposta_perplexity(
@@ -1171,5 +1661,9 @@ __all__ = [
     "gerar_aposta_aleatoria_com_regras",
     "ajustar_aposta_para_regras",
     "gerar_aposta_automatica",
+    "FalhaApostasAutomaticas",
+    "gerar_apostas_automaticas_prova",
     "gerar_aposta_sem_ideias",
+    "obter_modelo_corrida",
+    "invalidar_modelos_corrida",
 ]
@@ -8,26 +8,35 @@ from db.db_config import (
 )
 from db.repo_users import (
     check_password,
+    delete_usuario,
     get_user_by_email,
     get_user_by_id,
     get_usuarios_df,
     registrar_historico_status_usuario,
+    rehash_senha_se_necessario,
     update_user_email,
     update_user_password,
+    update_usuario,
     usuarios_status_historico_disponivel,
 )
+from utils.senhas import MSG_SENHA_OCUPADO, SenhaServicoOcupado
 
 __all__ = [
     "LOCKOUT_DURATION",
+    "MSG_SENHA_OCUPADO",
     "MAX_LOGIN_ATTEMPTS",
     "MAX_RESET_ATTEMPTS",
     "RESET_LOCKOUT_DURATION",
+    "SenhaServicoOcupado",
     "check_password",
+    "delete_usuario",
     "get_user_by_email",
     "get_user_by_id",
     "get_usuarios_df",
     "registrar_historico_status_usuario",
+    "rehash_senha_se_necessario",
     "update_user_email",
     "update_user_password",
+    "update_usuario",
     "usuarios_status_historico_disponivel",
 ]
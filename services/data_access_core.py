@@ -1,8 +1,10 @@
 """Fachada de utilitarios de infraestrutura de dados para UI."""
 
 from db.db_schema import db_connect, get_table_columns
+from db.query_cache import invalidar_tabelas
 
 __all__ = [
     "db_connect",
     "get_table_columns",
+    "invalidar_tabelas",
 ]
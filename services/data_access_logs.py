@@ -0,0 +1,17 @@
+"""Fachada de consulta paginada dos logs (apostas e acessos) para a camada de UI."""
+
+from db.repo_logs import (
+    LOGS_POR_PAGINA,
+    consultar_access_logs,
+    consultar_logs_apostas,
+    opcoes_filtro_access_logs,
+    opcoes_status_log_apostas,
+)
+
+__all__ = [
+    "LOGS_POR_PAGINA",
+    "consultar_access_logs",
+    "consultar_logs_apostas",
+    "opcoes_filtro_access_logs",
+    "opcoes_status_log_apostas",
+]
@@ -5,10 +5,12 @@ from db.circuitos_utils import (
     get_circuitos_df,
     get_temporadas_existentes_provas,
 )
+from db.ergast_mirror import atualizar_base_ergast
 from db.repo_races import get_pilotos_df, get_provas_df, get_resultados_df
 
 __all__ = [
     "atualizar_base_circuitos",
+    "atualizar_base_ergast",
     "get_circuitos_df",
     "get_temporadas_existentes_provas",
     "get_pilotos_df",
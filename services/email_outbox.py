@@ -0,0 +1,126 @@
+"""Worker da fila de emails: renderiza e envia fora do fluxo da requisição, com retry/backoff."""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from typing import Callable
+
+from db.repo_email_outbox import (
+    marcar_email_enviado,
+    marcar_email_falha,
+    reservar_emails_pendentes,
+)
+from services.email_service import enviar_email
+from utils.logging_utils import redact_identifier
+
+logger = logging.getLogger(__name__)
+
+TIPO_APOSTA_REGISTRADA = "aposta_registrada"
+TIPO_LEMBRETE_APOSTA = "lembrete_aposta"
+
+MAX_TENTATIVAS = int(os.getenv("BF1_EMAIL_MAX_TENTATIVAS", "6"))
+BACKOFF_BASE_SEGUNDOS = 60
+BACKOFF_MAX_SEGUNDOS = 3600
+# Varredura periódica mesmo sem notificação (reagendamentos e outros processos)
+INTERVALO_VARREDURA = 30.0
+
+_worker_lock = threading.Lock()
+_worker_thread: threading.Thread | None = None
+_acordar = threading.Event()
+
+
+def _renderizador(tipo: str) -> Callable[[dict], tuple[str, str, str]] | None:
+    """Retorna função payload -> (destinatario, assunto, corpo_html) para o tipo."""
+    if tipo == TIPO_APOSTA_REGISTRADA:
+        from services.bets_write import renderizar_email_aposta_registrada
+
+        return renderizar_email_aposta_registrada
+    if tipo == TIPO_LEMBRETE_APOSTA:
+        from services.bets_agendador import renderizar_email_lembrete_aposta
+
+        return renderizar_email_lembrete_aposta
+    return None
+
+
+def _atraso_backoff(tentativas: int) -> int:
+    return int(min(BACKOFF_MAX_SEGUNDOS, BACKOFF_BASE_SEGUNDOS * (2 ** max(0, tentativas))))
+
+
+def processar_email_outbox(limite: int = 5) -> int:
+    """Processa até `limite` emails da fila. Retorna quantos foram enviados.
+
+    Reserva um email por vez: o lease cobre só a renderização (que pode chamar
+    o LLM) e o envio daquele email, então outro worker não o pega no meio.
+    """
+    enviados = 0
+    for _ in range(limite):
+        reservados = reservar_emails_pendentes(limite=1)
+        if not reservados:
+            break
+        item = reservados[0]
+        email_id = int(item["id"])
+        tentativas = int(item.get("tentativas") or 0)
+        destinatario = ""
+        try:
+            renderizar = _renderizador(str(item["tipo"]))
+            if renderizar is None:
+                marcar_email_falha(email_id, f"tipo desconhecido: {item['tipo']}", 0, definitivo=True)
+                continue
+            destinatario, assunto, corpo = renderizar(item["payload"] or {})
+            if not enviar_email(destinatario, assunto, corpo):
+                raise RuntimeError("enviar_email retornou False")
+        except Exception as exc:
+            definitivo = tentativas + 1 >= MAX_TENTATIVAS
+            logger.warning(
+                "Falha ao enviar email #%s para %s (tentativa %s/%s): %s",
+                email_id,
+                redact_identifier(str(destinatario)),
+                tentativas + 1,
+                MAX_TENTATIVAS,
+                exc,
+            )
+            marcar_email_falha(email_id, str(exc), _atraso_backoff(tentativas), definitivo=definitivo)
+            continue
+        marcar_email_enviado(email_id)
+        enviados += 1
+    return enviados
+
+
+def _loop_worker() -> None:
+    while True:
+        _acordar.wait(INTERVALO_VARREDURA)
+        _acordar.clear()
+        try:
+            while processar_email_outbox() > 0:
+                pass
+        except Exception as exc:
+            logger.warning("Falha no worker da fila de emails: %s", exc)
+
+
+def iniciar_worker_email_outbox() -> bool:
+    """Inicia (uma vez por processo) a thread que drena a fila de emails."""
+    global _worker_thread
+    with _worker_lock:
+        if _worker_thread is not None and _worker_thread.is_alive():
+            return False
+        _worker_thread = threading.Thread(target=_loop_worker, name="email-outbox", daemon=True)
+        _worker_thread.start()
+    _acordar.set()
+    return True
+
+
+def notificar_email_outbox() -> None:
+    """Acorda o worker após um commit que enfileirou email."""
+    iniciar_worker_email_outbox()
+    _acordar.set()
+
+
+__all__ = [
+    "TIPO_APOSTA_REGISTRADA",
+    "TIPO_LEMBRETE_APOSTA",
+    "processar_email_outbox",
+    "iniciar_worker_email_outbox",
+    "notificar_email_outbox",
+]
@@ -0,0 +1,286 @@
+"""Rate limiting de login e recuperação de senha por janela deslizante.
+
+As falhas recentes são contadas por (ação, email) e por (ação, IP). Dois modos,
+escolhidos por `BF1_LOGIN_RATE_LIMIT_MODO`:
+
+- `postgres` (padrão): a janela fica na tabela UNLOGGED `login_falhas_recentes`,
+  compartilhada entre as réplicas. Cada verificação é uma única consulta
+  indexada sobre essa tabela pequena, em vez das agregações sobre
+  `login_attempts`.
+- `memoria`: só para implantação com uma única réplica. A janela fica no
+  processo e é carregada uma vez de `login_attempts` para sobreviver a
+  reinícios; verificar o bloqueio não consulta o banco.
+
+Nos dois modos as tentativas vão para `login_attempts` em lote, por uma
+thread, apenas para auditoria.
+"""
+
+from __future__ import annotations
+
+import atexit
+import logging
+import os
+import queue
+import threading
+import time
+from collections import Counter, deque
+from datetime import datetime, timedelta
+from typing import Optional
+
+from db.db_config import LOCKOUT_DURATION, RESET_LOCKOUT_DURATION
+from db.db_schema import db_connect
+from db.repo_login_rate_limit import contar_falhas_recentes, limpar_falhas_expiradas, registrar_falha_recente
+
+logger = logging.getLogger(__name__)
+
+MODO_POSTGRES = "postgres"
+MODO_MEMORIA = "memoria"
+MODO_RATE_LIMIT = os.getenv("BF1_LOGIN_RATE_LIMIT_MODO", MODO_POSTGRES).strip().lower()
+if MODO_RATE_LIMIT not in (MODO_POSTGRES, MODO_MEMORIA):
+    logger.warning("BF1_LOGIN_RATE_LIMIT_MODO inválido (%s); usando %s", MODO_RATE_LIMIT, MODO_POSTGRES)
+    MODO_RATE_LIMIT = MODO_POSTGRES
+
+# Gravação assíncrona das tentativas (auditoria)
+INTERVALO_GRAVACAO = float(os.getenv("BF1_LOGIN_ATTEMPTS_INTERVALO", "2"))
+LOTE_GRAVACAO = int(os.getenv("BF1_LOGIN_ATTEMPTS_LOTE", "500"))
+# Tentativas não gravadas retidas enquanto o banco estiver indisponível
+MAX_PENDENTES = 10_000
+# Falhas guardadas por chave: acima disso a contagem satura (o bloqueio já vale)
+MAX_FALHAS_POR_CHAVE = 1_000
+INTERVALO_RECARGA = 60.0
+INTERVALO_LIMPEZA = 60.0
+
+_janelas: dict[tuple[str, str, str], deque[float]] = {}
+_janelas_lock = threading.Lock()
+_janela_segundos = max(LOCKOUT_DURATION, RESET_LOCKOUT_DURATION)
+
+_carga_lock = threading.Lock()
+_carregada = False
+_ultima_tentativa_carga = 0.0
+
+_fila: queue.Queue[tuple] = queue.Queue()
+_writer_lock = threading.Lock()
+_writer_thread: Optional[threading.Thread] = None
+
+
+def _registrar_falha_memoria(email: str, ip_address: str, action: str, instante: float) -> None:
+    for chave in ((action, "email", email), (action, "ip", ip_address)):
+        falhas = _janelas.get(chave)
+        if falhas is None:
+            falhas = _janelas[chave] = deque(maxlen=MAX_FALHAS_POR_CHAVE)
+        falhas.append(instante)
+
+
+def _contar_falhas(chave: tuple[str, str, str], desde: float, limite_descarte: float) -> int:
+    falhas = _janelas.get(chave)
+    if not falhas:
+        return 0
+    while falhas and falhas[0] <= limite_descarte:
+        falhas.popleft()
+    if not falhas:
+        del _janelas[chave]
+        return 0
+    total = 0
+    for instante in reversed(falhas):
+        if instante <= desde:
+            break
+        total += 1
+    return total
+
+
+def _carregar_janela() -> None:
+    """Preenche a janela com as falhas recentes já gravadas (uma vez por processo)."""
+    global _carregada, _ultima_tentativa_carga
+    if _carregada:
+        return
+    with _carga_lock:
+        agora = time.monotonic()
+        if _carregada or agora - _ultima_tentativa_carga < INTERVALO_RECARGA:
+            return
+        _ultima_tentativa_carga = agora
+        desde = datetime.now() - timedelta(seconds=_janela_segundos)
+        try:
+            with db_connect() as conn:
+                c = conn.cursor()
+                c.execute(
+                    """
+                    SELECT email, ip_address, COALESCE(action, 'login') AS action, tentativa_em
+                    FROM login_attempts
+                    WHERE tentativa_em > %s AND sucesso IS NOT TRUE
+                    ORDER BY tentativa_em
+                    """,
+                    (desde,),
+                )
+                linhas = c.fetchall() or []
+        except Exception as exc:
+            logger.warning("Falha ao carregar tentativas de login recentes: %s", exc)
+            return
+        with _janelas_lock:
+            locais = {chave: list(falhas) for chave, falhas in _janelas.items()}
+            _janelas.clear()
+            for linha in linhas:
+                _registrar_falha_memoria(
+                    str(linha["email"] or ""),
+                    str(linha["ip_address"] or ""),
+                    str(linha["action"]),
+                    linha["tentativa_em"].timestamp(),
+                )
+            # Falhas contadas em memória antes desta carga (ex.: a primeira falhou) podem
+            # já ter sido gravadas pelo gravador. `tentativa_em` é o mesmo instante
+            # usado em memória, então só entram as que o banco ainda não tem.
+            for chave, falhas in locais.items():
+                destino = _janelas.setdefault(chave, deque(maxlen=MAX_FALHAS_POR_CHAVE))
+                no_banco = Counter(destino)
+                novas = []
+                for instante in falhas:
+                    if no_banco[instante] > 0:
+                        no_banco[instante] -= 1
+                    else:
+                        novas.append(instante)
+                if novas:
+                    _janelas[chave] = deque(sorted([*destino, *novas]), maxlen=MAX_FALHAS_POR_CHAVE)
+        _carregada = True
+        logger.info("Rate limiting de login: %s falha(s) recente(s) carregada(s)", len(linhas))
+
+
+def verificar_limite_login(
+    email: str,
+    ip_address: str,
+    max_attempts: int,
+    lockout_seconds: int,
+    action: str = "login",
+) -> tuple[int, int, bool]:
+    """Retorna (falhas_email, falhas_ip, bloqueado) na janela de `lockout_seconds`."""
+    global _janela_segundos
+    falhas = falhas_ip = None
+    if MODO_RATE_LIMIT == MODO_POSTGRES:
+        try:
+            falhas, falhas_ip = contar_falhas_recentes(email, ip_address, action, int(lockout_seconds))
+        except Exception as exc:
+            # Banco indisponível: vale a janela local deste processo até voltar.
+            logger.warning("Falha ao consultar janela compartilhada de login; usando a local: %s", exc)
+    else:
+        _carregar_janela()
+    agora = time.time()
+    with _janelas_lock:
+        _janela_segundos = max(_janela_segundos, int(lockout_seconds))
+        limite_descarte = agora - _janela_segundos
+        desde = agora - lockout_seconds
+        falhas_locais = _contar_falhas((action, "email", email), desde, limite_descarte)
+        falhas_ip_locais = _contar_falhas((action, "ip", ip_address), desde, limite_descarte)
+    if falhas is None:
+        falhas, falhas_ip = falhas_locais, falhas_ip_locais
+    # Limite por IP mais permissivo para reduzir falso positivo em redes compartilhadas.
+    bloqueado = falhas >= max_attempts or falhas_ip >= (max_attempts * 3)
+    return falhas, falhas_ip, bloqueado
+
+
+def registrar_tentativa(email: str, sucesso: bool, ip_address: str = "LOCAL", action: str = "login") -> None:
+    """Conta a tentativa na janela e enfileira a gravação em `login_attempts`."""
+    if MODO_RATE_LIMIT == MODO_MEMORIA:
+        _carregar_janela()
+    instante = datetime.now()
+    if not sucesso:
+        with _janelas_lock:
+            _registrar_falha_memoria(email, ip_address, action, instante.timestamp())
+        if MODO_RATE_LIMIT == MODO_POSTGRES:
+            try:
+                registrar_falha_recente(email, ip_address, action)
+            except Exception as exc:
+                logger.warning("Falha ao registrar falha de login na janela compartilhada: %s", exc)
+    _fila.put((email, bool(sucesso), ip_address, action, instante))
+    iniciar_gravador_tentativas()
+
+
+def _gravar_lote(lote: list[tuple]) -> None:
+    with db_connect() as conn:
+        c = conn.cursor()
+        c.executemany(
+            """
+            INSERT INTO login_attempts (email, sucesso, ip_address, action, tentativa_em)
+            VALUES (%s, %s, %s, %s, %s)
+            """,
+            lote,
+        )
+        conn.commit()
+
+
+def gravar_tentativas_pendentes(pendentes: Optional[list[tuple]] = None) -> list[tuple]:
+    """Drena a fila e grava em lotes. Retorna o que não pôde ser gravado."""
+    pendentes = list(pendentes or [])
+    while True:
+        try:
+            pendentes.append(_fila.get_nowait())
+        except queue.Empty:
+            break
+    while pendentes:
+        lote = pendentes[:LOTE_GRAVACAO]
+        try:
+            _gravar_lote(lote)
+        except Exception as exc:
+            logger.warning("Falha ao gravar %s tentativa(s) de login: %s", len(lote), exc)
+            if len(pendentes) > MAX_PENDENTES:
+                logger.warning("Descartando %s tentativa(s) de login não gravadas", len(pendentes) - MAX_PENDENTES)
+                pendentes = pendentes[-MAX_PENDENTES:]
+            return pendentes
+        del pendentes[:LOTE_GRAVACAO]
+    return pendentes
+
+
+def _limpar_janelas() -> None:
+    limite_descarte = time.time() - _janela_segundos
+    with _janelas_lock:
+        expiradas = [chave for chave, falhas in _janelas.items() if not falhas or falhas[-1] <= limite_descarte]
+        for chave in expiradas:
+            del _janelas[chave]
+
+
+def _loop_gravador() -> None:
+    pendentes: list[tuple] = []
+    ultima_limpeza = time.monotonic()
+    while True:
+        try:
+            pendentes.append(_fila.get(timeout=INTERVALO_LIMPEZA))
+            # Junta o que chegar no intervalo para gravar num único lote.
+            time.sleep(INTERVALO_GRAVACAO)
+        except queue.Empty:
+            pass
+        try:
+            pendentes = gravar_tentativas_pendentes(pendentes)
+            if time.monotonic() - ultima_limpeza >= INTERVALO_LIMPEZA:
+                _limpar_janelas()
+                if MODO_RATE_LIMIT == MODO_POSTGRES:
+                    limpar_falhas_expiradas(_janela_segundos)
+                ultima_limpeza = time.monotonic()
+        except Exception as exc:
+            logger.warning("Falha no gravador de tentativas de login: %s", exc)
+
+
+def iniciar_gravador_tentativas() -> bool:
+    """Inicia (uma vez por processo) a thread que grava as tentativas em lote."""
+    global _writer_thread
+    if _writer_thread is not None and _writer_thread.is_alive():
+        return False
+    with _writer_lock:
+        if _writer_thread is not None and _writer_thread.is_alive():
+            return False
+        _writer_thread = threading.Thread(target=_loop_gravador, name="login-attempts", daemon=True)
+        _writer_thread.start()
+    return True
+
+
+@atexit.register
+def _gravar_ao_encerrar() -> None:
+    try:
+        gravar_tentativas_pendentes()
+    except Exception as exc:
+        logger.warning("Falha ao gravar tentativas de login no encerramento: %s", exc)
+
+
+__all__ = [
+    "MODO_RATE_LIMIT",
+    "verificar_limite_login",
+    "registrar_tentativa",
+    "gravar_tentativas_pendentes",
+    "iniciar_gravador_tentativas",
+]
@@ -4,7 +4,9 @@ import ast
 from datetime import datetime
 import logging
 from db.db_schema import db_connect
+from db.query_cache import invalidar_tabelas
 from db.repo_races import get_provas_df, get_resultados_df
+from services.bets_scoring import atualizar_classificacao_prova
 from db.migrations_native_types import (
     parse_posicoes_safe,
     posicoes_to_json,
@@ -58,11 +60,17 @@ def salvar_resultado_prova(prova_id: int, posicoes: dict) -> bool:
             # Sincroniza coluna JSONB nativa (sem rollback se coluna não existir)
             sync_resultado_native(conn, prova_id)
             conn.commit()
-            return True
+        invalidar_tabelas("resultados")
     except Exception as e:
         logger.exception("Erro ao salvar resultado da prova %s: %s", prova_id, e)
         return False
 
+    try:
+        atualizar_classificacao_prova(prova_id)
+    except Exception as e:
+        logger.exception("Erro ao recalcular classificação da prova %s: %s", prova_id, e)
+    return True
+
 def obter_resultados():
     """Retorna todos os resultados de todas as provas como DataFrame pandas."""
     return get_resultados_df()
@@ -1,17 +1,29 @@
 """
 Serviço de Gestão de Regras
 """
+import copy
 import logging
+import threading
 from db.rules_utils import (
     get_regra_temporada,
-    get_regra_by_nome
+    get_regra_by_nome,
+    get_versao_regras,
 )
 
 logger = logging.getLogger(__name__)
 
+# Cache do processo: (temporada, tipo_prova) -> (versão das regras, config).
+# Invalidado explicitamente pelas escritas de db.rules_utils (sem TTL).
+_regras_cache: dict[tuple[str, str], tuple[int, dict]] = {}
+_regras_cache_lock = threading.Lock()
+
+
 def get_regras_aplicaveis(temporada: str, tipo_prova: str = "Normal") -> dict:
     """
     Retorna as regras aplicáveis para uma temporada e tipo de prova.
+
+    Resultado memoizado por (temporada, tipo_prova) e compartilhado pelo processo;
+    cada chamador recebe uma cópia, podendo alterá-la livremente.
     
     Parâmetros retornados:
     - quantidade_fichas: Total de fichas para a prova
@@ -28,6 +40,21 @@ def get_regras_aplicaveis(temporada: str, tipo_prova: str = "Normal") -> dict:
     - pontos_posicoes: Lista de pontos P1-P20 (ou P1-P8 se sprint)
     - pontos_campeao, pontos_vice, pontos_equipe: Bônus finais
     """
+    chave = (str(temporada), str(tipo_prova))
+    versao = get_versao_regras()
+    with _regras_cache_lock:
+        item = _regras_cache.get(chave)
+    if item is not None and item[0] == versao:
+        return copy.deepcopy(item[1])
+
+    config = _resolver_regras_aplicaveis(temporada, tipo_prova)
+    with _regras_cache_lock:
+        _regras_cache[chave] = (versao, config)
+    return copy.deepcopy(config)
+
+
+def _resolver_regras_aplicaveis(temporada: str, tipo_prova: str) -> dict:
+    """Monta a config de regras a partir do banco (sem cache)."""
     regra = get_regra_temporada(temporada)
     
     # Fallback para regra padrão
@@ -26,7 +26,7 @@ from services.data_access_auth import (
 )
 from services.championship_service import get_championship_bets_df, get_final_results
 from services.rules_service import get_regras_aplicaveis
-from services.bets_scoring import _parse_datetime_sp, calcular_pontuacao_lote, atualizar_classificacoes_todas_as_provas
+from services.bets_scoring import _parse_datetime_sp, calcular_pontuacao_temporada, atualizar_classificacoes_todas_as_provas
 from utils.helpers import render_page_header
 from utils.season_utils import get_default_season_index, get_season_options
 
@@ -235,6 +235,12 @@ def main():
     tabela_classificacao = []
     tabela_detalhada = []
 
+    # Pontua todas as apostas da temporada em uma única passada; os laços abaixo só projetam.
+    pontos_apostas = calcular_pontuacao_temporada(apostas_df, resultados_df, provas_df)
+
+    def _pontos_lista(apostas_sel):
+        return [None if pd.isna(v) else float(v) for v in pontos_apostas.loc[apostas_sel.index].tolist()]
+
     regras_temporada = get_regras_aplicaveis(str(season), "Normal")
     pontos_campeao = regras_temporada.get('pontos_campeao', 150)
     pontos_vice = regras_temporada.get('pontos_vice', 100)
@@ -302,7 +308,7 @@ def main():
         else:
             apostas_part = apostas_part_raw
         apostas_part = apostas_part.sort_values(by='prova_id')
-        pontos_part = calcular_pontuacao_lote(apostas_part, resultados_df, provas_df, temporada_descarte=season)
+        pontos_part = _pontos_lista(apostas_part)
         total_provas = sum([p for p in pontos_part if p is not None])
 
         bonus_campeao = 0
@@ -373,7 +379,7 @@ def main():
             else:
                 apostas_anteriores = apostas_anteriores_raw
             apostas_anteriores = apostas_anteriores.sort_values(by='prova_id')
-            pontos_anteriores = calcular_pontuacao_lote(apostas_anteriores, resultados_df, provas_df)
+            pontos_anteriores = _pontos_lista(apostas_anteriores)
             total_anteriores = sum([p for p in pontos_anteriores if p is not None])
 
             tabela_anterior.append({
@@ -478,10 +484,8 @@ def main():
         pontos_por_prova = {}
         usr_id = df_class[df_class['Participante'] == participante]['usuario_id'].iloc[0]
         apostas_part = apostas_df[apostas_df['usuario_id'] == usr_id]
-        for _, aposta in apostas_part.iterrows():
-            p_list = calcular_pontuacao_lote(pd.DataFrame([aposta]), resultados_df, provas_df)
-            if p_list:
-                pontos_por_prova[aposta['prova_id']] = p_list[0]
+        for prova_id, pt in zip(apostas_part['prova_id'], _pontos_lista(apostas_part)):
+            pontos_por_prova[prova_id] = pt
         for prova_id, prova_nome in zip(provas_ids_ordenados, provas_nomes):
             pt = pontos_por_prova.get(prova_id, 0)
             dados_cruzados[prova_nome][participante] = pt if pt is not None else 0
@@ -9,7 +9,8 @@ from services.data_access_provas import (
 from services.data_access_auth import (
     usuarios_status_historico_disponivel,
 )
-from services.bets_write import gerar_aposta_automatica
+from services.bets_write import gerar_aposta_automatica, gerar_apostas_automaticas_prova
+from services.data_access_core import invalidar_tabelas
 from services.email_service import enviar_email
 from utils.helpers import render_page_header
 from utils.season_utils import get_default_season_index, get_season_options
@@ -87,7 +88,7 @@ def main():
                     disabled=disabled_btn):
                     ok, msg = gerar_aposta_automatica(part_id, prova.id, prova.nome, apostas_df, provas_df, temporada=season)
                     if ok:
-                        st.cache_data.clear()
+                        invalidar_tabelas("apostas", "usuarios")
                         st.success(msg)
                         st.rerun()
                     else:
@@ -169,6 +170,27 @@ def main():
                         else:
                             st.error("Falha ao enviar e-mail de lembrete.")
 
+            if st.button(
+                f"🤖 Gerar apostas automáticas para quem não apostou - {prova_sel}",
+                key=f"auto_lote_{prova_id}",
+                disabled=sem_aposta_df.empty,
+            ):
+                with st.spinner("Gerando apostas automáticas..."):
+                    geradas, mensagens = gerar_apostas_automaticas_prova(
+                        prova_id,
+                        temporada=season,
+                        usuario_ids=sem_aposta_df["id"].tolist(),
+                    )
+                for msg in mensagens:
+                    st.warning(msg)
+                if geradas:
+                    invalidar_tabelas("apostas", "usuarios")
+                    st.success(f"{geradas} aposta(s) automática(s) gerada(s).")
+                    if not mensagens:
+                        st.rerun()
+                elif not mensagens:
+                    st.info("Nenhuma aposta automática gerada.")
+
             for idx, part in enumerate(participantes.itertuples()):
                 aposta = apostas_prova[apostas_prova["usuario_id"] == part.id]
                 existe_aposta_manual = (
@@ -194,7 +216,7 @@ def main():
                     disabled=disabled_btn):
                     ok, msg = gerar_aposta_automatica(part.id, prova_id, prova_row["nome"], apostas_df_atual, provas_df, temporada=season)
                     if ok:
-                        st.cache_data.clear()
+                        invalidar_tabelas("apostas", "usuarios")
                         st.success(msg)
                         st.rerun()
                     else:
@@ -6,7 +6,7 @@ Reorganizado em abas: Editar Pilotos / Adicionar Novo Piloto
 
 import streamlit as st
 import pandas as pd
-from services.data_access_core import db_connect
+from services.data_access_core import db_connect, invalidar_tabelas
 from services.data_access_provas import get_pilotos_df
 from utils.helpers import render_page_header
 
@@ -159,7 +159,7 @@ def _render_aba_editar(df: pd.DataFrame):
                 conn.commit()
             
             st.success("✅ Piloto atualizado com sucesso!")
-            st.cache_data.clear()
+            invalidar_tabelas("pilotos")
             st.rerun()
     
     # Botão: Excluir
@@ -171,7 +171,7 @@ def _render_aba_editar(df: pd.DataFrame):
                 conn.commit()
             
             st.success("✅ Piloto excluído com sucesso!")
-            st.cache_data.clear()
+            invalidar_tabelas("pilotos")
             st.rerun()
 
 
@@ -216,7 +216,7 @@ def _render_aba_adicionar():
                 conn.commit()
             
             st.success("✅ Piloto adicionado com sucesso!")
-            st.cache_data.clear()
+            invalidar_tabelas("pilotos")
             st.rerun()
 
 
@@ -11,13 +11,16 @@ from zoneinfo import ZoneInfo
 from services.data_access_core import (
     db_connect,
     get_table_columns,
+    invalidar_tabelas,
 )
 from services.data_access_provas import (
     get_provas_df,
     atualizar_base_circuitos,
+    atualizar_base_ergast,
     get_circuitos_df,
     get_temporadas_existentes_provas,
 )
+from services.bets_write import invalidar_modelos_corrida
 from utils.helpers import render_page_header
 from utils.season_utils import get_default_season_index, get_season_options
 
@@ -243,7 +246,7 @@ def _render_aba_editar(df: pd.DataFrame):
                 conn.commit()
             
             st.success("✅ Prova atualizada com sucesso!")
-            st.cache_data.clear()
+            invalidar_tabelas("provas")
             st.rerun()
     
     # Botão: Excluir
@@ -255,7 +258,7 @@ def _render_aba_editar(df: pd.DataFrame):
                 conn.commit()
             
             st.success("✅ Prova exluída com sucesso!")
-            st.cache_data.clear()
+            invalidar_tabelas("provas")
             st.rerun()
 
 
@@ -356,7 +359,7 @@ def _render_aba_adicionar():
                         )
                     conn.commit()
                     st.success("✅ Prova adicionada com sucesso!")
-                    st.cache_data.clear()
+                    invalidar_tabelas("provas")
                     st.rerun()
 
 
@@ -389,6 +392,22 @@ def main():
         st.cache_data.clear()
         st.rerun()
 
+    if st.button("🔄 Sincroniza Dados Ergast (resultados, grid, pit stops)", key="btn_sync_ergast"):
+        temporadas_sync = {str(temporada_sel)}
+        try:
+            ano_sel = int(temporada_sel)
+            temporadas_sync.update(str(ano_sel - i) for i in range(1, 4))
+        except Exception:
+            pass
+        with st.spinner("Sincronizando dados Ergast..."):
+            stats = atualizar_base_ergast(sorted(temporadas_sync))
+        st.success(
+            f"✅ Espelho Ergast atualizado: {stats.get('resultados', 0)} resultados de {stats.get('temporadas', 0)} temporada(s)."
+        )
+        st.cache_data.clear()
+        invalidar_modelos_corrida()
+        st.rerun()
+
     # Buscar provas filtradas por temporada usando helper compatível com psycopg3
     df = get_provas_df(temporada_sel)
     df = _normalizar_df_provas(df)
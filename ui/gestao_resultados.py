@@ -2,9 +2,9 @@ import streamlit as st
 import pandas as pd
 import ast
 
-from services.data_access_core import db_connect, get_table_columns
+from services.data_access_core import db_connect, get_table_columns, invalidar_tabelas
 from services.data_access_provas import get_pilotos_df, get_provas_df, get_resultados_df
-from services.bets_scoring import atualizar_classificacoes_todas_as_provas
+from services.bets_scoring import atualizar_classificacao_prova
 from utils.helpers import render_page_header
 from utils.season_utils import get_current_year_str, get_default_season_index, get_season_options
 
@@ -195,9 +195,9 @@ def resultados_view():
                             )
                 conn.commit()
             st.success("Resultado salvo!")
-            st.cache_data.clear()
-            # Atualiza todas as classificações após editar resultados
-            atualizar_classificacoes_todas_as_provas()
+            invalidar_tabelas("resultados")
+            # Recalcula apenas a classificação da prova editada
+            atualizar_classificacao_prova(prova_id)
             st.rerun()
 
     st.markdown("---")
@@ -10,6 +10,7 @@ import plotly.express as px
 from datetime import datetime as dt_datetime
 from services.data_access_core import (
     db_connect,
+    invalidar_tabelas,
 )
 from services.data_access_apostas import (
     get_participantes_temporada_df,
@@ -407,7 +408,7 @@ def render_admin_panel(conn, seasons):
                     if success_count > 0:
                         st.success(f"✅ {success_count} resultado(s) adicionado(s) com sucesso!")
                         st.balloons()
-                        st.cache_data.clear()
+                        invalidar_tabelas("hall_da_fama")
                         st.session_state.hall_fama_rows = [{'user': None, 'position': None}] * 3
                         st.rerun()
                     
@@ -489,7 +490,7 @@ def render_admin_panel(conn, seasons):
                                 c.execute("DELETE FROM hall_da_fama WHERE id = %s", (record_id,))
                                 conn.commit()
                                 st.success(f"✅ Registro de **{name}** ({season}) deletado!")
-                                st.cache_data.clear()
+                                invalidar_tabelas("hall_da_fama")
                                 st.rerun()
                             except Exception as e:
                                 st.error(f"❌ Erro ao deletar: {e}")
@@ -646,7 +647,7 @@ def import_historical_data(conn):
                 st.text(error)
     
     st.info("🔄 Recarregue a página para visualizar os dados atualizados.")
-    st.cache_data.clear()
+    invalidar_tabelas("hall_da_fama")
 
 
 if __name__ == "__main__":
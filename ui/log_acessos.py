@@ -2,8 +2,8 @@ import datetime
 import pandas as pd
 import streamlit as st
 
-from services.data_access_core import db_connect
-from utils.helpers import render_page_header
+from services.data_access_logs import LOGS_POR_PAGINA, consultar_access_logs, opcoes_filtro_access_logs
+from utils.helpers import keyset_page_cursor, render_keyset_pager, render_page_header
 
 
 def _table_height(total_rows: int, row_height: int = 36, max_height: int = 620) -> int:
@@ -18,102 +18,34 @@ def _load_access_logs(
     sucesso_sel: str,
     ip_contains: str,
     usuario_contains: str,
-) -> pd.DataFrame:
+    antes_de: tuple[datetime.datetime, int] | None = None,
+) -> tuple[pd.DataFrame, tuple[datetime.datetime, int] | None, dict[str, int]]:
+    """Uma página do log de acessos. Retorna (df, cursor da próxima página, estimativas)."""
     start_ts = datetime.datetime.combine(data_inicial, datetime.time.min)
     end_ts_exclusive = datetime.datetime.combine(
         data_final + datetime.timedelta(days=1),
         datetime.time.min,
     )
-
-    where = ["created_at >= %s", "created_at < %s"]
-    params: list[object] = [start_ts, end_ts_exclusive]
-
-    if perfil_sel != "Todos":
-        where.append("LOWER(COALESCE(perfil, '')) = %s")
-        params.append(perfil_sel.lower())
-
-    if evento_sel != "Todos":
-        where.append("evento = %s")
-        params.append(evento_sel)
-
-    if sucesso_sel == "Sucesso":
-        where.append("sucesso = %s")
-        params.append(True)
-    elif sucesso_sel == "Falha":
-        where.append("sucesso = %s")
-        params.append(False)
-
-    if ip_contains:
-        where.append("LOWER(COALESCE(ip_address, '')) LIKE %s")
-        params.append(f"%{ip_contains.lower()}%")
-
-    if usuario_contains:
-        where.append("(LOWER(COALESCE(email, '')) LIKE %s OR LOWER(COALESCE(nome, '')) LIKE %s)")
-        token = f"%{usuario_contains.lower()}%"
-        params.extend([token, token])
-
-    where_sql = " AND ".join(where)
-
-    query = f"""
-        SELECT
-            id,
-            created_at,
-            evento,
-            sucesso,
-            user_id,
-            email,
-            nome,
-            perfil,
-            ip_address,
-            detalhes
-        FROM access_logs
-        WHERE {where_sql}
-        ORDER BY created_at DESC, id DESC
-    """
-
-    # pd.read_sql_query nao e compativel com psycopg3 (dict_row);
-    # usamos cursor manual e construimos o DataFrame a partir da lista de dicts.
-    with db_connect() as conn:
-        cur = conn.cursor()
-        cur.execute(query, params)
-        rows = cur.fetchall() or []
+    sucesso = {"Sucesso": True, "Falha": False}.get(sucesso_sel)
+
+    rows, proximo, estimativas = consultar_access_logs(
+        start_ts,
+        end_ts_exclusive,
+        perfil=None if perfil_sel == "Todos" else perfil_sel,
+        evento=None if evento_sel == "Todos" else evento_sel,
+        sucesso=sucesso,
+        ip_contem=ip_contains,
+        usuario_contem=usuario_contains,
+        antes_de=antes_de,
+    )
 
     if not rows:
         return pd.DataFrame(columns=[
             "id", "created_at", "evento", "sucesso",
             "user_id", "email", "nome", "perfil", "ip_address", "detalhes",
-        ])
-
-    return pd.DataFrame([dict(r) for r in rows])
-
+        ]), None, estimativas
 
-def _get_filter_options() -> tuple[list[str], list[str]]:
-    with db_connect() as conn:
-        cur = conn.cursor()
-
-        cur.execute(
-            """
-            SELECT DISTINCT LOWER(TRIM(COALESCE(perfil, ''))) AS perfil
-            FROM access_logs
-            WHERE perfil IS NOT NULL AND TRIM(COALESCE(perfil, '')) <> ''
-            ORDER BY perfil
-            """
-        )
-        perfis_rows = cur.fetchall() or []
-
-        cur.execute(
-            """
-            SELECT DISTINCT evento
-            FROM access_logs
-            WHERE evento IS NOT NULL AND TRIM(COALESCE(evento, '')) <> ''
-            ORDER BY evento
-            """
-        )
-        eventos_rows = cur.fetchall() or []
-
-    perfis: list[str] = [str(r["perfil"]).strip() for r in perfis_rows if r and r.get("perfil")]
-    eventos: list[str] = [str(r["evento"]).strip() for r in eventos_rows if r and r.get("evento")]
-    return perfis, eventos
+    return pd.DataFrame(rows), proximo, estimativas
 
 
 def main() -> None:
@@ -139,7 +71,7 @@ def main() -> None:
         st.warning("A data inicial não pode ser maior que a data final.")
         return
 
-    perfis, eventos = _get_filter_options()
+    perfis, eventos = opcoes_filtro_access_logs()
 
     col_perfil, col_evento, col_ip, col_usuario = st.columns([1, 1, 1, 1])
     with col_perfil:
@@ -151,28 +83,27 @@ def main() -> None:
     with col_usuario:
         usuario_contains = st.text_input("Usuário/Email contém", value="").strip()
 
-    df = _load_access_logs(
-        data_inicial=data_inicial,
-        data_final=data_final,
-        perfil_sel=perfil_sel,
-        evento_sel=evento_sel,
-        sucesso_sel=sucesso_sel,
-        ip_contains=ip_contains,
-        usuario_contains=usuario_contains,
-    )
+    filtros = (data_inicial, data_final, perfil_sel, evento_sel, sucesso_sel, ip_contains, usuario_contains)
+    chave_paginacao = "log_acessos_paginas"
+    antes_de = keyset_page_cursor(st, chave_paginacao, filtros)
+    df, proximo, estimativas = _load_access_logs(*filtros, antes_de=antes_de)
 
     if df.empty:
         st.info("Nenhum acesso encontrado com os filtros selecionados.")
+        if antes_de is not None:
+            render_keyset_pager(st, chave_paginacao, None)
         return
 
-    total = len(df)
-    total_sucesso = int((df["sucesso"] == True).sum())  # noqa: E712
-    total_falha = total - total_sucesso
+    # Totais estimados pelo planejador: contar tudo custaria uma varredura do período.
+    total = estimativas["total"]
+    total_sucesso = estimativas["sucesso"]
+    total_falha = max(0, total - total_sucesso)
 
     m1, m2, m3 = st.columns(3)
-    m1.metric("Total de eventos", total)
-    m2.metric("Sucessos", total_sucesso)
-    m3.metric("Falhas", total_falha)
+    m1.metric("Total de eventos (≈)", total)
+    m2.metric("Sucessos (≈)", total_sucesso)
+    m3.metric("Falhas (≈)", total_falha)
+    st.caption(f"{LOGS_POR_PAGINA} eventos por página, do mais recente ao mais antigo.")
 
     df_show = df.copy()
     df_show["sucesso"] = df_show["sucesso"].apply(lambda x: "Sucesso" if bool(x) else "Falha")
@@ -193,8 +124,9 @@ def main() -> None:
             }
         ),
         hide_index=True,
-        height=_table_height(total),
+        height=_table_height(len(df_show)),
     )
+    render_keyset_pager(st, chave_paginacao, proximo)
 
 
 if __name__ == "__main__":
@@ -1,8 +1,8 @@
 import streamlit as st
 import pandas as pd
 import logging
-from services.data_access_core import db_connect, get_table_columns
-from utils.helpers import render_page_header
+from services.data_access_logs import LOGS_POR_PAGINA, consultar_logs_apostas, opcoes_status_log_apostas
+from utils.helpers import keyset_page_cursor, render_keyset_pager, render_page_header
 from utils.season_utils import get_default_season_index, get_season_options
 
 logger = logging.getLogger(__name__)
@@ -56,101 +56,34 @@ def _to_int_safe(value: object) -> int:
         return 0
 
 
-def _sorted_unique_non_null(series: pd.Series, reverse: bool = False) -> list[object]:
-    """Retorna valores únicos não nulos com ordenação robusta para tipos mistos."""
-    values = [v for v in series.dropna().tolist() if not pd.isna(v)]
-    if not values:
-        return []
-    try:
-        return sorted(set(values), reverse=reverse)
-    except TypeError:
-        # Fallback para cenários com mistura de tipos (ex.: str + None já filtrado)
-        return sorted({str(v) for v in values}, reverse=reverse)
-
-
-def _normalize_date_for_filter(value: object) -> str:
-    """Normaliza valor de data para yyyy-mm-dd para uso em filtros."""
-    if value is None or (isinstance(value, float) and pd.isna(value)):
-        return ""
-
-    txt = str(value).strip()
-    if not txt:
-        return ""
-
-    dt = pd.to_datetime(txt, errors="coerce")
-    if pd.isna(dt):
-        return txt
-    return dt.strftime("%Y-%m-%d")
-
-
-def carregar_logs(temporada=None, usuario_id=None, usuario_nome=None, is_admin=False):
-    """Carrega logs de apostas, opcionalmente filtrando por temporada."""
-    with db_connect() as conn:
-        cols = [str(c) for c in get_table_columns(conn, "log_apostas")]
-        has_status = "status" in cols
-        has_ip_address = "ip_address" in cols
-        has_usuario_id = "usuario_id" in cols
-        has_user_id = "user_id" in cols
-        has_temporada = "temporada" in cols
-        has_data = "data" in cols
-        has_data_criacao = "data_criacao" in cols
-        user_col = "usuario_id" if has_usuario_id else ("user_id" if has_user_id else None)
-        status_expr = "status" if has_status else "'Registrada'"
-        ip_expr = "ip_address" if has_ip_address else "NULL"
-        user_expr = user_col if user_col else "NULL"
-
-        where_clauses: list[str] = []
-        params: list[object] = []
-
-        if temporada:
-            season_sources = []
-            if has_temporada:
-                season_sources.append("NULLIF(TRIM(CAST(temporada AS TEXT)), '')")
-            if has_data:
-                season_sources.append("NULLIF(SUBSTR(CAST(data AS TEXT), 1, 4), '')")
-            if has_data_criacao:
-                season_sources.append("NULLIF(SUBSTR(CAST(data_criacao AS TEXT), 1, 4), '')")
-
-            if season_sources:
-                season_expr = f"COALESCE({', '.join(season_sources)})"
-                where_clauses.append(f"{season_expr} = %s")
-                params.append(str(temporada).strip())
-
-        if not is_admin:
-            if not user_col or usuario_id is None:
-                return pd.DataFrame()
-            where_clauses.append(f"{user_col} = %s")
-            params.append(int(usuario_id))
-
-        where_sql = (" WHERE " + " AND ".join(where_clauses)) if where_clauses else ""
-
-        query = (
-            "SELECT id, "
-            f"{user_expr} AS usuario_id, "
-            "data, horario, apostador, nome_prova, pilotos, aposta, piloto_11, "
-            "tipo_aposta, automatica, "
-            f"{ip_expr} AS ip_address, "
-            "temporada, "
-            f"{status_expr} AS status "
-            f"FROM log_apostas{where_sql} ORDER BY id DESC"
-        )
-
-        # Usa cursor manual — pd.read_sql é incompatível com psycopg3 (dict_row)
-        cur = conn.cursor()
-        cur.execute(query, tuple(params) if params else ())
-        rows = cur.fetchall() or []
-
-    if not rows:
-        return pd.DataFrame()
-
-    df = pd.DataFrame([dict(r) for r in rows])
+def carregar_logs(
+    temporada=None,
+    usuario_id=None,
+    is_admin=False,
+    filtros: dict | None = None,
+    antes_de_id: int | None = None,
+) -> tuple[pd.DataFrame, int | None, int]:
+    """Carrega uma página do log de apostas. Retorna (df, cursor da próxima página, total estimado)."""
+    if not is_admin and usuario_id is None:
+        return pd.DataFrame(), None, 0
+
+    linhas, proximo, total = consultar_logs_apostas(
+        temporada=temporada,
+        usuario_id=None if is_admin else int(usuario_id),
+        antes_de_id=antes_de_id,
+        **(filtros or {}),
+    )
+    if not linhas:
+        return pd.DataFrame(), None, total
+
+    df = pd.DataFrame(linhas)
 
     # Garante tipos numéricos para colunas usadas em comparações
     for col in ("automatica", "tipo_aposta"):
         if col in df.columns:
             df[col] = df[col].apply(_to_int_safe)
 
-    return df
+    return df, proximo, total
 
 
 def main():
@@ -159,7 +92,6 @@ def main():
     perfil = st.session_state.get("user_role", "participante")
     is_admin = perfil in ("admin", "master")
     user_id = st.session_state.get("user_id")
-    user_nome = st.session_state.get("user_nome")
     if not is_admin and not user_id:
         st.info("Sessão inválida ou expirada. Faça login novamente.")
         return
@@ -172,51 +104,26 @@ def main():
     season = st.selectbox("Temporada", season_options, index=default_index, key="log_apostas_season")
     st.session_state["temporada"] = season
 
-    df = carregar_logs(season, usuario_id=user_id, usuario_nome=user_nome, is_admin=is_admin)
-    if df.empty:
-        st.warning("Nenhum registro no log de apostas.")
-        return
-
     tipos_map = {0: "Dentro do Prazo", 1: "Fora do Prazo"}
 
     st.markdown("### Filtros")
     with st.expander("Abrir filtros", expanded=False):
-        normalizar_data = st.checkbox(
-            "Normalizar Data para yyyy-mm-dd nos filtros",
-            value=True,
-            help="Padroniza o valor de Data apenas para seleção de filtro, sem alterar os dados originais.",
-        )
-
-        df_filtro = df.copy()
-        if "data" in df_filtro.columns:
-            if normalizar_data:
-                df_filtro["_data_filtro"] = df_filtro["data"].apply(_normalize_date_for_filter)
-            else:
-                df_filtro["_data_filtro"] = df_filtro["data"]
-
-        colunas_filtro = []
-        if perfil in ("admin", "master"):
-            colunas_filtro.append("apostador")
-
         row1_col1, row1_col2 = st.columns(2)
         row2_col1, row2_col2 = st.columns(2)
 
-        if "apostador" in colunas_filtro:
-            apostador_opcoes = ["Todos"] + _sorted_unique_non_null(df["apostador"])
-            apostador_sel = row1_col1.selectbox("Apostador", apostador_opcoes)
+        if is_admin:
+            apostador_contem = row1_col1.text_input("Apostador contém", value="").strip()
         else:
-            apostador_sel = "Todos"
+            apostador_contem = ""
 
         tipo_filtro = row1_col2.selectbox(
             "Tipo de Aposta", ["Todas"] + list(tipos_map.values())
         )
 
-        data_sel = row2_col1.selectbox(
-            "Data", ["Todas"] + _sorted_unique_non_null(df_filtro["_data_filtro"], reverse=True)
-        )
+        data_sel = row2_col1.date_input("Data", value=None, format="YYYY-MM-DD")
 
         status_sel = row2_col2.selectbox(
-            "Status", ["Todos"] + sorted(df["status"].fillna("Registrada").unique().tolist())
+            "Status", ["Todos"] + opcoes_status_log_apostas(season)
         )
 
         mostrar_automaticas = st.checkbox(
@@ -224,27 +131,35 @@ def main():
             value=False,
         )
 
-    filtro = df_filtro.copy()
-
-    if is_admin:
-        if apostador_sel != "Todos":
-            filtro = filtro[filtro["apostador"] == apostador_sel]
-
-    if tipo_filtro != "Todas":
-        inv_tipos_map = {v: k for k, v in tipos_map.items()}
-        # tipo_aposta já é int graças à conversão em carregar_logs
-        filtro = filtro[filtro["tipo_aposta"] == inv_tipos_map[tipo_filtro]]
-    if data_sel != "Todas":
-        filtro = filtro[filtro["_data_filtro"] == data_sel]
-    if status_sel != "Todos":
-        filtro = filtro[filtro["status"].fillna("Registrada") == status_sel]
-    if mostrar_automaticas:
-        filtro = filtro[filtro["automatica"] > 0]
+    inv_tipos_map = {v: k for k, v in tipos_map.items()}
+    filtros = {
+        "apostador_contem": apostador_contem,
+        "tipo_aposta": inv_tipos_map.get(tipo_filtro),
+        "data": data_sel.isoformat() if data_sel else None,
+        "status": None if status_sel == "Todos" else status_sel,
+        "somente_automaticas": mostrar_automaticas,
+    }
+
+    chave_paginacao = "log_apostas_paginas"
+    antes_de_id = keyset_page_cursor(st, chave_paginacao, (season, user_id, tuple(sorted(filtros.items()))))
+    filtro, proximo, total_estimado = carregar_logs(
+        season,
+        usuario_id=user_id,
+        is_admin=is_admin,
+        filtros=filtros,
+        antes_de_id=antes_de_id,
+    )
 
     if filtro.empty:
-        st.info("Nenhum registro encontrado com os filtros selecionados.")
+        if antes_de_id is None:
+            st.info("Nenhum registro encontrado com os filtros selecionados.")
+        else:
+            st.info("Não há mais registros.")
+            render_keyset_pager(st, chave_paginacao, None)
         return
 
+    st.caption(f"≈ {total_estimado} registro(s) · {LOGS_POR_PAGINA} por página")
+
     filtro_show = filtro.copy()
     if "horario" in filtro_show.columns:
         filtro_show["horario"] = filtro_show["horario"].apply(_formatar_horario_hhmmss)
@@ -293,6 +208,7 @@ def main():
     else:
         st.dataframe(filtro_show, width="stretch", hide_index=True, height=_table_height(len(filtro_show)))
 
+    render_keyset_pager(st, chave_paginacao, proximo)
     st.caption("*O campo 'Automática' indica apostas geradas automaticamente pelo sistema (qualquer valor > 0 no campo).*")
 
 
@@ -9,7 +9,6 @@ Melhorias:
 
 import streamlit as st
 import logging
-from datetime import datetime, timedelta
 from services.auth_service import redefinir_senha_usuario, redefinir_senha_com_token
 from services.auth_service import set_auth_cookies
 from services.auth_service import clear_auth_cookies
@@ -27,9 +26,13 @@ from services.data_access_auth import (
     MAX_LOGIN_ATTEMPTS,
     LOCKOUT_DURATION,
     MAX_RESET_ATTEMPTS,
-    RESET_LOCKOUT_DURATION
+    RESET_LOCKOUT_DURATION,
+    MSG_SENHA_OCUPADO,
+    SenhaServicoOcupado,
+    rehash_senha_se_necessario,
 )
 from services.auth_service import create_token
+from services.login_rate_limit import registrar_tentativa, verificar_limite_login
 
 logger = logging.getLogger(__name__)
 
@@ -39,18 +42,15 @@ def registrar_tentativa_login(email: str, sucesso: bool, ip_address: str = "LOCA
     """
     Registra tentativa de login para rate limiting
     
+    A falha conta na janela deslizante na hora; a linha de auditoria em
+    `login_attempts` é gravada em lote por uma thread.
+    
     Args:
         email: Email do usuário
         sucesso: True se login foi bem-sucedido
         ip_address: IP da requisição (para análise de segurança)
     """
-    with db_connect() as conn:
-        cursor = conn.cursor()
-        cursor.execute('''
-            INSERT INTO login_attempts (email, sucesso, ip_address, action)
-            VALUES (%s, %s, %s, %s)
-        ''', (email, sucesso, ip_address, action))
-        conn.commit()
+    registrar_tentativa(email, sucesso, ip_address=ip_address, action=action)
 
 
 def registrar_evento_acesso(
@@ -99,41 +99,12 @@ def obter_tentativas_recentes(
     action: str = "login"
 ) -> tuple[int, int, bool]:
     """
-    Obtém tentativas de login recentes
+    Obtém tentativas de login recentes (janela deslizante de `services.login_rate_limit`)
     
     Returns:
         (falhas_email, falhas_ip, usuario_bloqueado)
     """
-    with db_connect() as conn:
-        cursor = conn.cursor()
-        
-        # Buscar tentativas dos últimos 15 minutos
-        tempo_limite = datetime.now() - timedelta(seconds=lockout_seconds)
-        
-        cursor.execute('''
-            SELECT COUNT(*) as total,
-                   SUM(CASE WHEN sucesso IS NOT TRUE THEN 1 ELSE 0 END) as falhas
-            FROM login_attempts
-            WHERE email = %s AND tentativa_em > %s AND action = %s
-        ''', (email, tempo_limite, action))
-        
-        resultado = cursor.fetchone()
-        falhas = resultado['falhas'] if resultado and resultado['falhas'] else 0
-
-        cursor.execute('''
-            SELECT SUM(CASE WHEN sucesso IS NOT TRUE THEN 1 ELSE 0 END) as falhas_ip
-            FROM login_attempts
-            WHERE ip_address = %s AND tentativa_em > %s AND action = %s
-        ''', (ip_address, tempo_limite, action))
-
-        resultado_ip = cursor.fetchone()
-        falhas_ip = resultado_ip['falhas_ip'] if resultado_ip and resultado_ip['falhas_ip'] else 0
-        
-        # Bloqueado se tiver mais que MAX_LOGIN_ATTEMPTS falhas
-        # Limite por IP mais permissivo para reduzir falso positivo em redes compartilhadas.
-        bloqueado = falhas >= max_attempts or falhas_ip >= (max_attempts * 3)
-        
-        return falhas, falhas_ip, bloqueado
+    return verificar_limite_login(email, ip_address, max_attempts, lockout_seconds, action=action)
 
 
 def _classificar_motivo_bloqueio(
@@ -153,20 +124,6 @@ def _classificar_motivo_bloqueio(
     return "none"
 
 
-def limpar_tentativas_antigas():
-    """Remove registros de tentativas mais antigos que 24h"""
-    with db_connect() as conn:
-        cursor = conn.cursor()
-        tempo_limite = datetime.now() - timedelta(hours=24)
-        
-        cursor.execute('''
-            DELETE FROM login_attempts
-            WHERE tentativa_em < %s
-        ''', (tempo_limite,))
-        
-        conn.commit()
-
-
 # ============ UI DE LOGIN ============
 
 def _injetar_autocomplete_login() -> None:
@@ -228,11 +185,8 @@ def _injetar_autocomplete_login() -> None:
 def login_view():
     """Interface de login com rate limiting e segurança"""
     
-    # Limpar tentativas antigas periodicamente
-    if 'login_cleanup_done' not in st.session_state:
-        limpar_tentativas_antigas()
-        st.session_state['login_cleanup_done'] = True
-    
+    # Tentativas antigas saem por partição mensal (db/particoes_logs), sem DELETE aqui.
+
     # ========== LAYOUT ==========
     col1, col2, col3 = st.columns([1, 2, 1])
     
@@ -344,7 +298,14 @@ def login_view():
             
             # Verificar senha com bcrypt
             # fix(crítico): coluna real é `senha_hash` — confirmado via dump de produção.
-            if not check_password(senha, usuario['senha_hash']):
+            try:
+                senha_ok = check_password(senha, usuario['senha_hash'])
+            except SenhaServicoOcupado:
+                # Pool de bcrypt cheio: não conta como tentativa falha.
+                logger.warning("Login adiado por pool de bcrypt ocupado: %s", redact_identifier(email))
+                st.warning(f"⏳ {MSG_SENHA_OCUPADO}")
+                return
+            if not senha_ok:
                 tentativas_restantes = MAX_LOGIN_ATTEMPTS - falhas - 1
                 
                 if tentativas_restantes > 0:
@@ -372,6 +333,7 @@ def login_view():
                 return
             
             # ========== LOGIN SUCESSO ==========
+            rehash_senha_se_necessario(usuario['id'], senha, usuario['senha_hash'])
             try:
                 token = create_token(
                     user_id=usuario['id'],
@@ -522,5 +484,7 @@ def login_view():
                         ok, msg = redefinir_senha_com_token(email_token, token_reset, nova_senha)
                         if ok:
                             st.success("✅ Senha redefinida com sucesso. Faça login com a nova senha.")
+                        elif msg == MSG_SENHA_OCUPADO:
+                            st.warning(f"⏳ {msg}")
                         else:
                             st.error(f"❌ {msg}")
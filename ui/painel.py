@@ -24,6 +24,7 @@ from services.data_access_auth import (
 from services.bets_scoring import calcular_pontuacao_lote
 from services.bets_write import gerar_aposta_sem_ideias, salvar_aposta
 from services.auth_service import check_password, hash_password
+from services.data_access_auth import MSG_SENHA_OCUPADO, SenhaServicoOcupado
 from services.painel_controller import (
     get_proxima_prova_id as _controller_get_proxima_prova_id,
     ordenar_provas_por_calendario as _controller_ordenar_provas_por_calendario,
@@ -666,10 +667,16 @@ def participante_view():
                     erros.append("O email informado já está em uso por outro usuário.")
 
             if senha_atual or nova_senha or confirma_senha:
+                try:
+                    # fix(crítico): coluna real é `senha_hash` — era `user['senha']` (KeyError silencioso)
+                    senha_atual_ok = bool(senha_atual) and check_password(senha_atual, user['senha_hash'])
+                except SenhaServicoOcupado:
+                    senha_atual_ok = None
                 if not senha_atual:
                     erros.append("Informe a senha atual para alterar a senha.")
-                # fix(crítico): coluna real é `senha_hash` — era `user['senha']` (KeyError silencioso)
-                elif not check_password(senha_atual, user['senha_hash']):
+                elif senha_atual_ok is None:
+                    erros.append(MSG_SENHA_OCUPADO)
+                elif not senha_atual_ok:
                     erros.append("Senha atual incorreta.")
                 elif not nova_senha:
                     erros.append("Informe a nova senha.")
@@ -688,12 +695,17 @@ def participante_view():
                     else:
                         st.error("Falha ao atualizar email.")
                 if nova_senha:
-                    senha_hash = hash_password(nova_senha)
-                    if update_user_password(user['id'], senha_hash):
-                        st.success("Senha alterada!")
-                        atualizado = True
-                        st.session_state['force_password_change'] = False
-                    else:
-                        st.error("Falha ao alterar senha.")
+                    try:
+                        senha_hash = hash_password(nova_senha)
+                    except SenhaServicoOcupado:
+                        senha_hash = None
+                        st.warning(f"⏳ {MSG_SENHA_OCUPADO}")
+                    if senha_hash is not None:
+                        if update_user_password(user['id'], senha_hash):
+                            st.success("Senha alterada!")
+                            atualizado = True
+                            st.session_state['force_password_change'] = False
+                        else:
+                            st.error("Falha ao alterar senha.")
                 if atualizado:
                     st.rerun()
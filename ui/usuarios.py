@@ -2,14 +2,19 @@ import streamlit as st
 import pandas as pd
 from services.data_access_core import (
     db_connect,
+    invalidar_tabelas,
 )
 from services.data_access_apostas import (
     get_participantes_temporada_df,
 )
 from services.data_access_auth import (
+    MSG_SENHA_OCUPADO,
+    SenhaServicoOcupado,
+    delete_usuario,
     get_usuarios_df,
     registrar_historico_status_usuario,
     update_user_password,
+    update_usuario,
     usuarios_status_historico_disponivel,
 )
 from services.auth_service import hash_password
@@ -200,36 +205,30 @@ def _render_gestao_usuarios_tab(perfil: str):
     with col1:
         if st.button("Atualizar usuário"):
             status_anterior = str(user_row["status"]).strip()
-            with db_connect() as conn:
-                c = conn.cursor()
-                if novas_faltas is not None:
-                    # Inclui faltas no UPDATE quando a coluna está disponível
-                    c.execute(
-                        "UPDATE usuarios SET nome=%s, email=%s, perfil=%s, status=%s, faltas=%s WHERE id=%s",
-                        (novo_nome, novo_email, novo_perfil, novo_status, int(novas_faltas), int(user_row["id"]))
-                    )
-                else:
-                    c.execute(
-                        "UPDATE usuarios SET nome=%s, email=%s, perfil=%s, status=%s WHERE id=%s",
-                        (novo_nome, novo_email, novo_perfil, novo_status, int(user_row["id"]))
+            campos = {"nome": novo_nome, "email": novo_email, "perfil": novo_perfil, "status": novo_status}
+            if novas_faltas is not None:
+                # Inclui faltas no UPDATE quando a coluna está disponível
+                campos["faltas"] = int(novas_faltas)
+            # Via repositório para também invalidar as sessões em cache do usuário.
+            if not update_usuario(int(user_row["id"]), **campos):
+                st.error("Não foi possível atualizar o usuário.")
+            else:
+                if status_anterior != novo_status:
+                    alterado_por = st.session_state.get("user_id")
+                    data_referencia_status = None
+                    if str(novo_status).strip().lower() == "inativo":
+                        ano_anterior = datetime.now().year - 1
+                        data_referencia_status = f"{ano_anterior}-12-31 23:59:59"
+                    registrar_historico_status_usuario(
+                        int(user_row["id"]),
+                        novo_status,
+                        alterado_por=alterado_por,
+                        motivo="gestao_usuarios",
+                        data_referencia=data_referencia_status,
                     )
-                conn.commit()
-            if status_anterior != novo_status:
-                alterado_por = st.session_state.get("user_id")
-                data_referencia_status = None
-                if str(novo_status).strip().lower() == "inativo":
-                    ano_anterior = datetime.now().year - 1
-                    data_referencia_status = f"{ano_anterior}-12-31 23:59:59"
-                registrar_historico_status_usuario(
-                    int(user_row["id"]),
-                    novo_status,
-                    alterado_por=alterado_por,
-                    motivo="gestao_usuarios",
-                    data_referencia=data_referencia_status,
-                )
-            st.success("Usuário atualizado!")
-            st.cache_data.clear()
-            st.rerun()
+                st.success("Usuário atualizado!")
+                invalidar_tabelas("usuarios", "usuarios_status_historico")
+                st.rerun()
 
     with col2:
         if "alterar_senha" not in st.session_state:
@@ -244,14 +243,18 @@ def _render_gestao_usuarios_tab(perfil: str):
                 if not nova_senha:
                     st.error("Digite a nova senha.")
                 else:
-                    nova_hash = hash_password(nova_senha)
-                    ok = update_user_password(int(user_row["id"]), nova_hash, must_change_password=True)
-                    if ok:
-                        st.success("Senha atualizada com sucesso! O usuário deverá trocar a senha no próximo acesso.")
-                        st.session_state["alterar_senha"] = False
-                        st.rerun()
+                    try:
+                        nova_hash = hash_password(nova_senha)
+                    except SenhaServicoOcupado:
+                        st.warning(f"⏳ {MSG_SENHA_OCUPADO}")
                     else:
-                        st.error("Não foi possível atualizar a senha deste usuário.")
+                        ok = update_user_password(int(user_row["id"]), nova_hash, must_change_password=True)
+                        if ok:
+                            st.success("Senha atualizada com sucesso! O usuário deverá trocar a senha no próximo acesso.")
+                            st.session_state["alterar_senha"] = False
+                            st.rerun()
+                        else:
+                            st.error("Não foi possível atualizar a senha deste usuário.")
             if st.button("Cancelar alteração de senha"):
                 st.session_state["alterar_senha"] = False
 
@@ -260,14 +263,11 @@ def _render_gestao_usuarios_tab(perfil: str):
         if st.button("Excluir usuário selecionado"):
             if user_row["perfil"] == "master":
                 st.error("Não é possível excluir um usuário master.")
-            else:
-                with db_connect() as conn:
-                    c = conn.cursor()
-                    c.execute("DELETE FROM usuarios WHERE id=%s", (int(user_row["id"]),))
-                    conn.commit()
+            elif delete_usuario(int(user_row["id"])):
                 st.success("Usuário excluído com sucesso!")
-                st.cache_data.clear()
                 st.rerun()
+            else:
+                st.error("Não foi possível excluir o usuário.")
 
     st.markdown("---")
     st.markdown("### Adicionar Novo Usuário")
@@ -282,13 +282,17 @@ def _render_gestao_usuarios_tab(perfil: str):
             st.error("Preencha todos os campos obrigatórios.")
         else:
           from services.auth_service import cadastrar_usuario
-          sucesso = cadastrar_usuario(nome_novo, email_novo, senha_novo, perfil=perfil_novo, status=status_novo)
-          if sucesso:
-              st.success("Usuário adicionado com sucesso!")
-              st.cache_data.clear()
-              st.rerun()
+          try:
+              sucesso = cadastrar_usuario(nome_novo, email_novo, senha_novo, perfil=perfil_novo, status=status_novo)
+          except SenhaServicoOcupado:
+              st.warning(f"⏳ {MSG_SENHA_OCUPADO}")
           else:
-              st.error("Email já cadastrado.")
+              if sucesso:
+                  st.success("Usuário adicionado com sucesso!")
+                  invalidar_tabelas("usuarios", "usuarios_status_historico")
+                  st.rerun()
+              else:
+                  st.error("Email já cadastrado.")
 
 
 def _render_gestao_financeira_tab():
@@ -1,15 +1,31 @@
 import datetime
+import os
 import re
+import threading
+import time
 from collections import defaultdict
-from typing import Optional
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Iterator, Optional
 
 import pandas as pd
 import requests
 import streamlit as st
 
+from utils.ergast_cache import ErgastResponseCache
+
 BASE_URL = "https://api.jolpi.ca/ergast/f1"
+# Teto do parâmetro `limit` da API Jolpica
+ERGAST_PAGE_LIMIT = 100
 REQUEST_TIMEOUT = 10
 _SESSION = requests.Session()
+_FETCH_EXECUTOR = ThreadPoolExecutor(max_workers=6, thread_name_prefix="ergast-fetch")
+
+# Cache HTTP persistente: sobrevive a restarts/redeploys. Vazio desativa.
+ERGAST_CACHE_PATH = os.getenv("BF1_ERGAST_CACHE_PATH", os.path.join(".cache", "ergast_cache.sqlite3"))
+_HTTP_CACHE = (
+    ErgastResponseCache(ERGAST_CACHE_PATH, _SESSION, REQUEST_TIMEOUT, fresh_ttl=300.0) if ERGAST_CACHE_PATH else None
+)
 
 
 def _empty_df(columns: list[str]) -> pd.DataFrame:
@@ -38,15 +54,107 @@ def _status_is_finished(status: str) -> bool:
     return s == "finished" or s.startswith("+")
 
 
-def _request_json(url: str) -> Optional[dict]:
+class PrazoErgastEsgotado(TimeoutError):
+    """Requisição interrompida pelo prazo de `prazo_requisicoes`.
+
+    É exceção (e não None) para que o `st.cache_data` das funções não guarde
+    como resultado os dados que faltaram por causa do prazo.
+    """
+
+
+_prazo_local = threading.local()
+
+
+@contextmanager
+def prazo_requisicoes(prazo: Optional[float]) -> Iterator[None]:
+    """Limita as requisições deste thread ao instante `prazo` (`time.monotonic()`)."""
+    anterior = getattr(_prazo_local, "prazo", None)
+    _prazo_local.prazo = prazo
     try:
-        response = _SESSION.get(url, timeout=REQUEST_TIMEOUT)
-        response.raise_for_status()
-        return response.json()
-    except requests.RequestException:
-        return None
-    except ValueError:
-        return None
+        yield
+    finally:
+        _prazo_local.prazo = anterior
+
+
+def _timeout_requisicao() -> float:
+    prazo = getattr(_prazo_local, "prazo", None)
+    if prazo is None:
+        return REQUEST_TIMEOUT
+    return min(float(REQUEST_TIMEOUT), prazo - time.monotonic())
+
+
+def _request_json(url: str) -> Optional[dict]:
+    timeout = _timeout_requisicao()
+    data = None
+    if _HTTP_CACHE is not None:
+        # Sem tempo restante, o cache ainda serve o que tiver, sem ir à rede.
+        data = _HTTP_CACHE.get_json(url, timeout=timeout)
+    elif timeout > 0:
+        try:
+            response = _SESSION.get(url, timeout=timeout)
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError):
+            data = None
+    if data is None and _timeout_requisicao() <= 0:
+        raise PrazoErgastEsgotado(url)
+    return data
+
+
+def _request_json_many(urls: list[str]) -> list[Optional[dict]]:
+    """Busca várias URLs independentes em paralelo, preservando a ordem."""
+    if len(urls) <= 1:
+        return [_request_json(url) for url in urls]
+    prazo = getattr(_prazo_local, "prazo", None)
+    if prazo is None:
+        return list(_FETCH_EXECUTOR.map(_request_json, urls))
+
+    def _request_json_no_prazo(url: str) -> Optional[dict]:
+        with prazo_requisicoes(prazo):
+            return _request_json(url)
+
+    return list(_FETCH_EXECUTOR.map(_request_json_no_prazo, urls))
+
+
+def _request_races_paginado(paths: list[str], chave_itens: str) -> list[Optional[list[dict]]]:
+    """Busca todas as páginas de cada endpoint de corridas e junta os itens por rodada.
+
+    A API limita `limit` a 100 itens (resultados, não corridas), então uma mesma
+    corrida pode vir dividida entre páginas. As primeiras páginas e depois as
+    restantes são buscadas em paralelo. Para cada path retorna a lista de
+    corridas, ou None se alguma página falhar.
+    """
+    def _url(path: str, offset: int) -> str:
+        sep = "&" if "?" in path else "?"
+        return f"{BASE_URL}/{path}{sep}limit={ERGAST_PAGE_LIMIT}&offset={offset}"
+
+    paginas: list[Optional[list]] = []
+    pendentes: list[tuple[int, str]] = []
+    for i, (path, primeira) in enumerate(zip(paths, _request_json_many([_url(p, 0) for p in paths]))):
+        try:
+            total = int(primeira["MRData"].get("total", 0))
+        except (KeyError, TypeError, ValueError):
+            paginas.append(None)
+            continue
+        paginas.append([primeira])
+        pendentes.extend((i, _url(path, offset)) for offset in range(ERGAST_PAGE_LIMIT, total, ERGAST_PAGE_LIMIT))
+    for (i, _), data in zip(pendentes, _request_json_many([url for _, url in pendentes])):
+        if paginas[i] is not None:
+            paginas[i].append(data)
+
+    resultado: list[Optional[list[dict]]] = []
+    for paginas_path in paginas:
+        por_rodada: dict[tuple[str, int], dict] = {}
+        try:
+            for data in paginas_path or []:
+                for race in data["MRData"]["RaceTable"].get("Races", []):
+                    chave = (str(race.get("season", "")), _safe_int(race.get("round"), default=-1))
+                    atual = por_rodada.setdefault(chave, {k: v for k, v in race.items() if k != chave_itens})
+                    atual.setdefault(chave_itens, []).extend(race.get(chave_itens, []))
+        except (KeyError, TypeError):
+            paginas_path = None
+        resultado.append([por_rodada[chave] for chave in sorted(por_rodada)] if paginas_path is not None else None)
+    return resultado
 
 
 def _resolve_season(season: str) -> str:
@@ -66,6 +174,85 @@ def get_current_season() -> str:
     except (KeyError, TypeError):
         return str(datetime.datetime.now().year)
 
+def _index_store_round(store: dict, rnd: int, race_name: str, rows: list[dict]) -> None:
+    store["race_names"][rnd] = race_name
+    store["by_round"][rnd] = rows
+    for row in rows:
+        if row["name"]:
+            store["by_driver"].setdefault(row["name"], {}).setdefault(rnd, (row["position"], row["finished"]))
+
+
+def _season_store_from_mirror(season_val: str) -> Optional[dict]:
+    try:
+        from db.ergast_mirror import get_resultados_temporada_espelho
+
+        espelho = get_resultados_temporada_espelho(season_val)
+    except Exception:
+        return None
+    if espelho is None:
+        return None
+
+    store = {"total_races": espelho["total_races"], "rounds": [], "race_names": {}, "by_round": {}, "by_driver": {}}
+    for rnd, race_name, linhas in espelho["races"]:
+        rows = [
+            {
+                "driver": str(linha["piloto"] or ""),
+                "name": _normalize_driver_name(linha["piloto"]),
+                "position": _safe_int(linha["posicao"], default=0),
+                "points": _safe_int(linha["pontos"]),
+                "finished": bool(linha["terminou"]),
+            }
+            for linha in linhas
+        ]
+        _index_store_round(store, rnd, race_name, rows)
+    store["rounds"] = sorted(store["by_round"].keys())
+    return store
+
+
+@st.cache_data(ttl=600, show_spinner=False)
+def _get_season_results_store(season_val: str) -> dict:
+    """Indexa uma única vez os resultados da temporada.
+
+    Lê do espelho local (`db/ergast_mirror`) quando a temporada já foi sincronizada;
+    senão baixa o documento `/{season}/results.json`.
+
+    Estrutura retornada:
+      - total_races: quantidade de corridas (rodadas distintas)
+      - rounds: rodadas válidas, em ordem
+      - race_names: {rodada: nome da corrida}
+      - by_round: {rodada: [{driver, name, position, points, finished}, ...]}
+      - by_driver: {nome_normalizado: {rodada: (posicao, terminou)}}
+    """
+    store = _season_store_from_mirror(season_val)
+    if store is not None:
+        return store
+
+    store = {"total_races": 0, "rounds": [], "race_names": {}, "by_round": {}, "by_driver": {}}
+    races = _request_races_paginado([f"{season_val}/results.json"], "Results")[0]
+    if not races:
+        return store
+
+    for race in races:
+        rnd = _safe_int(race.get('round'), default=-1)
+        if rnd <= 0 or rnd in store["by_round"]:
+            continue
+        rows = []
+        for result in race.get('Results', []):
+            driver = _extract_driver_name(result.get('Driver', {}))
+            rows.append({
+                "driver": driver,
+                "name": _normalize_driver_name(driver),
+                "position": _safe_int(result.get('position'), default=0),
+                "points": _safe_int(result.get('points')),
+                "finished": _status_is_finished(str(result.get('status', ''))),
+            })
+        _index_store_round(store, rnd, str(race.get('raceName', f'Round {rnd}')), rows)
+
+    store["rounds"] = sorted(store["by_round"].keys())
+    store["total_races"] = len(store["rounds"])
+    return store
+
+
 # 2. Get driver standings by season
 @st.cache_data(ttl=600, show_spinner=False)
 def get_driver_standings(season: str = 'current') -> pd.DataFrame:
@@ -159,48 +346,23 @@ def get_driver_points_by_race(season: str = 'current') -> pd.DataFrame:
     Args:
         season: Ano da temporada (ex: '2024', '1950') ou 'current' para temporada atual
     """
-    season_val = _resolve_season(season)
-    data = _request_json(f"{BASE_URL}/{season_val}/results.json?limit=2000")
-    if not data:
-        return _empty_df(['Round', 'Race'])
-
-    try:
-        all_races = data['MRData']['RaceTable'].get('Races', [])
-    except (KeyError, TypeError):
-        return _empty_df(['Round', 'Race'])
-
-    if not all_races:
-        return _empty_df(['Round', 'Race'])
-
-    unique_races = {}
-    for race in all_races:
-        round_num = _safe_int(race.get('round'), default=-1)
-        if round_num > 0 and round_num not in unique_races:
-            unique_races[round_num] = race
-
-    rounds = sorted(unique_races.keys())
+    store = _get_season_results_store(_resolve_season(season))
+    rounds = store["rounds"]
     if not rounds:
         return _empty_df(['Round', 'Race'])
 
     points_tracker: dict[str, dict[int, int]] = defaultdict(dict)
-    driver_names: set[str] = set()
-
     for round_num in rounds:
-        race = unique_races[round_num]
-        for result in race.get('Results', []):
-            driver_info = result.get('Driver', {})
-            driver_name = f"{driver_info.get('givenName', '')} {driver_info.get('familyName', '')}".strip()
-            if not driver_name:
-                continue
-            driver_names.add(driver_name)
-            points_tracker[driver_name][round_num] = _safe_int(result.get('points'))
+        for row in store["by_round"][round_num]:
+            if row["driver"]:
+                points_tracker[row["driver"]][round_num] = row["points"]
 
     output = {
         'Round': rounds,
-        'Race': [str(unique_races[r].get('raceName', f'Round {r}')) for r in rounds],
+        'Race': [store["race_names"][r] for r in rounds],
     }
 
-    for driver in sorted(driver_names):
+    for driver in sorted(points_tracker):
         cumulative = 0
         cumulative_points = []
         for round_num in rounds:
@@ -365,63 +527,51 @@ def get_posicoes_recentes(season: str = 'current', n_corridas: int = 5) -> dict[
 
     Usa resultados oficiais da temporada e considera as últimas n corridas disponíveis.
     """
-    season_val = _resolve_season(season)
-    data = _request_json(f"{BASE_URL}/{season_val}/results.json?limit=2000")
-    if not data:
-        return {}
-
-    try:
-        races = data['MRData']['RaceTable'].get('Races', [])
-    except (KeyError, TypeError):
-        return {}
-
-    if not races:
-        return {}
-
-    unique_by_round: dict[int, dict] = {}
-    for race in races:
-        r = _safe_int(race.get('round'), default=-1)
-        if r > 0 and r not in unique_by_round:
-            unique_by_round[r] = race
-
-    rounds = sorted(unique_by_round.keys())
+    store = _get_season_results_store(_resolve_season(season))
+    rounds = store["rounds"]
     if not rounds:
         return {}
 
     selected_rounds = rounds[-max(1, int(n_corridas)):]
-    out: dict[str, list[int]] = defaultdict(list)
-    for rnd in selected_rounds:
-        race = unique_by_round[rnd]
-        for result in race.get('Results', []):
-            driver = result.get('Driver', {})
-            name = _normalize_driver_name(_extract_driver_name(driver))
-            if not name:
-                continue
-            pos = _safe_int(result.get('position'), default=0)
-            if pos > 0:
-                out[name].append(pos)
+    out: dict[str, list[int]] = {}
+    for name, por_rodada in store["by_driver"].items():
+        posicoes = [por_rodada[rnd][0] for rnd in selected_rounds if rnd in por_rodada and por_rodada[rnd][0] > 0]
+        if posicoes:
+            out[name] = posicoes
 
-    return dict(out)
+    return out
 
 
 @st.cache_data(ttl=3600, show_spinner=False)
 def get_qualifying_grid_ultima_corrida(season: str = 'current') -> dict[str, int]:
     """Retorna grid de classificação da última corrida disponível na temporada.
 
+    O espelho sincroniza de hora em hora: na temporada corrente ele só é usado se
+    a última rodada espelhada for a mesma de `last/qualifying` na API.
+
     Formato: {nome_normalizado: posicao_grid}
     """
     season_val = _resolve_season(season)
-    data = _request_json(f"{BASE_URL}/{season_val}/last/qualifying.json")
-    if not data:
-        return {}
+    try:
+        from db.ergast_mirror import get_grid_ultima_corrida_espelho
+
+        rodada_espelho, grid_espelho = get_grid_ultima_corrida_espelho(season_val) or (None, {})
+    except Exception:
+        rodada_espelho, grid_espelho = None, {}
+    if grid_espelho and season_val != get_current_season():
+        return grid_espelho
 
+    data = _request_json(f"{BASE_URL}/{season_val}/last/qualifying.json")
     try:
-        races = data['MRData']['RaceTable'].get('Races', [])
+        races = data['MRData']['RaceTable'].get('Races', []) if data else []
     except (KeyError, TypeError):
-        return {}
+        races = []
 
     if not races:
-        return {}
+        # API indisponível: o espelho é o melhor dado que há.
+        return grid_espelho
+    if grid_espelho and _safe_int(races[0].get('round'), default=-1) == rodada_espelho:
+        return grid_espelho
 
     out: dict[str, int] = {}
     for item in races[0].get('QualifyingResults', []):
@@ -501,16 +651,19 @@ def get_historico_circuito(circuit_id: str, n_anos: int = 4, season_ref: str = '
     ano_ref = _safe_int(season_val, default=datetime.datetime.now().year)
     anos = [str(ano) for ano in range(max(1950, ano_ref - max(1, n_anos) + 1), ano_ref + 1)]
 
+    try:
+        from db.ergast_mirror import get_historico_circuito_espelho
+
+        medias_espelho = get_historico_circuito_espelho(circuit_id, anos)
+    except Exception:
+        medias_espelho = None
+    if medias_espelho is not None:
+        return medias_espelho
+
     acum: dict[str, list[int]] = defaultdict(list)
-    for ano in anos:
-        data = _request_json(f"{BASE_URL}/{ano}/circuits/{circuit_id}/results.json?limit=2000")
-        if not data:
-            continue
-        try:
-            races = data['MRData']['RaceTable'].get('Races', [])
-        except (KeyError, TypeError):
-            continue
-        for race in races:
+    respostas = _request_races_paginado([f"{ano}/circuits/{circuit_id}/results.json" for ano in anos], "Results")
+    for races in respostas:
+        for race in races or []:
             for result in race.get('Results', []):
                 driver = result.get('Driver', {})
                 name = _normalize_driver_name(_extract_driver_name(driver))
@@ -541,31 +694,13 @@ def get_frequencia_11_por_piloto(seasons: Optional[list[str]] = None) -> dict[st
     contagem_p11: dict[str, int] = defaultdict(int)
 
     for season in seasons:
-        season_val = _resolve_season(str(season))
-        season_results = _request_json(f"{BASE_URL}/{season_val}/results.json?limit=2000")
-        if season_results:
-            try:
-                races_all = season_results['MRData']['RaceTable'].get('Races', [])
-                total_corridas += len(races_all)
-            except (KeyError, TypeError):
-                pass
-
-        data = _request_json(f"{BASE_URL}/{season_val}/results/11.json?limit=2000")
-        if not data:
-            continue
-        try:
-            races = data['MRData']['RaceTable'].get('Races', [])
-        except (KeyError, TypeError):
-            continue
-
-        for race in races:
-            results = race.get('Results', [])
-            if not results:
-                continue
-            driver = results[0].get('Driver', {})
-            name = _normalize_driver_name(_extract_driver_name(driver))
-            if name:
-                contagem_p11[name] += 1
+        store = _get_season_results_store(_resolve_season(str(season)))
+        total_corridas += store["total_races"]
+        for rnd in store["rounds"]:
+            for row in store["by_round"][rnd]:
+                if row["position"] == 11 and row["name"]:
+                    contagem_p11[row["name"]] += 1
+                    break
 
     if total_corridas <= 0:
         return {}
@@ -586,25 +721,8 @@ def get_taxa_dnf_por_piloto(
     Quando usar_suavizacao=True, aplica prior bayesiano para reduzir extremos no início da temporada:
       taxa = (dnf_observado + prior_corridas * prior_taxa_dnf) / (corridas_observadas + prior_corridas)
     """
-    season_val = _resolve_season(season)
-    data = _request_json(f"{BASE_URL}/{season_val}/results.json?limit=2000")
-    if not data:
-        return {}
-
-    try:
-        races = data['MRData']['RaceTable'].get('Races', [])
-    except (KeyError, TypeError):
-        return {}
-
-    if not races:
-        return {}
-
-    unique_by_round: dict[int, dict] = {}
-    for race in races:
-        r = _safe_int(race.get('round'), default=-1)
-        if r > 0 and r not in unique_by_round:
-            unique_by_round[r] = race
-    rounds = sorted(unique_by_round.keys())
+    store = _get_season_results_store(_resolve_season(season))
+    rounds = store["rounds"]
     if not rounds:
         return {}
 
@@ -612,16 +730,12 @@ def get_taxa_dnf_por_piloto(
     total_partidas: dict[str, int] = defaultdict(int)
     total_dnf: dict[str, int] = defaultdict(int)
 
-    for rnd in selected_rounds:
-        race = unique_by_round[rnd]
-        for result in race.get('Results', []):
-            driver = result.get('Driver', {})
-            name = _normalize_driver_name(_extract_driver_name(driver))
-            if not name:
+    for name, por_rodada in store["by_driver"].items():
+        for rnd in selected_rounds:
+            if rnd not in por_rodada:
                 continue
             total_partidas[name] += 1
-            status = str(result.get('status', ''))
-            if not _status_is_finished(status):
+            if not por_rodada[rnd][1]:
                 total_dnf[name] += 1
 
     out: dict[str, float] = {}
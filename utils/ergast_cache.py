@@ -0,0 +1,197 @@
+"""Cache HTTP persistente (SQLite) para respostas da API Ergast/Jolpica.
+
+Regras:
+  - Temporadas encerradas (ano < ano corrente) são imutáveis: guardadas para sempre.
+  - Demais respostas ficam frescas por `fresh_ttl`; depois disso são revalidadas com
+    If-None-Match / If-Modified-Since.
+  - Respostas vencidas há menos de `stale_window` são servidas na hora e revalidadas
+    em background (stale-while-revalidate). Se a API falhar, a cópia local é servida.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import logging
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+_SEASON_RE = re.compile(r"/f1/(\d{4})(?:/|\.json)")
+
+_DDL = """
+    CREATE TABLE IF NOT EXISTS ergast_respostas (
+        url           TEXT PRIMARY KEY,
+        corpo         TEXT NOT NULL,
+        etag          TEXT,
+        last_modified TEXT,
+        obtido_em     REAL NOT NULL,
+        imutavel      INTEGER NOT NULL DEFAULT 0
+    )
+"""
+
+
+def _url_imutavel(url: str) -> bool:
+    match = _SEASON_RE.search(url)
+    if not match:
+        return False
+    return int(match.group(1)) < datetime.datetime.now().year
+
+
+class ErgastResponseCache:
+    """Cache de respostas JSON em disco, seguro para uso entre threads e processos."""
+
+    def __init__(
+        self,
+        path: str,
+        session: requests.Session,
+        timeout: float,
+        fresh_ttl: float = 600.0,
+        stale_window: float = 86400.0,
+    ) -> None:
+        self.path = path
+        self.session = session
+        self.timeout = timeout
+        self.fresh_ttl = fresh_ttl
+        self.stale_window = stale_window
+        self._habilitado = True
+        self._em_revalidacao: set[str] = set()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="ergast-swr")
+        self._inicializar()
+
+    def _conectar(self) -> sqlite3.Connection:
+        return sqlite3.connect(self.path, timeout=5)
+
+    def _inicializar(self) -> None:
+        try:
+            pasta = os.path.dirname(self.path)
+            if pasta:
+                os.makedirs(pasta, exist_ok=True)
+            with self._conectar() as conn:
+                conn.execute("PRAGMA journal_mode=WAL")
+                conn.execute(_DDL)
+        except (OSError, sqlite3.Error) as exc:
+            logger.warning("Cache Ergast em disco desativado (%s): %s", self.path, exc)
+            self._habilitado = False
+
+    def _ler(self, url: str) -> Optional[tuple]:
+        try:
+            with self._conectar() as conn:
+                return conn.execute(
+                    "SELECT corpo, etag, last_modified, obtido_em, imutavel FROM ergast_respostas WHERE url = ?",
+                    (url,),
+                ).fetchone()
+        except sqlite3.Error as exc:
+            logger.debug("Falha ao ler cache Ergast: %s", exc)
+            return None
+
+    def _gravar(self, url: str, corpo: str, etag: Optional[str], last_modified: Optional[str]) -> None:
+        try:
+            with self._conectar() as conn:
+                conn.execute(
+                    """
+                    INSERT INTO ergast_respostas (url, corpo, etag, last_modified, obtido_em, imutavel)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(url) DO UPDATE SET
+                        corpo = excluded.corpo,
+                        etag = excluded.etag,
+                        last_modified = excluded.last_modified,
+                        obtido_em = excluded.obtido_em,
+                        imutavel = excluded.imutavel
+                    """,
+                    (url, corpo, etag, last_modified, time.time(), int(_url_imutavel(url))),
+                )
+        except sqlite3.Error as exc:
+            logger.debug("Falha ao gravar cache Ergast: %s", exc)
+
+    def _tocar(self, url: str) -> None:
+        try:
+            with self._conectar() as conn:
+                conn.execute("UPDATE ergast_respostas SET obtido_em = ? WHERE url = ?", (time.time(), url))
+        except sqlite3.Error as exc:
+            logger.debug("Falha ao atualizar cache Ergast: %s", exc)
+
+    def _buscar(self, url: str, entrada: Optional[tuple], timeout: Optional[float] = None) -> Optional[dict]:
+        """GET (condicional quando há entrada). Retorna o JSON atualizado ou None em erro.
+
+        `timeout` <= 0 (prazo do chamador esgotado) não chega a ir à rede.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if timeout <= 0:
+            return None
+        headers = {}
+        if entrada is not None:
+            if entrada[1]:
+                headers["If-None-Match"] = entrada[1]
+            if entrada[2]:
+                headers["If-Modified-Since"] = entrada[2]
+        try:
+            response = self.session.get(url, timeout=timeout, headers=headers or None)
+            if response.status_code == 304 and entrada is not None:
+                if self._habilitado:
+                    self._tocar(url)
+                return json.loads(entrada[0])
+            response.raise_for_status()
+            data = response.json()
+        except (requests.RequestException, ValueError):
+            return None
+
+        if self._habilitado and data:
+            self._gravar(
+                url,
+                json.dumps(data, ensure_ascii=False, separators=(",", ":")),
+                response.headers.get("ETag"),
+                response.headers.get("Last-Modified"),
+            )
+        return data
+
+    def _revalidar_em_background(self, url: str, entrada: tuple) -> None:
+        with self._lock:
+            if url in self._em_revalidacao:
+                return
+            self._em_revalidacao.add(url)
+
+        def _tarefa() -> None:
+            try:
+                self._buscar(url, entrada)
+            finally:
+                with self._lock:
+                    self._em_revalidacao.discard(url)
+
+        self._executor.submit(_tarefa)
+
+    def get_json(self, url: str, timeout: Optional[float] = None) -> Optional[dict]:
+        """JSON de `url`; `timeout` limita só a ida à rede desta chamada."""
+        if not self._habilitado:
+            return self._buscar(url, None, timeout)
+
+        entrada = self._ler(url)
+        if entrada is None:
+            return self._buscar(url, None, timeout)
+
+        corpo, _etag, _last_modified, obtido_em, imutavel = entrada
+        idade = time.time() - float(obtido_em or 0)
+        if imutavel or idade <= self.fresh_ttl:
+            return json.loads(corpo)
+
+        if idade <= self.fresh_ttl + self.stale_window:
+            self._revalidar_em_background(url, entrada)
+            return json.loads(corpo)
+
+        data = self._buscar(url, entrada, timeout)
+        if data is None:
+            # API fora do ar (ou sem tempo): serve a última cópia conhecida.
+            return json.loads(corpo)
+        return data
+
+
+__all__ = ["ErgastResponseCache"]
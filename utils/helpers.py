@@ -122,3 +122,33 @@ def render_page_header(st_module: Any, title: str, logo_width: int = 75) -> None
     if user_status and user_status != "ativo":
         st_module.warning("Você está inativo e visualiza apenas temporadas em que esteve ativo.")
 
+
+
+def keyset_page_cursor(st_module: Any, key: str, filters: tuple) -> Any:
+    """Cursor da página atual de uma listagem paginada por chave.
+
+    A pilha de cursores fica em `st.session_state[key]` e volta à primeira
+    página sempre que os filtros mudam.
+    """
+    state = st_module.session_state.get(key)
+    if not state or state.get("filters") != filters:
+        state = {"filters": filters, "cursors": [None]}
+        st_module.session_state[key] = state
+    return state["cursors"][-1]
+
+
+def render_keyset_pager(st_module: Any, key: str, next_cursor: Any) -> None:
+    """Botões Anterior/Próxima para a listagem de `keyset_page_cursor`."""
+    state = st_module.session_state.get(key) or {"cursors": [None]}
+    cursors = state["cursors"]
+    col_prev, col_page, col_next = st_module.columns([1, 2, 1])
+    with col_prev:
+        if st_module.button("← Anterior", key=f"{key}_prev", disabled=len(cursors) <= 1, width="stretch"):
+            cursors.pop()
+            st_module.rerun()
+    with col_page:
+        st_module.caption(f"Página {len(cursors)}")
+    with col_next:
+        if st_module.button("Próxima →", key=f"{key}_next", disabled=next_cursor is None, width="stretch"):
+            cursors.append(next_cursor)
+            st_module.rerun()
@@ -0,0 +1,137 @@
+"""Hash e verificação bcrypt num pool limitado de threads.
+
+O bcrypt libera o GIL, então rodá-lo no thread do script do Streamlit deixa
+cada login consumir um núcleo inteiro: num pico de acessos os reruns das
+demais sessões ficam sem CPU. Aqui no máximo `BF1_BCRYPT_WORKERS` hashes rodam
+ao mesmo tempo e a fila tem profundidade limitada; quando não há vaga a
+chamada levanta `SenhaServicoOcupado` para a interface pedir que o usuário
+tente de novo.
+"""
+
+from __future__ import annotations
+
+import logging
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+import bcrypt
+
+from db.db_config import BCRYPT_ROUNDS
+
+logger = logging.getLogger(__name__)
+
+WORKERS_BCRYPT = max(1, int(os.getenv("BF1_BCRYPT_WORKERS", str(min(4, max(1, (os.cpu_count() or 2) - 1))))))
+# Chamadas aguardando além das que estão em execução
+FILA_MAX_BCRYPT = max(0, int(os.getenv("BF1_BCRYPT_FILA_MAX", str(WORKERS_BCRYPT * 8))))
+# Quanto uma chamada espera por vaga na fila antes de desistir (segundos)
+ESPERA_VAGA_BCRYPT = float(os.getenv("BF1_BCRYPT_ESPERA", "3"))
+
+MSG_SENHA_OCUPADO = "Muitos acessos simultâneos no momento. Aguarde alguns segundos e tente novamente."
+
+_vagas = threading.BoundedSemaphore(WORKERS_BCRYPT + FILA_MAX_BCRYPT)
+_executor_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+class SenhaServicoOcupado(RuntimeError):
+    """Pool de bcrypt sem vaga: a operação deve ser tentada de novo em instantes."""
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=WORKERS_BCRYPT, thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _submeter(fn: Callable, *args, espera: Optional[float] = ESPERA_VAGA_BCRYPT) -> Future:
+    if espera is None:
+        vaga = _vagas.acquire()
+    else:
+        vaga = _vagas.acquire(timeout=espera) if espera > 0 else _vagas.acquire(blocking=False)
+    if not vaga:
+        raise SenhaServicoOcupado("Pool de bcrypt sem vaga")
+    try:
+        futuro = _get_executor().submit(fn, *args)
+    except BaseException:
+        _vagas.release()
+        raise
+    futuro.add_done_callback(lambda _: _vagas.release())
+    return futuro
+
+
+def _hash(plain: str, rounds: int) -> str:
+    return bcrypt.hashpw(plain.encode(), bcrypt.gensalt(rounds=rounds)).decode()
+
+
+def _verificar(plain: str, hashed: str) -> bool:
+    try:
+        return bcrypt.checkpw(plain.encode(), hashed.encode())
+    except Exception:
+        return False
+
+
+def hash_senha(plain: str, espera: Optional[float] = ESPERA_VAGA_BCRYPT) -> str:
+    """Gera o hash bcrypt com o custo `BCRYPT_ROUNDS` configurado.
+
+    `espera=None` aguarda vaga sem limite (inicialização, sem usuário esperando).
+    """
+    return _submeter(_hash, plain, BCRYPT_ROUNDS, espera=espera).result()
+
+
+def verificar_senha(plain: str, hashed: str) -> bool:
+    """True se `plain` confere com `hashed`; hash inválido conta como senha errada."""
+    if not plain or not hashed:
+        return False
+    return _submeter(_verificar, plain, hashed).result()
+
+
+def custo_hash(hashed: str) -> Optional[int]:
+    """Custo (log2 das rodadas) de um hash `$2b$12$...`, ou None se não for bcrypt."""
+    partes = str(hashed or "").split("$")
+    if len(partes) < 4 or not partes[1].startswith("2"):
+        return None
+    try:
+        return int(partes[2])
+    except ValueError:
+        return None
+
+
+def precisa_rehash(hashed: str) -> bool:
+    custo = custo_hash(hashed)
+    return custo is not None and custo != BCRYPT_ROUNDS
+
+
+def agendar_rehash(plain: str, ao_concluir: Callable[[str], None]) -> bool:
+    """Recalcula o hash em segundo plano e entrega o novo a `ao_concluir`.
+
+    Não espera vaga: com o pool ocupado o rehash fica para o próximo login.
+    """
+    try:
+        futuro = _submeter(_hash, plain, BCRYPT_ROUNDS, espera=0)
+    except SenhaServicoOcupado:
+        return False
+
+    def _concluir(f: Future) -> None:
+        try:
+            ao_concluir(f.result())
+        except Exception as exc:
+            logger.warning("Falha ao atualizar hash de senha: %s", exc)
+
+    futuro.add_done_callback(_concluir)
+    return True
+
+
+__all__ = [
+    "MSG_SENHA_OCUPADO",
+    "SenhaServicoOcupado",
+    "hash_senha",
+    "verificar_senha",
+    "custo_hash",
+    "precisa_rehash",
+    "agendar_rehash",
+]